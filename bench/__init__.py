@@ -0,0 +1,4 @@
+# bench/__init__.py
+"""
+Бенчмарки производительности OnboardingBuddy
+"""
@@ -0,0 +1,116 @@
+# bench/active_users_bench.py
+"""
+Бенчмарк активных пользователей: дневные скетчи HyperLogLog против
+COUNT(DISTINCT user_id) по user_actions
+
+Замеряются точный расчет статистики и активности по дням, первая загрузка
+скетчей по всей истории, загрузка сохраненных скетчей и ответ по ним.
+Ошибка скетчей считается для каждого дня и для DAU/WAU/MAU. Проверяется,
+что действия через log_user_action сразу попадают в счетчики и не
+теряются при перезапуске без сохранения.
+
+Запуск: python -m bench.active_users_bench [--db data/bench.db] [--users N] [--actions N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+from bench.dataset import generate
+from database.manager import DatabaseManager
+
+
+def timed(func, *args, repeat: int = 1):
+    """Результат и медиана времени вызова, мс"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return result, timings[len(timings) // 2] * 1000
+
+
+def relative_error(estimate: int, exact: int) -> float:
+    return abs(estimate - exact) / exact if exact else float(estimate != 0)
+
+
+def run(db_path: str, users: int, actions: int):
+    """Запустить бенчмарк"""
+    if not os.path.exists(db_path):
+        generate(db_path, users=users, actions=actions, feedback=100)
+    manager = DatabaseManager(db_path)
+    # Скетчи строятся заново по всей истории
+    with manager.get_connection() as conn:
+        conn.execute("DELETE FROM activity_sketches")
+        conn.commit()
+
+    print(f"👥 Активные пользователи: {manager.get_last_action_id()} действий")
+
+    exact_stats, exact_stats_time = timed(manager.get_user_statistics, True)
+    exact_daily, exact_daily_time = timed(manager.get_daily_activity, 10_000, True)
+    print(f"  Точно: статистика (DAU/WAU/MAU) {exact_stats_time / 1000:.1f} с, "
+          f"активность по {len(exact_daily)} дням {exact_daily_time / 1000:.1f} с")
+
+    _, backfill = timed(manager.active_users.count, 1)
+    saved, save = timed(manager.active_users.save)
+    sizes = [len(row[1]) for row in manager.get_activity_sketches()]
+    print(f"  Скетчи по всей истории {backfill / 1000:.1f} с, сохранение {saved} дней {save:.0f} мс, "
+          f"{sum(sizes) / 1024:.0f} КБ (в среднем {sum(sizes) / max(len(sizes), 1) / 1024:.1f} КБ на день)")
+
+    restarted = DatabaseManager(db_path)
+    _, load = timed(restarted.active_users.count, 1)
+    stats, stats_time = timed(restarted.get_user_statistics, repeat=10)
+    daily, daily_time = timed(restarted.get_daily_activity, 30, repeat=10)
+    print(f"  После перезапуска: загрузка {load:.0f} мс, статистика {stats_time:.1f} мс, "
+          f"активность за 30 дней {daily_time:.1f} мс")
+
+    for key, name in (('active_day', "DAU"), ('active_week', "WAU"), ('active_month', "MAU")):
+        print(f"    {name}: {stats[key]} (точно {exact_stats[key]}, "
+              f"ошибка {relative_error(stats[key], exact_stats[key]) * 100:.2f}%)")
+
+    sketched = {row['date']: row for row in restarted.get_daily_activity(10_000)}
+    errors = sorted(relative_error(sketched[row['date']]['unique_users'], row['unique_users'])
+                    for row in exact_daily if row['date'] in sketched)
+    missing = [row['date'] for row in exact_daily if row['date'] not in sketched]
+    wrong_actions = [row['date'] for row in exact_daily
+                     if row['date'] in sketched and sketched[row['date']]['total_actions'] != row['total_actions']]
+    print(f"  Дневные счетчики ({len(errors)} дней): средняя ошибка {sum(errors) / len(errors) * 100:.2f}%, "
+          f"p99 {errors[int(len(errors) * 0.99)] * 100:.2f}%, наибольшая {errors[-1] * 100:.2f}%; "
+          f"дней без скетча {len(missing)}, с неверным количеством действий {len(wrong_actions)}")
+
+    # Новые действия сразу видны в счетчиках и досчитываются после перезапуска без сохранения
+    bench_user = 900_000_000
+    before = restarted.active_users.count(1)
+    for _ in range(1000):
+        restarted.log_user_action(bench_user, "bench", "Бенчмарк активных пользователей")
+    live = restarted.get_daily_activity(0)
+    after_crash = DatabaseManager(db_path).get_daily_activity(0)
+    exact_today = manager.get_daily_activity(0, exact=True)
+    print(f"  1000 действий через log_user_action: DAU {before} -> {restarted.active_users.count(1)}; "
+          f"сегодня по скетчам {live}, после перезапуска без сохранения {after_crash}, точно {exact_today}")
+
+    with manager.get_connection() as conn:
+        conn.execute("DELETE FROM user_actions WHERE action = 'bench'")
+        conn.execute("DELETE FROM activity_sketches")
+        conn.commit()
+
+    worst = max(relative_error(stats[key], exact_stats[key]) for key in ('active_day', 'active_week', 'active_month'))
+    today_actions = [[row['total_actions'] for row in rows] for rows in (live, after_crash, exact_today)]
+    if worst > 0.05 or missing or wrong_actions or not today_actions[0] == today_actions[1] == today_actions[2]:
+        print("  ⚠️ Скетчи активных пользователей расходятся с точным расчетом")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк скетчей активных пользователей")
+    parser.add_argument('--db', help="Набор данных (создается, если файла нет)")
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--actions', type=int, default=1_000_000)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    run(args.db or os.path.join(tempfile.mkdtemp(prefix="active_users_bench_"), "active.db"), args.users, args.actions)
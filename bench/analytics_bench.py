@@ -0,0 +1,139 @@
+# bench/analytics_bench.py
+"""
+Бенчмарк аналитики когорт и воронки: полный расчет, ответ из кэша и
+досчет после новых действий
+
+Отчет сверяется с расчетом «в лоб» по всем строкам user_actions в Python
+(на больших наборах сверка пропускается - она слишком долгая).
+
+Запуск: python -m bench.analytics_bench [--db data/bench.db] [--users N] [--actions N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+from bench.dataset import generate
+from database.manager import DatabaseManager
+from services.analytics import FUNNEL_STEPS, OnboardingAnalytics, percentile, week_number
+
+# Больше скольких действий не сверять с расчетом «в лоб»
+EXACT_CHECK_LIMIT = 3_000_000
+
+
+def exact_report(manager: DatabaseManager, retention_weeks: int) -> Dict[str, Any]:
+    """Та же аналитика простым перебором всех действий"""
+    with manager.get_connection() as conn:
+        signups = {user_id: datetime.fromisoformat(created_at)
+                   for user_id, created_at in conn.execute('SELECT user_id, created_at FROM users')}
+        weeks: Dict[int, set] = {}
+        firsts: Dict[int, Dict[str, datetime]] = {}
+        milestones = {action for action, _ in FUNNEL_STEPS}
+        for user_id, action, created_at in conn.execute('SELECT user_id, action, created_at FROM user_actions'):
+            moment = datetime.fromisoformat(created_at)
+            weeks.setdefault(user_id, set()).add(week_number(moment.date()))
+            if action in milestones:
+                user_firsts = firsts.setdefault(user_id, {})
+                if action not in user_firsts or moment < user_firsts[action]:
+                    user_firsts[action] = moment
+
+    current_week = week_number(date.today())
+    funnel = [[] for _ in FUNNEL_STEPS]
+    cohorts: Dict[int, Dict[str, Any]] = {}
+    for user_id, signup in signups.items():
+        signup_week = week_number(signup.date())
+        cohort = cohorts.setdefault(signup_week, {'users': 0, 'active': [0] * (retention_weeks + 1)})
+        cohort['users'] += 1
+        for week in weeks.get(user_id, ()):
+            if 0 <= week - signup_week <= retention_weeks:
+                cohort['active'][week - signup_week] += 1
+        for index, (action, _) in enumerate(FUNNEL_STEPS):
+            if action not in firsts.get(user_id, {}):
+                break
+            funnel[index].append(max(0.0, (firsts[user_id][action] - signup).total_seconds()))
+
+    return {
+        'funnel': [(len(values), percentile(sorted(values), 0.5), percentile(sorted(values), 0.9))
+                   for values in funnel],
+        'retention': {
+            week: [round(active / cohort['users'] * 100, 1) if week + offset <= current_week else None
+                   for offset, active in enumerate(cohort['active'])]
+            for week, cohort in cohorts.items()
+        },
+    }
+
+
+def compare(report: Dict[str, Any], exact: Dict[str, Any]) -> List[str]:
+    """Расхождения отчета с расчетом «в лоб»"""
+    problems = []
+    for step, (users, median, p90) in zip(report['funnel'], exact['funnel']):
+        expected = (users, round(median / 3600, 1) if median is not None else None,
+                    round(p90 / 3600, 1) if p90 is not None else None)
+        actual = (step['users'], step['median_hours'], step['p90_hours'])
+        if actual != expected:
+            problems.append(f"{step['action']}: {actual} вместо {expected}")
+
+    for cohort in report['cohorts']:
+        expected = exact['retention'][week_number(date.fromisoformat(cohort['week']))]
+        if cohort['retention'] != expected:
+            problems.append(f"когорта {cohort['week']}: {cohort['retention']} вместо {expected}")
+    return problems
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def run(db_path: str, users: int, actions: int):
+    """Запустить бенчмарк"""
+    if not os.path.exists(db_path):
+        generate(db_path, users=users, actions=actions, feedback=100)
+    manager = DatabaseManager(db_path)
+    first_id, last_id, users_count, _ = manager.get_analytics_watermark()
+    total_actions = last_id - first_id + 1 if last_id else 0
+
+    print(f"📈 Аналитика когорт: {users_count} пользователей, ~{total_actions} действий")
+    analytics = OnboardingAnalytics(manager)
+
+    report, full = timed(analytics.report)
+    _, cached = timed(analytics.report)
+    print(f"  Полный расчет {full:.2f} с, из кэша {cached * 1000:.1f} мс")
+
+    bench_user = manager.get_user_signups()[0][0]
+    for action, _ in FUNNEL_STEPS:
+        manager.log_user_action(bench_user, action, "Бенчмарк аналитики")
+    report, incremental = timed(analytics.report)
+    print(f"  Досчет после {len(FUNNEL_STEPS)} новых действий {incremental:.2f} с "
+          f"(досчетов {analytics.incremental_computations}, полных расчетов {analytics.full_computations})")
+
+    for step in report['funnel']:
+        print(f"  {step['name']:32} {step['users']:>8} {step['conversion']:>6.1f}%  "
+              f"медиана {step['median_hours']} ч, p90 {step['p90_hours']} ч")
+
+    if total_actions > EXACT_CHECK_LIMIT:
+        print(f"  Сверка с расчетом «в лоб» пропущена: больше {EXACT_CHECK_LIMIT} действий")
+        return
+
+    exact, exact_time = timed(exact_report, manager, analytics.retention_weeks)
+    problems = compare(report, exact)
+    print(f"  Расчет «в лоб» {exact_time:.2f} с, расхождений: {len(problems)}")
+    for problem in problems[:10]:
+        print(f"  ⚠️ {problem}")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк аналитики когорт и воронки")
+    parser.add_argument('--db', help="Набор данных (создается, если файла нет)")
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--actions', type=int, default=1_000_000)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    run(args.db or os.path.join(tempfile.mkdtemp(prefix="analytics_bench_"), "analytics.db"), args.users, args.actions)
@@ -0,0 +1,345 @@
+# bench/dataset.py
+"""
+Генератор синтетического набора данных для бенчмарков DatabaseManager
+
+Заполняет схему DatabaseSchema правдоподобными распределениями:
+пользователи по всем статусам UserStatus с согласованными этапами,
+действия с суточным и недельным ритмом и «тяжелым хвостом» активности,
+обратная связь из шаблонных фраз. Генерация детерминирована (seed),
+вставка идет пакетами executemany в больших транзакциях.
+
+Запуск: python -m bench.dataset --db data/bench.db [--users N] [--actions N] [--feedback N] [--days N] [--seed N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+from config.settings import settings
+from database.manager import DatabaseManager
+from database.models import UserStatus, OnboardingStage, DatabaseSchema
+
+# Доли пользователей по статусам и допустимые для статуса этапы
+STATUS_WEIGHTS = [
+    (UserStatus.NEW, 0.10, (0, 0)),
+    (UserStatus.PREBOARDING, 0.20, (1, 4)),
+    (UserStatus.PREBOARDED, 0.15, (5, 5)),
+    (UserStatus.ONBOARDING, 0.25, (6, 9)),
+    (UserStatus.COMPLETED, 0.30, (10, 10)),
+]
+
+# Относительная активность по часам суток (пик днем, провал ночью)
+HOURLY_WEIGHTS = [
+    1, 1, 1, 1, 1, 2, 4, 8, 14, 20, 22, 21,
+    18, 20, 22, 21, 18, 14, 10, 7, 5, 4, 2, 1,
+]
+
+# Активность в выходные ниже, чем в будни
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 0.9, 0.3, 0.25]
+
+# Действия, которые логируют обработчики, с относительной частотой
+ACTIONS = [
+    ("start", "Возврат в главное меню", 20),
+    ("faq", "Открыл раздел FAQ", 8),
+    ("salary_faq", "Просмотрел FAQ по зарплате и льготам", 4),
+    ("progress_check", "Проверил свой прогресс", 6),
+    ("search", "Поиск: отпуск", 5),
+    ("search_no_results", "Поиск без результатов: парковка", 1),
+    ("contacts", "Просмотрел контакты сотрудников", 3),
+    ("help", "Запросил справку", 2),
+    ("status_check", "Проверил статус через команду", 2),
+    ("preboarding_start", "Начал пребординг", 2),
+    ("docs_main_view", "Просмотрел список основных документов", 3),
+    ("docs_tk_view", "Просмотрел список документов по ТК РФ", 2),
+    ("docs_main_sent", "Подтвердил отправку основных документов", 1),
+    ("docs_tk_sent", "Подтвердил отправку документов по ТК РФ", 1),
+    ("preboarding_complete", "Завершил пребординг", 1),
+    ("onboarding_start", "Начал процесс онбординга", 1),
+    ("email_access_confirmed", "Подтвердил получение доступа к почте", 1),
+    ("team_intro", "Изучил информацию о команде", 2),
+    ("meetings_info", "Изучил информацию о планерках", 2),
+    ("onboarding_completed", "Завершил онбординг", 1),
+    ("feedback_start", "Начал оставлять обратную связь", 1),
+    ("callback_back_to_main", "Нажал кнопку: back_to_main", 10),
+]
+
+FEEDBACK_SUBJECTS = [
+    "доступ к почте", "пропуск в офис", "VPN", "корпоративный ноутбук", "наставник", "планерки",
+    "документы по ТК РФ", "ДМС", "парковка", "обучение", "график работы", "зарплата",
+]
+FEEDBACK_TEMPLATES = [
+    "Долго ждал {0}, хотелось бы быстрее",
+    "Спасибо, с {0} все понятно",
+    "Не работает {0}, подскажите к кому обратиться",
+    "Хотелось бы больше информации про {0}",
+    "Очень понравилось, как устроено {0}",
+    "Проблема: {0} до сих пор не настроен",
+]
+
+FIRST_NAMES = ["Анна", "Иван", "Мария", "Петр", "Елена", "Алексей", "Ольга", "Дмитрий", "Наталья", "Сергей"]
+LAST_NAMES = ["Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов"]
+POSITIONS = [None, "Разработчик", "Аналитик", "Тестировщик", "Дизайнер", "Менеджер проектов", "HR"]
+
+FIRST_USER_ID = 100_000_000
+
+
+def _timestamp(moment: datetime) -> str:
+    """Время в формате, в котором его сохраняет адаптер sqlite3"""
+    return moment.isoformat(" ")
+
+
+class DatasetGenerator:
+    """Детерминированный генератор строк для таблиц users, user_actions, feedback"""
+
+    def __init__(self, users: int, actions: int, feedback: int, days: int = 180, seed: int = 42,
+                 now: datetime = None):
+        self.users = users
+        self.actions = actions
+        self.feedback = feedback
+        self.days = days
+        self.rng = random.Random(seed)
+        self.now = (now or datetime.now()).replace(microsecond=0)
+        # История заканчивается вчерашним днем, дни начинаются в полночь
+        self.start = self.now.replace(hour=0, minute=0, second=0) - timedelta(days=days)
+
+        # Веса дней с учетом дня недели: совокупные веса для rng.choices
+        day_weights = [WEEKDAY_WEIGHTS[(self.start + timedelta(days=d)).weekday()] for d in range(days)]
+        self._day_cum = list(self._cumulative(day_weights))
+        self._hour_cum = list(self._cumulative(HOURLY_WEIGHTS))
+        self._action_cum = list(self._cumulative([weight for _, _, weight in ACTIONS]))
+        self._status_cum = list(self._cumulative([weight for _, weight, _ in STATUS_WEIGHTS]))
+        self._day_starts = [self.start + timedelta(days=d) for d in range(days)]
+
+        # Пользователь регистрируется в случайный день и действует только после регистрации
+        self.user_start_day: List[int] = []
+
+    @staticmethod
+    def _cumulative(weights) -> Iterator[float]:
+        total = 0.0
+        for weight in weights:
+            total += weight
+            yield total
+
+    def _moment(self, day: int) -> datetime:
+        """Случайный момент дня с суточным ритмом"""
+        hour = self.rng.choices(range(24), cum_weights=self._hour_cum)[0]
+        return self._day_starts[day] + timedelta(hours=hour, seconds=self.rng.randrange(3600),
+                                                 microseconds=self.rng.randrange(1_000_000))
+
+    def user_rows(self) -> Iterator[Tuple]:
+        """Строки таблицы users"""
+        rng = self.rng
+        statuses = rng.choices(STATUS_WEIGHTS, cum_weights=self._status_cum, k=self.users)
+        start_days = rng.choices(range(self.days), cum_weights=self._day_cum, k=self.users)
+
+        for index in range(self.users):
+            status, _, (min_stage, max_stage) = statuses[index]
+            day = start_days[index]
+            self.user_start_day.append(day)
+            created_at = self._moment(day)
+            updated_at = min(self.now, created_at + timedelta(hours=rng.expovariate(1 / 72)))
+            user_id = FIRST_USER_ID + index
+            stage = rng.randint(min_stage, max_stage)
+            # Как DatabaseManager: незавершившим онбординг напоминание через REMINDER_INTERVAL_DAYS
+            reminder_at = None
+            if stage < OnboardingStage.COMPLETE and status != UserStatus.COMPLETED:
+                reminder_at = _timestamp(updated_at + timedelta(days=settings.REMINDER_INTERVAL_DAYS))
+            yield (
+                user_id,
+                f"employee{user_id}",
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                rng.choice(POSITIONS),
+                status.value,
+                stage,
+                _timestamp(created_at),
+                _timestamp(updated_at),
+                reminder_at,
+                _timestamp(updated_at),
+            )
+
+    def action_rows(self) -> Iterator[Tuple]:
+        """Строки таблицы user_actions
+
+        Активность пользователей распределена по Парето: немногие делают
+        большую часть действий. Даты действий не раньше регистрации
+        пользователя; чем ближе к регистрации, тем активнее пользователь.
+        """
+        rng = self.rng
+        shares = [rng.paretovariate(1.5) for _ in range(self.users)]
+        scale = self.actions / sum(shares)
+        actions = ACTIONS
+
+        produced = 0
+        for index in range(self.users):
+            count = int(shares[index] * scale)
+            if index == self.users - 1:
+                count = self.actions - produced
+            produced += count
+
+            first_day = self.user_start_day[index]
+            span = self.days - first_day
+            user_id = FIRST_USER_ID + index
+            chosen = rng.choices(actions, cum_weights=self._action_cum, k=count)
+            hours = rng.choices(range(24), cum_weights=self._hour_cum, k=count)
+
+            for position in range(count):
+                # Экспоненциальное затухание активности после регистрации
+                day = first_day + min(span - 1, int(rng.expovariate(1 / 14)))
+                day_start = self._day_starts[day]
+                if (day_start.weekday() >= 5) and rng.random() < 0.7:
+                    day = min(self.days - 1, day + 7 - day_start.weekday())
+                    day_start = self._day_starts[day]
+
+                action, details, _ = chosen[position]
+                moment = day_start + timedelta(hours=hours[position], seconds=rng.random() * 3600)
+                yield user_id, action, details, _timestamp(moment)
+
+    def feedback_rows(self) -> Iterator[Tuple]:
+        """Строки таблицы feedback"""
+        rng = self.rng
+        for _ in range(self.feedback):
+            index = rng.randrange(self.users)
+            day = rng.randint(self.user_start_day[index], self.days - 1)
+            message = rng.choice(FEEDBACK_TEMPLATES).format(rng.choice(FEEDBACK_SUBJECTS))
+            if rng.random() < 0.3:
+                message += f". {rng.choice(FEEDBACK_TEMPLATES).format(rng.choice(FEEDBACK_SUBJECTS))}"
+            yield FIRST_USER_ID + index, message, _timestamp(self._moment(day))
+
+
+def _batches(rows: Iterator[Tuple], size: int) -> Iterator[List[Tuple]]:
+    """Разбить поток строк на пакеты"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(db_path: str, users: int = 100_000, actions: int = 10_000_000, feedback: int = 50_000,
+             days: int = 180, seed: int = 42, batch_size: int = 100_000) -> Dict[str, float]:
+    """Сгенерировать набор данных в БД db_path (существующие данные дополняются)
+
+    Returns:
+        Время загрузки каждой таблицы в секундах
+    """
+    manager = DatabaseManager(db_path)
+    generator = DatasetGenerator(users, actions, feedback, days, seed)
+    timings = {}
+
+    with manager.get_connection() as conn:
+        # Журнал и синхронизация не нужны при одноразовой загрузке
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")
+
+        # Индексы user_actions дешевле построить один раз после загрузки
+        conn.execute("DROP INDEX IF EXISTS idx_actions_user_id")
+        conn.execute("DROP INDEX IF EXISTS idx_actions_created_at")
+
+        loads = [
+            ('users', '''
+                INSERT OR REPLACE INTO users
+                (user_id, username, full_name, position, status, stage, created_at, updated_at,
+                 next_reminder_at, stage_started_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', generator.user_rows(), users),
+            ('user_actions', '''
+                INSERT INTO user_actions (user_id, action, details, created_at) VALUES (?, ?, ?, ?)
+            ''', generator.action_rows(), actions),
+            ('feedback', '''
+                INSERT INTO feedback (user_id, message, created_at) VALUES (?, ?, ?)
+            ''', generator.feedback_rows(), feedback),
+        ]
+
+        for table, sql, rows, total in loads:
+            started = time.perf_counter()
+            inserted = 0
+            conn.execute("BEGIN")
+            for batch in _batches(rows, batch_size):
+                conn.executemany(sql, batch)
+                inserted += len(batch)
+                if inserted % (batch_size * 10) == 0:
+                    print(f"  {table}: {inserted}/{total}", file=sys.stderr)
+            conn.commit()
+            timings[table] = time.perf_counter() - started
+            print(f"📥 {table}: {inserted} строк за {timings[table]:.1f} с "
+                  f"({inserted / max(timings[table], 1e-9):.0f} строк/с)")
+
+        started = time.perf_counter()
+        for index_sql in DatabaseSchema.CREATE_INDEXES:
+            conn.execute(index_sql)
+        conn.execute("ANALYZE")
+        conn.commit()
+        timings['indexes'] = time.perf_counter() - started
+        print(f"🗂️ Индексы и статистика: {timings['indexes']:.1f} с")
+
+    return timings
+
+
+def verify(db_path: str, users: int, actions: int, feedback: int) -> List[str]:
+    """Проверить, что распределения набора данных правдоподобны"""
+    manager = DatabaseManager(db_path)
+    problems = []
+
+    with manager.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM users WHERE user_id >= ?", (FIRST_USER_ID,))
+        if cursor.fetchone()[0] < users:
+            problems.append("загружены не все пользователи")
+
+        cursor.execute("SELECT status, MIN(stage), MAX(stage) FROM users WHERE user_id >= ? GROUP BY status",
+                       (FIRST_USER_ID,))
+        ranges = {status.value: stages for status, _, stages in STATUS_WEIGHTS}
+        for status, min_stage, max_stage in cursor.fetchall():
+            expected = ranges.get(status)
+            if expected is None or min_stage < expected[0] or max_stage > expected[1]:
+                problems.append(f"этапы статуса {status} вне диапазона: {min_stage}-{max_stage}")
+
+        cursor.execute('''
+            SELECT COUNT(*) FROM user_actions a JOIN users u ON u.user_id = a.user_id
+            WHERE a.created_at < DATE(u.created_at)
+        ''')
+        if cursor.fetchone()[0]:
+            problems.append("есть действия раньше регистрации пользователя")
+
+        cursor.execute('''
+            SELECT CAST(strftime('%H', created_at) AS INTEGER) AS hour, COUNT(*)
+            FROM user_actions GROUP BY hour
+        ''')
+        by_hour = dict(cursor.fetchall())
+        if by_hour and by_hour.get(10, 0) < 5 * max(1, by_hour.get(3, 0)):
+            problems.append("нет суточного ритма активности")
+
+    return problems
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Аргументы командной строки"""
+    parser = argparse.ArgumentParser(description="Генератор синтетических данных OnboardingBuddy")
+    parser.add_argument('--db', required=True, help="путь к БД (не используйте рабочую базу)")
+    parser.add_argument('--users', type=int, default=100_000, help="количество пользователей")
+    parser.add_argument('--actions', type=int, default=10_000_000, help="количество действий")
+    parser.add_argument('--feedback', type=int, default=50_000, help="количество сообщений обратной связи")
+    parser.add_argument('--days', type=int, default=180, help="период истории в днях")
+    parser.add_argument('--seed', type=int, default=42, help="seed генератора случайных чисел")
+    parser.add_argument('--batch-size', type=int, default=100_000, help="строк в одном executemany")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    if os.path.abspath(args.db) == os.path.abspath(settings.DATABASE_PATH):
+        sys.exit("❌ Укажите отдельную БД для синтетических данных")
+
+    started = time.perf_counter()
+    generate(args.db, args.users, args.actions, args.feedback, args.days, args.seed, args.batch_size)
+    print(f"✅ Набор данных готов за {time.perf_counter() - started:.1f} с: {args.db}")
+
+    for problem in verify(args.db, args.users, args.actions, args.feedback):
+        print(f"⚠️ {problem}")
@@ -0,0 +1,252 @@
+# bench/db_bench.py
+"""
+Микробенчмарк всех публичных методов DatabaseManager
+
+Работает на базе, заполненной bench.dataset. Для каждого метода
+измеряются p50/p95 времени вызова; результаты можно сохранить как
+базовые и сравнивать с ними последующие прогоны. Если в DatabaseManager
+появится метод без сценария замера, бенчмарк сообщит об этом.
+
+Запуск: python -m bench.db_bench --db data/bench.db [--save-baseline base.json] [--baseline base.json]
+        [--tolerance 0.25] [--only метод,метод]
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from types import FunctionType
+from typing import Any, Callable, Dict, List, Tuple
+
+from database.manager import DatabaseManager
+from database.models import Feedback, OnboardingEvent, UserStatus
+from services.analytics import FUNNEL_STEPS
+
+# Пользователи, создаваемые бенчмарком, не пересекаются с набором данных
+BENCH_USER_ID = 900_000_000
+BENCH_FEEDBACK = "Не работает VPN, бенчмарк"
+
+
+def public_methods() -> List[str]:
+    """Публичные методы DatabaseManager, которые должны быть покрыты замерами"""
+    return sorted(
+        name for name, attr in vars(DatabaseManager).items()
+        if not name.startswith('_') and name != 'get_connection'
+        and isinstance(attr, (FunctionType, staticmethod))
+    )
+
+
+def build_cases(manager: DatabaseManager) -> Tuple[Dict[str, Callable[[], Any]], int]:
+    """Сценарии вызова для каждого метода и id первой созданной замерами группы"""
+    with manager.get_connection() as conn:
+        user_ids = [row[0] for row in conn.execute(
+            "SELECT user_id FROM users ORDER BY user_id LIMIT 1000"
+        )]
+        feedback_row = conn.execute("SELECT * FROM feedback ORDER BY id DESC LIMIT 1").fetchone()
+
+    if not user_ids or feedback_row is None:
+        raise SystemExit("❌ База пуста: сначала заполните ее через python -m bench.dataset")
+
+    users = itertools.cycle(user_ids)
+    new_ids = itertools.count(BENCH_USER_ID + 1)
+    stages = itertools.cycle(range(11))
+    events = itertools.cycle(OnboardingEvent)
+    feedback = Feedback.from_db_row(feedback_row)
+
+    # Изменения пользователя замеряются на отдельной записи, чтобы не портить набор данных
+    user = manager.create_user(BENCH_USER_ID, "bench", "Бенчмарк")
+    last_action_id = manager.get_analytics_watermark()[1] or 0
+    milestones = [action for action, _ in FUNNEL_STEPS]
+    # Сохранение скетчей замеряется на уже сохраненных, чтобы не менять их
+    stage_sketches = [(stage, sketch) for stage, sketch, _ in manager.get_stage_sketches()]
+    last_transition_id = max((row[2] or 0 for row in manager.get_stage_sketches()), default=0)
+    activity_sketches = [(day, sketch, actions) for day, sketch, actions, _ in manager.get_activity_sketches()]
+    last_sketched_action_id = max((row[3] or 0 for row in manager.get_activity_sketches()), default=0)
+
+    # Группа для замеров increment_feedback_cluster и save_feedback_signature
+    cluster = manager.create_feedback_cluster(feedback)
+
+    return {
+        'init_database': manager.init_database,
+        'get_user': lambda: manager.get_user(next(users)),
+        'create_user': lambda: manager.create_user(next(new_ids), "bench", "Бенчмарк"),
+        'update_user': lambda: manager.update_user(user),
+        'update_user_stage': lambda: manager.update_user_stage(user.user_id, next(stages)),
+        'transition_user': lambda: manager.transition_user(user.user_id, next(events)),
+        'get_users_by_status': lambda: manager.get_users_by_status(UserStatus.PREBOARDED),
+        'get_all_users': manager.get_all_users,
+        'get_segment_rows': manager.get_segment_rows,
+        # Порог в прошлом: замеряется поиск по очереди без переноса напоминаний набора данных
+        'claim_due_reminders': lambda: manager.claim_due_reminders(50, datetime(2000, 1, 1)),
+        'reschedule_reminders': lambda: manager.reschedule_reminders([user.user_id], datetime.now()),
+        'count_due_reminders': manager.count_due_reminders,
+        'get_stage_sketches': manager.get_stage_sketches,
+        'save_stage_sketches': lambda: manager.save_stage_sketches(stage_sketches, last_transition_id),
+        'get_stage_transitions': lambda: manager.get_stage_transitions(last_transition_id),
+        'get_stage_durations': lambda: manager.get_stage_durations(next(stages)),
+        'save_feedback': lambda: manager.save_feedback(next(users), BENCH_FEEDBACK),
+        'get_recent_feedback': lambda: manager.get_recent_feedback(10),
+        'search_feedback': lambda: manager.search_feedback("доступ почта", limit=10),
+        'create_feedback_cluster': lambda: manager.create_feedback_cluster(feedback),
+        'increment_feedback_cluster': lambda: manager.increment_feedback_cluster(cluster.id),
+        'save_feedback_signature': lambda: manager.save_feedback_signature(feedback.id, cluster.id, b"\0" * 256),
+        'get_cluster_signatures': manager.get_cluster_signatures,
+        'get_unclustered_feedback': manager.get_unclustered_feedback,
+        'get_feedback_clusters': lambda: manager.get_feedback_clusters(10),
+        'log_user_action': lambda: manager.log_user_action(next(users), "bench", "Бенчмарк"),
+        'get_user_actions': lambda: manager.get_user_actions(next(users), 50),
+        'get_popular_actions': lambda: manager.get_popular_actions(7, 10),
+        'get_user_statistics': manager.get_user_statistics,
+        'get_user_counts': manager.get_user_counts,
+        'get_daily_activity': lambda: manager.get_daily_activity(30),
+        'count_active_users': lambda: manager.count_active_users(7),
+        'get_activity_sketches': manager.get_activity_sketches,
+        'save_activity_sketches': lambda: manager.save_activity_sketches(activity_sketches, last_sketched_action_id),
+        'get_last_action_id': manager.get_last_action_id,
+        'get_action_days': lambda: manager.get_action_days(last_action_id - 10_000),
+        'get_analytics_watermark': manager.get_analytics_watermark,
+        'get_user_signups': manager.get_user_signups,
+        # Досчет аналитики по последним 10 тысячам действий (полный проход замеряет bench.analytics_bench)
+        'get_activity_weeks': lambda: manager.get_activity_weeks(last_action_id - 10_000),
+        'get_first_actions': lambda: manager.get_first_actions(milestones, last_action_id - 10_000),
+        # Порог в далеком прошлом: замеряется поиск устаревших строк, а не удаление набора данных
+        'cleanup_old_data': lambda: manager.cleanup_old_data(days=100_000),
+        'get_recent_actions': lambda: manager.get_recent_actions(1000),
+        'iter_table_batches': lambda: sum(map(len, manager.iter_table_batches('users', ['user_id', 'status']))),
+        'get_export_high_watermarks': manager.get_export_high_watermarks,
+        'count_export_rows': manager.count_export_rows,
+        'get_export_tombstones': manager.get_export_tombstones,
+        'get_export_state': manager.get_export_state,
+        'save_export_state': lambda: manager.save_export_state({'bench': next(users)}),
+        'export_to_dict': manager.export_to_dict,
+        'save_persistent_states': lambda: manager.save_persistent_states(
+            [('bench', str(next(users)), b'{"waiting_feedback":true}')]
+        ),
+        'get_persistent_state': lambda: manager.get_persistent_state('bench', str(next(users))),
+        'get_persistent_states': lambda: manager.get_persistent_states('bench'),
+    }, cluster.id
+
+
+def cleanup(manager: DatabaseManager, first_cluster_id: int):
+    """Удалить строки, созданные замерами, чтобы набор данных не менялся между прогонами"""
+    with manager.get_connection() as conn:
+        conn.execute("DELETE FROM users WHERE user_id >= ?", (BENCH_USER_ID,))
+        conn.execute("DELETE FROM stage_transitions WHERE user_id >= ?", (BENCH_USER_ID,))
+        conn.execute("DELETE FROM user_actions WHERE action = 'bench'")
+        conn.execute("DELETE FROM feedback WHERE message = ?", (BENCH_FEEDBACK,))
+        conn.execute("DELETE FROM bot_persistence WHERE scope = 'bench'")
+        conn.execute("DELETE FROM export_state WHERE name = 'bench'")
+        conn.execute("DELETE FROM feedback_signatures WHERE cluster_id >= ?", (first_cluster_id,))
+        conn.execute("DELETE FROM feedback_clusters WHERE id >= ?", (first_cluster_id,))
+        conn.commit()
+
+
+def measure(func: Callable[[], Any], budget: float, min_runs: int = 3, max_runs: int = 500) -> List[float]:
+    """Вызывать функцию, пока не исчерпан бюджет времени; вернуть отсортированные замеры в мс"""
+    timings = []
+    deadline = time.perf_counter() + budget
+    while len(timings) < max_runs and (len(timings) < min_runs or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings
+
+
+def dataset_size(manager: DatabaseManager) -> Dict[str, int]:
+    """Размер набора данных, на котором проводились замеры"""
+    with manager.get_connection() as conn:
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ('users', 'user_actions', 'feedback')
+        }
+
+
+def run(db_path: str, budget: float = 1.0, only: List[str] = None) -> Dict[str, Any]:
+    """Замерить все методы и вернуть отчет"""
+    manager = DatabaseManager(db_path)
+    size = dataset_size(manager)
+    cases, first_cluster_id = build_cases(manager)
+
+    missing = [name for name in public_methods() if name not in cases]
+    if missing:
+        print(f"⚠️ Нет сценария замера для: {', '.join(missing)}")
+
+    print(f"🗄️ Бенчмарк DatabaseManager ({db_path}): "
+          f"{size['users']} пользователей, {size['user_actions']} действий, {size['feedback']} отзывов")
+
+    results = {}
+    try:
+        for name, func in cases.items():
+            if only and name not in only:
+                continue
+            timings = measure(func, budget)
+            results[name] = {
+                'runs': len(timings),
+                'p50_ms': round(timings[len(timings) // 2], 3),
+                'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            }
+            print(f"  {name:28} p50 {results[name]['p50_ms']:>10.3f} мс   "
+                  f"p95 {results[name]['p95_ms']:>10.3f} мс   ({len(timings)} вызовов)")
+    finally:
+        cleanup(manager, first_cluster_id)
+
+    return {
+        'created_at': datetime.now().isoformat(),
+        'dataset': size,
+        'methods': results,
+        'missing': missing,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Tuple[str, float, float]]:
+    """Методы, у которых p50 ухудшилась больше допустимого: (метод, было, стало)"""
+    if report['dataset'] != baseline.get('dataset'):
+        print(f"⚠️ Размер набора данных отличается от базового: {baseline.get('dataset')}")
+
+    regressions = []
+    for name, result in report['methods'].items():
+        base = baseline['methods'].get(name)
+        if base is None:
+            continue
+        change = result['p50_ms'] / base['p50_ms'] - 1 if base['p50_ms'] else 0.0
+        marker = "❌" if change > tolerance else ("✅" if change < -tolerance else "  ")
+        print(f"{marker} {name:28} {base['p50_ms']:>10.3f} -> {result['p50_ms']:>10.3f} мс ({change:+.0%})")
+        if change > tolerance:
+            regressions.append((name, base['p50_ms'], result['p50_ms']))
+    return regressions
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Аргументы командной строки"""
+    parser = argparse.ArgumentParser(description="Микробенчмарк методов DatabaseManager")
+    parser.add_argument('--db', required=True, help="БД, заполненная python -m bench.dataset")
+    parser.add_argument('--budget', type=float, default=1.0, help="секунд на замер одного метода")
+    parser.add_argument('--only', help="замерить только перечисленные через запятую методы")
+    parser.add_argument('--save-baseline', help="сохранить результаты как базовые")
+    parser.add_argument('--baseline', help="сравнить с базовыми результатами")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="допустимое ухудшение p50 (доля)")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    if not os.path.exists(args.db):
+        sys.exit(f"❌ БД {args.db} не найдена: сначала запустите python -m bench.dataset --db {args.db}")
+
+    report = run(args.db, args.budget, args.only.split(',') if args.only else None)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Базовые результаты сохранены: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ Регрессии: {len(regressions)}")
+            sys.exit(1)
+        print("✅ Регрессий относительно базовых результатов нет")
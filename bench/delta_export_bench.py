@@ -0,0 +1,175 @@
+# bench/delta_export_bench.py
+"""
+Бенчмарк инкрементальной выгрузки (utils/delta_export.py): время
+выгрузки изменений за день против полной выгрузки
+
+На копии набора данных делается первая (полная) выгрузка, затем
+имитируется день работы: новые действия, переходы по этапам, обратная
+связь, напоминания и очистка старых действий (tombstone), после чего выгружаются
+только изменения и, для сравнения, все таблицы целиком. Затем выгрузки
+применяются по манифесту к пустому состоянию (tombstone-ы, затем upsert
+по ключу) и результат сверяется с БД. Та же сверка повторяется на
+небольшой базе из нескольких шардов.
+
+Запуск: python -m bench.delta_export_bench [--db PATH] [--users N] [--actions N] [--changes N] [--format parquet]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from database.manager import DatabaseManager
+from database.models import OnboardingEvent
+from database.sharding import ShardedDatabaseManager
+from utils.columnar import TABLE_COLUMNS, export_columnar
+from utils.delta_export import export_delta, load_manifest, read_delta_rows
+from bench.dataset import generate
+
+
+def _normalize(table: str, row: Dict[str, Any]) -> tuple:
+    """Строка с временем в одном виде (в БД время хранится с микросекундами и без)"""
+    return tuple(datetime.fromisoformat(row[name]).isoformat(' ') if kind == 'timestamp' and row[name] else row[name]
+                 for name, kind in TABLE_COLUMNS[table])
+
+
+def database_rows(manager: DatabaseManager) -> Dict[str, Dict[Any, tuple]]:
+    result = {}
+    for table in TABLE_COLUMNS:
+        columns = [name for name, _ in TABLE_COLUMNS[table]]
+        result[table] = {
+            row[0]: _normalize(table, dict(zip(columns, row)))
+            for rows in manager.iter_table_batches(table, columns) for row in rows
+        }
+    return result
+
+
+def apply_deltas(directory: str) -> Dict[str, Dict[Any, tuple]]:
+    """Применить выгрузки по манифесту к пустому состоянию"""
+    state: Dict[str, Dict[Any, tuple]] = {table: {} for table in TABLE_COLUMNS}
+    for entry in sorted(load_manifest(directory)['deltas'], key=lambda entry: entry['sequence']):
+        for tombstone in entry['tombstones']:
+            assert tombstone['condition'] == 'created_before', tombstone
+            rows = state[tombstone['table']]
+            position = [name for name, _ in TABLE_COLUMNS[tombstone['table']]].index('created_at')
+            cutoff = datetime.fromisoformat(tombstone['value']).isoformat(' ')
+            for key in [key for key, row in rows.items() if row[position] < cutoff]:
+                del rows[key]
+        for table, info in entry['tables'].items():
+            for row in read_delta_rows(directory, entry, table):
+                state[table][row[info['key']]] = _normalize(table, row)
+    return state
+
+
+def simulate_day(manager: DatabaseManager, changes: int, cutoff: datetime, seed: int = 0) -> Dict[str, int]:
+    """Изменения за день: действия, переходы, обратная связь и очистка действий до cutoff"""
+    rng = random.Random(seed)
+    user_ids = [user_id for user_id, _ in manager.get_user_signups()]
+    events = list(OnboardingEvent)
+    for _ in range(changes):
+        manager.log_user_action(rng.choice(user_ids), "bench_day", "Бенчмарк инкрементальной выгрузки")
+    transitions = sum(manager.transition_user(rng.choice(user_ids), rng.choice(events)) is not None
+                      for _ in range(changes // 10))
+    for _ in range(changes // 100):
+        manager.save_feedback(rng.choice(user_ids), "Обратная связь бенчмарка выгрузки")
+    # Напоминания переносятся без updated_at: выгрузка не должна зависеть от таких изменений
+    manager.claim_due_reminders(changes // 100, datetime.now() + timedelta(days=30))
+    deleted = manager.cleanup_old_data(cutoff_date=cutoff)
+    return {'actions': changes, 'transitions': transitions, 'feedback': changes // 100, 'deleted': deleted}
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def check(manager: DatabaseManager, directory: str) -> List[str]:
+    """Расхождения состояния, собранного из выгрузок, с БД"""
+    expected, applied = database_rows(manager), apply_deltas(directory)
+    problems = []
+    for table in TABLE_COLUMNS:
+        if applied[table] != expected[table]:
+            missing = expected[table].keys() - applied[table].keys()
+            extra = applied[table].keys() - expected[table].keys()
+            changed = sum(applied[table][key] != row for key, row in expected[table].items() if key in applied[table])
+            problems.append(f"{table}: нет {len(missing)}, лишних {len(extra)}, отличаются {changed}")
+    return problems
+
+
+def run_sharded(fmt: str, shards: int = 4, users: int = 300):
+    """Сверка выгрузок на небольшой базе из нескольких шардов"""
+    directory = tempfile.mkdtemp(prefix="delta_export_sharded_")
+    manager = ShardedDatabaseManager(os.path.join(directory, "sharded.db"), shards)
+    for user_id in range(1, users + 1):
+        manager.create_user(user_id, f"user{user_id}", f"Сотрудник {user_id}")
+        manager.log_user_action(user_id, "start", "")
+    # Очистка удаляет действия, уже попавшие в первую выгрузку
+    cutoff = datetime.now()
+    export_delta(manager, manager, os.path.join(directory, "delta"), fmt)
+    simulate_day(manager, users * 2, cutoff)
+    export_delta(manager, manager, os.path.join(directory, "delta"), fmt)
+    problems = check(manager, os.path.join(directory, "delta"))
+    print(f"  сверка на {shards} шардах: {'совпадает' if not problems else '⚠️ ' + '; '.join(problems)}")
+    shutil.rmtree(directory)
+
+
+def run(db_path: str, users: int, actions: int, changes: int, fmt: str):
+    """Запустить бенчмарк"""
+    if not os.path.exists(db_path):
+        generate(db_path, users=users, actions=actions, feedback=users // 2)
+    directory = tempfile.mkdtemp(prefix="delta_export_bench_")
+    # Набор данных меняется бенчмарком, поэтому работаем с копией
+    work_path = os.path.join(directory, "work.db")
+    shutil.copyfile(db_path, work_path)
+    manager = DatabaseManager(work_path)
+    delta_directory = os.path.join(directory, "delta")
+    print(f"🧩 Инкрементальная выгрузка ({fmt}): {os.path.getsize(work_path) / 2 ** 20:.0f} МБ БД")
+
+    entry, seconds = timed(export_delta, manager, manager, delta_directory, fmt)
+    rows = sum(info['rows'] for info in entry['tables'].values())
+    print(f"  первая выгрузка №{entry['sequence']} (полная): {rows} строк, {seconds:.2f} с")
+
+    with manager.get_connection() as conn:
+        oldest = datetime.fromisoformat(conn.execute('SELECT MIN(created_at) FROM user_actions').fetchone()[0])
+    day, seconds = timed(simulate_day, manager, changes, oldest + timedelta(days=1))
+    print(f"  день работы: {day['actions']} действий, {day['transitions']} переходов, {day['feedback']} отзывов, "
+          f"удалено {day['deleted']} старых действий ({seconds:.1f} с)")
+
+    entry, delta_seconds = timed(export_delta, manager, manager, delta_directory, fmt)
+    rows = ", ".join(f"{table} {info['rows']}" for table, info in entry['tables'].items())
+    size = sum(os.path.getsize(os.path.join(delta_directory, info['file'])) for info in entry['tables'].values())
+    print(f"  выгрузка изменений №{entry['sequence']}: {rows} строк, {len(entry['tombstones'])} tombstone, "
+          f"{size / 2 ** 10:.0f} КБ, {delta_seconds:.2f} с")
+
+    if fmt != 'jsonl':
+        files, full_seconds = timed(export_columnar, manager, "full", fmt, directory)
+        size = sum(info['bytes'] for info in files.values())
+        print(f"  полная выгрузка для сравнения: {size / 2 ** 20:.1f} МБ, {full_seconds:.2f} с "
+              f"({full_seconds / delta_seconds:.0f}x дольше)")
+
+    problems, seconds = timed(check, manager, delta_directory)
+    print(f"  сверка выгрузок с БД ({seconds:.1f} с): {'совпадает' if not problems else '⚠️ ' + '; '.join(problems)}")
+    shutil.rmtree(directory)
+
+    run_sharded(fmt)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк инкрементальной выгрузки")
+    parser.add_argument('--db', help="Набор данных (создается, если файла нет; не меняется)")
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--actions', type=int, default=1_000_000)
+    parser.add_argument('--changes', type=int, default=10_000, help="новых действий за день")
+    parser.add_argument('--format', default='parquet', choices=['parquet', 'arrow', 'jsonl'])
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    run(args.db or os.path.join(tempfile.mkdtemp(prefix="delta_export_bench_"), "delta.db"),
+        args.users, args.actions, args.changes, args.format)
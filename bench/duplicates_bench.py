@@ -0,0 +1,109 @@
+# bench/duplicates_bench.py
+"""
+Бенчмарк группировки похожей обратной связи
+
+Запуск: python -m bench.duplicates_bench [количество сообщений]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from database.manager import DatabaseManager
+from services.duplicates import FeedbackClusterer
+
+TOPICS = [
+    "не работает vpn не могу подключиться к корпоративной сети",
+    "долго делали пропуск в офис пришлось ждать на ресепшене",
+    "не выдали ноутбук в первый день работы",
+    "нет доступа к корпоративной почте и календарю",
+    "очень понравилась встреча с командой и наставником",
+    "непонятно как оформить отпуск в первые полгода",
+    "в переговорной постоянно не работает проектор",
+    "хотелось бы больше информации про дмс и страховку",
+]
+
+NOISE = "пожалуйста срочно снова опять вообще очень кстати спасибо привет коллеги".split()
+
+
+def make_message(rng: random.Random, topic: str) -> str:
+    """Перефразировать сообщение: перестановка, пропуск слов и шум"""
+    words = topic.split()
+    words = [word for word in words if rng.random() > 0.15]
+    rng.shuffle(words)
+    words += rng.sample(NOISE, rng.randint(0, 2))
+    return " ".join(words)
+
+
+def percentile(values, p: float) -> float:
+    """Перцентиль отсортированного списка"""
+    index = min(len(values) - 1, int(len(values) * p))
+    return values[index]
+
+
+def run(total: int = 20000):
+    """Запустить бенчмарк группировки"""
+    rng = random.Random(42)
+    unique_words = [f"тема{i} вопрос{i} проблема{i}" for i in range(total // 10)]
+    messages = []
+    for _ in range(total):
+        if rng.random() < 0.7:
+            topic_id = rng.randrange(len(TOPICS))
+            messages.append((topic_id, make_message(rng, TOPICS[topic_id])))
+        else:
+            messages.append((None, rng.choice(unique_words)))
+
+    clusterer = FeedbackClusterer(manager=None)
+    clusterer.loaded = True
+    latencies = []
+    topic_clusters = {}
+    next_id = 0
+
+    for topic_id, message in messages:
+        started = time.perf_counter()
+        match = clusterer.assign(message)
+        latencies.append((time.perf_counter() - started) * 1_000_000)
+
+        if match.cluster_id is None:
+            next_id += 1
+            match.cluster_id = next_id
+            if len(match.signature):
+                clusterer.register(next_id, match.signature)
+
+        if topic_id is not None:
+            topic_clusters.setdefault(topic_id, set()).add(match.cluster_id)
+
+    latencies.sort()
+    print("🔁 Бенчмарк группировки обратной связи (в памяти)")
+    print(f"  Сообщений: {total}, групп: {len(clusterer.signatures)}, LSH-корзин: {len(clusterer.buckets)}")
+    print(f"  Задержка assign: p50={percentile(latencies, 0.5):.0f} мкс, "
+          f"p95={percentile(latencies, 0.95):.0f} мкс, p99={percentile(latencies, 0.99):.0f} мкс")
+    for topic_id, clusters in sorted(topic_clusters.items()):
+        print(f"  Тема «{TOPICS[topic_id][:40]}»: групп {len(clusters)}")
+
+    # Полный путь с записью в БД
+    manager = DatabaseManager(os.path.join(tempfile.mkdtemp(), "duplicates_bench.db"))
+    clusterer = FeedbackClusterer(manager)
+    clusterer.load()
+    sample = messages[:1000]
+    latencies = []
+    for _, message in sample:
+        feedback = manager.save_feedback(1, message)
+        started = time.perf_counter()
+        clusterer.add_feedback(feedback)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    print(f"💾 add_feedback с записью в БД ({len(sample)} сообщений): "
+          f"p50={percentile(latencies, 0.5):.2f} мс, p99={percentile(latencies, 0.99):.2f} мс")
+
+    # Проверка восстановления после перезапуска
+    reloaded = FeedbackClusterer(manager)
+    reloaded.load()
+    assert reloaded.signatures.keys() == clusterer.signatures.keys()
+    print(f"✅ После перезагрузки восстановлено групп: {len(reloaded.signatures)}")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
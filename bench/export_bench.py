@@ -0,0 +1,145 @@
+# bench/export_bench.py
+"""
+Бенчмарк колоночной выгрузки: Parquet и Arrow IPC (utils/columnar.py)
+против построчного CSV
+
+Таблицы users, feedback и user_actions выгружаются из одних и тех же
+пачек курсора: в CSV через csv.writer, как в utils/export.py, и в
+Parquet/Arrow с типами и сжатием. Замеряются размер файлов, время записи
+и время чтения с типами: CSV разбирается заново (числа и время из
+строк), колоночные файлы читаются в таблицы Arrow. Прочитанные строки
+сверяются с БД.
+
+Запуск: python -m bench.export_bench [--db PATH] [--users N] [--actions N] [--compression zstd]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from database.manager import DatabaseManager
+from utils.columnar import COLUMNAR_FORMATS, TABLE_COLUMNS, write_table
+from bench.dataset import generate
+
+
+def write_csv(manager: DatabaseManager, table: str, path: str) -> int:
+    columns = [name for name, _ in TABLE_COLUMNS[table]]
+    rows_written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(columns)
+        for rows in manager.iter_table_batches(table, columns):
+            writer.writerows(rows)
+            rows_written += len(rows)
+    return rows_written
+
+
+def read_csv(table: str, path: str) -> List[tuple]:
+    """Строки CSV с восстановленными типами"""
+    parsers = []
+    for _, kind in TABLE_COLUMNS[table]:
+        if kind in ('int64', 'int8'):
+            parsers.append(lambda value: int(value) if value else None)
+        elif kind == 'timestamp':
+            parsers.append(lambda value: datetime.fromisoformat(value) if value else None)
+        else:
+            parsers.append(lambda value: value or None)
+
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader)
+        return [tuple(parse(value) for parse, value in zip(parsers, row)) for row in reader]
+
+
+def read_columnar(path: str, fmt: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == 'parquet':
+        return pq.read_table(path)
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def run(db_path: str, users: int, actions: int, compression: str):
+    """Запустить бенчмарк"""
+    if not os.path.exists(db_path):
+        generate(db_path, users=users, actions=actions, feedback=users // 2)
+    manager = DatabaseManager(db_path)
+    directory = tempfile.mkdtemp(prefix="export_bench_")
+    print(f"🧱 Колоночная выгрузка ({compression}) против CSV: {os.path.getsize(db_path) / 2 ** 20:.0f} МБ БД")
+
+    totals: Dict[str, Dict[str, float]] = {}
+    mismatched = []
+    for table in TABLE_COLUMNS:
+        columns = [name for name, _ in TABLE_COLUMNS[table]]
+        with manager.get_connection() as conn:
+            expected = conn.execute(f'SELECT {", ".join(columns)} FROM {table} ORDER BY rowid LIMIT 1000').fetchall()
+
+        results: Dict[str, Any] = {}
+        path = os.path.join(directory, f"{table}.csv")
+        rows, write_seconds = timed(write_csv, manager, table, path)
+        parsed, read_seconds = timed(read_csv, table, path)
+        results['csv'] = (os.path.getsize(path), write_seconds, read_seconds)
+        if len(parsed) != rows:
+            mismatched.append(f"{table}.csv: {len(parsed)} строк из {rows}")
+
+        for fmt, extension in COLUMNAR_FORMATS.items():
+            path = os.path.join(directory, f"{table}{extension}")
+            rows, write_seconds = timed(write_table, manager, table, path, fmt, compression)
+            loaded, read_seconds = timed(read_columnar, path, fmt)
+            results[fmt] = (os.path.getsize(path), write_seconds, read_seconds)
+
+            # Первые строки совпадают с БД (время - с точностью до типа timestamp)
+            head = loaded.slice(0, len(expected)).to_pylist()
+            sample = [tuple(value.isoformat(' ') if isinstance(value, datetime) else value
+                            for value in row.values()) for row in head]
+            normalized = [tuple(datetime.fromisoformat(value).isoformat(' ')
+                                if kind == 'timestamp' and value else value
+                                for value, (_, kind) in zip(row, TABLE_COLUMNS[table])) for row in expected]
+            if loaded.num_rows != rows or sample != normalized:
+                mismatched.append(f"{table}{extension}: {loaded.num_rows} строк, первые строки "
+                                  f"{'совпадают' if sample == normalized else 'расходятся'}")
+
+        print(f"  {table} ({rows} строк):")
+        csv_size = results['csv'][0]
+        for fmt, (size, write_seconds, read_seconds) in results.items():
+            ratio = f" ({csv_size / size:4.1f}x меньше CSV)" if fmt != 'csv' else ""
+            print(f"    {fmt:8} {size / 2 ** 20:8.2f} МБ{ratio}, "
+                  f"запись {write_seconds:6.2f} с, чтение с типами {read_seconds:6.2f} с")
+            total = totals.setdefault(fmt, {'size': 0, 'write': 0, 'read': 0})
+            total['size'] += size
+            total['write'] += write_seconds
+            total['read'] += read_seconds
+
+    print("  всего:")
+    for fmt, total in totals.items():
+        print(f"    {fmt:8} {total['size'] / 2 ** 20:8.2f} МБ, запись {total['write']:6.2f} с, "
+              f"чтение {total['read']:6.2f} с")
+    for problem in mismatched:
+        print(f"  ⚠️ {problem}")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк колоночной выгрузки")
+    parser.add_argument('--db', help="Набор данных (создается, если файла нет)")
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--actions', type=int, default=1_000_000)
+    parser.add_argument('--compression', default='zstd')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    run(args.db or os.path.join(tempfile.mkdtemp(prefix="export_bench_"), "export.db"),
+        args.users, args.actions, args.compression)
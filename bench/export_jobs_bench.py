@@ -0,0 +1,187 @@
+# bench/export_jobs_bench.py
+"""
+Бенчмарк фоновой выгрузки для администраторов (services/export_jobs.py):
+задержка ответов сотрудникам, пока идет выгрузка
+
+Настоящее Application из main.setup_handlers работает против имитатора
+Bot API (bench/load.py) на копии набора данных. Сотрудники без перерыва
+открывают «Мой прогресс» и FAQ; замеряются p50/p99 ответа без выгрузки,
+с выгрузкой прямо в цикле событий (как раньше в обработчике) и с
+фоновой выгрузкой по кнопке администратора. Отправленные документы
+распаковываются: количество строк сверяется с БД, размер частей - с
+EXPORT_PART_SIZE_MB.
+
+Запуск: python -m bench.export_jobs_bench [--db PATH] [--users N] [--actions N] [--employees N]
+        [--seconds N] [--part-size-mb N]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк фоновой выгрузки")
+    parser.add_argument('--db', help="Набор данных (создается, если файла нет; не меняется)")
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--actions', type=int, default=1_000_000)
+    parser.add_argument('--employees', type=int, default=10, help="сотрудников, нажимающих кнопки")
+    parser.add_argument('--seconds', type=float, default=10, help="длительность замера без выгрузки")
+    parser.add_argument('--part-size-mb', type=float, default=5)
+    return parser.parse_args(argv)
+
+
+ARGS = parse_args(sys.argv[1:]) if __name__ == '__main__' else parse_args([])
+ADMIN_ID = 900000001
+FIRST_EMPLOYEE_ID = 800_000_000
+PAUSE = 0.05
+
+# Настройки задаются до импорта приложения: копия набора данных, частые обновления прогресса
+WORK_DIRECTORY = tempfile.mkdtemp(prefix="export_jobs_bench_")
+os.environ['DATABASE_PATH'] = os.path.join(WORK_DIRECTORY, "work.db")
+os.environ['ADMIN_IDS'] = str(ADMIN_ID)
+os.environ['EXPORT_PROGRESS_INTERVAL'] = '1'
+os.environ['EXPORT_PART_SIZE_MB'] = str(ARGS.part_size_mb)
+
+from telegram.ext import Application  # noqa: E402
+
+import main  # noqa: E402
+from bench.dataset import generate  # noqa: E402
+from bench.load import FakeBotRequest, make_callback_update, make_text_update, percentile  # noqa: E402
+from database.manager import db_manager  # noqa: E402
+from database.replica import analytics_db  # noqa: E402
+from services.export_jobs import ExportJob, export_jobs, write_export  # noqa: E402
+
+
+class DocumentCapture(FakeBotRequest):
+    """Имитатор Bot API, сохраняющий отправленные документы"""
+
+    def __init__(self):
+        super().__init__()
+        self.documents: List[bytes] = []
+
+    async def do_request(self, url: str, method: str, request_data=None, **kwargs):
+        if url.endswith('/sendDocument'):
+            self.documents.append(request_data.multipart_data['document'][1])
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+async def employees(application, count: int, stop: asyncio.Event) -> List[float]:
+    """Нажатия сотрудников до stop; вернуть задержки ответов, мс"""
+    latencies = []
+    update_ids = iter(range(10**9, 2 * 10**9))
+
+    async def employee(user_id: int):
+        steps = ["📊 Мой прогресс", "❓ FAQ"]
+        step = 0
+        pressed = time.perf_counter()
+        while not stop.is_set():
+            update = make_text_update(application.bot, next(update_ids), user_id, steps[step % len(steps)])
+            await application.process_update(update)
+            # Задержка считается от момента нажатия: если цикл событий занят, ответ ждет вместе с ним
+            answered = time.perf_counter()
+            latencies.append((answered - pressed) * 1000)
+            step += 1
+            # Пауза между нажатиями, как у живых пользователей
+            pressed = answered + PAUSE
+            await asyncio.sleep(PAUSE)
+
+    await asyncio.gather(*(employee(FIRST_EMPLOYEE_ID + index) for index in range(count)))
+    return sorted(latencies)
+
+
+def describe(name: str, latencies: List[float], extra: str = "") -> str:
+    return (f"  {name}: {len(latencies)} ответов, p50 {percentile(latencies, 0.5):.1f} мс, "
+            f"p99 {percentile(latencies, 0.99):.1f} мс, max {latencies[-1]:.0f} мс{extra}")
+
+
+def check_documents(documents: List[bytes], counts: Dict[str, int], part_size: int) -> List[str]:
+    """Расхождения распакованных документов с БД"""
+    rows: Dict[str, int] = {}
+    for document in documents:
+        for line in gzip.decompress(document).splitlines():
+            table = json.loads(line)['table']
+            rows[table] = rows.get(table, 0) + 1
+    problems = [f"{table}: {rows.get(table, 0)} строк из {count}" for table, count in counts.items()
+                if rows.get(table, 0) != count]
+    # Часть может превысить предел на одну пачку строк
+    problems += [f"часть {number}: {len(document) / 2 ** 20:.1f} МБ" for number, document in enumerate(documents, 1)
+                 if len(document) > part_size + 2 ** 20]
+    return problems
+
+
+async def run(args: argparse.Namespace):
+    """Запустить бенчмарк"""
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="export_jobs_bench_"), "dataset.db")
+    if not os.path.exists(db_path):
+        generate(db_path, users=args.users, actions=args.actions, feedback=args.users // 2)
+    shutil.copyfile(db_path, os.environ['DATABASE_PATH'])
+    export_jobs.directory = os.path.join(WORK_DIRECTORY, "exports")
+
+    api = DocumentCapture()
+    application = Application.builder().token("123456:LOAD-TEST").request(api) \
+        .get_updates_request(FakeBotRequest()).build()
+    main.setup_handlers(application)
+    await application.initialize()
+    for index in range(args.employees):
+        await application.process_update(make_text_update(application.bot, index + 1, FIRST_EMPLOYEE_ID + index,
+                                                          "/start"))
+    counts = await asyncio.to_thread(db_manager.count_export_rows)
+    print(f"📦 Фоновая выгрузка: {sum(counts.values())} строк, {args.employees} сотрудников, "
+          f"части по {args.part_size_mb:g} МБ")
+
+    # Без выгрузки
+    stop = asyncio.Event()
+    asyncio.get_running_loop().call_later(args.seconds, stop.set)
+    print(describe("без выгрузки", await employees(application, args.employees, stop)))
+
+    # Выгрузка прямо в цикле событий, как раньше в обработчике
+    stop = asyncio.Event()
+    tapping = asyncio.create_task(employees(application, args.employees, stop))
+    await asyncio.sleep(1)
+    started = time.perf_counter()
+    write_export(db_manager, ExportJob(admin_id=ADMIN_ID, chat_id=ADMIN_ID), os.path.join(WORK_DIRECTORY, "inline"),
+                 export_jobs.part_size)
+    inline_seconds = time.perf_counter() - started
+    await asyncio.sleep(1)
+    stop.set()
+    print(describe("выгрузка в цикле событий", await tapping, f"; выгрузка {inline_seconds:.1f} с"))
+
+    # Фоновая выгрузка по кнопке администратора
+    stop = asyncio.Event()
+    tapping = asyncio.create_task(employees(application, args.employees, stop))
+    await asyncio.sleep(1)
+    started = time.perf_counter()
+    await application.process_update(make_callback_update(application.bot, 1, ADMIN_ID, "admin_export"))
+    handler_ms = (time.perf_counter() - started) * 1000
+    while export_jobs.jobs:
+        await asyncio.sleep(0.1)
+    job_seconds = time.perf_counter() - started
+    stop.set()
+    size = sum(map(len, api.documents))
+    print(describe("фоновая выгрузка", await tapping,
+                   f"; выгрузка {job_seconds:.1f} с, ответ на кнопку {handler_ms:.0f} мс, "
+                   f"обновлений прогресса {export_jobs.progress_edits}, "
+                   f"документов {len(api.documents)} ({size / 2 ** 20:.1f} МБ)"))
+
+    # Выгрузка читает копию БД для аналитики, сотрудники тем временем пишут в основную
+    counts = await asyncio.to_thread(analytics_db.count_export_rows)
+    problems = check_documents(api.documents, counts, export_jobs.part_size)
+    leftovers = os.listdir(export_jobs.directory)
+    if leftovers:
+        problems.append(f"не удалены файлы: {leftovers}")
+    print(f"  сверка документов с БД: {'совпадает' if not problems else '⚠️ ' + '; '.join(problems)}")
+
+    await export_jobs.stop()
+    await application.shutdown()
+    shutil.rmtree(WORK_DIRECTORY)
+
+
+if __name__ == '__main__':
+    asyncio.run(run(ARGS))
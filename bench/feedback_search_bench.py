@@ -0,0 +1,73 @@
+# bench/feedback_search_bench.py
+"""
+Бенчмарк полнотекстового поиска по обратной связи
+
+Запуск: python -m bench.feedback_search_bench [количество сообщений] [путь к БД]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from database.manager import DatabaseManager
+
+WORDS = (
+    "доступ почта пароль ноутбук монитор пропуск офис парковка обед кофе зарплата аванс отпуск "
+    "больничный документы договор подпись наставник команда планерка задача jira vpn wifi принтер "
+    "кондиционер шум стул стол переговорная календарь обучение курс английский бонус премия "
+    "онбординг адаптация руководитель hr бухгалтерия справка график удаленка опоздание"
+).split()
+
+QUERIES = ["доступ почта", "vpn", "отпуск", "пароль ноутбук", "кондиц", "больничный справка", "несуществующееслово"]
+
+
+def fill_feedback(manager: DatabaseManager, total: int, batch_size: int = 50000):
+    """Заполнить таблицу обратной связи синтетическими сообщениями"""
+    rng = random.Random(42)
+    with manager.get_connection() as conn:
+        conn.execute("INSERT OR IGNORE INTO users (user_id, full_name) VALUES (1, 'Bench User')")
+        for start in range(0, total, batch_size):
+            rows = [
+                (1, " ".join(rng.choices(WORDS, k=rng.randint(5, 25))))
+                for _ in range(min(batch_size, total - start))
+            ]
+            conn.executemany("INSERT INTO feedback (user_id, message) VALUES (?, ?)", rows)
+        conn.commit()
+
+
+def run(total: int = 1_000_000, db_path: str = None):
+    """Запустить бенчмарк поиска по обратной связи"""
+    db_path = db_path or os.path.join(tempfile.mkdtemp(), "feedback_bench.db")
+    manager = DatabaseManager(db_path)
+
+    with manager.get_connection() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+
+    if existing < total:
+        started = time.perf_counter()
+        fill_feedback(manager, total - existing)
+        print(f"📥 Загружено {total - existing} сообщений за {time.perf_counter() - started:.1f} с")
+
+    print(f"🔍 Поиск по {total} сообщениям ({db_path}), FTS5: {'да' if manager.fts_enabled else 'нет'}")
+    for query in QUERIES:
+        timings = []
+        cursor = None
+        for _ in range(20):
+            started = time.perf_counter()
+            page = manager.search_feedback(query, cursor=cursor, limit=10)
+            timings.append((time.perf_counter() - started) * 1000)
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        timings.sort()
+        print(f"  «{query}»: страниц {len(timings)}, "
+              f"медиана {timings[len(timings) // 2]:.2f} мс, максимум {timings[-1]:.2f} мс")
+
+
+if __name__ == '__main__':
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        sys.argv[2] if len(sys.argv) > 2 else None
+    )
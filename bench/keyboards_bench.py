@@ -0,0 +1,101 @@
+# bench/keyboards_bench.py
+"""
+Бенчмарк клавиатур: сборка разметки и ее сериализация для запроса к Bot
+API без кэша и с кэшем Keyboards
+
+Для каждой клавиатуры замеряется то, что происходит на каждом ответе
+бота: получение разметки и превращение ее в параметр reply_markup
+запроса (RequestParameter, как при отправке через PTB). Клавиатуры с
+параметрами вызываются с набором аргументов, как в админке: страницы
+списков, подтверждения для разных сотрудников, кнопка "Дальше" поиска.
+Проверяется, что кэшированные разметки сериализуются так же, как
+собранные заново.
+
+Запуск: python -m bench.keyboards_bench [--requests N]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from telegram.request._requestparameter import RequestParameter
+
+from bot.keyboards import KEYBOARD_REGISTRY, Keyboards
+
+
+def build_calls(requests: int, seed: int = 5) -> Dict[str, List[Tuple[Callable, Callable]]]:
+    """Вызовы клавиатур: (с кэшем, без кэша) для каждого запроса"""
+    rng = random.Random(seed)
+    calls = {}
+
+    static = [getter for name, getter in KEYBOARD_REGISTRY.items() if name.startswith('get_')
+              and getter.__wrapped__.__code__.co_argcount == 0]
+    calls['статические'] = [(getter, getter.__wrapped__) for getter in
+                            (rng.choice(static) for _ in range(requests))]
+
+    pagination = []
+    for _ in range(requests):
+        args = (rng.randint(1, 20), 20, rng.choice(("users", "feedback")))
+        pagination.append((lambda args=args: Keyboards.get_pagination(*args),
+                           lambda args=args: Keyboards.get_pagination.__wrapped__(*args)))
+    calls['get_pagination'] = pagination
+
+    confirmation = []
+    for _ in range(requests):
+        # Подтверждения для сотрудников, которых смотрят чаще других
+        args = ("сброс", f"confirm_reset_progress?user_id={int(rng.paretovariate(1.2)) * 1000}", "back_to_admin")
+        confirmation.append((lambda args=args: Keyboards.get_confirmation(*args),
+                             lambda args=args: Keyboards.get_confirmation.__wrapped__(*args)))
+    calls['get_confirmation'] = confirmation
+
+    callback = []
+    for _ in range(requests):
+        buttons = [("➡️ Дальше", f"admin_fbsearch_{rng.randint(1, 300)}")]
+        callback.append((lambda buttons=buttons: Keyboards.create_callback_keyboard(buttons),
+                         lambda buttons=buttons: Keyboards._callback_keyboard.__wrapped__(tuple(buttons), 2)))
+    calls['create_callback_keyboard'] = callback
+    return calls
+
+
+def serialize(markup) -> str:
+    """Параметр reply_markup так, как его готовит PTB для запроса"""
+    return RequestParameter.from_input('reply_markup', markup).json_value
+
+
+def measure(calls: List[Callable]) -> float:
+    """Среднее время получения и сериализации разметки, мкс"""
+    started = time.perf_counter()
+    for call in calls:
+        serialize(call())
+    return (time.perf_counter() - started) / len(calls) * 1_000_000
+
+
+def run(requests: int):
+    """Запустить бенчмарк"""
+    print(f"⌨️ Клавиатуры: {requests} запросов на группу, сборка и сериализация reply_markup")
+    mismatched = 0
+    for name, pairs in build_calls(requests).items():
+        uncached = measure([build for _, build in pairs])
+        cached = measure([getter for getter, _ in pairs])
+        mismatched += sum(1 for getter, build in pairs[:200]
+                          if json.loads(serialize(getter())) != json.loads(serialize(build())))
+        print(f"  {name}: без кэша {uncached:.1f} мкс, с кэшем {cached:.1f} мкс ({uncached / cached:.1f}x)")
+
+    for name in ('get_pagination', 'get_confirmation', '_callback_keyboard'):
+        info = KEYBOARD_REGISTRY[name].cache_info()
+        print(f"  LRU {name}: попаданий {info.hits}, промахов {info.misses}, размер {info.currsize}/{info.maxsize}")
+    if mismatched:
+        print(f"  ⚠️ Кэшированные разметки отличаются от собранных заново: {mismatched}")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк клавиатур")
+    parser.add_argument('--requests', type=int, default=20000)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    run(args.requests)
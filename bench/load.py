@@ -0,0 +1,321 @@
+# bench/load.py
+"""
+Сквозной нагрузочный тест: настоящее Application из main.setup_handlers
+против встроенного имитатора Telegram Bot API
+
+Каждый синтетический сотрудник проходит сценарий: /start -> пребординг ->
+онбординг -> FAQ -> обратная связь. Результат выводится в JSON:
+пропускная способность, p50/p95/p99 по маршрутам, SQL-запросы и фиксации
+транзакций на обновление, пиковое потребление памяти.
+
+Запуск: python -m bench.load [--users N] [--concurrency N] [--api-latency мс] [--output report.json]
+       [--baseline previous.json] [--tolerance 0.2]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Отдельная БД и администраторы задаются до импорта приложения
+os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(), "load_bench.db"))
+os.environ.setdefault('ADMIN_IDS', "900000001,900000002")
+
+from telegram import Update  # noqa: E402
+from telegram.ext import Application  # noqa: E402
+from telegram.request import BaseRequest, RequestData  # noqa: E402
+
+import main  # noqa: E402
+from handlers.routes import router  # noqa: E402
+from services.metrics import metrics  # noqa: E402
+from services.notifier import admin_notifier  # noqa: E402
+
+BOT_USER = {"id": 100000, "is_bot": True, "first_name": "OnboardingBuddy", "username": "onboarding_buddy_bot"}
+
+# Сценарий сотрудника: ("text", текст) или ("callback", callback_data)
+JOURNEY: List[Tuple[str, str]] = [
+    ("text", "/start"),
+    ("text", "🚀 Пребординг"),
+    ("callback", "start_preboarding"),
+    ("callback", "docs_main"),
+    ("callback", "docs_main_sent"),
+    ("callback", "docs_tk"),
+    ("callback", "docs_tk_sent"),
+    ("callback", "all_docs_sent"),
+    ("text", "📋 Онбординг"),
+    ("callback", "start_onboarding"),
+    ("callback", "email_received"),
+    ("callback", "team_intro"),
+    ("callback", "meetings"),
+    ("callback", "complete_onboarding"),
+    ("text", "❓ FAQ"),
+    ("text", "💰 Зарплата и льготы"),
+    ("text", "🏖️ Отпуска и больничные"),
+    ("text", "когда приходит зарплата"),
+    ("text", "💬 Обратная связь"),
+    ("text", "feedback"),
+    ("text", "📊 Мой прогресс"),
+]
+
+FEEDBACK_TEXTS = [
+    "Не работает VPN, не могу подключиться к корпоративной сети",
+    "Очень понравилась встреча с командой, спасибо наставнику",
+    "Долго делали пропуск в офис",
+    "Хотелось бы больше информации про ДМС",
+]
+
+
+class FakeBotRequest(BaseRequest):
+    """Имитатор Bot API: отвечает на методы, которые использует бот"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._message_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        self.calls[api_method] = self.calls.get(api_method, 0) + 1
+        params = request_data.parameters if request_data else {}
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if api_method == 'getMe':
+            result: Any = BOT_USER
+        elif api_method in ('sendMessage', 'editMessageText', 'sendDocument'):
+            chat_id = int(params.get('chat_id', 0))
+            result = {
+                "message_id": int(params.get('message_id') or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get('text', ''),
+            }
+        else:
+            result = True
+
+        return 200, json.dumps({"ok": True, "result": result}).encode('utf-8')
+
+
+def make_user(user_id: int) -> Dict[str, Any]:
+    """Пользователь Telegram"""
+    return {"id": user_id, "is_bot": False, "first_name": f"Сотрудник{user_id}", "username": f"employee{user_id}"}
+
+
+def make_text_update(bot, update_id: int, user_id: int, text: str) -> Update:
+    """Обновление с текстовым сообщением (или командой)"""
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": make_user(user_id),
+        "text": text,
+    }
+    if text.startswith('/'):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return Update.de_json({"update_id": update_id, "message": message}, bot)
+
+
+def make_callback_update(bot, update_id: int, user_id: int, data: str) -> Update:
+    """Обновление с нажатием inline-кнопки"""
+    return Update.de_json({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": make_user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": BOT_USER,
+                "text": "...",
+            },
+        },
+    }, bot)
+
+
+def route_name(kind: str, value: str) -> str:
+    """Название шага для отчета"""
+    if kind == "callback":
+        return router.resolve_callback(value)[0]
+    if value.startswith('/'):
+        return value.split()[0]
+    return router.resolve_text(value)[0]
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Перцентиль отсортированного списка"""
+    index = min(len(values) - 1, int(len(values) * p))
+    return values[index]
+
+
+def peak_rss_mb() -> float:
+    """Пиковое потребление памяти процессом"""
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+
+
+async def run_load(users: int = 200, concurrency: int = 50, api_latency_ms: float = 0.0,
+                   journey: List[Tuple[str, str]] = None,
+                   prepare: Callable[[Application], Any] = None) -> Dict[str, Any]:
+    """Прогнать сценарии users сотрудников и вернуть отчет
+
+    prepare вызывается с готовым приложением перед началом нагрузки.
+    """
+    journey = journey or JOURNEY
+    fake_api = FakeBotRequest(api_latency_ms / 1000)
+    application = (
+        Application.builder()
+        .token("123456:LOAD-TEST")
+        .request(fake_api)
+        .get_updates_request(FakeBotRequest())
+        .build()
+    )
+    main.setup_handlers(application)
+    await application.initialize()
+    if prepare:
+        prepare(application)
+
+    update_ids = itertools.count(1)
+    latencies: Dict[str, List[float]] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    statements = metrics.counter('onboarding_db_statements_total', 'Выполнено SQL-запросов')
+    statements_before = statements.value
+    commits = metrics.counter('onboarding_db_commits_total', 'Зафиксировано транзакций')
+    commits_before = commits.value
+
+    async def employee(index: int):
+        user_id = 10_000_000 + index
+        async with semaphore:
+            for kind, value in journey:
+                if kind == "text" and value == "feedback":
+                    value = f"{FEEDBACK_TEXTS[index % len(FEEDBACK_TEXTS)]} #{index}"
+                    name = "feedback_message"
+                else:
+                    name = route_name(kind, value)
+
+                update_id = next(update_ids)
+                if kind == "callback":
+                    update = make_callback_update(application.bot, update_id, user_id, value)
+                else:
+                    update = make_text_update(application.bot, update_id, user_id, value)
+
+                started = time.perf_counter()
+                await application.process_update(update)
+                latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(employee(i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+
+    await admin_notifier.stop()
+    await application.shutdown()
+
+    total_updates = sum(len(values) for values in latencies.values())
+    all_latencies = sorted(value for values in latencies.values() for value in values)
+    errors = sum(counter.value for counter in metrics.counters.get('onboarding_handler_errors_total', {}).values())
+
+    per_route = {}
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        per_route[name] = {
+            'count': len(values),
+            'p50_ms': round(percentile(values, 0.5), 3),
+            'p95_ms': round(percentile(values, 0.95), 3),
+            'p99_ms': round(percentile(values, 0.99), 3),
+        }
+
+    return {
+        'users': users,
+        'concurrency': concurrency,
+        'api_latency_ms': api_latency_ms,
+        'updates': total_updates,
+        'duration_s': round(elapsed, 3),
+        'throughput_updates_per_s': round(total_updates / elapsed, 1),
+        'latency_ms': {
+            'p50': round(percentile(all_latencies, 0.5), 3),
+            'p95': round(percentile(all_latencies, 0.95), 3),
+            'p99': round(percentile(all_latencies, 0.99), 3),
+        },
+        'routes': per_route,
+        'db_statements_per_update': round((statements.value - statements_before) / total_updates, 2),
+        'db_commits_per_update': round((commits.value - commits_before) / total_updates, 2),
+        'api_calls': fake_api.calls,
+        'handler_errors': errors,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Аргументы командной строки"""
+    parser = argparse.ArgumentParser(description="Сквозной нагрузочный тест OnboardingBuddy")
+    parser.add_argument('--users', type=int, default=200, help="количество синтетических сотрудников")
+    parser.add_argument('--concurrency', type=int, default=50, help="сотрудников одновременно")
+    parser.add_argument('--api-latency', type=float, default=0.0, help="задержка имитатора Bot API, мс")
+    parser.add_argument('--output', help="файл для JSON-отчета (по умолчанию stdout)")
+    parser.add_argument('--baseline', help="отчет предыдущего релиза для сравнения")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="допустимое ухудшение (доля)")
+    return parser.parse_args(argv)
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Список регрессий относительно базового отчета"""
+    regressions = []
+
+    if report['throughput_updates_per_s'] < baseline['throughput_updates_per_s'] * (1 - tolerance):
+        regressions.append(f"пропускная способность {report['throughput_updates_per_s']} "
+                           f"< {baseline['throughput_updates_per_s']} обновлений/с")
+
+    for key in ('p95', 'p99'):
+        if report['latency_ms'][key] > baseline['latency_ms'][key] * (1 + tolerance):
+            regressions.append(f"{key} {report['latency_ms'][key]} > {baseline['latency_ms'][key]} мс")
+
+    if report['db_statements_per_update'] > baseline['db_statements_per_update'] * (1 + tolerance):
+        regressions.append(f"SQL на обновление {report['db_statements_per_update']} "
+                           f"> {baseline['db_statements_per_update']}")
+
+    return regressions
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    report = asyncio.run(run_load(args.users, args.concurrency, args.api_latency))
+    report_json = json.dumps(report, ensure_ascii=False, indent=2)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report_json)
+        print(f"📊 Отчет сохранен: {args.output}")
+    else:
+        print(report_json)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"❌ Регрессия: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ Регрессий относительно базового отчета нет")
@@ -0,0 +1,124 @@
+# bench/logging_bench.py
+"""
+Бенчмарк логирования: синхронные FileHandler/StreamHandler против
+очереди QueueHandler/QueueListener (с выборкой и в JSON)
+
+Для каждой конфигурации измеряются вызовы logger.info в секунду и
+задержка цикла событий (насколько опаздывает таймер 1 мс, пока
+обработчики пишут логи). Медленный диск имитируется задержкой записи.
+
+Запуск: python -m bench.logging_bench [количество вызовов] [задержка записи, мс]
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from utils.log_pipeline import LogPipeline, JsonFormatter, TEXT_FORMAT, create_file_handler
+
+
+class SlowStream:
+    """Поток вывода, каждая запись в который занимает latency секунд"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lines = 0
+
+    def write(self, text: str):
+        if self.latency:
+            time.sleep(self.latency)
+        self.lines += 1
+
+    def flush(self):
+        pass
+
+
+def build(kind: str, directory: str, latency: float):
+    """Настроить логгер бенчмарка; вернуть (логгер, очередь или None, обработчик консоли)"""
+    logger = logging.getLogger(f"bench.logging.{kind}")
+    logger.handlers.clear()
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    json_output = kind == "очередь + JSON"
+    formatter = JsonFormatter() if json_output else logging.Formatter(TEXT_FORMAT)
+    file_handler = create_file_handler(os.path.join(directory, f"{abs(hash(kind))}.log"), 10 * 1024 * 1024, 3)
+    stream_handler = logging.StreamHandler(SlowStream(latency))
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    if kind == "синхронно":
+        logger.addHandler(file_handler)
+        logger.addHandler(stream_handler)
+        return logger, None, stream_handler
+
+    pipeline = LogPipeline([file_handler, stream_handler], sample_rate=0.1 if "выборка" in kind else 1.0)
+    pipeline.start(logger)
+    return logger, pipeline, stream_handler
+
+
+def calls_per_second(logger: logging.Logger, calls: int) -> float:
+    """Скорость вызовов logger.info из одного места, как в DatabaseManager.update_user_stage"""
+    started = time.perf_counter()
+    for i in range(calls):
+        logger.info(f"Этап пользователя {i} обновлен: stage={i % 10}, status=None")
+    return calls / (time.perf_counter() - started)
+
+
+async def loop_stall(logger: logging.Logger, updates: int, logs_per_update: int = 5) -> tuple:
+    """Опоздание таймера 1 мс (p99 и максимум, мс), пока «обработчики» пишут логи"""
+    lateness = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            lateness.append(max(0.0, time.perf_counter() - expected))
+
+    async def handlers():
+        for update in range(updates):
+            for i in range(logs_per_update):
+                logger.info(f"Пользователь {update} обновлен, шаг {i}")
+            await asyncio.sleep(0)
+        done.set()
+
+    await asyncio.gather(ticker(), handlers())
+    if not lateness:
+        return 0.0, 0.0
+    lateness.sort()
+    return lateness[int(len(lateness) * 0.99)] * 1000, lateness[-1] * 1000
+
+
+def run(calls: int = 100_000, latency_ms: float = 0.2):
+    """Запустить бенчмарк"""
+    directory = tempfile.mkdtemp(prefix="logging_bench_")
+    kinds = ["синхронно", "очередь", "очередь + выборка", "очередь + JSON"]
+
+    for latency in (0.0, latency_ms / 1000):
+        count = calls if not latency else max(100, int(calls / 50))
+        print(f"📝 Логирование, задержка записи {latency * 1000:.1f} мс, {count} вызовов")
+        for kind in kinds:
+            logger, pipeline, stream_handler = build(kind, directory, latency)
+            rate = calls_per_second(logger, count)
+            stall_p99, stall_max = asyncio.run(loop_stall(logger, max(20, count // 50)))
+
+            written_before_stop = stream_handler.stream.lines
+            if pipeline:
+                pipeline.stop(logger)
+            dropped = pipeline.queue_handler.dropped if pipeline else 0
+            suppressed = pipeline.sampling.total_suppressed if pipeline and pipeline.sampling else 0
+
+            print(f"  {kind:20} {rate:>10.0f} вызовов/с, "
+                  f"опоздание таймера p99 {stall_p99:>6.2f} / макс {stall_max:>6.1f} мс, "
+                  f"записано {stream_handler.stream.lines} (до остановки {written_before_stop}), "
+                  f"прорежено {suppressed}, отброшено {dropped}")
+
+
+if __name__ == '__main__':
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    )
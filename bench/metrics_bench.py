@@ -0,0 +1,79 @@
+# bench/metrics_bench.py
+"""
+Бенчмарк накладных расходов инструментирования
+
+Запуск: python -m bench.metrics_bench [количество итераций]
+"""
+import asyncio
+import sqlite3
+import sys
+import time
+import urllib.request
+
+from services.metrics import (
+    instrument_handler, instrument_method, count_db_statement, metrics, start_metrics_server
+)
+from utils.helpers import get_system_info
+
+
+def plain_method(value):
+    return value
+
+
+async def plain_handler(update, context):
+    return None
+
+
+def per_call_ns(func, iterations: int) -> float:
+    """Среднее время вызова в наносекундах"""
+    started = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+async def per_call_async_ns(func, iterations: int) -> float:
+    """Среднее время вызова корутины в наносекундах"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await func(None, None)
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def run(iterations: int = 200000):
+    """Запустить бенчмарк"""
+    print("📈 Накладные расходы инструментирования")
+
+    bare = per_call_ns(plain_method, iterations)
+    wrapped = per_call_ns(instrument_method('bench_method', plain_method), iterations)
+    print(f"  Метод БД: {bare:.0f} нс -> {wrapped:.0f} нс (+{(wrapped - bare) / 1000:.2f} мкс)")
+
+    bare = asyncio.run(per_call_async_ns(plain_handler, iterations))
+    wrapped = asyncio.run(per_call_async_ns(instrument_handler('bench_handler', plain_handler), iterations))
+    print(f"  Обработчик: {bare:.0f} нс -> {wrapped:.0f} нс (+{(wrapped - bare) / 1000:.2f} мкс)")
+
+    conn = sqlite3.connect(":memory:")
+    bare = per_call_ns(lambda i: conn.execute("SELECT ?", (i,)), iterations)
+    conn.set_trace_callback(count_db_statement)
+    traced = per_call_ns(lambda i: conn.execute("SELECT ?", (i,)), iterations)
+    print(f"  SQL-запрос: {bare:.0f} нс -> {traced:.0f} нс (+{(traced - bare) / 1000:.2f} мкс)")
+
+    started = time.perf_counter()
+    get_system_info()
+    print(f"  get_system_info: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    server = start_metrics_server(port=19108)
+    if server:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            body = response.read().decode('utf-8')
+        server.shutdown()
+        print(f"  HTTP-выгрузка: {len(body.splitlines())} строк, "
+              f"bench_handler в выгрузке: {'да' if 'bench_handler' in body else 'нет'}")
+
+    started = time.perf_counter()
+    metrics.render()
+    print(f"  Формирование выгрузки: {(time.perf_counter() - started) * 1000:.2f} мс")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
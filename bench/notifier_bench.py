@@ -0,0 +1,99 @@
+# bench/notifier_bench.py
+"""
+Бенчмарк задержки подтверждения обратной связи при уведомлении администраторов
+
+Сравнивает прямую последовательную отправку (NOTIFICATION_DIGEST_WINDOW=0)
+и фоновые дайджесты. Bot API имитируется задержкой на каждый send_message.
+
+Запуск: python -m bench.notifier_bench [количество сообщений] [задержка API, мс]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ADMINS = 10
+
+# Настройки должны быть заданы до импорта обработчиков
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(), "notifier_bench.db")
+os.environ['ADMIN_IDS'] = ",".join(str(1000 + i) for i in range(ADMINS))
+
+from handlers.feedback import handle_feedback_message  # noqa: E402
+from services.notifier import admin_notifier  # noqa: E402
+
+
+class FakeBot:
+    """Имитация Bot API с фиксированной задержкой ответа"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.sent = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.sent += 1
+
+
+def make_update(user_id: int, text: str, replies: list):
+    """Собрать минимальный Update с текстовым сообщением"""
+    async def reply_text(reply, **kwargs):
+        replies.append(time.perf_counter())
+
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id, username=f"user{user_id}"),
+        message=SimpleNamespace(text=text, reply_text=reply_text)
+    )
+
+
+def percentile(values, p: float) -> float:
+    """Перцентиль отсортированного списка"""
+    index = min(len(values) - 1, int(len(values) * p))
+    return values[index]
+
+
+async def measure(window: float, total: int, latency: float) -> dict:
+    """Отправить total сообщений обратной связи и замерить задержку подтверждения"""
+    admin_notifier.window = window
+    bot = FakeBot(latency)
+    latencies = []
+
+    for i in range(total):
+        replies = []
+        update = make_update(1, f"сообщение {window} номер {i} тема{i} вопрос{i}", replies)
+        context = SimpleNamespace(bot=bot, user_data={'waiting_feedback': True})
+
+        started = time.perf_counter()
+        await handle_feedback_message(update, context)
+        latencies.append((replies[-1] - started) * 1000)
+
+    started = time.perf_counter()
+    await admin_notifier.stop()
+    drain_ms = (time.perf_counter() - started) * 1000
+
+    latencies.sort()
+    return {
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        'api_calls': bot.sent,
+        'drain_ms': drain_ms
+    }
+
+
+async def run(total: int, latency_ms: float):
+    """Запустить сравнение"""
+    print(f"📨 Подтверждение обратной связи: {ADMINS} администраторов, "
+          f"{total} сообщений, задержка API {latency_ms:.0f} мс")
+
+    for title, window in (("До (последовательная отправка)", 0), ("После (фоновые дайджесты)", 30)):
+        result = await measure(window, total, latency_ms / 1000)
+        print(f"  {title}: p50={result['p50']:.1f} мс, p99={result['p99']:.1f} мс, "
+              f"вызовов API={result['api_calls']}, досылка при остановке={result['drain_ms']:.0f} мс")
+
+
+if __name__ == '__main__':
+    asyncio.run(run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    ))
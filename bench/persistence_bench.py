@@ -0,0 +1,162 @@
+# bench/persistence_bench.py
+"""
+Бенчмарк хранения состояния бота: SQLitePersistence против PicklePersistence
+на состоянии 100 тысяч пользователей
+
+Измеряются запуск (загрузка состояния), первая подгрузка данных
+пользователя и сохранение, когда обновления были у всех пользователей,
+но данные изменились у 1%. Отдельно проверяется, что ожидание обратной
+связи переживает перезапуск приложения.
+
+Запуск: python -m bench.persistence_bench [количество пользователей]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from telegram.ext import Application, PicklePersistence
+
+from bench.load import FakeBotRequest, make_text_update
+from bot.persistence import SQLitePersistence
+from database.manager import DatabaseManager
+
+FIRST_USER_ID = 200_000_000
+
+
+def make_state(rng: random.Random, user_id: int) -> dict:
+    """Типичные user_data бота"""
+    state = {'waiting_feedback': rng.random() < 0.05}
+    if rng.random() < 0.01:
+        state['feedback_search_query'] = "доступ к почте"
+    return state
+
+
+async def mark_all(persistence, user_data: dict):
+    """Как Application.update_persistence: передать данные всех пользователей с обновлениями"""
+    await asyncio.gather(*(persistence.update_user_data(user_id, data) for user_id, data in user_data.items()))
+    await persistence.flush()
+
+
+async def bench_sqlite(directory: str, user_data: dict, changed: list):
+    manager = DatabaseManager(os.path.join(directory, "state.db"))
+
+    persistence = SQLitePersistence(manager)
+    started = time.perf_counter()
+    await mark_all(persistence, user_data)
+    initial = time.perf_counter() - started
+
+    # Перезапуск: состояние не читается целиком
+    started = time.perf_counter()
+    persistence = SQLitePersistence(manager)
+    await persistence.get_user_data()
+    await persistence.get_chat_data()
+    await persistence.get_bot_data()
+    startup = time.perf_counter() - started
+
+    loaded = {}
+    timings = []
+    for user_id in user_data:
+        data = {}
+        started = time.perf_counter()
+        await persistence.refresh_user_data(user_id, data)
+        timings.append(time.perf_counter() - started)
+        loaded[user_id] = data
+    timings.sort()
+    mismatches = sum(1 for user_id, data in user_data.items() if loaded[user_id] != data)
+
+    for user_id in changed:
+        loaded[user_id]['waiting_feedback'] = not loaded[user_id]['waiting_feedback']
+    writes_before = persistence.writes
+    started = time.perf_counter()
+    await mark_all(persistence, loaded)
+    steady = time.perf_counter() - started
+
+    print(f"  SQLite:  первая запись {initial:.2f} с, запуск {startup * 1000:.1f} мс, "
+          f"подгрузка пользователя p50 {timings[len(timings) // 2] * 1e6:.0f} мкс, "
+          f"сохранение 1% изменений {steady * 1000:.0f} мс "
+          f"(записано {persistence.writes - writes_before} строк), расхождений после перезапуска {mismatches}")
+
+
+async def bench_pickle(directory: str, user_data: dict, changed: list):
+    # on_flush=True - лучший для pickle режим: без него файл переписывается на каждом update_user_data
+    path = os.path.join(directory, "state.pickle")
+
+    persistence = PicklePersistence(path, on_flush=True)
+    started = time.perf_counter()
+    await mark_all(persistence, user_data)
+    initial = time.perf_counter() - started
+
+    started = time.perf_counter()
+    persistence = PicklePersistence(path, on_flush=True)
+    loaded = await persistence.get_user_data()
+    await persistence.get_chat_data()
+    await persistence.get_bot_data()
+    startup = time.perf_counter() - started
+
+    for user_id in changed:
+        loaded[user_id]['waiting_feedback'] = not loaded[user_id]['waiting_feedback']
+    started = time.perf_counter()
+    await mark_all(persistence, loaded)
+    steady = time.perf_counter() - started
+
+    print(f"  Pickle:  первая запись {initial:.2f} с, запуск {startup * 1000:.1f} мс, "
+          f"сохранение 1% изменений {steady * 1000:.0f} мс (файл переписывается целиком, "
+          f"{os.path.getsize(path) / 1024 / 1024:.1f} МБ)")
+
+
+async def check_restart(directory: str) -> bool:
+    """Ожидание обратной связи переживает перезапуск приложения"""
+    import main
+    from database.manager import db_manager
+    from services.notifier import admin_notifier
+
+    manager = DatabaseManager(os.path.join(directory, "restart.db"))
+    user_id = FIRST_USER_ID - 1
+
+    async def start_app():
+        application = (
+            Application.builder()
+            .token("123456:PERSISTENCE-TEST")
+            .request(FakeBotRequest())
+            .get_updates_request(FakeBotRequest())
+            .persistence(SQLitePersistence(manager))
+            .build()
+        )
+        main.setup_handlers(application)
+        await application.initialize()
+        return application
+
+    application = await start_app()
+    await application.process_update(make_text_update(application.bot, 1, user_id, "/start"))
+    await application.process_update(make_text_update(application.bot, 2, user_id, "💬 Обратная связь"))
+    await application.update_persistence()
+    await application.persistence.flush()
+    await application.shutdown()
+
+    application = await start_app()
+    await application.process_update(make_text_update(application.bot, 3, user_id, "Сообщение после перезапуска"))
+    await admin_notifier.stop()
+    await application.shutdown()
+
+    return any(item['message'] == "Сообщение после перезапуска" for item in db_manager.get_recent_feedback(5))
+
+
+def run(users: int = 100_000):
+    """Запустить бенчмарк"""
+    rng = random.Random(42)
+    user_data = {FIRST_USER_ID + i: make_state(rng, FIRST_USER_ID + i) for i in range(users)}
+    changed = rng.sample(list(user_data), max(1, users // 100))
+
+    print(f"💾 Состояние бота: {users} пользователей, изменено {len(changed)}")
+    asyncio.run(bench_sqlite(tempfile.mkdtemp(), {k: dict(v) for k, v in user_data.items()}, changed))
+    asyncio.run(bench_pickle(tempfile.mkdtemp(), {k: dict(v) for k, v in user_data.items()}, changed))
+
+    survived = asyncio.run(check_restart(tempfile.mkdtemp()))
+    print(f"  Ожидание обратной связи после перезапуска: {'сохранилось' if survived else 'ПОТЕРЯНО'}")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,64 @@
+# bench/profiler_bench.py
+"""
+Бенчмарк профилирования по запросу: пропускная способность сквозного
+сценария без профилировщика, с выключенным и с включенным профилированием
+
+Запуск: python -m bench.profiler_bench [количество сотрудников]
+"""
+import asyncio
+import os
+import pstats
+import sys
+import tempfile
+
+from bench.load import run_load
+from services.profiler import update_profiler
+
+
+def run(users: int = 50):
+    """Запустить бенчмарк"""
+    update_profiler.output_dir = tempfile.mkdtemp(prefix="profiles_")
+    originals = {}
+
+    def remember(application):
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                originals[handler] = handler.callback
+
+    def enable(rate, memory=False):
+        def prepare(application):
+            remember(application)
+            update_profiler.enable(rate, memory=memory)
+        return prepare
+
+    print("🔬 Профилирование по запросу")
+    scenarios = [
+        ("выключено", remember),
+        ("10% обновлений", enable(0.1)),
+        ("100% обновлений", enable(1.0)),
+        ("100% + tracemalloc", enable(1.0, memory=True)),
+    ]
+
+    for title, prepare in scenarios:
+        report = asyncio.run(run_load(users, concurrency=10, prepare=prepare))
+        files = update_profiler.disable()
+
+        # После выключения колбэки обработчиков должны вернуться к исходным
+        restored = all(handler.callback is callback for handler, callback in originals.items())
+        originals.clear()
+
+        print(f"  {title:20} {report['throughput_updates_per_s']:>7.1f} обновлений/с, "
+              f"p99 {report['latency_ms']['p99']:.1f} мс, файлов {len(files)}, "
+              f"колбэки восстановлены: {'да' if restored else 'НЕТ'}")
+
+        for path in files:
+            if path.endswith('.pstats'):
+                pstats.Stats(path)
+            elif os.path.getsize(path) == 0:
+                print(f"  ⚠️ Пустой файл: {path}")
+
+    print(f"  📁 Результаты: {update_profiler.output_dir}")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,132 @@
+# bench/reminders_bench.py
+"""
+Бенчмарк напоминаний: выбор «кому пора напомнить» по частичному индексу
+против просмотра всей таблицы users и отправка очереди через ReminderScheduler
+
+Проверяется, что запрос очереди идет по индексу, что два планировщика,
+работающие одновременно, не отправляют напоминание одному пользователю
+дважды, и что после отправки очередь пуста.
+
+Запуск: python -m bench.reminders_bench [количество пользователей]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List
+
+from telegram import Bot
+
+from bench.dataset import generate
+from bench.load import FakeBotRequest
+from config.settings import settings
+from database.manager import DatabaseManager
+from database.models import OnboardingStage, UserStatus
+from services.reminders import ReminderScheduler
+
+
+class RecordingRequest(FakeBotRequest):
+    """FakeBotRequest, запоминающий получателей и тексты сообщений"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency)
+        self.messages: List[tuple] = []
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if url.endswith('/sendMessage') and request_data:
+            self.messages.append((int(request_data.parameters['chat_id']), request_data.parameters['text']))
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+def timed(func, *args, repeat: int = 20) -> float:
+    """Медиана времени вызова, мс"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def full_scan_due(manager: DatabaseManager, now: datetime, limit: int) -> list:
+    """Выбор без очереди: кто не завершил онбординг и давно не менял этап"""
+    threshold = now - timedelta(days=settings.REMINDER_INTERVAL_DAYS)
+    with manager.get_connection() as conn:
+        return conn.execute('''
+            SELECT * FROM users
+            WHERE stage < ? AND status != ? AND updated_at <= ?
+            ORDER BY updated_at LIMIT ?
+        ''', (OnboardingStage.COMPLETE, UserStatus.COMPLETED.value, threshold, limit)).fetchall()
+
+
+def query_plan(manager: DatabaseManager, now: datetime) -> str:
+    """План запроса очереди напоминаний"""
+    with manager.get_connection() as conn:
+        rows = conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT user_id FROM users WHERE next_reminder_at <= ? ORDER BY next_reminder_at LIMIT 50
+        ''', (now,)).fetchall()
+    return "; ".join(row[-1] for row in rows)
+
+
+async def send_backlog(manager: DatabaseManager, now: datetime, schedulers: int, latency: float):
+    """Отправить всю очередь несколькими планировщиками одновременно"""
+    request = RecordingRequest(latency)
+    bot = Bot("123456:REMINDERS-BENCH", request=request, get_updates_request=FakeBotRequest())
+    await bot.initialize()
+
+    # Лимит одного запуска не ограничивает: rate * interval больше очереди
+    instances = [ReminderScheduler(manager, batch_size=settings.REMINDER_BATCH_SIZE, rate=10_000, interval=3600)
+                 for _ in range(schedulers)]
+
+    started = time.perf_counter()
+    sent = await asyncio.gather(*(scheduler.run_once(bot, now) for scheduler in instances))
+    elapsed = time.perf_counter() - started
+
+    await bot.shutdown()
+    return request.messages, sum(sent), elapsed, instances[0].backlog
+
+
+def run(users: int = 200_000):
+    """Запустить бенчмарк"""
+    path = os.path.join(tempfile.mkdtemp(prefix="reminders_bench_"), "reminders.db")
+    generate(path, users=users, actions=users, feedback=100)
+    manager = DatabaseManager(path)
+    now = datetime.now()
+
+    print(f"⏰ Напоминания: {users} пользователей, пора напомнить {manager.count_due_reminders(now)}")
+    print(f"  План запроса очереди: {query_plan(manager, now)}")
+
+    # Захват пачек в замере тоже забирает их из очереди, поэтому очередь считается после
+    batch = settings.REMINDER_BATCH_SIZE
+    print(f"  Выбор пачки из {batch}: просмотр таблицы {timed(full_scan_due, manager, now, batch):.2f} мс, "
+          f"захват из очереди {timed(manager.claim_due_reminders, batch, now):.2f} мс, "
+          f"глубина очереди {timed(manager.count_due_reminders, now):.2f} мс")
+    due = manager.count_due_reminders(now)
+
+    messages, sent, elapsed, backlog = asyncio.run(send_backlog(manager, now, schedulers=2, latency=0.005))
+    recipients = Counter(chat_id for chat_id, _ in messages)
+    duplicates = sum(1 for count in recipients.values() if count > 1)
+    print(f"  Отправка двумя планировщиками: {sent} напоминаний за {elapsed:.1f} с "
+          f"({sent / elapsed * 60:.0f} в минуту), осталось в очереди {backlog}, повторных {duplicates}")
+
+    # Тексты зависят от этапа
+    by_stage = {}
+    for chat_id, text in messages:
+        by_stage.setdefault(manager.get_user(chat_id).stage, text)
+    print(f"  Разных текстов по этапам: {len(set(by_stage.values()))} для этапов {sorted(by_stage)}")
+
+    # Повторный запуск сразу после отправки ничего не отправляет: следующие напоминания через интервал
+    _, sent_again, _, _ = asyncio.run(send_backlog(manager, now, schedulers=1, latency=0.0))
+    print(f"  Повторный запуск: отправлено {sent_again}")
+
+    if duplicates or backlog or sent != due or sent_again:
+        print("  ⚠️ Очередь напоминаний работает неверно")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
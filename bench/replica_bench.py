@@ -0,0 +1,144 @@
+# bench/replica_bench.py
+"""
+Бенчмарк копии БД для аналитики: задержка нажатий сотрудников, пока
+администратор строит отчеты
+
+Несколько потоков нажимают кнопки сценария (log_user_action и
+transition_user, как обработчики), а один поток без перерыва считает
+тяжелую аналитику: полный отчет когорт и воронки, точную активность по
+дням и популярные действия за всю историю. Режимы: без аналитики,
+аналитика на основной БД и на копии (database/replica.py) с частым
+обновлением, чтобы копирование попало в замер. Сравниваются p50/p99
+нажатия и ошибки блокировок; результаты отчета на копии и на основной
+БД сверяются.
+
+Запуск: python -m bench.replica_bench [--db PATH] [--users N] [--actions N] [--seconds N] [--max-lag N]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+from database.manager import DatabaseManager
+from database.models import OnboardingEvent
+from database.replica import AnalyticsReplica
+from services.analytics import OnboardingAnalytics
+from bench.dataset import generate
+
+
+def analytics_pass(manager: DatabaseManager) -> Dict[str, Any]:
+    """Тяжелые запросы админ-панели и выгрузки по всей истории"""
+    report = dict(OnboardingAnalytics(manager).report())
+    # Время расчета отличается от прогона к прогону
+    del report['computed_at'], report['compute_seconds']
+    return {
+        'report': report,
+        'daily': manager.get_daily_activity(days=365, exact=True),
+        'popular': manager.get_popular_actions(days=365, limit=20),
+    }
+
+
+def run_mode(manager: DatabaseManager, user_ids: List[int], analytics: DatabaseManager, seconds: float,
+             threads: int) -> Dict[str, Any]:
+    """Нажатия в threads потоках в течение seconds секунд, аналитика на analytics (None - без нее)"""
+    stop = threading.Event()
+    timings, errors, passes = [], [], []
+    lock = threading.Lock()
+    events = list(OnboardingEvent)
+
+    def tapper(seed: int):
+        rng = random.Random(seed)
+        local = []
+        while not stop.is_set():
+            user_id = rng.choice(user_ids)
+            started = time.perf_counter()
+            try:
+                manager.log_user_action(user_id, "bench_tap", "Бенчмарк копии БД")
+                manager.transition_user(user_id, rng.choice(events))
+            except sqlite3.OperationalError as e:
+                with lock:
+                    errors.append(str(e))
+            local.append(time.perf_counter() - started)
+            # Пауза между нажатиями, как у живых пользователей
+            time.sleep(0.005)
+        with lock:
+            timings.extend(local)
+
+    def analyst():
+        while not stop.is_set():
+            started = time.perf_counter()
+            analytics_pass(analytics)
+            passes.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=tapper, args=(seed,)) for seed in range(threads)]
+    if analytics is not None:
+        workers.append(threading.Thread(target=analyst))
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    timings.sort()
+    return {
+        'taps': len(timings) / seconds,
+        'p50_ms': timings[len(timings) // 2] * 1000,
+        'p99_ms': timings[int(len(timings) * 0.99)] * 1000,
+        'max_ms': timings[-1] * 1000,
+        'errors': errors,
+        'passes': passes,
+    }
+
+
+def run(db_path: str, users: int, actions: int, seconds: float, max_lag: float, threads: int):
+    """Запустить бенчмарк"""
+    if not os.path.exists(db_path):
+        generate(db_path, users=users, actions=actions, feedback=100)
+    manager = DatabaseManager(db_path)
+    user_ids = [user_id for user_id, _ in manager.get_user_signups()]
+    replica = AnalyticsReplica(manager, path=f"{db_path}.replica", max_lag=max_lag)
+    refresh_seconds = replica.refresh()
+    size_mb = os.path.getsize(db_path) / 2 ** 20
+    print(f"🪞 Копия БД для аналитики: {len(user_ids)} пользователей, {size_mb:.0f} МБ, "
+          f"копирование {refresh_seconds:.2f} с; {threads} потоков нажатий по {seconds:.0f} с")
+
+    modes = [("без аналитики", None), ("аналитика на основной БД", manager), ("аналитика на копии", replica.reader)]
+    for name, analytics in modes:
+        refreshes = replica.refreshes
+        result = run_mode(manager, user_ids, analytics, seconds, threads)
+        passes = result['passes']
+        line = (f"  {name}: {result['taps']:.0f} нажатий/с, p50 {result['p50_ms']:.1f} мс, "
+                f"p99 {result['p99_ms']:.1f} мс, max {result['max_ms']:.0f} мс, ошибок БД {len(result['errors'])}")
+        if passes:
+            line += f"; отчетов {len(passes)}, в среднем {sum(passes) / len(passes):.1f} с"
+        if analytics is replica.reader:
+            line += f", обновлений копии {replica.refreshes - refreshes} (последнее {replica.last_refresh_seconds:.2f} с)"
+        print(line)
+
+    # Отчеты по копии и по основной БД совпадают сразу после обновления копии
+    replica.refresh()
+    same = analytics_pass(replica.reader) == analytics_pass(manager)
+    print(f"  сверка отчетов копии и основной БД: {'совпадают' if same else '⚠️ расходятся'}")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк копии БД для аналитики")
+    parser.add_argument('--db', help="Набор данных (создается, если файла нет)")
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--actions', type=int, default=1_000_000)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--max-lag', type=float, default=5, help="граница устаревания копии, секунды")
+    parser.add_argument('--threads', type=int, default=4)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    run(args.db or os.path.join(tempfile.mkdtemp(prefix="replica_bench_"), "replica.db"),
+        args.users, args.actions, args.seconds, args.max_lag, args.threads)
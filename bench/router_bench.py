@@ -0,0 +1,54 @@
+# bench/router_bench.py
+"""
+Бенчмарк выбора обработчика: таблица маршрутов против цепочки regex-фильтров
+
+Запуск: python -m bench.router_bench [количество итераций]
+"""
+import re
+import sys
+import time
+
+from handlers.routes import router, TEXT_ROUTES, CALLBACK_ROUTES
+
+# Фильтры, которыми раньше разбирались текстовые сообщения в setup_handlers
+LEGACY_PATTERNS = [
+    re.compile("^(🚀|📋|📚|❓|👥|📞|💬|📊|🏠).*"),
+    re.compile("^(🏢|📜|🔧|📅).*"),
+    re.compile("^(💰|🕐|🏖️|🎓).*"),
+]
+
+
+def legacy_resolve(text: str) -> int:
+    """Старая схема: перебор regex-фильтров, затем цепочка сравнений"""
+    for index, pattern in enumerate(LEGACY_PATTERNS):
+        if pattern.match(text):
+            for position, route in enumerate(TEXT_ROUTES):
+                if text == route:
+                    return position
+            return -1
+    return -1
+
+
+def measure(func, items, iterations: int) -> float:
+    """Среднее время одного вызова в наносекундах"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for item in items:
+            func(item)
+    return (time.perf_counter() - started) / (iterations * len(items)) * 1e9
+
+
+def run(iterations: int = 20000):
+    """Запустить бенчмарк"""
+    texts = list(TEXT_ROUTES) + ["когда зарплата", "спасибо за помощь"]
+    callbacks = list(CALLBACK_ROUTES) + ["users_page_2", "admin_fbsearch_100", "unknown_action"]
+
+    print("🧭 Бенчмарк маршрутизации")
+    print(f"  Маршрутов: {len(TEXT_ROUTES)} текстовых, {len(CALLBACK_ROUTES)} callback")
+    print(f"  Текст, regex + if/elif: {measure(legacy_resolve, texts, iterations):.0f} нс")
+    print(f"  Текст, таблица маршрутов: {measure(router.resolve_text, texts, iterations):.0f} нс")
+    print(f"  Callback, таблица маршрутов: {measure(router.resolve_callback, callbacks, iterations):.0f} нс")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
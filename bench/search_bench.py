@@ -0,0 +1,72 @@
+# bench/search_bench.py
+"""
+Бенчмарк поиска по FAQ и полезной информации
+
+Запуск: python -m bench.search_bench [количество запросов]
+"""
+import random
+import sys
+import time
+
+from services.search import get_search_index
+
+QUERIES = [
+    "когда приходит зарплата",
+    "аванс",
+    "отпуск в первый месяц",
+    "сколько дней отпуска",
+    "больничный лист потерял",
+    "оплата больничного",
+    "удаленная работа",
+    "гибкий график",
+    "курсы английского",
+    "бюджет на обучение",
+    "компенсация спортзала",
+    "ДМС",
+    "vpn",
+    "корпоративная почта",
+    "jira confluence",
+    "хакатон",
+    "новогодний корпоратив",
+    "планерка it отдела",
+    "ценности компании",
+    "программа менторства",
+    "квантовый блокчейн",
+]
+
+
+def percentile(values, p: float) -> float:
+    """Перцентиль отсортированного списка"""
+    index = min(len(values) - 1, int(len(values) * p))
+    return values[index]
+
+
+def run(total_queries: int = 20000):
+    """Запустить бенчмарк поиска"""
+    started = time.perf_counter()
+    index = get_search_index()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(42)
+    queries = [rng.choice(QUERIES) for _ in range(total_queries)]
+    latencies = []
+
+    started = time.perf_counter()
+    for query in queries:
+        query_started = time.perf_counter()
+        index.search(query)
+        latencies.append((time.perf_counter() - query_started) * 1_000_000)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print("🔎 Бенчмарк поиска")
+    print(f"  Фрагментов в индексе: {len(index.documents)}, терминов: {len(index.postings)}")
+    print(f"  Построение индекса: {build_ms:.1f} мс")
+    print(f"  Запросов: {total_queries}, пропускная способность: {total_queries / elapsed:.0f} запросов/с")
+    print(f"  Задержка: p50={percentile(latencies, 0.5):.1f} мкс, "
+          f"p95={percentile(latencies, 0.95):.1f} мкс, p99={percentile(latencies, 0.99):.1f} мкс")
+    print(f"  Запросы без результатов: {index.get_zero_result_queries(5)}")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,132 @@
+# bench/segments_bench.py
+"""
+Бенчмарк сегментов рассылки: битовые индексы (services/segments.py)
+против COUNT(*) по users с подзапросом к user_actions
+
+На базе с N пользователями (id разрежены, как у Telegram) и последним
+действием у большей части из них замеряются построение индексов,
+подсчет получателей (dry-run) и выборка их id для нескольких условий.
+Проверяется, что количество совпадает с SQL, в том числе после
+переходов и действий через DatabaseManager, которые обновляют индексы.
+
+Запуск: python -m bench.segments_bench [--users N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import List
+
+from database.manager import DatabaseManager
+from database.models import OnboardingEvent, UserStatus
+
+# Условие сегмента и то же условие на SQL (параметр - первый день окна активности)
+SEGMENTS = [
+    ("onboarding AND stage>=7 AND inactive=3",
+     "status = 'onboarding' AND stage >= 7 AND NOT EXISTS "
+     "(SELECT 1 FROM user_actions a WHERE a.user_id = users.user_id AND a.created_at >= :since3)"),
+    ("status=preboarding,preboarded stage<5",
+     "status IN ('preboarding', 'preboarded') AND stage < 5"),
+    ("active=7 AND NOT status=completed",
+     "status != 'completed' AND EXISTS "
+     "(SELECT 1 FROM user_actions a WHERE a.user_id = users.user_id AND a.created_at >= :since7)"),
+    ("(new OR stage=10) AND inactive=14",
+     "(status = 'new' OR stage = 10) AND NOT EXISTS "
+     "(SELECT 1 FROM user_actions a WHERE a.user_id = users.user_id AND a.created_at >= :since14)"),
+]
+
+STATUS_BY_STAGE = [UserStatus.NEW] + [UserStatus.PREBOARDING] * 4 + [UserStatus.PREBOARDED] + \
+    [UserStatus.ONBOARDING] * 4 + [UserStatus.COMPLETED]
+
+
+def create_dataset(manager: DatabaseManager, users: int, seed: int = 3) -> List[int]:
+    """Пользователи на случайных этапах и последнее действие у 70% из них за последние 60 дней"""
+    rng = random.Random(seed)
+    user_ids = rng.sample(range(100_000_000, 7_000_000_000), users)
+    now = datetime.now()
+    with manager.get_connection() as conn:
+        for start in range(0, users, 100_000):
+            chunk = user_ids[start:start + 100_000]
+            stages = [rng.randint(0, 10) for _ in chunk]
+            conn.executemany('''
+                INSERT INTO users (user_id, username, full_name, status, stage, created_at, updated_at, stage_started_at)
+                VALUES (?, NULL, 'Сотрудник', ?, ?, ?, ?, ?)
+            ''', [(user_id, STATUS_BY_STAGE[stage].value, stage, now, now, now)
+                  for user_id, stage in zip(chunk, stages)])
+            conn.executemany('''
+                INSERT INTO user_actions (user_id, action, details, created_at) VALUES (?, 'start', '', ?)
+            ''', [(user_id, now - timedelta(days=rng.random() * 60)) for user_id in chunk if rng.random() < 0.7])
+        conn.commit()
+    return user_ids
+
+
+def sql_count(manager: DatabaseManager, where: str) -> int:
+    today = date.today()
+    params = {f'since{days}': (today - timedelta(days=days - 1)).isoformat() for days in (3, 7, 14)}
+    with manager.get_connection() as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM users WHERE {where}', params).fetchone()[0]
+
+
+def timed(func, *args, repeat: int = 1):
+    """Результат и медиана времени вызова, мс"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return result, timings[len(timings) // 2] * 1000
+
+
+def run(users: int, repeat: int):
+    """Запустить бенчмарк"""
+    path = os.path.join(tempfile.mkdtemp(prefix="segments_bench_"), "segments.db")
+    manager = DatabaseManager(path)
+    started = time.perf_counter()
+    user_ids = create_dataset(manager, users)
+    print(f"🎯 Сегменты: {users} пользователей (база заполнена за {time.perf_counter() - started:.1f} с)")
+
+    segments = manager.segments
+    _, elapsed = timed(segments._ensure_loaded)
+    index_bytes = sum(bitmap.nbytes() for index in (segments.statuses, segments.stages, segments.activity)
+                      for bitmap in index.values())
+    print(f"  построение индексов: {elapsed:.0f} мс, битовые множества {index_bytes / 1024:.0f} КБ")
+
+    mismatched = 0
+    for expression, where in SEGMENTS:
+        count, bitmap_ms = timed(segments.count, expression, repeat=repeat)
+        ids, ids_ms = timed(segments.user_ids, expression, repeat=max(1, repeat // 5))
+        exact, sql_ms = timed(sql_count, manager, where, repeat=max(1, repeat // 5))
+        mismatched += count != exact or len(ids) != exact
+        print(f"  {expression}: {count} получателей; dry-run {bitmap_ms:.2f} мс, id получателей {ids_ms:.1f} мс, "
+              f"SQL COUNT {sql_ms:.0f} мс ({sql_ms / bitmap_ms:.0f}x)")
+
+    # Изменения через DatabaseManager обновляют индексы после фиксации
+    rng = random.Random(7)
+    events = list(OnboardingEvent)
+    for user_id in rng.sample(user_ids, min(2000, users)):
+        manager.transition_user(user_id, rng.choice(events))
+        if rng.random() < 0.5:
+            manager.log_user_action(user_id, "bench", "Бенчмарк сегментов")
+    for index in range(200):
+        manager.create_user(50_000 + index, "bench", "Бенчмарк")
+    stale = sum(segments.count(expression) != sql_count(manager, where) for expression, where in SEGMENTS)
+    print(f"  после 2000 переходов, действий и 200 новых пользователей: расхождений с SQL {stale}")
+
+    if mismatched or stale:
+        print("  ⚠️ Индексы сегментов расходятся с базой")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк сегментов рассылки")
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    run(args.users, args.repeat)
@@ -0,0 +1,154 @@
+# bench/sharding_bench.py
+"""
+Бенчмарк шардирования: пропускная способность записи при 1, 4 и 8
+файлах SQLite, параллельные агрегаты и перераспределение шардов
+
+Несколько потоков проводят своих сотрудников по сценарию онбординга:
+на каждое нажатие log_user_action и transition_user, как в обработчиках.
+Замеряются нажатия в секунду, p99 времени нажатия и ошибки блокировок.
+Затем на каждой раскладке считаются get_user_statistics, точная
+get_daily_activity и export_to_dict; результаты должны совпадать с
+одним файлом. В конце база из одного файла перераспределяется
+1 -> 4 -> 8 -> 1 шард с проверкой, что данные не изменились.
+
+Запуск: python -m bench.sharding_bench [--users N] [--threads N] [--shards 1,4,8]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+from database.manager import DatabaseManager
+from database.models import OnboardingEvent
+from database.sharding import ShardedDatabaseManager, reshard, unrouted_methods
+
+FIRST_USER_ID = 600_000_000
+
+
+def open_manager(path: str, shards: int) -> DatabaseManager:
+    return ShardedDatabaseManager(path, shards) if shards > 1 else DatabaseManager(path)
+
+
+def write_load(manager: DatabaseManager, users: int, threads: int) -> Dict[str, Any]:
+    """Провести сотрудников по сценарию из нескольких потоков"""
+    timings, errors = [], []
+    lock = threading.Lock()
+
+    def worker(offset: int):
+        local = []
+        for index in range(offset, users, threads):
+            user_id = FIRST_USER_ID + index
+            manager.create_user(user_id, f"user{index}", f"Сотрудник {index}")
+            for event in OnboardingEvent:
+                started = time.perf_counter()
+                try:
+                    manager.log_user_action(user_id, f"callback_{event.value}", "Бенчмарк шардов")
+                    manager.transition_user(user_id, event)
+                except sqlite3.OperationalError as e:
+                    with lock:
+                        errors.append(str(e))
+                local.append(time.perf_counter() - started)
+        with lock:
+            timings.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(offset,)) for offset in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        'taps_per_s': len(timings) / elapsed,
+        'p99_ms': timings[int(len(timings) * 0.99)] * 1000,
+        'errors': errors,
+    }
+
+
+def aggregates(manager: DatabaseManager) -> Dict[str, Any]:
+    """Агрегаты для сверки и время их расчета"""
+    result, timings = {}, {}
+    for name, call in (
+        ('statistics', lambda: manager.get_user_statistics(exact=True)),
+        ('daily', lambda: manager.get_daily_activity(30, exact=True)),
+        ('export', manager.export_to_dict),
+    ):
+        started = time.perf_counter()
+        result[name] = call()
+        timings[name] = (time.perf_counter() - started) * 1000
+
+    export = result['export']
+    # Длительности этапов и порядок действий зависят от прогона: между раскладками
+    # сравниваются этапы и количества, после reshard - строки целиком
+    transitions = manager.get_stage_transitions(0)
+    rows = (transitions, sorted(action['id'] for action in export['actions']))
+    comparable = {
+        'statistics': result['statistics'],
+        'daily': result['daily'],
+        'export': (len(export['users']), len(export['feedback']), len(export['actions'])),
+        'transitions': sorted(stage for _, stage, _ in transitions),
+        'last_action_id': manager.get_last_action_id(),
+    }
+    return {'values': comparable, 'rows': rows, 'timings': timings}
+
+
+def run(users: int, threads: int, layouts: List[int]):
+    """Запустить бенчмарк"""
+    print(f"🗂 Шарды: {users} сотрудников, {len(OnboardingEvent)} нажатий у каждого, {threads} потоков")
+    unrouted = unrouted_methods()
+    if unrouted:
+        print(f"  ⚠️ Методы без маршрута по шардам: {', '.join(unrouted)}")
+
+    # Эталон - первая раскладка без ошибок записи
+    reference, single, single_path = None, None, None
+    for shards in layouts:
+        path = os.path.join(tempfile.mkdtemp(prefix="sharding_bench_"), "onboarding.db")
+        manager = open_manager(path, shards)
+        load = write_load(manager, users, threads)
+        errors = load['errors']
+        print(f"  {shards} шард(ов): {load['taps_per_s']:.0f} нажатий/с, p99 {load['p99_ms']:.1f} мс, "
+              f"ошибок БД {len(errors)}" + (f" ({errors[0]})" if errors else ""))
+
+        report = aggregates(manager)
+        timings = report['timings']
+        print(f"    статистика {timings['statistics']:.1f} мс, активность по дням {timings['daily']:.1f} мс, "
+              f"экспорт {timings['export']:.1f} мс")
+        if shards == 1 and single is None:
+            single, single_path = report, path
+        if errors:
+            print("    сверка пропущена: часть записей потеряна из-за блокировок")
+        elif reference is None:
+            reference = report['values']
+        elif report['values'] != reference:
+            print("    ⚠️ Агрегаты расходятся с первой раскладкой")
+
+    if single_path:
+        # Перераспределение данных одного файла и обратно
+        steps = [(1, 4), (4, 8), (8, 1)]
+        for from_shards, to_shards in steps:
+            started = time.perf_counter()
+            copied = reshard(single_path, from_shards, to_shards)
+            elapsed = time.perf_counter() - started
+            report = aggregates(open_manager(single_path, to_shards))
+            same = report['values'] == single['values'] and report['rows'] == single['rows']
+            print(f"  reshard {from_shards} -> {to_shards}: {sum(copied.values())} строк за {elapsed:.2f} с, "
+                  f"{'данные совпадают' if same else '⚠️ данные расходятся'}")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк шардирования SQLite")
+    parser.add_argument('--users', type=int, default=800)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--shards', default="1,4,8", help="раскладки через запятую")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    run(args.users, args.threads, [int(value) for value in args.shards.split(',')])
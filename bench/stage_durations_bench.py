@@ -0,0 +1,124 @@
+# bench/stage_durations_bench.py
+"""
+Бенчмарк квантилей времени на этапах: ответ по скетчам KLL против точного
+пересчета по журналу stage_transitions
+
+Проверяется ошибка скетчей по рангу для p50/p90/p99 каждого этапа, что
+переходы через update_user_stage попадают в скетчи, и что после
+перезапуска без сохранения (как при аварии) скетчи досчитываются по
+журналу и совпадают по количеству с точным пересчетом.
+
+Запуск: python -m bench.stage_durations_bench [количество переходов]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bench.dataset import FIRST_USER_ID, generate
+from database.manager import DatabaseManager
+from database.models import OnboardingStage
+from services.analytics import percentile
+from services.stage_durations import QUANTILES, format_summary
+
+
+def timed(func, *args, repeat: int = 1):
+    """Результат и медиана времени вызова, мс"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return result, timings[len(timings) // 2] * 1000
+
+
+def fill_transitions(manager: DatabaseManager, transitions: int, users: int, seed: int = 7):
+    """Записать в журнал переходы с логнормальными длительностями (медиана этапа - от часа до недели)"""
+    rng = random.Random(seed)
+    medians = {stage: 3600 * rng.choice([1, 4, 12, 24, 72, 168]) for stage in range(OnboardingStage.COMPLETE)}
+    now = datetime.now()
+    rows = []
+    for _ in range(transitions):
+        stage = rng.randrange(OnboardingStage.COMPLETE)
+        duration = medians[stage] * rng.lognormvariate(0, 1)
+        rows.append((FIRST_USER_ID + rng.randrange(users), stage, stage + 1, duration, now))
+    with manager.get_connection() as conn:
+        conn.executemany('''
+            INSERT INTO stage_transitions (user_id, from_stage, to_stage, duration, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+
+def exact_quantiles(manager: DatabaseManager) -> dict:
+    """Точные квантили всех этапов по журналу"""
+    result = {}
+    for stage in range(OnboardingStage.COMPLETE):
+        durations = manager.get_stage_durations(stage)
+        result[stage] = {q: percentile(durations, q) for q in QUANTILES}
+    return result
+
+
+def sketch_quantiles(manager: DatabaseManager) -> dict:
+    """Квантили всех этапов по скетчам"""
+    return {stage: manager.stage_durations.quantiles(stage) for stage in range(OnboardingStage.COMPLETE)}
+
+
+def run(transitions: int = 1_000_000):
+    """Запустить бенчмарк"""
+    path = os.path.join(tempfile.mkdtemp(prefix="stage_durations_bench_"), "stages.db")
+    generate(path, users=10_000, actions=10_000, feedback=10)
+    manager = DatabaseManager(path)
+
+    started = time.perf_counter()
+    fill_transitions(manager, transitions, users=10_000)
+    print(f"⏱ Время на этапах: {transitions} переходов записано за {time.perf_counter() - started:.1f} с")
+
+    # Первый запрос строит скетчи по всему журналу
+    _, build = timed(manager.stage_durations.summary)
+    saved, save = timed(manager.stage_durations.save)
+    print(f"  Построение скетчей по журналу {build:.0f} мс, сохранение {saved} скетчей {save:.1f} мс")
+
+    blobs = manager.get_stage_sketches()
+    print(f"  Размер скетчей: {sum(len(blob) for _, blob, _ in blobs) / 1024:.1f} КБ на {len(blobs)} этапов")
+
+    # Перезапуск: скетчи читаются из БД, журнал не просматривается
+    restarted = DatabaseManager(path)
+    _, load = timed(restarted.stage_durations.summary)
+    _, sketch_time = timed(sketch_quantiles, restarted, repeat=20)
+    exact, exact_time = timed(exact_quantiles, restarted)
+    print(f"  Загрузка после перезапуска {load:.1f} мс; p50/p90/p99 всех этапов: "
+          f"по скетчам {sketch_time:.2f} мс, точный пересчет {exact_time:.0f} мс")
+
+    report, verify_time = timed(restarted.stage_durations.verify)
+    worst = max(row[f'p{round(q * 100)}_rank_error'] for row in report for q in QUANTILES)
+    print(f"  Сверка с точным пересчетом {verify_time:.0f} мс: наибольшая ошибка по рангу {worst * 100:.2f}%")
+    for row in report:
+        estimates = " / ".join(f"{row[f'p{round(q * 100)}'][0] / 3600:.1f}" for q in QUANTILES)
+        exacts = " / ".join(f"{exact[row['stage']][q] / 3600:.1f}" for q in QUANTILES)
+        print(f"    этап {row['stage']:>2}: {row['count']:>7} переходов, {estimates} ч (точно {exacts} ч)")
+
+    # Переходы через update_user_stage сразу попадают в скетчи; перезапуск без сохранения их не теряет
+    moved = 0
+    for user in restarted.get_all_users()[:2000]:
+        if user.stage < OnboardingStage.COMPLETE:
+            moved += restarted.update_user_stage(user.user_id, user.stage + 1)
+    live = sum(sketch.count for sketch in restarted.stage_durations.sketches.values())
+
+    after_crash = DatabaseManager(path)
+    summary = after_crash.stage_durations.summary()
+    replayed = sum(row['count'] for row in summary)
+    logged = len(after_crash.get_stage_transitions())
+    print(f"  Переходов через update_user_stage: {moved}; в скетчах {live}, "
+          f"после перезапуска без сохранения {replayed}, в журнале {logged}")
+
+    print(format_summary(summary))
+    if worst > 0.01 or not live == replayed == logged == transitions + moved:
+        print("  ⚠️ Скетчи времени на этапах расходятся с журналом")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,108 @@
+# bench/startup_bench.py
+"""
+Бенчмарк запуска команд CLI: время `python main.py <команда>` от запуска
+интерпретатора до выхода и разбор `-X importtime`
+
+Для каждой команды выводятся медиана времени, самые долгие импорты и
+проверяется, что команда не загружает модули бота (telegram, обработчики,
+HTTP-сервер метрик). Для `main.py stats` задана цель по времени.
+
+Запуск: python -m bench.startup_bench [--db data/bench.db] [--runs N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+from bench.dataset import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Цель для `main.py stats`: не больше стольких миллисекунд сверх пустого запуска интерпретатора
+STATS_TARGET_MS = 60
+
+# Модули, которые нужны только работающему боту
+BOT_ONLY_MODULES = ('telegram', 'handlers', 'http.server', 'apscheduler', 'httpx')
+
+MAIN = os.path.join(ROOT, 'main.py')
+
+COMMANDS = [
+    ('stats', [MAIN, 'stats']),
+    ('cleanup', [MAIN, 'cleanup', '100000']),
+    ('export', [MAIN, 'export']),
+]
+
+
+def wall_time(args: List[str], env: Dict[str, str], cwd: str, runs: int) -> float:
+    """Медиана времени запуска процесса, мс"""
+    import time
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=cwd, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def import_times(args: List[str], env: Dict[str, str], cwd: str) -> List[Tuple[str, int, int]]:
+    """Импорты процесса по -X importtime: (модуль, собственное время, с вложенными), мкс"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=cwd, env=env, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def run(db_path: str, runs: int):
+    """Запустить бенчмарк"""
+    if not os.path.exists(db_path):
+        generate(db_path, users=20_000, actions=200_000, feedback=1000)
+
+    env = dict(os.environ, DATABASE_PATH=os.path.abspath(db_path))
+    # Экспорт пишет файлы в data/exports текущего каталога
+    cwd = tempfile.mkdtemp(prefix="startup_bench_cwd_")
+
+    # Первый запуск досчитывает и сохраняет скетчи активных пользователей, дальше они читаются из БД
+    subprocess.run([sys.executable, MAIN, 'stats'], cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    bare = wall_time(['-c', 'pass'], env, cwd, runs)
+    print(f"🚀 Запуск команд CLI (медиана {runs} запусков), пустой интерпретатор {bare:.0f} мс")
+
+    results = {}
+    for name, args in COMMANDS:
+        elapsed = wall_time(args, env, cwd, runs if name != 'export' else 1)
+        imports = import_times(args, env, cwd)
+        own = {module: cumulative for module, _, cumulative in imports}
+        top = sorted((row for row in imports if '.' not in row[0]), key=lambda row: row[2], reverse=True)[:5]
+        bot_modules = sorted({module.split('.')[0] for module in own
+                              if module.split('.')[0] in BOT_ONLY_MODULES or module in BOT_ONLY_MODULES})
+        results[name] = elapsed
+        print(f"  main.py {name}: {elapsed:.0f} мс (+{elapsed - bare:.0f} мс), "
+              f"модулей загружено {len(imports)}, модули бота: {', '.join(bot_modules) or 'нет'}")
+        print("    самые долгие импорты: " + ", ".join(f"{module} {cumulative / 1000:.1f} мс"
+                                                     for module, _, cumulative in top))
+
+    overhead = results['stats'] - bare
+    status = "✅" if overhead <= STATS_TARGET_MS else "⚠️"
+    print(f"  {status} main.py stats: +{overhead:.0f} мс к запуску интерпретатора (цель - не больше +{STATS_TARGET_MS} мс)")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк запуска команд CLI")
+    parser.add_argument('--db', help="Набор данных (создается, если файла нет)")
+    parser.add_argument('--runs', type=int, default=9)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    run(args.db or os.path.join(tempfile.mkdtemp(prefix="startup_bench_"), "startup.db"), args.runs)
@@ -0,0 +1,264 @@
+# bench/transitions_bench.py
+"""
+Бенчмарк переходов между этапами при одновременных нажатиях: таблица
+переходов (DatabaseManager.transition_user) против прежней схемы
+обработчиков (get_user и безусловный update_user_stage)
+
+Каждый сотрудник проходит один из сценариев от пребординга до
+завершения онбординга: по всей цепочке этапов или по кнопкам, которые
+предлагает интерфейс (завершение сразу после знакомства с командой,
+планерки до знакомства); часть кнопок нажимается дважды подряд, часть -
+повторно со старых сообщений. Нажатия обрабатываются несколькими потоками
+одновременно. По журналу stage_transitions проверяется, что этап не
+уходит назад и ни один переход не потерян: записи журнала каждого
+пользователя идут цепочкой, последняя совпадает с этапом в users, а
+записей не больше, чем переходов вернул transition_user. Затем те же
+нажатия обрабатываются по порядку в одном потоке: каждый сценарий должен
+довести сотрудника до завершения онбординга.
+
+Запуск: python -m bench.transitions_bench [--users N] [--threads N]
+(код выхода 1, если проверка не прошла; те же проверки - в tests/test_transitions.py)
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from database.manager import DatabaseManager
+from database.models import OnboardingEvent, OnboardingStage, UserStatus
+from services.metrics import metrics
+
+FIRST_USER_ID = 700_000_000
+
+# Сценарии сотрудника в порядке кнопок: вся цепочка этапов и короткие пути, которые предлагают клавиатуры
+JOURNEY = [
+    OnboardingEvent.PREBOARDING_OPENED,
+    OnboardingEvent.DOCUMENTS_OPENED,
+    OnboardingEvent.DOCS_MAIN_SENT,
+    OnboardingEvent.DOCS_TK_SENT,
+    OnboardingEvent.ALL_DOCS_SENT,
+    OnboardingEvent.ONBOARDING_OPENED,
+    OnboardingEvent.ONBOARDING_STARTED,
+    OnboardingEvent.EMAIL_RECEIVED,
+    OnboardingEvent.TEAM_INTRO_READ,
+    OnboardingEvent.MEETINGS_READ,
+    OnboardingEvent.ONBOARDING_COMPLETED,
+]
+JOURNEYS = [
+    JOURNEY,
+    # «Завершить онбординг» под знакомством с командой (этап 9)
+    JOURNEY[:9] + [OnboardingEvent.ONBOARDING_COMPLETED],
+    # «Планерки» рядом со «Знакомством с командой» (этап 8), затем завершение
+    JOURNEY[:8] + [OnboardingEvent.MEETINGS_READ, OnboardingEvent.ONBOARDING_COMPLETED],
+    # Завершение под планерками, открытыми до знакомства с командой
+    JOURNEY[:8] + [OnboardingEvent.MEETINGS_READ, OnboardingEvent.TEAM_INTRO_READ,
+                   OnboardingEvent.ONBOARDING_COMPLETED],
+]
+
+
+def legacy_transition(manager: DatabaseManager, user_id: int, event: OnboardingEvent) -> bool:
+    """Смена этапа так, как ее делали обработчики до таблицы переходов"""
+    def read():
+        return manager.get_user(user_id)
+
+    if event == OnboardingEvent.PREBOARDING_OPENED:
+        if read().status == UserStatus.NEW:
+            return manager.update_user_stage(user_id, OnboardingStage.REGISTRATION, UserStatus.PREBOARDING)
+    elif event == OnboardingEvent.DOCUMENTS_OPENED:
+        return manager.update_user_stage(user_id, OnboardingStage.DOCUMENTS_INTRO)
+    elif event == OnboardingEvent.DOCS_MAIN_SENT:
+        return manager.update_user_stage(user_id, max(read().stage, OnboardingStage.DOCUMENTS_MAIN))
+    elif event == OnboardingEvent.DOCS_TK_SENT:
+        return manager.update_user_stage(user_id, max(read().stage, OnboardingStage.DOCUMENTS_TK))
+    elif event == OnboardingEvent.ALL_DOCS_SENT:
+        return manager.update_user_stage(user_id, OnboardingStage.DOCUMENTS_COMPLETE, UserStatus.PREBOARDED)
+    elif event == OnboardingEvent.ONBOARDING_OPENED:
+        if read().status == UserStatus.PREBOARDED:
+            return manager.update_user_stage(user_id, OnboardingStage.ONBOARDING_START, UserStatus.ONBOARDING)
+    elif event == OnboardingEvent.ONBOARDING_STARTED:
+        if read().stage < OnboardingStage.EMAIL_ACCESS:
+            return manager.update_user_stage(user_id, OnboardingStage.EMAIL_ACCESS)
+    elif event == OnboardingEvent.EMAIL_RECEIVED:
+        return manager.update_user_stage(user_id, OnboardingStage.TEAM_INTRO)
+    elif event == OnboardingEvent.TEAM_INTRO_READ:
+        return manager.update_user_stage(user_id, OnboardingStage.MEETINGS)
+    elif event == OnboardingEvent.MEETINGS_READ:
+        return manager.update_user_stage(user_id, OnboardingStage.COMPLETE)
+    elif event == OnboardingEvent.ONBOARDING_COMPLETED:
+        success = manager.update_user_stage(user_id, OnboardingStage.COMPLETE, UserStatus.COMPLETED)
+        read()
+        return success
+    return False
+
+
+def build_taps(users: int, seed: int = 11) -> List[Tuple[int, OnboardingEvent]]:
+    """Нажатия всех сотрудников вперемешку; у каждого сотрудника - в порядке сценария"""
+    rng = random.Random(seed)
+    streams = []
+    for index in range(users):
+        journey = JOURNEYS[index % len(JOURNEYS)]
+        taps = []
+        for step, event in enumerate(journey):
+            taps.append(event)
+            # Двойное нажатие
+            if rng.random() < 0.3:
+                taps.append(event)
+            # Нажатие кнопки из старого сообщения
+            if step and rng.random() < 0.15:
+                taps.append(journey[rng.randrange(step)])
+        streams.append([(FIRST_USER_ID + index, event) for event in taps])
+
+    result = []
+    while streams:
+        stream = streams[rng.randrange(len(streams))]
+        # Нажатия одного сотрудника идут пачками, чтобы двойные нажатия попадали в разные потоки одновременно
+        result.extend(stream[:3])
+        del stream[:3]
+        if not stream:
+            streams.remove(stream)
+    return result
+
+
+def create_users(path: str, users: int) -> DatabaseManager:
+    """Новая БД с сотрудниками на нулевом этапе"""
+    manager = DatabaseManager(path)
+    now = datetime.now()
+    with manager.get_connection() as conn:
+        conn.executemany('''
+            INSERT INTO users (user_id, username, full_name, status, stage, created_at, updated_at, stage_started_at)
+            VALUES (?, ?, ?, ?, 0, ?, ?, ?)
+        ''', [(FIRST_USER_ID + index, f"user{index}", f"Сотрудник {index}", UserStatus.NEW.value, now, now, now)
+              for index in range(users)])
+        conn.commit()
+    return manager
+
+
+def replay(apply: Callable[[int, OnboardingEvent], object], taps: List[Tuple[int, OnboardingEvent]],
+           threads: int) -> Dict[str, object]:
+    """Обработать нажатия несколькими потоками; вернуть время, ошибки и успешные переходы"""
+    position = iter(range(len(taps)))
+    lock = threading.Lock()
+    applied, errors = [], []
+
+    def worker():
+        while True:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                return
+            user_id, event = taps[index]
+            try:
+                result = apply(user_id, event)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+                continue
+            if result:
+                applied.append(result)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return {'elapsed': time.perf_counter() - started, 'applied': applied, 'errors': errors}
+
+
+def verify(manager: DatabaseManager, users: int) -> Dict[str, int]:
+    """Проверить журнал переходов: этап не уходит назад, цепочка без разрывов и совпадает с users"""
+    chains = defaultdict(list)
+    for _, user_id, from_stage, to_stage in _transitions(manager):
+        chains[user_id].append((from_stage, to_stage))
+    with manager.get_connection() as conn:
+        final = dict(conn.execute('SELECT user_id, stage FROM users WHERE user_id >= ?', (FIRST_USER_ID,)))
+        completed = conn.execute('SELECT COUNT(*) FROM users WHERE user_id >= ? AND status = ?',
+                                 (FIRST_USER_ID, UserStatus.COMPLETED.value)).fetchone()[0]
+
+    backwards = sum(1 for chain in chains.values() for from_stage, to_stage in chain if to_stage < from_stage)
+    broken = 0
+    for user_id in range(FIRST_USER_ID, FIRST_USER_ID + users):
+        chain = chains.get(user_id, [])
+        links = [0] + [to_stage for _, to_stage in chain]
+        if any(from_stage != links[index] for index, (from_stage, _) in enumerate(chain)) \
+                or links[-1] != final[user_id]:
+            broken += 1
+    return {
+        'logged': sum(len(chain) for chain in chains.values()),
+        'backwards': backwards,
+        'broken': broken,
+        'completed': completed,
+    }
+
+
+def _transitions(manager: DatabaseManager) -> List[tuple]:
+    with manager.get_connection() as conn:
+        return conn.execute('''
+            SELECT id, user_id, from_stage, to_stage FROM stage_transitions
+            WHERE user_id >= ? ORDER BY id
+        ''', (FIRST_USER_ID,)).fetchall()
+
+
+def run(users: int, threads: int) -> bool:
+    """Запустить бенчмарк; вернуть False, если переходы потеряны или сценарий не завершается"""
+    taps = build_taps(users)
+    statements = metrics.counter('onboarding_db_statements_total', 'Выполнено SQL-запросов')
+    print(f"🔀 Переходы между этапами: {users} сотрудников, {len(taps)} нажатий, {threads} потоков")
+
+    results = {}
+    for name, make_apply in (
+        ("get_user + update_user_stage", lambda manager: lambda user_id, event:
+            legacy_transition(manager, user_id, event)),
+        ("transition_user", lambda manager: manager.transition_user),
+    ):
+        path = os.path.join(tempfile.mkdtemp(prefix="transitions_bench_"), "transitions.db")
+        manager = create_users(path, users)
+        statements_before = statements.value
+        outcome = replay(make_apply(manager), taps, threads)
+        report = verify(manager, users)
+        results[name] = (outcome, report)
+
+        errors = outcome['errors']
+        print(f"  {name}: {len(taps) / outcome['elapsed']:.0f} нажатий/с, "
+              f"SQL на нажатие {(statements.value - statements_before) / len(taps):.2f}, "
+              f"ошибок БД {len(errors)}" + (f" ({errors[0]})" if errors else ""))
+        print(f"    переходов применено {len(outcome['applied'])}, в журнале {report['logged']}, "
+              f"назад {report['backwards']}, пользователей с разрывом цепочки {report['broken']}, "
+              f"завершили онбординг {report['completed']}/{users}")
+
+    # Журнал не расходится с users, каждый переход записан не больше одного раза
+    # (завершение на этапе 10 меняет только статус)
+    outcome, report = results["transition_user"]
+    ok = not (report['backwards'] or report['broken'] or report['logged'] > len(outcome['applied']))
+    if not ok:
+        print("  ⚠️ Таблица переходов потеряла или откатила переходы")
+
+    # При нажатиях по порядку любой сценарий из кнопок интерфейса завершает онбординг
+    # (в потоках нажатия одного сотрудника могут обгонять друг друга)
+    manager = create_users(os.path.join(tempfile.mkdtemp(prefix="transitions_bench_"), "sequential.db"), users)
+    replay(manager.transition_user, taps, 1)
+    report = verify(manager, users)
+    print(f"  по порядку: завершили онбординг {report['completed']}/{users}, "
+          f"пользователей с разрывом цепочки {report['broken']}")
+    if report['completed'] != users or report['broken']:
+        print("  ⚠️ Сценарий из кнопок интерфейса не доходит до завершения онбординга")
+        ok = False
+    return ok
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк переходов между этапами")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    sys.exit(0 if run(args.users, args.threads) else 1)
@@ -0,0 +1,170 @@
+# bench/unit_of_work_bench.py
+"""
+Бенчмарк единицы работы обновления: записи обработчика одной транзакцией
+против commit в каждом методе DatabaseManager
+
+Обработчик повторяет handle_email_received вместе с маршрутизатором:
+log_user_action, transition_user, log_user_action и ответ через Bot API.
+Замеряются время обновления и фиксации транзакций на обновление.
+Проверяется, что чтения внутри обновления видят незафиксированные
+записи, ошибка обработчика откатывает записи и не пополняет скетчи, а
+запись из другой задачи, пока обработчик ждет API, не упирается в
+блокировку.
+
+Запуск: python -m bench.unit_of_work_bench [--updates N]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List
+
+from database.manager import DatabaseManager
+from database.models import OnboardingEvent, OnboardingStage, UserStatus
+from database.unit_of_work import unit_of_work
+from services.metrics import metrics
+
+FIRST_USER_ID = 800_000_000
+
+
+def create_users(manager: DatabaseManager, users: int):
+    """Сотрудники на этапе получения доступов"""
+    now = datetime.now()
+    with manager.get_connection() as conn:
+        conn.executemany('''
+            INSERT INTO users (user_id, username, full_name, status, stage, created_at, updated_at, stage_started_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(FIRST_USER_ID + index, f"user{index}", f"Сотрудник {index}", UserStatus.ONBOARDING.value,
+               OnboardingStage.EMAIL_ACCESS, now, now, now) for index in range(users)])
+        conn.commit()
+
+
+def create_users_for_checks(manager: DatabaseManager):
+    """Сотрудники для проверок (id перед основными)"""
+    now = datetime.now()
+    with manager.get_connection() as conn:
+        conn.executemany('''
+            INSERT INTO users (user_id, username, full_name, status, stage, created_at, updated_at, stage_started_at)
+            VALUES (?, 'check', 'Проверка', ?, ?, ?, ?, ?)
+        ''', [(FIRST_USER_ID - offset, UserStatus.ONBOARDING.value, OnboardingStage.EMAIL_ACCESS, now, now, now)
+              for offset in (1, 2, 3)])
+        conn.commit()
+
+
+def make_handler(manager: DatabaseManager, api_latency: float):
+    """Обработчик, пишущий в БД так же, как handle_email_received"""
+    async def handle_email_received(update, context):
+        # Вместо объекта Update передается id сотрудника
+        user_id = update
+        manager.log_user_action(user_id, "callback_email_received", "Нажал кнопку: email_received")
+        manager.transition_user(user_id, OnboardingEvent.EMAIL_RECEIVED)
+        manager.log_user_action(user_id, "email_access_confirmed", "Подтвердил получение доступа к почте")
+        # Ответ пользователю
+        await asyncio.sleep(api_latency)
+
+    return handle_email_received
+
+
+async def replay(handler, users: int) -> float:
+    """Обработать по одному обновлению на сотрудника; вернуть среднее время обновления, мс"""
+    started = time.perf_counter()
+    for index in range(users):
+        await handler(FIRST_USER_ID + index, None)
+    return (time.perf_counter() - started) / users * 1000
+
+
+async def check_visibility(manager: DatabaseManager) -> bool:
+    """Чтения внутри обновления видят незафиксированные записи"""
+    seen = {}
+
+    async def handler(update, context):
+        manager.transition_user(update, OnboardingEvent.EMAIL_RECEIVED)
+        seen['stage'] = manager.get_user(update).stage
+        seen['actions'] = len(manager.get_user_actions(update))
+        manager.log_user_action(update, "bench", "Бенчмарк единицы работы")
+        seen['actions_after'] = len(manager.get_user_actions(update))
+
+    await unit_of_work(handler)(FIRST_USER_ID - 1, None)
+    return seen == {'stage': OnboardingStage.TEAM_INTRO, 'actions': 0, 'actions_after': 1}
+
+
+async def check_rollback(manager: DatabaseManager) -> bool:
+    """Ошибка обработчика откатывает записи, сделанные после последней фиксации"""
+    user_id = FIRST_USER_ID - 2
+    sketched = sum(sketch.count for sketch in manager.stage_durations.sketches.values())
+
+    async def handler(update, context):
+        manager.transition_user(user_id, OnboardingEvent.EMAIL_RECEIVED)
+        manager.log_user_action(user_id, "bench", "Бенчмарк единицы работы")
+        raise RuntimeError("ошибка обработчика")
+
+    try:
+        await unit_of_work(handler)(None, None)
+    except RuntimeError:
+        pass
+    user = manager.get_user(user_id)
+    after = sum(sketch.count for sketch in manager.stage_durations.sketches.values())
+    return user.stage == OnboardingStage.EMAIL_ACCESS and not manager.get_user_actions(user_id) and after == sketched
+
+
+async def check_concurrent_writer(manager: DatabaseManager) -> bool:
+    """Пока обработчик ждет API, другая задача пишет в БД без ожидания блокировки"""
+    user_id = FIRST_USER_ID - 3
+
+    async def handler(update, context):
+        manager.log_user_action(user_id, "bench", "Бенчмарк единицы работы")
+        await asyncio.sleep(0.01)
+        manager.transition_user(user_id, OnboardingEvent.EMAIL_RECEIVED)
+
+    async def writer():
+        await asyncio.sleep(0.001)
+        started = time.perf_counter()
+        manager.log_user_action(user_id, "bench", "Запись из другой задачи")
+        return time.perf_counter() - started
+
+    _, waited = await asyncio.gather(unit_of_work(handler)(None, None), writer())
+    return waited < 0.5 and len(manager.get_user_actions(user_id)) == 2
+
+
+async def run(updates: int, api_latency: float):
+    """Запустить бенчмарк"""
+    path = os.path.join(tempfile.mkdtemp(prefix="unit_of_work_bench_"), "unit.db")
+    manager = DatabaseManager(path)
+    create_users(manager, updates)
+    create_users_for_checks(manager)
+    manager.stage_durations.summary()
+
+    commits = metrics.counter('onboarding_db_commits_total', 'Зафиксировано транзакций')
+    handler = make_handler(manager, api_latency)
+    print(f"🧾 Единица работы: {updates} обновлений handle_email_received")
+
+    for name, wrapped in (("commit в каждом методе", handler), ("единица работы", unit_of_work(handler))):
+        with manager.get_connection() as conn:
+            conn.execute("UPDATE users SET stage = ? WHERE user_id >= ?", (OnboardingStage.EMAIL_ACCESS, FIRST_USER_ID))
+            conn.commit()
+        before = commits.value
+        elapsed = await replay(wrapped, updates)
+        print(f"  {name}: {elapsed:.2f} мс на обновление, фиксаций на обновление {(commits.value - before) / updates:.2f}")
+
+    checks = {
+        "чтения видят незафиксированные записи": await check_visibility(manager),
+        "ошибка обработчика откатывает записи": await check_rollback(manager),
+        "запись из другой задачи не ждет блокировку": await check_concurrent_writer(manager),
+    }
+    for name, passed in checks.items():
+        print(f"  {'✅' if passed else '⚠️'} {name}")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк единицы работы обновления")
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--api-latency', type=float, default=0.0, help="ожидание ответа API, с")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    asyncio.run(run(args.updates, args.api_latency))
@@ -1,11 +1,86 @@
 # bot/keyboards.py
 """
 Клавиатуры и меню для OnboardingBuddy
+
+Разметки неизменяемы, поэтому собираются один раз: статические - при
+первом обращении, с параметрами - в LRU-кэше на ограниченное число
+вариантов. Представление для Bot API каждой разметки тоже вычисляется
+один раз, при сборке.
 """
+import functools
+import json
+from typing import Callable, Dict, List, Optional
+
 from telegram import ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton
-from typing import List
+
+# Кэширующие методы Keyboards по имени
+KEYBOARD_REGISTRY: Dict[str, Callable] = {}
+
+
+class _CachedPayload:
+    """Представление разметки для Bot API, вычисленное один раз при сборке"""
+
+    __slots__ = ()
+
+    def _cache_payload(self):
+        with self._unfrozen():
+            self._payload = super().to_dict()
+            self._payload_json = json.dumps(self._payload)
+
+    def to_dict(self, recursive: bool = True) -> dict:
+        """Общий словарь разметки: не изменять"""
+        if not recursive:
+            return super().to_dict(recursive=False)
+        return self._payload
+
+    def to_json(self) -> str:
+        return self._payload_json
+
+
+class CachedReplyKeyboardMarkup(_CachedPayload, ReplyKeyboardMarkup):
+    __slots__ = ('_payload', '_payload_json')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_payload()
+
+
+class CachedInlineKeyboardMarkup(_CachedPayload, InlineKeyboardMarkup):
+    __slots__ = ('_payload', '_payload_json')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_payload()
+
+
+_CACHED_TYPES = {
+    ReplyKeyboardMarkup: CachedReplyKeyboardMarkup,
+    InlineKeyboardMarkup: CachedInlineKeyboardMarkup,
+}
+
+
+def freeze(markup):
+    """Копия разметки с вычисленным представлением для Bot API"""
+    return _CACHED_TYPES[type(markup)].de_json(markup.to_dict())
 
 
+def cached_keyboard(maxsize: Optional[int] = None):
+    """Собирать клавиатуру один раз на набор аргументов
+
+    Без maxsize - для статических клавиатур, с maxsize - LRU для
+    клавиатур с параметрами. Исходная сборка доступна как __wrapped__.
+    """
+    def decorator(builder):
+        @functools.lru_cache(maxsize=maxsize)
+        def getter(*args, **kwargs):
+            return freeze(builder(*args, **kwargs))
+
+        functools.update_wrapper(getter, builder)
+        KEYBOARD_REGISTRY[builder.__name__] = getter
+        return getter
+
+    return decorator
+
 class Keyboards:
     """Класс для управления клавиатурами бота"""
 
@@ -30,6 +105,7 @@ class Keyboards:
     ]
 
     @staticmethod
+    @cached_keyboard()
     def get_main_menu() -> ReplyKeyboardMarkup:
         """Получить главное меню"""
         return ReplyKeyboardMarkup(
@@ -39,6 +115,7 @@ class Keyboards:
         )
 
     @staticmethod
+    @cached_keyboard()
     def get_info_menu() -> ReplyKeyboardMarkup:
         """Получить меню полезной информации"""
         return ReplyKeyboardMarkup(
@@ -48,6 +125,7 @@ class Keyboards:
         )
 
     @staticmethod
+    @cached_keyboard()
     def get_faq_menu() -> ReplyKeyboardMarkup:
         """Получить FAQ меню"""
         return ReplyKeyboardMarkup(
@@ -57,6 +135,7 @@ class Keyboards:
         )
 
     @staticmethod
+    @cached_keyboard()
     def get_preboarding_start() -> InlineKeyboardMarkup:
         """Кнопка начала пребординга"""
         return InlineKeyboardMarkup([
@@ -64,6 +143,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_document_categories() -> InlineKeyboardMarkup:
         """Категории документов"""
         return InlineKeyboardMarkup([
@@ -72,6 +152,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_docs_main_menu() -> InlineKeyboardMarkup:
         """Меню основных документов"""
         return InlineKeyboardMarkup([
@@ -81,6 +162,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_docs_tk_menu() -> InlineKeyboardMarkup:
         """Меню документов по ТК РФ"""
         return InlineKeyboardMarkup([
@@ -90,6 +172,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_docs_completion_menu() -> InlineKeyboardMarkup:
         """Меню завершения отправки документов"""
         return InlineKeyboardMarkup([
@@ -99,6 +182,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_start_onboarding() -> InlineKeyboardMarkup:
         """Кнопка начала онбординга"""
         return InlineKeyboardMarkup([
@@ -106,6 +190,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_documents_received() -> InlineKeyboardMarkup:
         """Кнопка получения документов"""
         return InlineKeyboardMarkup([
@@ -113,6 +198,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_email_access() -> InlineKeyboardMarkup:
         """Проверка доступа к почте"""
         return InlineKeyboardMarkup([
@@ -121,6 +207,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_email_retry() -> InlineKeyboardMarkup:
         """Повторная проверка доступа к почте"""
         return InlineKeyboardMarkup([
@@ -129,6 +216,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_onboarding_next() -> InlineKeyboardMarkup:
         """Следующие шаги онбординга"""
         return InlineKeyboardMarkup([
@@ -137,6 +225,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_team_intro_next() -> InlineKeyboardMarkup:
         """После знакомства с командой"""
         return InlineKeyboardMarkup([
@@ -145,6 +234,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_meetings_next() -> InlineKeyboardMarkup:
         """После ознакомления с планерками"""
         return InlineKeyboardMarkup([
@@ -153,6 +243,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_admin_panel() -> InlineKeyboardMarkup:
         """Административная панель"""
         return InlineKeyboardMarkup([
@@ -170,6 +261,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard()
     def get_user_status_filter() -> InlineKeyboardMarkup:
         """Фильтр пользователей по статусу"""
         return InlineKeyboardMarkup([
@@ -188,6 +280,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard(maxsize=256)
     def get_confirmation(action: str, confirm_data: str, cancel_data: str = "cancel") -> InlineKeyboardMarkup:
         """Клавиатура подтверждения действия"""
         return InlineKeyboardMarkup([
@@ -198,6 +291,7 @@ class Keyboards:
         ])
 
     @staticmethod
+    @cached_keyboard(maxsize=256)
     def get_pagination(page: int, total_pages: int, prefix: str) -> InlineKeyboardMarkup:
         """Пагинация для списков"""
         buttons = []
@@ -236,11 +330,7 @@ class Keyboards:
         Args:
             buttons: Список кортежей (text, url)
         """
-        keyboard = []
-        for text, url in buttons:
-            keyboard.append([InlineKeyboardButton(text, url=url)])
-
-        return InlineKeyboardMarkup(keyboard)
+        return Keyboards._url_keyboard(tuple(map(tuple, buttons)))
 
     @staticmethod
     def create_callback_keyboard(buttons: List[tuple], columns: int = 2) -> InlineKeyboardMarkup:
@@ -250,6 +340,20 @@ class Keyboards:
             buttons: Список кортежей (text, callback_data)
             columns: Количество кнопок в ряду
         """
+        return Keyboards._callback_keyboard(tuple(map(tuple, buttons)), columns)
+
+    @staticmethod
+    @cached_keyboard(maxsize=128)
+    def _url_keyboard(buttons: tuple) -> InlineKeyboardMarkup:
+        keyboard = []
+        for text, url in buttons:
+            keyboard.append([InlineKeyboardButton(text, url=url)])
+
+        return InlineKeyboardMarkup(keyboard)
+
+    @staticmethod
+    @cached_keyboard(maxsize=512)
+    def _callback_keyboard(buttons: tuple, columns: int) -> InlineKeyboardMarkup:
         keyboard = []
         row = []
 
@@ -260,4 +364,4 @@ class Keyboards:
                 keyboard.append(row)
                 row = []
 
-        return InlineKeyboardMarkup(keyboard)
\ No newline at end of file
+        return InlineKeyboardMarkup(keyboard)
@@ -0,0 +1,209 @@
+# bot/persistence.py
+"""
+Хранение user_data, chat_data, bot_data и состояний диалогов в SQLite
+
+Данные каждого пользователя и чата - отдельная компактная строка таблицы
+bot_persistence (JSON, а если данные не переживают JSON без потерь -
+pickle). Загрузка ленивая: при запуске ничего не читается, данные
+пользователя подгружаются перед первым его обновлением. Application
+передает на запись всех пользователей, чьи обновления обрабатывались;
+записываются только те, чьи данные действительно изменились, одной
+транзакцией за раз.
+"""
+import asyncio
+import json
+import logging
+import pickle
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+USER_SCOPE = 'user'
+CHAT_SCOPE = 'chat'
+BOT_SCOPE = 'bot'
+CALLBACK_SCOPE = 'callback'
+CONVERSATION_SCOPE = 'conversation:'
+
+
+def encode_state(data: Any) -> bytes:
+    """Сериализовать состояние: JSON, если он восстанавливает данные без потерь, иначе pickle"""
+    try:
+        encoded = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if json.loads(encoded) == data:
+            return encoded
+    except (TypeError, ValueError):
+        pass
+    return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_state(blob: bytes) -> Any:
+    """Восстановить состояние, записанное encode_state"""
+    if blob[:1] == b'\x80':
+        return pickle.loads(blob)
+    return json.loads(blob)
+
+
+class SQLitePersistence(BasePersistence):
+    """BasePersistence поверх DatabaseManager с ленивой загрузкой и записью только изменений"""
+
+    def __init__(self, manager=None, update_interval: float = 60,
+                 store_data: PersistenceInput = None):
+        super().__init__(
+            store_data=store_data or PersistenceInput(callback_data=False),
+            update_interval=update_interval
+        )
+        if manager is None:
+            from database.manager import db_manager
+            manager = db_manager
+
+        self.manager = manager
+        self.loaded_users = set()
+        self.loaded_chats = set()
+        self.writes = 0
+        self.skipped = 0
+
+        # Хэши последних сохраненных (или поставленных в очередь) данных: неизменившиеся не пишутся
+        self._persisted: Dict[Tuple[str, str], int] = {}
+        self._pending: Dict[Tuple[str, str], Optional[bytes]] = {}
+        self._write_task: Optional[asyncio.Task] = None
+
+    # Загрузка
+
+    def _load(self, scope: str, key: str) -> Optional[Any]:
+        """Прочитать одно состояние и запомнить его хэш"""
+        blob = self.manager.get_persistent_state(scope, key)
+        if blob is None:
+            return None
+        self._persisted[(scope, key)] = hash(blob)
+        return decode_state(blob)
+
+    async def get_user_data(self) -> Dict[int, Any]:
+        # Данные пользователей подгружаются лениво в refresh_user_data
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Any]:
+        return {}
+
+    async def get_bot_data(self) -> Any:
+        return self._load(BOT_SCOPE, '') or {}
+
+    async def get_callback_data(self) -> Optional[Any]:
+        data = self._load(CALLBACK_SCOPE, '')
+        if data is None:
+            return None
+        # JSON превращает кортежи в списки, а кэш callback-данных ожидает кортежи
+        return [tuple(item) for item in data[0]], data[1]
+
+    async def get_conversations(self, name: str) -> Dict[tuple, object]:
+        conversations = {}
+        for key, blob in self.manager.get_persistent_states(CONVERSATION_SCOPE + name):
+            self._persisted[(CONVERSATION_SCOPE + name, key)] = hash(blob)
+            conversations[tuple(json.loads(key))] = decode_state(blob)
+        return conversations
+
+    async def refresh_user_data(self, user_id: int, user_data: Any) -> None:
+        if user_id in self.loaded_users:
+            return
+        self.loaded_users.add(user_id)
+        stored = self._load(USER_SCOPE, str(user_id))
+        if stored:
+            # Значения, выставленные до загрузки, важнее сохраненных
+            for key, value in stored.items():
+                user_data.setdefault(key, value)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Any) -> None:
+        if chat_id in self.loaded_chats:
+            return
+        self.loaded_chats.add(chat_id)
+        stored = self._load(CHAT_SCOPE, str(chat_id))
+        if stored:
+            for key, value in stored.items():
+                chat_data.setdefault(key, value)
+
+    async def refresh_bot_data(self, bot_data: Any) -> None:
+        pass
+
+    # Запись
+
+    def _stage(self, scope: str, key: str, data: Any):
+        """Поставить состояние в очередь на запись, если оно изменилось"""
+        state_key = (scope, key)
+        if data is None or data == {}:
+            if state_key not in self._persisted:
+                self.skipped += 1
+                return
+            del self._persisted[state_key]
+            self._pending[state_key] = None
+        else:
+            blob = encode_state(data)
+            blob_hash = hash(blob)
+            if self._persisted.get(state_key) == blob_hash:
+                self.skipped += 1
+                return
+            # Хэш запоминается сразу: при ошибке записи изменения вернутся в очередь
+            self._persisted[state_key] = blob_hash
+            self._pending[state_key] = blob
+
+        # Application вызывает update_* для всех изменений сразу (asyncio.gather),
+        # поэтому запись, запланированная на следующую итерацию цикла, соберет их в одну транзакцию
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self):
+        """Записать накопленные изменения одной транзакцией в отдельном потоке"""
+        await asyncio.sleep(0)
+        while self._pending:
+            pending, self._pending = self._pending, {}
+            upserts = [(scope, key, blob) for (scope, key), blob in pending.items() if blob is not None]
+            deletes = [state_key for state_key, blob in pending.items() if blob is None]
+
+            try:
+                await asyncio.to_thread(self.manager.save_persistent_states, upserts, deletes)
+            except Exception as e:
+                # Вернем несохраненное в очередь (более новые изменения важнее), запишем в следующий раз
+                for state_key, blob in pending.items():
+                    self._pending.setdefault(state_key, blob)
+                logger.error(f"Не удалось сохранить состояние бота: {e}")
+                return
+
+            self.writes += len(pending)
+
+    async def update_user_data(self, user_id: int, data: Any) -> None:
+        self._stage(USER_SCOPE, str(user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: Any) -> None:
+        self._stage(CHAT_SCOPE, str(chat_id), data)
+
+    async def update_bot_data(self, data: Any) -> None:
+        self._stage(BOT_SCOPE, '', data)
+
+    async def update_callback_data(self, data: Any) -> None:
+        self._stage(CALLBACK_SCOPE, '', data)
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        self._stage(CONVERSATION_SCOPE + name, json.dumps(list(key)), new_state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self.loaded_users.discard(user_id)
+        self._stage(USER_SCOPE, str(user_id), None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self.loaded_chats.discard(chat_id)
+        self._stage(CHAT_SCOPE, str(chat_id), None)
+
+    async def flush(self) -> None:
+        if self._write_task is not None:
+            await self._write_task
+        if self._pending:
+            await self._write_pending()
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики для метрик"""
+        return {
+            'loaded_users': len(self.loaded_users),
+            'writes': self.writes,
+            'skipped': self.skipped,
+            'pending': len(self._pending),
+        }
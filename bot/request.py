@@ -0,0 +1,20 @@
+# bot/request.py
+"""
+HTTP-клиент Bot API с замером времени запросов
+"""
+import time
+
+from telegram.request import HTTPXRequest
+
+from services.metrics import observe_api_call
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest, учитывающий время ожидания ответа Bot API"""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        finally:
+            observe_api_call(url.rsplit('/', 1)[-1], time.perf_counter() - started)
@@ -0,0 +1,142 @@
+# bot/router.py
+"""
+Маршрутизатор текстовых кнопок и callback-запросов по таблице маршрутов
+"""
+import importlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+RouteHandler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[Any]]
+
+# Уже загруженные обработчики по пути "модуль:функция"
+_resolved: Dict[str, Callable] = {}
+
+
+def resolve_handler(path: str) -> Callable:
+    """Функция по пути "модуль:функция" (модуль импортируется при первом обращении)"""
+    func = _resolved.get(path)
+    if func is None:
+        module_name, _, func_name = path.partition(':')
+        func = _resolved[path] = getattr(importlib.import_module(module_name), func_name)
+    return func
+
+
+def lazy_handler(path: str) -> RouteHandler:
+    """Обработчик, модуль которого загружается при первом вызове
+
+    Имя обертки совпадает с именем функции, поэтому метрики и профилировщик
+    видят обработчик под тем же именем, что и при прямом импорте.
+    """
+    async def handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        return await resolve_handler(path)(update, context)
+
+    handler.__name__ = handler.__qualname__ = path.partition(':')[2]
+    return handler
+
+
+@dataclass
+class RouteStats:
+    """Счетчики обращений к маршруту"""
+    hits: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        """Среднее время обработки в миллисекундах"""
+        return self.total_time / self.hits * 1000 if self.hits else 0.0
+
+
+class Router:
+    """Маршрутизация обновлений поиском в словаре
+
+    Текст кнопки и callback_data ищутся по точному совпадению. Для
+    callback-ов с числовым параметром в конце (users_page_2,
+    admin_fbsearch_15) ключом служит часть до последнего '_'.
+    """
+
+    def __init__(self,
+                 text_routes: Dict[str, RouteHandler],
+                 callback_routes: Dict[str, RouteHandler],
+                 callback_prefix_routes: Dict[str, RouteHandler],
+                 text_fallback: RouteHandler,
+                 callback_fallback: RouteHandler):
+        self.text_routes = dict(text_routes)
+        self.callback_routes = dict(callback_routes)
+        self.callback_prefix_routes = dict(callback_prefix_routes)
+        self.text_fallback = text_fallback
+        self.callback_fallback = callback_fallback
+        self.stats: Dict[str, RouteStats] = {}
+
+    def resolve_text(self, text: str) -> Tuple[str, RouteHandler]:
+        """Найти обработчик текстового сообщения"""
+        handler = self.text_routes.get(text)
+        if handler is not None:
+            return f"text:{text}", handler
+        return "text:*", self.text_fallback
+
+    def resolve_callback(self, data: str) -> Tuple[str, RouteHandler]:
+        """Найти обработчик callback-запроса"""
+        handler = self.callback_routes.get(data)
+        if handler is not None:
+            return f"callback:{data}", handler
+
+        prefix, _, param = data.rpartition('_')
+        if param.isdigit():
+            handler = self.callback_prefix_routes.get(prefix)
+            if handler is not None:
+                return f"callback:{prefix}_*", handler
+
+        return "callback:*", self.callback_fallback
+
+    async def handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Точка входа для текстовых сообщений"""
+        route, handler = self.resolve_text(update.message.text)
+        await self._dispatch(route, handler, update, context)
+
+    async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Точка входа для callback-запросов"""
+        route, handler = self.resolve_callback(update.callback_query.data)
+        await self._dispatch(route, handler, update, context)
+
+    async def _dispatch(self, route: str, handler: RouteHandler, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Вызвать обработчик и учесть время его работы"""
+        stats = self.stats.get(route)
+        if stats is None:
+            stats = self.stats[route] = RouteStats()
+
+        started = time.perf_counter()
+        try:
+            await handler(update, context)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.hits += 1
+            stats.total_time += elapsed
+            if elapsed > stats.max_time:
+                stats.max_time = elapsed
+
+    def get_stats(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Статистика маршрутов, начиная с самых частых"""
+        rows = [
+            {
+                'route': route,
+                'hits': stats.hits,
+                'errors': stats.errors,
+                'avg_ms': round(stats.avg_ms, 2),
+                'max_ms': round(stats.max_time * 1000, 2)
+            }
+            for route, stats in self.stats.items()
+        ]
+        rows.sort(key=lambda row: row['hits'], reverse=True)
+        return rows[:limit] if limit else rows
@@ -20,10 +20,25 @@ class Settings:
 
     # База данных
     DATABASE_PATH: str = os.getenv('DATABASE_PATH', 'data/onboarding.db')
+    # Количество файлов-шардов для пользователей и их действий (1 - все в DATABASE_PATH);
+    # после изменения данные переносятся командой: python main.py reshard <шардов>
+    DATABASE_SHARDS: int = int(os.getenv('DATABASE_SHARDS', '1'))
+    # Аналитика и экспорт читают копию БД не старее стольких секунд (0 - читают основную БД);
+    # файл копии по умолчанию - рядом с DATABASE_PATH (onboarding.replica.db)
+    ANALYTICS_REPLICA_MAX_LAG: float = float(os.getenv('ANALYTICS_REPLICA_MAX_LAG', '300'))
+    ANALYTICS_REPLICA_PATH: str = os.getenv('ANALYTICS_REPLICA_PATH', '')
+    # Как часто (секунд) сохранять user_data и состояние диалогов в БД
+    PERSISTENCE_UPDATE_INTERVAL: float = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '30'))
 
     # Логирование
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE: str = os.getenv('LOG_FILE', 'data/logs/bot.log')
+    LOG_MAX_BYTES: int = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT: int = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    LOG_ROTATE_WHEN: str = os.getenv('LOG_ROTATE_WHEN', '')
+    LOG_JSON: bool = os.getenv('LOG_JSON', 'False').lower() == 'true'
+    LOG_SAMPLE_RATE: float = float(os.getenv('LOG_SAMPLE_RATE', '0.1'))
+    LOG_SAMPLE_BURST: int = int(os.getenv('LOG_SAMPLE_BURST', '20'))
 
     # Контакты компании
     COMPANY_NAME: str = os.getenv('COMPANY_NAME', 'АО "БигТайм АйТи"')
@@ -52,15 +67,41 @@ class Settings:
     # Настройки уведомлений
     NOTIFICATION_ENABLED: bool = os.getenv('NOTIFICATION_ENABLED', 'True').lower() == 'true'
     FEEDBACK_NOTIFICATION: bool = os.getenv('FEEDBACK_NOTIFICATION', 'True').lower() == 'true'
+    NOTIFICATION_DIGEST_WINDOW: float = float(os.getenv('NOTIFICATION_DIGEST_WINDOW', '30'))
+    NOTIFICATION_DIGEST_MAX_SIZE: int = int(os.getenv('NOTIFICATION_DIGEST_MAX_SIZE', '10'))
 
     # Настройки рассылки
     BROADCAST_DELAY: float = float(os.getenv('BROADCAST_DELAY', '0.1'))
     MAX_MESSAGE_LENGTH: int = int(os.getenv('MAX_MESSAGE_LENGTH', '4000'))
 
+    # Выгрузка данных администраторам: одновременных выгрузок, как часто обновлять прогресс (секунды)
+    # и размер части архива (МБ; Bot API принимает документы до 50 МБ)
+    EXPORT_MAX_JOBS: int = int(os.getenv('EXPORT_MAX_JOBS', '1'))
+    EXPORT_PROGRESS_INTERVAL: float = float(os.getenv('EXPORT_PROGRESS_INTERVAL', '5'))
+    EXPORT_PART_SIZE_MB: float = float(os.getenv('EXPORT_PART_SIZE_MB', '45'))
+
     # Настройки онбординга
     MAX_ONBOARDING_STAGES: int = int(os.getenv('MAX_ONBOARDING_STAGES', '10'))
     AUTO_REMINDERS: bool = os.getenv('AUTO_REMINDERS', 'False').lower() == 'true'
     REMINDER_INTERVAL_DAYS: int = int(os.getenv('REMINDER_INTERVAL_DAYS', '3'))
+    # Проверка очереди напоминаний (секунды), размер пачки и предел отправки (сообщений в секунду)
+    REMINDER_CHECK_INTERVAL: float = float(os.getenv('REMINDER_CHECK_INTERVAL', '60'))
+    REMINDER_BATCH_SIZE: int = int(os.getenv('REMINDER_BATCH_SIZE', '50'))
+    REMINDER_RATE: float = float(os.getenv('REMINDER_RATE', '20'))
+    # Как часто сохранять скетчи квантилей времени на этапах (секунды)
+    STAGE_SKETCH_SAVE_INTERVAL: float = float(os.getenv('STAGE_SKETCH_SAVE_INTERVAL', '300'))
+    # Как часто сохранять дневные скетчи активных пользователей (секунды)
+    ACTIVITY_SKETCH_SAVE_INTERVAL: float = float(os.getenv('ACTIVITY_SKETCH_SAVE_INTERVAL', '60'))
+
+    # Метрики (порт HTTP-выгрузки в формате Prometheus на 127.0.0.1, 0 - выключено)
+    METRICS_PORT: int = int(os.getenv('METRICS_PORT', '0'))
+
+    # Профилирование по запросу (/profile или SIGUSR2): доля обновлений и снимки памяти
+    PROFILE_SAMPLE_RATE: float = float(os.getenv('PROFILE_SAMPLE_RATE', '0.1'))
+    PROFILE_MEMORY: bool = os.getenv('PROFILE_MEMORY', 'False').lower() == 'true'
+
+    # Настройки поиска
+    SEARCH_RESULTS_LIMIT: int = int(os.getenv('SEARCH_RESULTS_LIMIT', '3'))
 
     @classmethod
     def validate(cls) -> List[str]:
@@ -79,6 +120,18 @@ class Settings:
         if cls.COMPANY_SITE == 'https://company-site.ru':
             issues.append("⚠️ Используется сайт компании по умолчанию")
 
+        if cls.DATABASE_SHARDS < 1:
+            issues.append("❌ DATABASE_SHARDS должно быть не меньше 1")
+
+        if cls.ANALYTICS_REPLICA_MAX_LAG < 0:
+            issues.append("❌ ANALYTICS_REPLICA_MAX_LAG не может быть отрицательным")
+
+        if cls.EXPORT_MAX_JOBS < 1:
+            issues.append("❌ EXPORT_MAX_JOBS должно быть не меньше 1")
+
+        if not 0 < cls.EXPORT_PART_SIZE_MB <= 50:
+            issues.append("❌ EXPORT_PART_SIZE_MB должно быть больше 0 и не больше 50")
+
         # Проверяем существование директорий
         os.makedirs(os.path.dirname(cls.DATABASE_PATH), exist_ok=True)
         os.makedirs(os.path.dirname(cls.LOG_FILE), exist_ok=True)
@@ -100,7 +153,7 @@ class Settings:
 🏢 Компания: {cls.COMPANY_NAME}
 📧 HR: {cls.HR_EMAIL}
 🌐 Сайт: {cls.COMPANY_SITE}
-🗄️ БД: {cls.DATABASE_PATH}
+🗄️ БД: {cls.DATABASE_PATH}{f' ({cls.DATABASE_SHARDS} шардов)' if cls.DATABASE_SHARDS > 1 else ''}
 📝 Логи: {cls.LOG_FILE}
 🔔 Уведомления: {'✅' if cls.NOTIFICATION_ENABLED else '❌'}
 """
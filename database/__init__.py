@@ -3,7 +3,7 @@
 Модуль работы с базой данных
 """
 
-from .models import User, Feedback, UserAction, UserStatus, OnboardingStage
+from .models import User, Feedback, FeedbackCluster, UserAction, UserStatus, OnboardingStage
 from .manager import db_manager
 
-__all__ = ['User', 'Feedback', 'UserAction', 'UserStatus', 'OnboardingStage', 'db_manager']
\ No newline at end of file
+__all__ = ['User', 'Feedback', 'FeedbackCluster', 'UserAction', 'UserStatus', 'OnboardingStage', 'db_manager']
\ No newline at end of file
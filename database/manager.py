@@ -2,29 +2,124 @@
 """
 Менеджер базы данных для OnboardingBuddy
 """
+import re
 import sqlite3
 import logging
-from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
+import threading
+from typing import Callable, Iterator, Optional, List, Dict, Any
+from datetime import date, datetime, timedelta
 from contextlib import contextmanager
 
 from config.settings import settings
-from database.models import User, Feedback, UserAction, UserStatus, DatabaseSchema
+from database.models import (
+    User, Feedback, FeedbackCluster, UserAction, UserStatus, OnboardingStage, OnboardingEvent, DatabaseSchema,
+    STAGE_TRANSITIONS
+)
+from database.unit_of_work import active_unit
+from services.search import stem
+from services.metrics import count_db_statement, instrument_class
+from services.stage_durations import StageDurations
+from services.active_users import ActiveUsers
+from services.segments import UserSegments
 
 logger = logging.getLogger(__name__)
 
+# Максимальный rowid SQLite (начальное значение курсора постраничной выборки)
+MAX_ROWID = 2 ** 63 - 1
+
+# Длины префиксов, для которых feedback_fts хранит префиксный индекс
+FTS_MIN_PREFIX = 3
+FTS_MAX_PREFIX = 6
+# Написания буквы в индексе feedback_fts: «ё» хранится как есть
+FTS_SPELLINGS = {'е': 'её'}
+
+
+def _search_fold(text: Optional[str]) -> Optional[str]:
+    """Текст для поиска без FTS5: LOWER SQLite переводит в нижний регистр только латиницу"""
+    return text.casefold().replace('ё', 'е') if text is not None else None
+
+
+# Таблицы, которые выгружаются (iter_table_batches), и столбец отметки их инкрементальной выгрузки:
+# новые и измененные строки - те, у которых он больше прошлой отметки
+EXPORT_TABLES = {'users': 'updated_at', 'feedback': 'id', 'user_actions': 'id'}
+
+# Запросы переходов по событиям, строятся из STAGE_TRANSITIONS при первом использовании
+_TRANSITION_SQL: Dict[OnboardingEvent, tuple] = {}
+
+
+def _transition_statements(event: OnboardingEvent) -> tuple:
+    """Запись в журнал этапов и условный UPDATE для события"""
+    statements = _TRANSITION_SQL.get(event)
+    if statements:
+        return statements
+
+    targets = {stage: target for (stage, on), target in STAGE_TRANSITIONS.items() if on == event}
+    # Значения берутся из таблицы переходов в коде, а не из ввода пользователя
+    sources = ', '.join(str(stage) for stage in sorted(targets))
+    new_stage = 'CASE stage ' + ' '.join(
+        f'WHEN {stage} THEN {to_stage}' for stage, (to_stage, _) in sorted(targets.items())
+    ) + ' END'
+    status_cases = ' '.join(
+        f"WHEN {stage} THEN '{status.value}'" for stage, (_, status) in sorted(targets.items()) if status
+    )
+    new_status = f'CASE stage {status_cases} ELSE status END' if status_cases else 'status'
+
+    log_sql = f'''
+        INSERT INTO stage_transitions (id, user_id, from_stage, to_stage, duration, created_at)
+        SELECT ?, user_id, stage, {new_stage}, MAX(0.0, (julianday(?) - julianday(stage_started_at)) * 86400.0), ?
+        FROM users
+        WHERE user_id = ? AND stage IN ({sources}) AND stage != {new_stage} AND stage_started_at IS NOT NULL
+        RETURNING id, from_stage, duration
+    '''
+    update_sql = f'''
+        UPDATE users SET stage = {new_stage}, status = {new_status}, updated_at = ?,
+            next_reminder_at = CASE WHEN {new_stage} >= {OnboardingStage.COMPLETE}
+                OR {new_status} = '{UserStatus.COMPLETED.value}' THEN NULL ELSE ? END,
+            stage_started_at = CASE WHEN stage = {new_stage} THEN stage_started_at ELSE ? END
+        WHERE user_id = ? AND stage IN ({sources}) AND NOT (stage = {new_stage} AND status = {new_status})
+        RETURNING user_id, username, full_name, position, status, stage, created_at, updated_at
+    '''
+    statements = _TRANSITION_SQL[event] = (log_sql, update_sql)
+    return statements
+
 
 class DatabaseManager:
     """Менеджер для работы с базой данных"""
 
     def __init__(self, db_path: str = None):
         self.db_path = db_path or settings.DATABASE_PATH
+        self.fts_enabled = False
+        # Выдача id новых строк по таблицам; без счетчика id выдает AUTOINCREMENT SQLite
+        # (шарды получают общие счетчики от ShardedDatabaseManager)
+        self.id_sequences: Dict[str, Callable[[], int]] = {}
+        # Копия БД для чтения (database/replica.py), если менеджер читает ее, а не основную БД
+        self.replica = None
         self.init_database()
 
+        # Квантили времени на этапах, обновляются при переходах между этапами
+        self.stage_durations = StageDurations(self)
+        # Активные пользователи по дням, обновляются в log_user_action
+        self.active_users = ActiveUsers(self)
+        # Битовые индексы сегментов для рассылок, обновляются при изменении пользователей и действиях
+        self.segments = UserSegments(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.replica is not None:
+            return self.replica.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.set_trace_callback(count_db_statement)
+        return conn
+
     @contextmanager
     def get_connection(self):
-        """Контекстный менеджер для работы с соединением"""
-        conn = sqlite3.connect(self.db_path)
+        """Контекстный менеджер для работы с соединением
+
+        Внутри обработчика обновления возвращается общее соединение единицы
+        работы (database/unit_of_work.py): commit методов откладывается до
+        конца обновления, чтения видят незафиксированные записи.
+        """
+        unit = active_unit()
+        conn = unit.connection(self.db_path, self._connect) if unit else self._connect()
         try:
             yield conn
         except Exception as e:
@@ -34,6 +129,19 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def _new_id(self, table: str) -> Optional[int]:
+        """id новой строки таблицы (None - выдаст SQLite)"""
+        sequence = self.id_sequences.get(table)
+        return sequence() if sequence else None
+
+    def _after_commit(self, callback):
+        """Выполнить callback, когда записи метода зафиксированы"""
+        unit = active_unit()
+        if unit:
+            unit.defer(callback)
+        else:
+            callback()
+
     def init_database(self):
         """Инициализация базы данных"""
         with self.get_connection() as conn:
@@ -43,14 +151,65 @@ class DatabaseManager:
             cursor.execute(DatabaseSchema.CREATE_USERS_TABLE)
             cursor.execute(DatabaseSchema.CREATE_FEEDBACK_TABLE)
             cursor.execute(DatabaseSchema.CREATE_USER_ACTIONS_TABLE)
+            cursor.execute(DatabaseSchema.CREATE_FEEDBACK_CLUSTERS_TABLE)
+            cursor.execute(DatabaseSchema.CREATE_FEEDBACK_SIGNATURES_TABLE)
+            cursor.execute(DatabaseSchema.CREATE_BOT_PERSISTENCE_TABLE)
+            cursor.execute(DatabaseSchema.CREATE_STAGE_TRANSITIONS_TABLE)
+            cursor.execute(DatabaseSchema.CREATE_STAGE_DURATION_SKETCHES_TABLE)
+            cursor.execute(DatabaseSchema.CREATE_ACTIVITY_SKETCHES_TABLE)
+            cursor.execute(DatabaseSchema.CREATE_EXPORT_STATE_TABLE)
+            cursor.execute(DatabaseSchema.CREATE_EXPORT_TOMBSTONES_TABLE)
+
+            # Новые колонки users должны появиться до создания их индексов
+            self._migrate_users_columns(cursor)
 
             # Создаем индексы
             for index_sql in DatabaseSchema.CREATE_INDEXES:
                 cursor.execute(index_sql)
 
+            self._migrate_feedback_fts(cursor)
+
             conn.commit()
             logger.info("База данных инициализирована")
 
+    def _migrate_users_columns(self, cursor):
+        """Добавление новых колонок в существующую таблицу users"""
+        cursor.execute('PRAGMA table_info(users)')
+        columns = {column[1] for column in cursor.fetchall()}
+
+        if 'next_reminder_at' not in columns:
+            cursor.execute('ALTER TABLE users ADD COLUMN next_reminder_at TIMESTAMP')
+            cursor.execute('''
+                UPDATE users SET next_reminder_at = datetime(updated_at, ?)
+                WHERE stage < ? AND status != ?
+            ''', (f'+{settings.REMINDER_INTERVAL_DAYS} days', OnboardingStage.COMPLETE, UserStatus.COMPLETED.value))
+            logger.info(f"Очередь напоминаний заполнена: {cursor.rowcount} пользователей")
+
+        if 'stage_started_at' not in columns:
+            cursor.execute('ALTER TABLE users ADD COLUMN stage_started_at TIMESTAMP')
+            # Точное время входа в текущий этап неизвестно, ближайшее - последнее обновление
+            cursor.execute('UPDATE users SET stage_started_at = updated_at')
+
+    def _migrate_feedback_fts(self, cursor):
+        """Создание полнотекстового индекса обратной связи и заполнение его существующими данными"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'feedback_fts'")
+        fts_exists = cursor.fetchone() is not None
+
+        try:
+            cursor.execute(DatabaseSchema.CREATE_FEEDBACK_FTS_TABLE)
+            for trigger_sql in DatabaseSchema.CREATE_FEEDBACK_FTS_TRIGGERS:
+                cursor.execute(trigger_sql)
+        except sqlite3.OperationalError as e:
+            self.fts_enabled = False
+            logger.warning(f"FTS5 недоступен, поиск по обратной связи будет медленным: {e}")
+            return
+
+        self.fts_enabled = True
+
+        if not fts_exists:
+            cursor.execute("INSERT INTO feedback_fts(feedback_fts) VALUES ('rebuild')")
+            logger.info("Полнотекстовый индекс обратной связи заполнен")
+
     # МЕТОДЫ ДЛЯ РАБОТЫ С ПОЛЬЗОВАТЕЛЯМИ
 
     def get_user(self, user_id: int) -> Optional[User]:
@@ -77,14 +236,17 @@ class DatabaseManager:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT OR REPLACE INTO users 
-                (user_id, username, full_name, position, status, stage, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                (user_id, username, full_name, position, status, stage, created_at, updated_at,
+                 next_reminder_at, stage_started_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 user.user_id, user.username, user.full_name, user.position,
-                user.status.value, user.stage, user.created_at, user.updated_at
+                user.status.value, user.stage, user.created_at, user.updated_at,
+                self._next_reminder_at(user.stage, user.status), user.created_at
             ))
             conn.commit()
 
+        self._after_commit(lambda: self.segments.observe_user(user_id, user.status, user.stage))
         logger.info(f"Пользователь {user_id} создан")
         return user
 
@@ -97,43 +259,93 @@ class DatabaseManager:
             cursor.execute('''
                 UPDATE users SET 
                 username = ?, full_name = ?, position = ?, 
-                status = ?, stage = ?, updated_at = ?
+                status = ?, stage = ?, updated_at = ?, next_reminder_at = ?
                 WHERE user_id = ?
             ''', (
                 user.username, user.full_name, user.position,
                 user.status.value, user.stage, user.updated_at,
+                self._next_reminder_at(user.stage, user.status),
                 user.user_id
             ))
             conn.commit()
             success = cursor.rowcount > 0
 
         if success:
+            self._after_commit(lambda: self.segments.observe_user(user.user_id, user.status, user.stage))
             logger.info(f"Пользователь {user.user_id} обновлен")
         return success
 
     def update_user_stage(self, user_id: int, stage: int, status: UserStatus = None) -> bool:
-        """Обновить этап пользователя"""
+        """Обновить этап пользователя
+
+        При смене этапа время, проведенное на предыдущем, записывается в
+        stage_transitions и добавляется в скетч квантилей этого этапа.
+        """
+        now = datetime.now()
+        # Переход на новый этап откладывает следующее напоминание
+        next_reminder_at = self._next_reminder_at(stage, status)
+        transition = None
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT stage, stage_started_at FROM users WHERE user_id = ?', (user_id,))
+            previous = cursor.fetchone()
 
-            if status:
-                cursor.execute('''
-                    UPDATE users SET stage = ?, status = ?, updated_at = CURRENT_TIMESTAMP 
-                    WHERE user_id = ?
-                ''', (stage, status.value, user_id))
-            else:
+            cursor.execute('''
+                UPDATE users SET stage = ?, status = COALESCE(?, status), updated_at = ?,
+                    next_reminder_at = ?,
+                    stage_started_at = CASE WHEN stage = ? THEN stage_started_at ELSE ? END
+                WHERE user_id = ?
+            ''', (stage, status.value if status else None, now, next_reminder_at, stage, now, user_id))
+            success = cursor.rowcount > 0
+
+            if success and previous and previous[0] != stage and previous[1]:
+                duration = max(0.0, (now - datetime.fromisoformat(previous[1])).total_seconds())
                 cursor.execute('''
-                    UPDATE users SET stage = ?, updated_at = CURRENT_TIMESTAMP 
-                    WHERE user_id = ?
-                ''', (stage, user_id))
+                    INSERT INTO stage_transitions (id, user_id, from_stage, to_stage, duration, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (self._new_id('stage_transitions'), user_id, previous[0], stage, duration, now))
+                transition = (cursor.lastrowid, previous[0], duration)
 
             conn.commit()
-            success = cursor.rowcount > 0
 
+        if transition:
+            self._after_commit(lambda: self.stage_durations.observe(*transition))
         if success:
+            self._after_commit(lambda: self.segments.observe_user(user_id, status, stage))
             logger.info(f"Этап пользователя {user_id} обновлен: stage={stage}, status={status}")
         return success
 
+    def transition_user(self, user_id: int, event: OnboardingEvent) -> Optional[User]:
+        """Перевести пользователя на следующий этап по событию
+
+        Новый этап и статус берутся из STAGE_TRANSITIONS по текущему этапу
+        в самом UPDATE ... WHERE stage IN (...) RETURNING, без чтения
+        пользователя заранее: повторные и запоздалые нажатия не меняют этап
+        и не возвращают пользователя назад. Возвращает обновленного
+        пользователя или None, если перехода по событию из текущего этапа нет.
+        """
+        log_sql, update_sql = _transition_statements(event)
+        now = datetime.now()
+        next_reminder_at = now + timedelta(days=settings.REMINDER_INTERVAL_DAYS)
+
+        with self.get_connection() as conn:
+            # Запись в журнал и UPDATE должны видеть один и тот же этап
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            transition = conn.execute(log_sql, (self._new_id('stage_transitions'), now, now, user_id)).fetchone()
+            row = conn.execute(update_sql, (now, next_reminder_at, now, user_id)).fetchone()
+            conn.commit()
+
+        if transition:
+            self._after_commit(lambda: self.stage_durations.observe(*transition))
+        if not row:
+            return None
+        user = User.from_db_row(row)
+        self._after_commit(lambda: self.segments.observe_user(user_id, user.status, user.stage))
+        logger.info(f"Этап пользователя {user_id} обновлен: {event.value} -> stage={user.stage}, status={user.status}")
+        return user
+
     def get_users_by_status(self, status: UserStatus) -> List[User]:
         """Получить пользователей по статусу"""
         with self.get_connection() as conn:
@@ -150,6 +362,112 @@ class DatabaseManager:
             rows = cursor.fetchall()
             return [User.from_db_row(row) for row in rows]
 
+    def get_segment_rows(self) -> List[tuple]:
+        """Статус, этап и время последнего действия каждого пользователя (для индексов сегментов)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT user_id, status, stage,
+                    (SELECT MAX(created_at) FROM user_actions WHERE user_actions.user_id = users.user_id)
+                FROM users
+            ''')
+            return cursor.fetchall()
+
+    # МЕТОДЫ ДЛЯ НАПОМИНАНИЙ
+
+    @staticmethod
+    def _next_reminder_at(stage: int, status: UserStatus = None) -> Optional[datetime]:
+        """Когда напомнить пользователю, застрявшему на этапе (None - онбординг завершен)"""
+        if stage >= OnboardingStage.COMPLETE or status == UserStatus.COMPLETED:
+            return None
+        return datetime.now() + timedelta(days=settings.REMINDER_INTERVAL_DAYS)
+
+    def claim_due_reminders(self, limit: int = 50, now: datetime = None) -> List[User]:
+        """Выбрать пользователей, которым пора напомнить, и сразу перенести их следующее напоминание
+
+        Выборка идет по частичному индексу idx_users_next_reminder_at
+        (только первые limit строк очереди), а перенос в том же запросе
+        не дает двум обработчикам взять одного пользователя дважды.
+        """
+        now = now or datetime.now()
+        next_reminder_at = now + timedelta(days=settings.REMINDER_INTERVAL_DAYS)
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE users SET next_reminder_at = ?
+                WHERE user_id IN (
+                    SELECT user_id FROM users
+                    WHERE next_reminder_at <= ?
+                    ORDER BY next_reminder_at
+                    LIMIT ?
+                )
+                RETURNING user_id, username, full_name, position, status, stage, created_at, updated_at
+            ''', (next_reminder_at, now, limit))
+            rows = cursor.fetchall()
+            conn.commit()
+            return [User.from_db_row(row) for row in rows]
+
+    def reschedule_reminders(self, user_ids: List[int], next_reminder_at: Optional[datetime]) -> int:
+        """Перенести напоминания пользователей (None - больше не напоминать)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                'UPDATE users SET next_reminder_at = ? WHERE user_id = ?',
+                [(next_reminder_at, user_id) for user_id in user_ids]
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def count_due_reminders(self, now: datetime = None) -> int:
+        """Количество пользователей, которым уже пора напомнить (глубина очереди)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM users WHERE next_reminder_at <= ?', (now or datetime.now(),))
+            return cursor.fetchone()[0]
+
+    # МЕТОДЫ ДЛЯ ВРЕМЕНИ НА ЭТАПАХ
+
+    def get_stage_sketches(self) -> List[tuple]:
+        """Сохраненные скетчи времени на этапах: (stage, sketch, last_transition_id)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT stage, sketch, last_transition_id FROM stage_duration_sketches')
+            return cursor.fetchall()
+
+    def save_stage_sketches(self, sketches: List[tuple], last_transition_id: int) -> int:
+        """Сохранить скетчи (stage, sketch) одной транзакцией вместе с последним учтенным переходом"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO stage_duration_sketches (stage, sketch, last_transition_id, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', [(stage, sketch, last_transition_id) for stage, sketch in sketches])
+            # Переход учтен во всех скетчах, в том числе не изменившихся
+            cursor.execute('UPDATE stage_duration_sketches SET last_transition_id = ?', (last_transition_id,))
+            conn.commit()
+            return len(sketches)
+
+    def get_stage_transitions(self, after_id: int = 0) -> List[tuple]:
+        """Переходы между этапами после after_id: (id, from_stage, duration)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, from_stage, duration FROM stage_transitions
+                WHERE id > ? ORDER BY id
+            ''', (after_id,))
+            return cursor.fetchall()
+
+    def get_stage_durations(self, stage: int) -> List[float]:
+        """Все длительности этапа по возрастанию (точный пересчет для проверки скетчей)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT duration FROM stage_transitions
+                WHERE from_stage = ? ORDER BY duration
+            ''', (stage,))
+            return [row[0] for row in cursor.fetchall()]
+
     # МЕТОДЫ ДЛЯ РАБОТЫ С ОБРАТНОЙ СВЯЗЬЮ
 
     def save_feedback(self, user_id: int, message: str) -> Feedback:
@@ -180,7 +498,7 @@ class DatabaseManager:
                 SELECT f.id, f.user_id, f.message, f.created_at,
                        u.full_name, u.username
                 FROM feedback f
-                JOIN users u ON f.user_id = u.user_id
+                LEFT JOIN users u ON f.user_id = u.user_id
                 ORDER BY f.created_at DESC
                 LIMIT ?
             ''', (limit,))
@@ -198,6 +516,184 @@ class DatabaseManager:
                 for row in rows
             ]
 
+    def search_feedback(self, query: str, cursor: Optional[int] = None, limit: int = 10) -> Dict[str, Any]:
+        """Полнотекстовый поиск по обратной связи с постраничной навигацией по ключу
+
+        Args:
+            query: Поисковый запрос (слова ищутся по префиксу)
+            cursor: id последнего сообщения предыдущей страницы (None - первая страница)
+            limit: Количество результатов на странице
+
+        Returns:
+            {'results': [...], 'next_cursor': id или None}
+        """
+        terms = re.findall(r'\w+', query.lower())
+        if not terms:
+            return {'results': [], 'next_cursor': None}
+
+        with self.get_connection() as conn:
+            db_cursor = conn.cursor()
+
+            if self.fts_enabled:
+                match_query = " AND ".join(self._fts_term(term) for term in terms)
+                db_cursor.execute('''
+                    SELECT f.id, f.user_id, snippet(feedback_fts, 0, '«', '»', '…', 16),
+                           f.created_at, u.full_name, u.username
+                    FROM feedback_fts
+                    JOIN feedback f ON f.id = feedback_fts.rowid
+                    LEFT JOIN users u ON u.user_id = f.user_id
+                    WHERE feedback_fts MATCH ? AND feedback_fts.rowid < ?
+                    ORDER BY feedback_fts.rowid DESC
+                    LIMIT ?
+                ''', (match_query, cursor if cursor is not None else MAX_ROWID, limit + 1))
+            else:
+                conn.create_function('search_fold', 1, _search_fold, deterministic=True)
+                terms = [_search_fold(term) for term in terms]
+                conditions = " AND ".join("search_fold(f.message) LIKE ?" for _ in terms)
+                db_cursor.execute(f'''
+                    SELECT f.id, f.user_id, f.message, f.created_at, u.full_name, u.username
+                    FROM feedback f
+                    LEFT JOIN users u ON u.user_id = f.user_id
+                    WHERE {conditions} AND f.id < ?
+                    ORDER BY f.id DESC
+                    LIMIT ?
+                ''', (*[f"%{term}%" for term in terms], cursor if cursor is not None else MAX_ROWID, limit + 1))
+
+            rows = db_cursor.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return {
+            'results': [
+                {
+                    'id': row[0],
+                    'user_id': row[1],
+                    'snippet': row[2],
+                    'created_at': row[3],
+                    'user_name': row[4],
+                    'username': row[5]
+                }
+                for row in rows
+            ],
+            'next_cursor': rows[-1][0] if has_more else None
+        }
+
+    @staticmethod
+    def _fts_term(term: str) -> str:
+        """Преобразовать слово запроса в префиксный FTS5-терм по его основе
+
+        unicode61 не считает «ё» буквой с диакритикой, поэтому в индексе
+        «ёлка» и «елка» - разные слова: основа ищется во всех написаниях
+        с «е» и «ё» («"елк"* OR "ёлк"*»).
+        """
+        prefix = stem(term.replace('ё', 'е'))[:FTS_MAX_PREFIX]
+        suffix = '' if len(prefix) < FTS_MIN_PREFIX else '*'
+        spellings = ['']
+        for char in prefix:
+            spellings = [spelling + variant for spelling in spellings for variant in FTS_SPELLINGS.get(char, char)]
+        if len(spellings) == 1:
+            return f'"{prefix}"{suffix}'
+        return '(' + ' OR '.join(f'"{spelling}"{suffix}' for spelling in spellings) + ')'
+
+    # МЕТОДЫ ДЛЯ ГРУППИРОВКИ ПОХОЖЕЙ ОБРАТНОЙ СВЯЗИ
+
+    def create_feedback_cluster(self, feedback: Feedback) -> FeedbackCluster:
+        """Создать группу обратной связи с этим сообщением в качестве образца"""
+        cluster = FeedbackCluster(
+            representative_id=feedback.id,
+            message=feedback.message,
+            count=1,
+            created_at=feedback.created_at or datetime.now(),
+            updated_at=feedback.created_at or datetime.now()
+        )
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO feedback_clusters (representative_id, message, count, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (cluster.representative_id, cluster.message, cluster.count, cluster.created_at, cluster.updated_at))
+            cluster.id = cursor.lastrowid
+            conn.commit()
+
+        return cluster
+
+    def increment_feedback_cluster(self, cluster_id: int) -> int:
+        """Увеличить счетчик сообщений в группе, вернуть новое значение"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE feedback_clusters SET count = count + 1, updated_at = ?
+                WHERE id = ?
+            ''', (datetime.now(), cluster_id))
+            cursor.execute('SELECT count FROM feedback_clusters WHERE id = ?', (cluster_id,))
+            row = cursor.fetchone()
+            conn.commit()
+
+        return row[0] if row else 0
+
+    def save_feedback_signature(self, feedback_id: int, cluster_id: int, signature: bytes):
+        """Сохранить MinHash-сигнатуру сообщения обратной связи"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO feedback_signatures (feedback_id, cluster_id, signature)
+                VALUES (?, ?, ?)
+            ''', (feedback_id, cluster_id, signature))
+            conn.commit()
+
+    def get_cluster_signatures(self) -> List[tuple]:
+        """Получить сигнатуры образцов групп: (cluster_id, signature)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT c.id, s.signature FROM feedback_clusters c
+                JOIN feedback_signatures s ON s.feedback_id = c.representative_id
+            ''')
+            return cursor.fetchall()
+
+    def get_unclustered_feedback(self) -> List[Feedback]:
+        """Получить обратную связь, еще не распределенную по группам"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT f.* FROM feedback f
+                LEFT JOIN feedback_signatures s ON s.feedback_id = f.id
+                WHERE s.feedback_id IS NULL
+                ORDER BY f.id
+            ''')
+            return [Feedback.from_db_row(row) for row in cursor.fetchall()]
+
+    def get_feedback_clusters(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Получить группы обратной связи, начиная с последних обновленных"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT c.id, c.message, c.count, c.created_at, c.updated_at,
+                       f.user_id, u.full_name, u.username
+                FROM feedback_clusters c
+                LEFT JOIN feedback f ON f.id = c.representative_id
+                LEFT JOIN users u ON u.user_id = f.user_id
+                ORDER BY c.updated_at DESC
+                LIMIT ?
+            ''', (limit,))
+
+            rows = cursor.fetchall()
+            return [
+                {
+                    'id': row[0],
+                    'message': row[1],
+                    'count': row[2],
+                    'created_at': row[3],
+                    'updated_at': row[4],
+                    'user_id': row[5],
+                    'user_name': row[6],
+                    'username': row[7]
+                }
+                for row in rows
+            ]
+
     # МЕТОДЫ ДЛЯ РАБОТЫ С ДЕЙСТВИЯМИ ПОЛЬЗОВАТЕЛЕЙ
 
     def log_user_action(self, user_id: int, action: str, details: str = "") -> UserAction:
@@ -212,12 +708,16 @@ class DatabaseManager:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO user_actions (user_id, action, details, created_at)
-                VALUES (?, ?, ?, ?)
-            ''', (user_action.user_id, user_action.action, user_action.details, user_action.created_at))
+                INSERT INTO user_actions (id, user_id, action, details, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (self._new_id('user_actions'), user_action.user_id, user_action.action, user_action.details,
+                  user_action.created_at))
             user_action.id = cursor.lastrowid
             conn.commit()
 
+        self._after_commit(lambda: self.active_users.observe(user_action.id, user_action.user_id,
+                                                             user_action.created_at))
+        self._after_commit(lambda: self.segments.observe_activity(user_action.user_id, user_action.created_at))
         return user_action
 
     def get_user_actions(self, user_id: int, limit: int = 50) -> List[UserAction]:
@@ -252,57 +752,119 @@ class DatabaseManager:
             rows = cursor.fetchall()
             return [{'action': row[0], 'count': row[1]} for row in rows]
 
+    # МЕТОДЫ ДЛЯ СОХРАНЕНИЯ СОСТОЯНИЯ БОТА
+
+    def get_persistent_state(self, scope: str, key: str) -> Optional[bytes]:
+        """Получить сохраненное состояние (например, user_data одного пользователя)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT data FROM bot_persistence WHERE scope = ? AND key = ?', (scope, key))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def get_persistent_states(self, scope: str) -> List[tuple]:
+        """Получить все сохраненные состояния области: (key, data)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT key, data FROM bot_persistence WHERE scope = ?', (scope,))
+            return cursor.fetchall()
+
+    def save_persistent_states(self, upserts: List[tuple], deletes: List[tuple] = ()) -> int:
+        """Записать измененные состояния одной транзакцией
+
+        Args:
+            upserts: Строки (scope, key, data) для вставки или замены
+            deletes: Пары (scope, key) для удаления
+
+        Returns:
+            Количество записанных и удаленных строк
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if upserts:
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO bot_persistence (scope, key, data, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ''', upserts)
+            if deletes:
+                cursor.executemany('DELETE FROM bot_persistence WHERE scope = ? AND key = ?', deletes)
+            conn.commit()
+
+        return len(upserts) + len(deletes)
+
     # АНАЛИТИЧЕСКИЕ МЕТОДЫ
 
-    def get_user_statistics(self) -> Dict[str, Any]:
-        """Получить статистику пользователей"""
+    def get_user_statistics(self, exact: bool = False) -> Dict[str, Any]:
+        """Получить статистику пользователей
+
+        Активные за день, неделю и месяц (последние 1, 7 и 30 календарных
+        дней) считаются по скетчам HyperLogLog с ошибкой около 1%;
+        exact=True считает их точно по user_actions (для сверки).
+        """
+        # Количество, сумма и число заполненных этапов по статусам
+        counts = self.get_user_counts()
+        total_users = sum(count for count, _, _ in counts.values())
+        status_stats = {status: count for status, (count, _, _) in counts.items()}
+        staged = sum(staged for _, _, staged in counts.values())
+        avg_progress = sum(stage_sum for _, stage_sum, _ in counts.values()) / staged if staged else 0
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            # Общее количество пользователей
-            cursor.execute('SELECT COUNT(*) FROM users')
-            total_users = cursor.fetchone()[0]
+            # Количество обратной связи
+            cursor.execute('SELECT COUNT(*) FROM feedback')
+            total_feedback = cursor.fetchone()[0]
 
-            # Статистика по статусам
-            cursor.execute('''
-                SELECT status, COUNT(*) as count 
-                FROM users 
-                GROUP BY status
-            ''')
-            status_stats = dict(cursor.fetchall())
+        # Активные пользователи
+        if exact:
+            active = {days: self.count_active_users(days) for days in (1, 7, 30)}
+        else:
+            active = {days: self.active_users.count(days) for days in (1, 7, 30)}
 
-            # Активные пользователи за неделю
-            week_ago = datetime.now() - timedelta(days=7)
+        return {
+            'total_users': total_users,
+            'status_stats': status_stats,
+            'active_day': active[1],
+            'active_week': active[7],
+            'active_month': active[30],
+            'total_feedback': total_feedback,
+            'avg_progress': round(avg_progress, 2),
+            'completion_rate': round(
+                (status_stats.get('completed', 0) / total_users * 100) if total_users > 0 else 0,
+                2
+            )
+        }
+
+    def get_user_counts(self) -> Dict[str, tuple]:
+        """Пользователи по статусам: {status: (количество, сумма этапов, количество с этапом)}"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status, COUNT(*), TOTAL(stage), COUNT(stage) FROM users GROUP BY status')
+            return {status: (count, stage_sum, staged) for status, count, stage_sum, staged in cursor.fetchall()}
+
+    def count_active_users(self, days: int = 7) -> int:
+        """Точное количество активных пользователей за последние days календарных дней"""
+        since_date = datetime.combine(date.today() - timedelta(days=days - 1), datetime.min.time())
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
             cursor.execute('''
                 SELECT COUNT(DISTINCT user_id) 
                 FROM user_actions 
                 WHERE created_at >= ?
-            ''', (week_ago,))
-            active_week = cursor.fetchone()[0]
+            ''', (since_date,))
+            return cursor.fetchone()[0]
 
-            # Количество обратной связи
-            cursor.execute('SELECT COUNT(*) FROM feedback')
-            total_feedback = cursor.fetchone()[0]
+    def get_daily_activity(self, days: int = 30, exact: bool = False) -> List[Dict[str, Any]]:
+        """Получить ежедневную активность
 
-            # Средний прогресс
-            cursor.execute('SELECT AVG(stage) FROM users')
-            avg_progress = cursor.fetchone()[0] or 0
+        По умолчанию - по дневным скетчам (количество пользователей с
+        ошибкой около 1%); exact=True считает точно по user_actions.
+        """
+        if not exact:
+            return self.active_users.daily(days)
 
-            return {
-                'total_users': total_users,
-                'status_stats': status_stats,
-                'active_week': active_week,
-                'total_feedback': total_feedback,
-                'avg_progress': round(avg_progress, 2),
-                'completion_rate': round(
-                    (status_stats.get('completed', 0) / total_users * 100) if total_users > 0 else 0,
-                    2
-                )
-            }
-
-    def get_daily_activity(self, days: int = 30) -> List[Dict[str, Any]]:
-        """Получить ежедневную активность"""
-        since_date = datetime.now() - timedelta(days=days)
+        since_date = datetime.combine(date.today() - timedelta(days=days), datetime.min.time())
 
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -327,9 +889,112 @@ class DatabaseManager:
                 for row in rows
             ]
 
-    def cleanup_old_data(self, days: int = 90) -> int:
-        """Очистка старых данных"""
-        cutoff_date = datetime.now() - timedelta(days=days)
+    # МЕТОДЫ ДЛЯ СКЕТЧЕЙ АКТИВНОСТИ
+
+    def get_activity_sketches(self) -> List[tuple]:
+        """Сохраненные дневные скетчи: (day, sketch, actions, last_action_id)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT day, sketch, actions, last_action_id FROM activity_sketches')
+            return cursor.fetchall()
+
+    def save_activity_sketches(self, sketches: List[tuple], last_action_id: int) -> int:
+        """Сохранить дневные скетчи (day, sketch, actions) одной транзакцией вместе с последним учтенным действием"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO activity_sketches (day, sketch, actions, last_action_id, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', [(day, sketch, actions, last_action_id) for day, sketch, actions in sketches])
+            # Действие учтено во всех днях, в том числе не изменившихся
+            cursor.execute('UPDATE activity_sketches SET last_action_id = ?', (last_action_id,))
+            conn.commit()
+            return len(sketches)
+
+    def get_last_action_id(self) -> int:
+        """Id последнего действия (0, если действий нет)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT MAX(id) FROM user_actions')
+            return cursor.fetchone()[0] or 0
+
+    def get_action_days(self, after_id: int = 0, until_id: int = None) -> List[tuple]:
+        """Действия с id из (after_id, until_id] по дням и пользователям: (day, user_id, количество)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('PRAGMA temp_store = MEMORY')
+            cursor.execute('''
+                SELECT substr(created_at, 1, 10), user_id, COUNT(*)
+                FROM user_actions
+                WHERE id > ? AND id <= ?
+                GROUP BY 1, 2
+            ''', (after_id, until_id if until_id is not None else MAX_ROWID))
+            return cursor.fetchall()
+
+    def get_analytics_watermark(self) -> tuple:
+        """Отметка состояния данных для кэша аналитики
+
+        (первый id действия, последний id действия, количество пользователей,
+        время последнего обновления пользователя). Новые действия меняют
+        последний id, очистка старых - первый.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # MIN и MAX отдельными запросами: так каждый читает одну страницу индекса rowid
+            cursor.execute('SELECT MIN(id) FROM user_actions')
+            first_id = cursor.fetchone()[0]
+            cursor.execute('SELECT MAX(id) FROM user_actions')
+            last_id = cursor.fetchone()[0]
+            cursor.execute('SELECT COUNT(*), MAX(updated_at) FROM users')
+            users_count, last_update = cursor.fetchone()
+            return first_id, last_id, users_count, last_update
+
+    def get_user_signups(self) -> List[tuple]:
+        """Даты регистрации всех пользователей: (user_id, created_at)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT user_id, created_at FROM users')
+            return cursor.fetchall()
+
+    def get_activity_weeks(self, after_id: int = 0, until_id: int = None) -> List[tuple]:
+        """Недели, в которые пользователи были активны: (user_id, номер недели)
+
+        Номер недели считается от понедельника 29.12.1969. Просмотр таблицы
+        целиком (NOT INDEXED) быстрее, чем обход индекса по user_id с
+        чтением каждой строки; диапазон id позволяет досчитать только новые действия.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('PRAGMA temp_store = MEMORY')
+            cursor.execute('''
+                SELECT DISTINCT user_id, CAST((julianday(created_at) - 2440584.5) / 7 AS INTEGER)
+                FROM user_actions NOT INDEXED
+                WHERE id > ? AND id <= ?
+            ''', (after_id, until_id if until_id is not None else MAX_ROWID))
+            return cursor.fetchall()
+
+    def get_first_actions(self, actions: List[str], after_id: int = 0, until_id: int = None) -> List[tuple]:
+        """Первое выполнение каждого из действий каждым пользователем: (user_id, action, created_at)"""
+        placeholders = ", ".join("?" * len(actions))
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('PRAGMA temp_store = MEMORY')
+            cursor.execute(f'''
+                SELECT user_id, action, MIN(created_at)
+                FROM user_actions NOT INDEXED
+                WHERE id > ? AND id <= ? AND action IN ({placeholders})
+                GROUP BY user_id, action
+            ''', (after_id, until_id if until_id is not None else MAX_ROWID, *actions))
+            return cursor.fetchall()
+
+    def cleanup_old_data(self, days: int = 90, cutoff_date: datetime = None) -> int:
+        """Очистка старых данных
+
+        Удаление записывается той же транзакцией как tombstone для
+        инкрементальной выгрузки (utils/delta_export.py).
+        """
+        cutoff_date = cutoff_date or datetime.now() - timedelta(days=days)
 
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -338,11 +1003,105 @@ class DatabaseManager:
                 WHERE created_at < ?
             ''', (cutoff_date,))
             deleted_count = cursor.rowcount
+            if deleted_count:
+                cursor.execute('''
+                    INSERT INTO export_tombstones (table_name, condition, value, created_at)
+                    VALUES ('user_actions', 'created_before', ?, ?)
+                ''', (cutoff_date.isoformat(' '), datetime.now()))
             conn.commit()
 
         logger.info(f"Удалено {deleted_count} старых записей действий")
         return deleted_count
 
+    def get_recent_actions(self, limit: int = 1000) -> List[UserAction]:
+        """Последние действия всех пользователей"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM user_actions 
+                ORDER BY created_at DESC 
+                LIMIT ?
+            ''', (limit,))
+            return [UserAction.from_db_row(row) for row in cursor.fetchall()]
+
+    def iter_table_batches(self, table: str, columns: List[str], batch_size: int = 50_000,
+                           after: Any = None, until: Any = None) -> Iterator[List[tuple]]:
+        """Строки таблицы пачками по batch_size
+
+        Строки читаются курсором по мере выгрузки, таблица целиком в
+        память не загружается. Столбцы задает код выгрузки, а не ввод
+        пользователя. after/until ограничивают столбец отметки таблицы
+        (EXPORT_TABLES): after < значение <= until; без них выгружается
+        вся таблица по порядку rowid.
+        """
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Таблица {table} не выгружается")
+
+        watermark = EXPORT_TABLES[table]
+        conditions, params = [], []
+        if after is not None:
+            conditions.append(f'{watermark} > ?')
+            params.append(after)
+        if until is not None:
+            conditions.append(f'{watermark} <= ?')
+            params.append(until)
+        where = f'WHERE {" AND ".join(conditions)} ORDER BY {watermark}' if conditions else 'ORDER BY rowid'
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.arraysize = batch_size
+            cursor.execute(f'SELECT {", ".join(columns)} FROM {table} {where}', params)
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield rows
+
+    def get_export_high_watermarks(self) -> Dict[str, Any]:
+        """Текущие значения столбцов отметки выгружаемых таблиц: {таблица: максимум}"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            return {
+                table: cursor.execute(f'SELECT MAX({column}) FROM {table}').fetchone()[0]
+                for table, column in EXPORT_TABLES.items()
+            }
+
+    def count_export_rows(self) -> Dict[str, int]:
+        """Количество строк выгружаемых таблиц: {таблица: строк}"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            return {table: cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in EXPORT_TABLES}
+
+    def get_export_tombstones(self, after: str = None) -> List[Dict[str, Any]]:
+        """Удаления строк выгружаемых таблиц, записанные после after (по времени записи)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT table_name, condition, value, created_at FROM export_tombstones
+                WHERE created_at > ? ORDER BY created_at
+            ''', (after or '',))
+            return [
+                {'table': table, 'condition': condition, 'value': value, 'recorded_at': recorded_at}
+                for table, condition, value, recorded_at in cursor.fetchall()
+            ]
+
+    def get_export_state(self) -> Dict[str, Any]:
+        """Состояние инкрементальной выгрузки: отметки таблиц, tombstone-ов и номер последней выгрузки"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name, value FROM export_state')
+            return dict(cursor.fetchall())
+
+    def save_export_state(self, state: Dict[str, Any]) -> int:
+        """Сохранить состояние инкрементальной выгрузки одной транзакцией"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO export_state (name, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', list(state.items()))
+            conn.commit()
+            return len(state)
+
     def export_to_dict(self) -> Dict[str, List[Dict[str, Any]]]:
         """Экспорт всех данных в словарь"""
         users = [user.to_dict() for user in self.get_all_users()]
@@ -355,14 +1114,8 @@ class DatabaseManager:
             feedback_rows = cursor.fetchall()
             feedback = [Feedback.from_db_row(row).to_dict() for row in feedback_rows]
 
-            # Экспорт действий (последние 1000)
-            cursor.execute('''
-                SELECT * FROM user_actions 
-                ORDER BY created_at DESC 
-                LIMIT 1000
-            ''')
-            action_rows = cursor.fetchall()
-            actions = [UserAction.from_db_row(row).to_dict() for row in action_rows]
+        # Экспорт действий (последние 1000)
+        actions = [action.to_dict() for action in self.get_recent_actions(1000)]
 
         return {
             'users': users,
@@ -372,5 +1125,43 @@ class DatabaseManager:
         }
 
 
-# Создаем глобальный экземпляр менеджера БД
-db_manager = DatabaseManager()
\ No newline at end of file
+# Замер времени всех публичных методов
+instrument_class(DatabaseManager, exclude=('get_connection',))
+
+_db_manager: Optional[DatabaseManager] = None
+_db_manager_lock = threading.Lock()
+
+
+def get_db_manager() -> DatabaseManager:
+    """Получить глобальный экземпляр менеджера БД (БД открывается при первом обращении)"""
+    global _db_manager
+
+    if _db_manager is None:
+        with _db_manager_lock:
+            if _db_manager is None:
+                if settings.DATABASE_SHARDS > 1:
+                    from database.sharding import ShardedDatabaseManager
+
+                    _db_manager = ShardedDatabaseManager()
+                else:
+                    _db_manager = DatabaseManager()
+
+    return _db_manager
+
+
+class _LazyDatabaseManager:
+    """Заместитель глобального менеджера БД
+
+    Импорт модуля не создает БД и не выполняет DDL: DatabaseManager
+    создается при первом обращении к любому атрибуту db_manager.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_db_manager(), name)
+
+    def __repr__(self) -> str:
+        return f"<db_manager {'создан' if _db_manager is not None else 'еще не создан'}>"
+
+
+# Глобальный менеджер БД
+db_manager = _LazyDatabaseManager()
\ No newline at end of file
@@ -156,6 +156,43 @@ class UserAction:
         }
 
 
+@dataclass
+class FeedbackCluster:
+    """Модель группы похожих сообщений обратной связи"""
+    id: Optional[int] = None
+    representative_id: Optional[int] = None
+    message: str = ""
+    count: int = 1
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_db_row(cls, row: tuple) -> 'FeedbackCluster':
+        """Создать объект FeedbackCluster из строки БД"""
+        if not row:
+            return None
+
+        return cls(
+            id=row[0],
+            representative_id=row[1],
+            message=row[2],
+            count=row[3] or 1,
+            created_at=datetime.fromisoformat(row[4]) if row[4] else None,
+            updated_at=datetime.fromisoformat(row[5]) if row[5] else None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразовать в словарь"""
+        return {
+            'id': self.id,
+            'representative_id': self.representative_id,
+            'message': self.message,
+            'count': self.count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
 class OnboardingStage:
     """Этапы онбординга"""
 
@@ -209,6 +246,59 @@ class OnboardingStage:
         return next_stage_descriptions.get(current_stage, "Продолжайте процесс адаптации")
 
 
+class OnboardingEvent(Enum):
+    """События, переводящие пользователя на следующий этап"""
+    PREBOARDING_OPENED = "preboarding_opened"
+    DOCUMENTS_OPENED = "documents_opened"
+    DOCS_MAIN_SENT = "docs_main_sent"
+    DOCS_TK_SENT = "docs_tk_sent"
+    ALL_DOCS_SENT = "all_docs_sent"
+    ONBOARDING_OPENED = "onboarding_opened"
+    ONBOARDING_STARTED = "onboarding_started"
+    EMAIL_RECEIVED = "email_received"
+    TEAM_INTRO_READ = "team_intro_read"
+    MEETINGS_READ = "meetings_read"
+    ONBOARDING_COMPLETED = "onboarding_completed"
+
+
+# Таблица переходов: (текущий этап, событие) -> (новый этап, новый статус или None - статус не меняется).
+# Пар, которых нет в таблице, не бывает: повторное или запоздалое нажатие ничего не меняет.
+STAGE_TRANSITIONS = {
+    # Пребординг
+    (0, OnboardingEvent.PREBOARDING_OPENED): (OnboardingStage.REGISTRATION, UserStatus.PREBOARDING),
+    (0, OnboardingEvent.DOCUMENTS_OPENED): (OnboardingStage.DOCUMENTS_INTRO, UserStatus.PREBOARDING),
+    (OnboardingStage.REGISTRATION, OnboardingEvent.DOCUMENTS_OPENED): (OnboardingStage.DOCUMENTS_INTRO, None),
+    (OnboardingStage.REGISTRATION, OnboardingEvent.DOCS_MAIN_SENT): (OnboardingStage.DOCUMENTS_MAIN, None),
+    (OnboardingStage.DOCUMENTS_INTRO, OnboardingEvent.DOCS_MAIN_SENT): (OnboardingStage.DOCUMENTS_MAIN, None),
+    (OnboardingStage.REGISTRATION, OnboardingEvent.DOCS_TK_SENT): (OnboardingStage.DOCUMENTS_TK, None),
+    (OnboardingStage.DOCUMENTS_INTRO, OnboardingEvent.DOCS_TK_SENT): (OnboardingStage.DOCUMENTS_TK, None),
+    (OnboardingStage.DOCUMENTS_MAIN, OnboardingEvent.DOCS_TK_SENT): (OnboardingStage.DOCUMENTS_TK, None),
+    (OnboardingStage.REGISTRATION, OnboardingEvent.ALL_DOCS_SENT):
+        (OnboardingStage.DOCUMENTS_COMPLETE, UserStatus.PREBOARDED),
+    (OnboardingStage.DOCUMENTS_INTRO, OnboardingEvent.ALL_DOCS_SENT):
+        (OnboardingStage.DOCUMENTS_COMPLETE, UserStatus.PREBOARDED),
+    (OnboardingStage.DOCUMENTS_MAIN, OnboardingEvent.ALL_DOCS_SENT):
+        (OnboardingStage.DOCUMENTS_COMPLETE, UserStatus.PREBOARDED),
+    (OnboardingStage.DOCUMENTS_TK, OnboardingEvent.ALL_DOCS_SENT):
+        (OnboardingStage.DOCUMENTS_COMPLETE, UserStatus.PREBOARDED),
+
+    # Онбординг
+    (OnboardingStage.DOCUMENTS_COMPLETE, OnboardingEvent.ONBOARDING_OPENED):
+        (OnboardingStage.ONBOARDING_START, UserStatus.ONBOARDING),
+    (OnboardingStage.ONBOARDING_START, OnboardingEvent.ONBOARDING_STARTED): (OnboardingStage.EMAIL_ACCESS, None),
+    (OnboardingStage.EMAIL_ACCESS, OnboardingEvent.EMAIL_RECEIVED): (OnboardingStage.TEAM_INTRO, None),
+    (OnboardingStage.TEAM_INTRO, OnboardingEvent.TEAM_INTRO_READ): (OnboardingStage.MEETINGS, None),
+    # Кнопки «Знакомство с командой» и «Планерки» показываются вместе, а «Завершить» - уже после
+    # знакомства с командой: планерки и завершение переводят вперед с любого из этих этапов
+    (OnboardingStage.TEAM_INTRO, OnboardingEvent.MEETINGS_READ): (OnboardingStage.COMPLETE, None),
+    (OnboardingStage.MEETINGS, OnboardingEvent.MEETINGS_READ): (OnboardingStage.COMPLETE, None),
+    (OnboardingStage.TEAM_INTRO, OnboardingEvent.ONBOARDING_COMPLETED):
+        (OnboardingStage.COMPLETE, UserStatus.COMPLETED),
+    (OnboardingStage.MEETINGS, OnboardingEvent.ONBOARDING_COMPLETED): (OnboardingStage.COMPLETE, UserStatus.COMPLETED),
+    (OnboardingStage.COMPLETE, OnboardingEvent.ONBOARDING_COMPLETED): (OnboardingStage.COMPLETE, UserStatus.COMPLETED),
+}
+
+
 class DatabaseSchema:
     """Схема базы данных"""
 
@@ -221,7 +311,9 @@ class DatabaseSchema:
             status TEXT DEFAULT 'new',
             stage INTEGER DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            next_reminder_at TIMESTAMP,
+            stage_started_at TIMESTAMP
         )
     '''
 
@@ -246,11 +338,142 @@ class DatabaseSchema:
         )
     '''
 
+    CREATE_FEEDBACK_CLUSTERS_TABLE = '''
+        CREATE TABLE IF NOT EXISTS feedback_clusters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            representative_id INTEGER,
+            message TEXT,
+            count INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (representative_id) REFERENCES feedback (id)
+        )
+    '''
+
+    # MinHash-сигнатуры сообщений для поиска похожей обратной связи
+    CREATE_FEEDBACK_SIGNATURES_TABLE = '''
+        CREATE TABLE IF NOT EXISTS feedback_signatures (
+            feedback_id INTEGER PRIMARY KEY,
+            cluster_id INTEGER,
+            signature BLOB,
+            FOREIGN KEY (feedback_id) REFERENCES feedback (id),
+            FOREIGN KEY (cluster_id) REFERENCES feedback_clusters (id)
+        )
+    '''
+
+    # Состояние бота между перезапусками (user_data, chat_data, bot_data, диалоги):
+    # одна компактная строка на пользователя/чат, ключ - (область, идентификатор)
+    CREATE_BOT_PERSISTENCE_TABLE = '''
+        CREATE TABLE IF NOT EXISTS bot_persistence (
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL,
+            data BLOB,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (scope, key)
+        ) WITHOUT ROWID
+    '''
+
+    # Переходы между этапами: сколько секунд пользователь провел на этапе from_stage
+    CREATE_STAGE_TRANSITIONS_TABLE = '''
+        CREATE TABLE IF NOT EXISTS stage_transitions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            from_stage INTEGER,
+            to_stage INTEGER,
+            duration REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    '''
+
+    # Скетчи квантилей времени на этапах; last_transition_id - последний учтенный переход
+    CREATE_STAGE_DURATION_SKETCHES_TABLE = '''
+        CREATE TABLE IF NOT EXISTS stage_duration_sketches (
+            stage INTEGER PRIMARY KEY,
+            sketch BLOB,
+            last_transition_id INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    '''
+
+    # Скетчи HyperLogLog активных пользователей по дням (day - YYYY-MM-DD) и количество действий за день;
+    # last_action_id - последнее учтенное действие
+    CREATE_ACTIVITY_SKETCHES_TABLE = '''
+        CREATE TABLE IF NOT EXISTS activity_sketches (
+            day TEXT PRIMARY KEY,
+            sketch BLOB,
+            actions INTEGER,
+            last_action_id INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    '''
+
+    # Состояние инкрементальной выгрузки (utils/delta_export.py): отметки таблиц и номер выгрузки
+    CREATE_EXPORT_STATE_TABLE = '''
+        CREATE TABLE IF NOT EXISTS export_state (
+            name TEXT PRIMARY KEY,
+            value,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    '''
+
+    # Удаления строк выгружаемых таблиц для инкрементальной выгрузки: условие, по которому
+    # удалены строки (created_before - создана раньше value)
+    CREATE_EXPORT_TOMBSTONES_TABLE = '''
+        CREATE TABLE IF NOT EXISTS export_tombstones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT,
+            condition TEXT,
+            value TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    '''
+
+    # Полнотекстовый индекс по обратной связи (external content FTS5).
+    # Префиксные индексы 3-6 символов позволяют искать по основам слов без полного перебора.
+    CREATE_FEEDBACK_FTS_TABLE = '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS feedback_fts USING fts5(
+            message,
+            content='feedback',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='3 4 5 6'
+        )
+    '''
+
+    # Триггеры синхронизации feedback_fts с таблицей feedback
+    CREATE_FEEDBACK_FTS_TRIGGERS = [
+        '''
+        CREATE TRIGGER IF NOT EXISTS feedback_fts_insert AFTER INSERT ON feedback BEGIN
+            INSERT INTO feedback_fts(rowid, message) VALUES (new.id, new.message);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS feedback_fts_delete AFTER DELETE ON feedback BEGIN
+            INSERT INTO feedback_fts(feedback_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS feedback_fts_update AFTER UPDATE OF message ON feedback BEGIN
+            INSERT INTO feedback_fts(feedback_fts, rowid, message) VALUES ('delete', old.id, old.message);
+            INSERT INTO feedback_fts(rowid, message) VALUES (new.id, new.message);
+        END
+        '''
+    ]
+
     # Индексы для оптимизации
     CREATE_INDEXES = [
         'CREATE INDEX IF NOT EXISTS idx_users_status ON users(status)',
         'CREATE INDEX IF NOT EXISTS idx_users_stage ON users(stage)',
+        # Инкрементальная выгрузка измененных пользователей
+        'CREATE INDEX IF NOT EXISTS idx_users_updated_at ON users(updated_at)',
+        # Очередь напоминаний: в индекс попадают только те, кому еще нужно напоминать
+        'CREATE INDEX IF NOT EXISTS idx_users_next_reminder_at ON users(next_reminder_at) '
+        'WHERE next_reminder_at IS NOT NULL',
         'CREATE INDEX IF NOT EXISTS idx_feedback_user_id ON feedback(user_id)',
         'CREATE INDEX IF NOT EXISTS idx_actions_user_id ON user_actions(user_id)',
-        'CREATE INDEX IF NOT EXISTS idx_actions_created_at ON user_actions(created_at)'
+        'CREATE INDEX IF NOT EXISTS idx_actions_created_at ON user_actions(created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_stage_transitions_duration ON stage_transitions(from_stage, duration)',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_clusters_updated_at ON feedback_clusters(updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_feedback_signatures_cluster_id ON feedback_signatures(cluster_id)'
     ]
\ No newline at end of file
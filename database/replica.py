@@ -0,0 +1,172 @@
+# database/replica.py
+"""
+Копия базы данных только для чтения для аналитики и экспорта
+
+Долгие запросы аналитики и выгрузок держат транзакцию чтения: пока она
+открыта, обработчики не могут зафиксировать записи (журнал отката
+SQLite) и ждут блокировку. Эти запросы выполняются на копии БД, которую
+AnalyticsReplica снимает через backup API во временный файл и атомарно
+подставляет (os.replace): уже открытые соединения дочитывают прежнюю
+копию, новые открывают свежую. Основная БД блокируется только на время
+копирования страниц.
+
+Копия не старее ANALYTICS_REPLICA_MAX_LAG секунд: задача JobQueue
+обновляет ее в фоне, а соединение с устаревшей копией сначала обновляет
+ее. При шардировании копируется каждый файл.
+"""
+import copy
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+from config.settings import settings
+from database.manager import DatabaseManager, get_db_manager
+from services.metrics import count_db_statement
+
+logger = logging.getLogger(__name__)
+
+
+def replica_path(db_path: str) -> str:
+    """Файл копии по умолчанию: рядом с БД"""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.replica{ext}"
+
+
+class AnalyticsReplica:
+    """Периодически обновляемая копия БД и менеджер для чтения из нее"""
+
+    def __init__(self, manager: DatabaseManager, path: str = None, max_lag: float = None):
+        self.manager = manager
+        self.path = path or settings.ANALYTICS_REPLICA_PATH or replica_path(manager.db_path)
+        self.max_lag = settings.ANALYTICS_REPLICA_MAX_LAG if max_lag is None else max_lag
+        # Копия соответствует основной БД на этот момент (time.monotonic())
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.last_refresh_seconds = 0.0
+        self._lock = threading.Lock()
+
+        self._files: List[Tuple[str, str]] = []
+        self.reader = self._reader(manager, self.path)
+
+    def _reader(self, manager: DatabaseManager, path: str) -> DatabaseManager:
+        """Менеджер с теми же методами и скетчами, читающий копию файла path"""
+        self._files.append((manager.db_path, path))
+        reader = copy.copy(manager)
+        reader.db_path = path
+        reader.replica = self
+        shards = getattr(manager, 'shards', None)
+        if shards:
+            from database.sharding import shard_paths
+
+            reader.shards = [self._reader(shard, shard_path)
+                             for shard, shard_path in zip(shards, shard_paths(path, len(shards)))]
+        return reader
+
+    def age(self) -> Optional[float]:
+        """Сколько секунд назад снята копия (None - еще не снята)"""
+        return None if self.refreshed_at is None else time.monotonic() - self.refreshed_at
+
+    def refresh(self) -> float:
+        """Снять копию всех файлов и подставить ее; вернуть время, секунды"""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> float:
+        started = time.monotonic()
+        for source, target in self._files:
+            src = sqlite3.connect(source)
+            dst = sqlite3.connect(f"{target}.tmp")
+            try:
+                # Одним шагом: пошаговое копирование начинается заново после каждой записи в БД
+                src.backup(dst)
+            finally:
+                dst.close()
+                src.close()
+        # Файлы подставляются после копирования всех, подряд
+        for _, target in self._files:
+            os.replace(f"{target}.tmp", target)
+
+        self.refreshed_at = started
+        self.refreshes += 1
+        self.last_refresh_seconds = time.monotonic() - started
+        logger.debug(f"Копия БД для аналитики обновлена за {self.last_refresh_seconds:.2f} с")
+        return self.last_refresh_seconds
+
+    def _stale(self) -> bool:
+        age = self.age()
+        return age is None or age > self.max_lag
+
+    def ensure_fresh(self):
+        """Обновить копию, если она старше max_lag"""
+        if not self._stale():
+            return
+        with self._lock:
+            # Копию мог обновить другой поток, пока этот ждал блокировку
+            if self._stale():
+                self._refresh()
+
+    def connect(self, path: str) -> sqlite3.Connection:
+        """Соединение только для чтения с копией файла"""
+        self.ensure_fresh()
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+        conn.set_trace_callback(count_db_statement)
+        return conn
+
+    def attach(self, application, interval: float = None):
+        """Обновлять копию в фоне по расписанию JobQueue приложения"""
+        if application.job_queue is None:
+            logger.warning("JobQueue недоступна, копия БД обновляется при запросах аналитики")
+            return
+
+        async def refresh_job(context):
+            import asyncio
+
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Не удалось обновить копию БД для аналитики: {e}")
+
+        # Чаще границы устаревания, чтобы запросы не ждали копирования
+        interval = interval or self.max_lag / 2
+        application.job_queue.run_repeating(refresh_job, interval=interval, first=0, name="analytics_replica")
+
+
+_analytics_replica: Optional[AnalyticsReplica] = None
+_analytics_replica_lock = threading.Lock()
+
+
+def get_analytics_replica() -> Optional[AnalyticsReplica]:
+    """Общая копия БД для аналитики (None, если ANALYTICS_REPLICA_MAX_LAG = 0)"""
+    global _analytics_replica
+
+    if settings.ANALYTICS_REPLICA_MAX_LAG <= 0:
+        return None
+    if _analytics_replica is None:
+        with _analytics_replica_lock:
+            if _analytics_replica is None:
+                _analytics_replica = AnalyticsReplica(get_db_manager())
+    return _analytics_replica
+
+
+def get_analytics_db() -> DatabaseManager:
+    """Менеджер для аналитики и экспорта: читает копию БД или основную БД, если копия выключена"""
+    replica = get_analytics_replica()
+    return replica.reader if replica else get_db_manager()
+
+
+class _LazyAnalyticsDatabase:
+    """Заместитель менеджера аналитики, как db_manager в database/manager.py"""
+
+    def __getattr__(self, name: str):
+        return getattr(get_analytics_db(), name)
+
+    def __repr__(self) -> str:
+        return f"<analytics_db {'копия БД' if settings.ANALYTICS_REPLICA_MAX_LAG > 0 else 'основная БД'}>"
+
+
+# Менеджер БД для аналитики и экспорта
+analytics_db = _LazyAnalyticsDatabase()
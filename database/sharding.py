@@ -0,0 +1,428 @@
+# database/sharding.py
+"""
+Хранение пользователей и их действий в нескольких файлах SQLite
+
+ShardedDatabaseManager направляет каждый user_id в один из N файлов
+(шардов) по хэшу: users, user_actions и stage_transitions пользователя
+лежат в его шарде, и записи обработчиков разных пользователей не ждут
+одну блокировку записи. Общие таблицы (обратная связь, состояние бота,
+скетчи) остаются в DATABASE_PATH. Агрегирующие запросы выполняются на
+всех шардах параллельно, результаты объединяются.
+
+id действий и переходов выдаются общими для всех шардов счетчиками
+процесса, поэтому остаются сквозными, как в одном файле: отметки
+"последний учтенный id" скетчей и аналитики работают без изменений. Бот
+пишет в БД одним процессом; reshard выполняется при остановленном боте.
+"""
+import heapq
+import itertools
+import logging
+import os
+import sqlite3
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from config.settings import settings
+from database.manager import DatabaseManager
+from database.models import User, UserAction, UserStatus, OnboardingEvent
+from database.unit_of_work import active_unit
+
+logger = logging.getLogger(__name__)
+
+# Таблицы, строки которых лежат в шарде пользователя, и столбец с user_id
+SHARDED_TABLES = {'users': 'user_id', 'user_actions': 'user_id', 'stage_transitions': 'user_id'}
+
+# Методы DatabaseManager, которые работают только с общими таблицами в DATABASE_PATH
+# или собирают результат из других методов
+HOME_METHODS = frozenset({
+    'save_feedback', 'create_feedback_cluster', 'increment_feedback_cluster', 'save_feedback_signature',
+    'get_cluster_signatures', 'get_unclustered_feedback',
+    'get_persistent_state', 'get_persistent_states', 'save_persistent_states',
+    'get_stage_sketches', 'save_stage_sketches', 'get_activity_sketches', 'save_activity_sketches',
+    'get_user_statistics', 'export_to_dict', 'get_export_state', 'save_export_state',
+})
+
+
+def shard_index(user_id: Optional[int], shards: int) -> int:
+    """Номер шарда пользователя (не зависит от процесса и версии Python)"""
+    return zlib.crc32((user_id or 0).to_bytes(8, 'little', signed=True)) % shards
+
+
+def shard_paths(db_path: str, shards: int) -> List[str]:
+    """Файлы шардов: при одном шарде - сам DATABASE_PATH"""
+    if shards == 1:
+        return [db_path]
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{index}-of-{shards}{ext}" for index in range(shards)]
+
+
+class ShardedDatabaseManager(DatabaseManager):
+    """DatabaseManager, хранящий пользователей и их действия в нескольких файлах"""
+
+    def __init__(self, db_path: str = None, shards: int = None):
+        self.shards: List[DatabaseManager] = []
+        super().__init__(db_path)
+
+        self.shards = [DatabaseManager(path) for path in shard_paths(self.db_path, shards or settings.DATABASE_SHARDS)]
+        self.id_sequences = {table: self._sequence(table) for table in ('user_actions', 'stage_transitions')}
+        for shard in self.shards:
+            # Записи шардов пополняют общие скетчи и индексы и получают сквозные id
+            shard.stage_durations = self.stage_durations
+            shard.active_users = self.active_users
+            shard.segments = self.segments
+            shard.id_sequences = self.id_sequences
+        self._pool = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+        self._claim_turn = 0
+
+    def _sequence(self, table: str) -> Callable[[], int]:
+        """Счетчик id таблицы, продолжающий самый большой id во всех шардах"""
+        last_id = 0
+        for shard in self.shards:
+            with shard.get_connection() as conn:
+                last_id = max(last_id, conn.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0] or 0)
+        return itertools.count(last_id + 1).__next__
+
+    def _shard(self, user_id: int) -> DatabaseManager:
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    def _map(self, func: Callable, items: List[Any]) -> List[Any]:
+        """Выполнить func для каждого элемента параллельно в пуле шардов"""
+        # Потоки пула работают со своими соединениями: записи обновления фиксируются заранее,
+        # как перед любым ожиданием, чтобы шарды видели их и не ждали блокировку обработчика
+        unit = active_unit()
+        if unit:
+            unit.flush()
+        return list(self._pool.map(func, items))
+
+    def _fan_out(self, method: str, *args, **kwargs) -> List[Any]:
+        """Вызвать метод на всех шардах параллельно"""
+        return self._map(lambda shard: getattr(shard, method)(*args, **kwargs), self.shards)
+
+    def _concat(self, method: str, *args) -> List[Any]:
+        return list(itertools.chain.from_iterable(self._fan_out(method, *args)))
+
+    def init_database(self):
+        """Инициализация общей базы и всех шардов"""
+        super().init_database()
+        for shard in self.shards:
+            shard.init_database()
+
+    # Один пользователь - один шард
+
+    def get_user(self, user_id: int) -> Optional[User]:
+        return self._shard(user_id).get_user(user_id)
+
+    def create_user(self, user_id: int, username: str = None, full_name: str = None) -> User:
+        return self._shard(user_id).create_user(user_id, username, full_name)
+
+    def update_user(self, user: User) -> bool:
+        return self._shard(user.user_id).update_user(user)
+
+    def update_user_stage(self, user_id: int, stage: int, status: UserStatus = None) -> bool:
+        return self._shard(user_id).update_user_stage(user_id, stage, status)
+
+    def transition_user(self, user_id: int, event: OnboardingEvent) -> Optional[User]:
+        return self._shard(user_id).transition_user(user_id, event)
+
+    def log_user_action(self, user_id: int, action: str, details: str = "") -> UserAction:
+        return self._shard(user_id).log_user_action(user_id, action, details)
+
+    def get_user_actions(self, user_id: int, limit: int = 50) -> List[UserAction]:
+        return self._shard(user_id).get_user_actions(user_id, limit)
+
+    def reschedule_reminders(self, user_ids: List[int], next_reminder_at: Optional[datetime]) -> int:
+        groups: Dict[int, List[int]] = {}
+        for user_id in user_ids:
+            groups.setdefault(shard_index(user_id, len(self.shards)), []).append(user_id)
+        return sum(self.shards[index].reschedule_reminders(ids, next_reminder_at) for index, ids in groups.items())
+
+    # Все шарды
+
+    def get_users_by_status(self, status: UserStatus) -> List[User]:
+        return self._concat('get_users_by_status', status)
+
+    def get_all_users(self) -> List[User]:
+        users = self._concat('get_all_users')
+        users.sort(key=lambda user: user.created_at or datetime.min, reverse=True)
+        return users
+
+    def get_segment_rows(self) -> List[tuple]:
+        return self._concat('get_segment_rows')
+
+    def claim_due_reminders(self, limit: int = 50, now: datetime = None) -> List[User]:
+        """Очередь напоминаний делится между шардами поровну
+
+        Взятых пользователей сразу переносят, поэтому брать больше limit
+        нельзя: остаток от деления достается шардам по очереди.
+        """
+        count = len(self.shards)
+        shares = [limit // count] * count
+        for offset in range(limit % count):
+            shares[(self._claim_turn + offset) % count] += 1
+        self._claim_turn = (self._claim_turn + limit % count) % count
+
+        active = [(shard, share) for shard, share in zip(self.shards, shares) if share]
+        return list(itertools.chain.from_iterable(
+            self._map(lambda item: item[0].claim_due_reminders(item[1], now), active)
+        ))
+
+    def count_due_reminders(self, now: datetime = None) -> int:
+        return sum(self._fan_out('count_due_reminders', now))
+
+    def get_stage_transitions(self, after_id: int = 0) -> List[tuple]:
+        return list(heapq.merge(*self._fan_out('get_stage_transitions', after_id)))
+
+    def get_stage_durations(self, stage: int) -> List[float]:
+        return list(heapq.merge(*self._fan_out('get_stage_durations', stage)))
+
+    def get_popular_actions(self, days: int = 7, limit: int = 10) -> List[Dict[str, Any]]:
+        # Для точного топа шарды возвращают все действия (LIMIT -1 в SQLite - без ограничения)
+        counts = Counter()
+        for actions in self._fan_out('get_popular_actions', days, -1):
+            for row in actions:
+                counts[row['action']] += row['count']
+        return [{'action': action, 'count': count} for action, count in counts.most_common(limit)]
+
+    def get_user_counts(self) -> Dict[str, tuple]:
+        merged: Dict[str, tuple] = {}
+        for counts in self._fan_out('get_user_counts'):
+            for status, values in counts.items():
+                previous = merged.get(status, (0, 0.0, 0))
+                merged[status] = tuple(total + value for total, value in zip(previous, values))
+        return merged
+
+    def count_active_users(self, days: int = 7) -> int:
+        # Действия пользователя лежат в одном шарде: множества пользователей шардов не пересекаются
+        return sum(self._fan_out('count_active_users', days))
+
+    def get_daily_activity(self, days: int = 30, exact: bool = False) -> List[Dict[str, Any]]:
+        if not exact:
+            return super().get_daily_activity(days)
+        merged: Dict[str, Dict[str, Any]] = {}
+        for rows in self._fan_out('get_daily_activity', days, True):
+            for row in rows:
+                day = merged.setdefault(row['date'], {'date': row['date'], 'unique_users': 0, 'total_actions': 0})
+                day['unique_users'] += row['unique_users']
+                day['total_actions'] += row['total_actions']
+        return [merged[day] for day in sorted(merged, reverse=True)]
+
+    def get_last_action_id(self) -> int:
+        return max(self._fan_out('get_last_action_id'))
+
+    def get_action_days(self, after_id: int = 0, until_id: int = None) -> List[tuple]:
+        return self._concat('get_action_days', after_id, until_id)
+
+    def get_analytics_watermark(self) -> tuple:
+        marks = self._fan_out('get_analytics_watermark')
+        first_ids = [mark[0] for mark in marks if mark[0] is not None]
+        last_ids = [mark[1] for mark in marks if mark[1] is not None]
+        updates = [mark[3] for mark in marks if mark[3] is not None]
+        return (min(first_ids, default=None), max(last_ids, default=None),
+                sum(mark[2] for mark in marks), max(updates, default=None))
+
+    def get_user_signups(self) -> List[tuple]:
+        return self._concat('get_user_signups')
+
+    def get_activity_weeks(self, after_id: int = 0, until_id: int = None) -> List[tuple]:
+        return self._concat('get_activity_weeks', after_id, until_id)
+
+    def get_first_actions(self, actions: List[str], after_id: int = 0, until_id: int = None) -> List[tuple]:
+        return self._concat('get_first_actions', actions, after_id, until_id)
+
+    def cleanup_old_data(self, days: int = 90, cutoff_date: datetime = None) -> int:
+        # Одна граница для всех шардов: их tombstone-ы описывают одно удаление
+        cutoff_date = cutoff_date or datetime.now() - timedelta(days=days)
+        return sum(self._fan_out('cleanup_old_data', days, cutoff_date))
+
+    def get_recent_actions(self, limit: int = 1000) -> List[UserAction]:
+        return heapq.nlargest(limit, self._concat('get_recent_actions', limit),
+                              key=lambda action: action.created_at or datetime.min)
+
+    def iter_table_batches(self, table: str, columns: List[str], batch_size: int = 50_000,
+                           after: Any = None, until: Any = None) -> Iterator[List[tuple]]:
+        """Строки таблиц пользователей выгружаются из шардов по очереди"""
+        if table not in SHARDED_TABLES:
+            yield from super().iter_table_batches(table, columns, batch_size, after, until)
+            return
+        for shard in self.shards:
+            yield from shard.iter_table_batches(table, columns, batch_size, after, until)
+
+    def get_export_high_watermarks(self) -> Dict[str, Any]:
+        watermarks = super().get_export_high_watermarks()
+        per_shard = self._fan_out('get_export_high_watermarks')
+        for table in SHARDED_TABLES.keys() & watermarks.keys():
+            values = [marks[table] for marks in per_shard if marks[table] is not None]
+            watermarks[table] = max(values) if values else None
+        return watermarks
+
+    def count_export_rows(self) -> Dict[str, int]:
+        counts = super().count_export_rows()
+        per_shard = self._fan_out('count_export_rows')
+        for table in SHARDED_TABLES.keys() & counts.keys():
+            counts[table] = sum(shard_counts[table] for shard_counts in per_shard)
+        return counts
+
+    def get_export_tombstones(self, after: str = None) -> List[Dict[str, Any]]:
+        """Tombstone-ы шардов; одно удаление на всех шардах отдается один раз"""
+        merged = {}
+        for tombstone in heapq.merge(*self._fan_out('get_export_tombstones', after),
+                                     key=lambda tombstone: tombstone['recorded_at']):
+            key = (tombstone['table'], tombstone['condition'], tombstone['value'])
+            merged[key] = tombstone
+        return sorted(merged.values(), key=lambda tombstone: tombstone['recorded_at'])
+
+    # Обратная связь в общей базе, имена авторов - в их шардах
+
+    def _with_user_names(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        users = {user_id: self.get_user(user_id) for user_id in {row['user_id'] for row in rows} if user_id}
+        for row in rows:
+            user = users.get(row['user_id'])
+            row['user_name'], row['username'] = (user.full_name, user.username) if user else (None, None)
+        return rows
+
+    def get_recent_feedback(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return self._with_user_names(super().get_recent_feedback(limit))
+
+    def search_feedback(self, query: str, cursor: Optional[int] = None, limit: int = 10) -> Dict[str, Any]:
+        page = super().search_feedback(query, cursor, limit)
+        self._with_user_names(page['results'])
+        return page
+
+    def get_feedback_clusters(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return self._with_user_names(super().get_feedback_clusters(limit))
+
+
+def unrouted_methods() -> List[str]:
+    """Публичные методы DatabaseManager, для которых не решено, где они выполняются при шардах"""
+    return sorted(
+        name for name, attr in vars(DatabaseManager).items()
+        if not name.startswith('_') and callable(attr) and name != 'get_connection'
+        and name not in vars(ShardedDatabaseManager) and name not in HOME_METHODS
+    )
+
+
+def _copy_tombstones(sources: List[str], connections: List[sqlite3.Connection]) -> int:
+    """Записать удаления старых шардов в каждый новый; вернуть количество удалений
+
+    cleanup_old_data пишет одно удаление в каждый шард со своим временем
+    записи: остается одна строка с наибольшим временем, как ее отдает
+    ShardedDatabaseManager.get_export_tombstones, поэтому отметка
+    выгрузки по-прежнему отделяет выгруженные удаления от новых.
+    """
+    latest: Dict[tuple, str] = {}
+
+    def collect(conn: sqlite3.Connection):
+        for table, condition, value, created_at in conn.execute(
+                'SELECT table_name, condition, value, created_at FROM export_tombstones'):
+            key = (table, condition, value)
+            latest[key] = max(latest.get(key, created_at), created_at)
+
+    for source_path in sources:
+        source = sqlite3.connect(source_path)
+        try:
+            collect(source)
+        finally:
+            source.close()
+    # При переходе к одному файлу в DATABASE_PATH могут остаться удаления, записанные до шардов
+    for conn in connections:
+        collect(conn)
+
+    rows = [(*key, created_at) for key, created_at in sorted(latest.items(), key=lambda item: item[1])]
+    for conn in connections:
+        conn.execute('DELETE FROM export_tombstones')
+        conn.executemany('''
+            INSERT INTO export_tombstones (table_name, condition, value, created_at) VALUES (?, ?, ?, ?)
+        ''', rows)
+    return len(rows)
+
+
+def reshard(db_path: str, from_shards: int, to_shards: int, chunk_size: int = 10_000) -> Dict[str, int]:
+    """Перенести строки пользователей из from_shards файлов в to_shards
+
+    Запускается при остановленном боте. Новые шарды пишутся во временные
+    файлы и переименовываются после сверки количества строк, затем старые
+    шарды удаляются (при переходе с одного файла строки удаляются из
+    DATABASE_PATH). Еще не выгруженные удаления (export_tombstones)
+    переносятся в каждый новый шард. Возвращает количество перенесенных
+    строк по таблицам.
+    """
+    if from_shards == to_shards:
+        return {}
+    sources = shard_paths(db_path, from_shards)
+    missing = [path for path in sources if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Нет файлов шардов: {', '.join(missing)}")
+
+    targets = shard_paths(db_path, to_shards)
+    # К одному файлу строки переносятся прямо в DATABASE_PATH
+    writing = [db_path] if to_shards == 1 else [f"{path}.tmp" for path in targets]
+    for path in writing:
+        if path != db_path and os.path.exists(path):
+            os.remove(path)
+        DatabaseManager(path)
+
+    connections = [sqlite3.connect(path) for path in writing]
+    copied = {}
+    try:
+        existing = {table: sum(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for conn in connections)
+                    for table in SHARDED_TABLES}
+        for table, column in SHARDED_TABLES.items():
+            copied[table] = 0
+            for source_path in sources:
+                source = sqlite3.connect(source_path)
+                try:
+                    cursor = source.execute(f'SELECT * FROM {table}')
+                    columns = [description[0] for description in cursor.description]
+                    key = columns.index(column)
+                    insert = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        groups: Dict[int, List[tuple]] = {}
+                        for row in rows:
+                            groups.setdefault(shard_index(row[key], to_shards), []).append(row)
+                        for index, group in groups.items():
+                            connections[index].executemany(insert, group)
+                        copied[table] += len(rows)
+                finally:
+                    source.close()
+
+        # Сверка до фиксации: при расхождении ничего не меняется
+        for table in SHARDED_TABLES:
+            total = sum(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for conn in connections)
+            if total != existing[table] + copied[table]:
+                raise RuntimeError(f"Перенесено строк {table}: {total - existing[table]} из {copied[table]}")
+        copied['export_tombstones'] = _copy_tombstones(sources, connections)
+        for conn in connections:
+            conn.commit()
+    except Exception:
+        for conn in connections:
+            conn.rollback()
+        raise
+    finally:
+        for conn in connections:
+            conn.close()
+
+    if to_shards > 1:
+        for path, target in zip(writing, targets):
+            os.replace(path, target)
+
+    if from_shards == 1:
+        conn = sqlite3.connect(db_path)
+        try:
+            # Удаления перенесены в шарды: ShardedDatabaseManager читает их оттуда
+            for table in [*SHARDED_TABLES, 'export_tombstones']:
+                conn.execute(f'DELETE FROM {table}')
+            conn.commit()
+        finally:
+            conn.close()
+    else:
+        for path in sources:
+            os.remove(path)
+
+    logger.info(f"Шарды перераспределены: {from_shards} -> {to_shards}, строк {copied}")
+    return copied
@@ -0,0 +1,209 @@
+# database/unit_of_work.py
+"""
+Единица работы обновления Telegram: записи всех методов DatabaseManager
+за время обработки одного обновления идут в одну транзакцию
+
+Внутри обработчика методы DatabaseManager получают общее соединение
+единицы работы: их commit откладывается, а чтения видят еще не
+зафиксированные записи. Транзакция фиксируется, когда обработчик
+завершился или отдает управление циклу событий (ждет Bot API, поток и
+т.п.) - блокировка записи не удерживается на время ожидания, и другие
+обработчики и задачи JobQueue не ждут ее синхронно. При ошибке
+обработчика незафиксированные записи откатываются.
+
+Каждый вызов метода DatabaseManager внутри транзакции открывает точку
+сохранения (SAVEPOINT): откат после ошибки БД в методе отменяет только его
+записи и отложенные им действия, а записи предыдущих методов обновления
+остаются, даже если обработчик перехватил ошибку и продолжил работу.
+"""
+import functools
+import sqlite3
+import threading
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+# Единица работы обновления, которое сейчас обрабатывается
+current_unit: ContextVar[Optional['UnitOfWork']] = ContextVar('current_unit', default=None)
+
+
+def _owner() -> tuple:
+    """Поток и задача asyncio, в которых выполняется код"""
+    # Команды CLI не открывают единиц работы и не должны загружать asyncio
+    import asyncio
+
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return threading.get_ident(), task
+
+
+class UnitConnection:
+    """Соединение единицы работы: фиксирует и закрывает его сама единица работы"""
+
+    __slots__ = ('_unit', '_conn', '_scopes')
+
+    def __init__(self, unit: 'UnitOfWork', conn: sqlite3.Connection):
+        self._unit = unit
+        self._conn = conn
+        # Вызовы методов, которые сейчас используют соединение: (точка сохранения или None, число
+        # отложенных действий на входе). None - в транзакции нет записей, сделанных до вызова
+        self._scopes: List[tuple] = []
+
+    def __getattr__(self, name: str):
+        return getattr(self._conn, name)
+
+    def begin(self):
+        """Начало вызова метода: его записи можно откатить отдельно от предыдущих"""
+        savepoint = None
+        if self._conn.in_transaction:
+            savepoint = f'method_{len(self._scopes)}'
+            self._conn.execute(f'SAVEPOINT {savepoint}')
+        self._scopes.append((savepoint, len(self._unit._after_commit)))
+
+    def commit(self):
+        """Записи фиксируются единицей работы"""
+
+    def rollback(self):
+        """Откатить записи и отложенные действия текущего метода"""
+        savepoint, deferred = self._scopes[-1] if self._scopes else (None, 0)
+        if savepoint is None:
+            # В транзакции только записи этого метода
+            self._conn.rollback()
+        elif self._conn.in_transaction:
+            self._conn.execute(f'ROLLBACK TO {savepoint}')
+        else:
+            # SQLite уже откатил транзакцию целиком (например, при нехватке места)
+            self._unit.rollback()
+            return
+        del self._unit._after_commit[deferred:]
+
+    def close(self):
+        """Конец вызова метода; соединение закрывается в конце обновления"""
+        savepoint, _ = self._scopes.pop()
+        if savepoint is not None:
+            self._conn.execute(f'RELEASE {savepoint}')
+
+    def reset_scopes(self):
+        """Транзакция завершена: открытые вызовы больше не защищают чужих записей"""
+        self._scopes = [(None, 0) for _ in self._scopes]
+
+
+class UnitOfWork:
+    """Общие соединения и транзакция одного обновления"""
+
+    def __init__(self):
+        self.owner = _owner()
+        self.commits = 0
+        self._connections: Dict[str, UnitConnection] = {}
+        self._after_commit: List[Callable[[], None]] = []
+
+    def connection(self, db_path: str, connect: Callable[[], sqlite3.Connection]) -> UnitConnection:
+        """Общее соединение с БД для вызова метода (открывается при первом обращении)"""
+        conn = self._connections.get(db_path)
+        if conn is None:
+            conn = self._connections[db_path] = UnitConnection(self, connect())
+        conn.begin()
+        return conn
+
+    def defer(self, callback: Callable[[], None]):
+        """Выполнить callback после фиксации записей (при откате - не выполнять)"""
+        self._after_commit.append(callback)
+
+    def flush(self):
+        """Зафиксировать накопленные записи"""
+        for conn in self._connections.values():
+            if conn.in_transaction:
+                conn._conn.commit()
+                self.commits += 1
+            conn.reset_scopes()
+
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        """Откатить все незафиксированные записи обновления"""
+        for conn in self._connections.values():
+            if conn.in_transaction:
+                conn._conn.rollback()
+            conn.reset_scopes()
+        self._after_commit = []
+
+    def close(self):
+        for conn in self._connections.values():
+            conn._conn.close()
+        self._connections = {}
+
+
+def active_unit() -> Optional[UnitOfWork]:
+    """Единица работы текущего обновления
+
+    Задачи и потоки, запущенные из обработчика, наследуют контекст, но
+    работают со своими соединениями: общее соединение используется только
+    там, где единица работы открыта.
+    """
+    unit = current_unit.get()
+    if unit is None or unit.owner != _owner():
+        return None
+    return unit
+
+
+class _FlushOnSuspend:
+    """Awaitable обработчика, фиксирующий записи перед каждой его приостановкой"""
+
+    __slots__ = ('coro', 'unit')
+
+    def __init__(self, coro, unit: UnitOfWork):
+        self.coro = coro
+        self.unit = unit
+
+    def __await__(self):
+        coro, unit = self.coro, self.unit
+        value, error = None, None
+        while True:
+            try:
+                awaited = coro.throw(error) if error is not None else coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+
+            try:
+                unit.flush()
+            except Exception as e:
+                # Ошибка фиксации достается обработчику в точке ожидания
+                unit.rollback()
+                error = e
+                continue
+
+            try:
+                value = yield awaited
+            except BaseException as e:
+                error = e
+
+
+def unit_of_work(callback):
+    """Обернуть обработчик обновлений единицей работы"""
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        unit = UnitOfWork()
+        token = current_unit.set(unit)
+        try:
+            result = await _FlushOnSuspend(callback(update, context), unit)
+            unit.flush()
+            return result
+        except BaseException:
+            unit.rollback()
+            raise
+        finally:
+            current_unit.reset(token)
+            unit.close()
+
+    return wrapper
+
+
+def use_unit_of_work(application):
+    """Обрабатывать каждое обновление всех обработчиков приложения в своей единице работы"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = unit_of_work(handler.callback)
@@ -1,21 +1,28 @@
 # handlers/__init__.py
 """
 Модуль обработчиков команд и сообщений
+
+Модули обработчиков загружаются при первом обращении к их именам.
 """
+import importlib
+
+_EXPORTS = {
+    'start_command': 'start', 'help_command': 'start', 'status_command': 'start', 'contacts_command': 'start',
+    'handle_preboarding': 'preboarding',
+    'handle_onboarding': 'onboarding',
+    'handle_useful_info': 'info',
+    'handle_faq': 'faq',
+    'handle_contacts': 'contacts', 'handle_support': 'contacts',
+    'handle_feedback': 'feedback', 'handle_progress': 'feedback',
+    'admin_command': 'admin', 'broadcast_command': 'admin',
+    'router': 'routes',
+}
+
+__all__ = list(_EXPORTS)
 
-from .start import start_command, help_command, status_command, contacts_command
-from .preboarding import handle_preboarding
-from .onboarding import handle_onboarding
-from .info import handle_useful_info
-from .faq import handle_faq
-from .contacts import handle_contacts, handle_support
-from .feedback import handle_feedback, handle_progress
-from .admin import admin_command, broadcast_command
-from .callbacks import handle_all_callbacks
 
-__all__ = [
-    'start_command', 'help_command', 'status_command', 'contacts_command',
-    'handle_preboarding', 'handle_onboarding', 'handle_useful_info',
-    'handle_faq', 'handle_contacts', 'handle_support', 'handle_feedback',
-    'handle_progress', 'admin_command', 'broadcast_command', 'handle_all_callbacks'
-]
\ No newline at end of file
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f'.{module}', __name__), name)
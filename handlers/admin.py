@@ -4,15 +4,23 @@
 """
 import logging
 import asyncio
+import time
 from datetime import datetime, timedelta
 from telegram import Update
 from telegram.ext import ContextTypes
 
 from config.settings import settings
 from database.manager import db_manager
+from database.replica import analytics_db
 from database.models import UserStatus
 from bot.keyboards import Keyboards
-from utils.helpers import format_datetime, create_progress_bar, save_json
+from services.export_jobs import export_jobs
+from services.metrics import metrics
+from services.profiler import update_profiler
+from services.reminders import reminder_scheduler
+from services.analytics import get_onboarding_analytics, format_report
+from services.stage_durations import format_summary
+from utils.helpers import format_datetime, create_progress_bar, get_system_info
 
 logger = logging.getLogger(__name__)
 
@@ -28,10 +36,11 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     db_manager.log_user_action(user_id, "admin_access", "Вошел в админ-панель")
 
-    # Получаем статистику
-    stats = db_manager.get_user_statistics()
-    popular_actions = db_manager.get_popular_actions(days=7, limit=5)
-    recent_feedback = db_manager.get_recent_feedback(limit=5)
+    # Получаем статистику (из копии БД для аналитики, в потоке)
+    stats, popular_actions = await asyncio.to_thread(
+        lambda: (analytics_db.get_user_statistics(), analytics_db.get_popular_actions(days=7, limit=5))
+    )
+    recent_feedback = db_manager.get_feedback_clusters(limit=5)
 
     # Формируем текст статистики
     stats_text = f"""
@@ -39,7 +48,7 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 👥 Общая статистика:
 • Всего пользователей: {stats['total_users']}
-• Активных за неделю: {stats['active_week']}
+• Активных за день / неделю / месяц: {stats['active_day']} / {stats['active_week']} / {stats['active_month']}
 • Процент завершения: {stats['completion_rate']}%
 • Средний прогресс: {stats['avg_progress']}/10
 
@@ -71,7 +80,8 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         stats_text += "\n📝 Последние отзывы:\n"
         for feedback in recent_feedback[:3]:
             short_message = feedback['message'][:50] + '...' if len(feedback['message']) > 50 else feedback['message']
-            stats_text += f"👤 {feedback['user_name']}: {short_message}\n"
+            repeats = f" (×{feedback['count']})" if feedback['count'] > 1 else ""
+            stats_text += f"👤 {feedback['user_name']}: {short_message}{repeats}\n"
 
     stats_text += f"\n🕐 Обновлено: {format_datetime(datetime.now(), 'short')}"
 
@@ -79,43 +89,19 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(stats_text, reply_markup=keyboard)
 
 
-async def admin_callback_handler(update, context):
-    """Обработчик callback-ов админ-панели"""
-    query = update.callback_query
-    user_id = query.from_user.id
-
-    if not settings.is_admin(user_id):
-        await query.answer("❌ Нет доступа")
-        return
-
-    await query.answer()
-    callback_data = query.data
-
-    if callback_data == "admin_refresh":
-        await admin_refresh_stats(query, context)
-    elif callback_data == "admin_export":
-        await admin_export_data(query, context)
-    elif callback_data == "admin_broadcast":
-        await admin_broadcast_info(query, context)
-    elif callback_data == "admin_cleanup":
-        await admin_cleanup_data(query, context)
-    elif callback_data == "admin_analytics":
-        await admin_detailed_analytics(query, context)
-
-
 async def admin_refresh_stats(query, context):
     """Обновление статистики"""
     db_manager.log_user_action(query.from_user.id, "admin_refresh", "Обновил статистику")
 
-    # Получаем свежую статистику
-    stats = db_manager.get_user_statistics()
+    # Получаем свежую статистику (из копии БД для аналитики, в потоке)
+    stats = await asyncio.to_thread(analytics_db.get_user_statistics)
 
     text = f"""
 🔄 Статистика обновлена
 
 👥 Актуальные данные:
 • Всего пользователей: {stats['total_users']}
-• Активных за неделю: {stats['active_week']}
+• Активных за день / неделю / месяц: {stats['active_day']} / {stats['active_week']} / {stats['active_month']}
 • Завершили онбординг: {stats['completion_rate']}%
 • Общий фидбек: {stats['total_feedback']} сообщений
 
@@ -152,46 +138,10 @@ async def admin_export_data(query, context):
     db_manager.log_user_action(query.from_user.id, "admin_export", "Запросил экспорт данных")
 
     try:
-        # Получаем все данные
-        export_data = db_manager.export_to_dict()
-
-        # Сохраняем в файл
-        filename = f"onboarding_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        filepath = f"data/exports/{filename}"
-
-        success = save_json(export_data, filepath)
-
-        if success:
-            stats = db_manager.get_user_statistics()
-
-            text = f"""
-📥 Экспорт данных завершен
-
-📊 Экспортированные данные:
-• Пользователи: {len(export_data['users'])}
-• Обратная связь: {len(export_data['feedback'])}
-• Действия пользователей: {len(export_data['actions'])}
-
-📁 Файл: {filename}
-📅 Дата экспорта: {export_data['exported_at']}
-
-💾 Сводка по статусам:
-"""
-
-            status_counts = {}
-            for user in export_data['users']:
-                status = user['status']
-                status_counts[status] = status_counts.get(status, 0) + 1
-
-            for status, count in status_counts.items():
-                text += f"• {status}: {count}\n"
-
-            text += f"\n✅ Данные сохранены в папку exports/"
-
-        else:
-            text = "❌ Ошибка при экспорте данных. Проверьте логи."
-
-        await query.edit_message_text(text)
+        # Выгрузка идет в фоне: прогресс выводится в это сообщение, файлы приходят документами
+        job = export_jobs.submit(context.bot, query.from_user.id, query.message.chat_id, query.message.message_id)
+        if job is None:
+            await query.edit_message_text("⏳ Экспорт данных уже выполняется, файлы придут в этот чат.")
 
     except Exception as e:
         logger.error(f"Ошибка экспорта данных: {e}")
@@ -204,14 +154,14 @@ async def admin_broadcast_info(query, context):
     """Информация о рассылке"""
     db_manager.log_user_action(query.from_user.id, "admin_broadcast_info", "Просмотрел информацию о рассылке")
 
-    stats = db_manager.get_user_statistics()
+    stats = await asyncio.to_thread(analytics_db.get_user_statistics)
 
     text = f"""
 📢 Система рассылки сообщений
 
 👥 Целевая аудитория:
 • Всего пользователей: {stats['total_users']}
-• Активных за неделю: {stats['active_week']}
+• Активных за день / неделю / месяц: {stats['active_day']} / {stats['active_week']} / {stats['active_month']}
 
 📝 Как отправить рассылку:
 Используйте команду:
@@ -220,13 +170,18 @@ async def admin_broadcast_info(query, context):
 Пример:
 `/broadcast Уважаемые коллеги! Завтра в офисе будет проходить team building. Начало в 18:00.`
 
+🎯 Рассылка по сегменту:
+`/broadcast --segment onboarding AND stage>=7 AND inactive=3 -- [сообщение]`
+Без текста (или с --dry-run) показывается только количество получателей.
+Условия: status=..., stage>=N, active=N, inactive=N (дней), all; AND, OR, NOT, скобки
+
 ⚙️ Настройки рассылки:
 • Задержка между отправками: {settings.BROADCAST_DELAY} сек
 • Максимальная длина сообщения: {settings.MAX_MESSAGE_LENGTH} символов
 • Автоматические уведомления: {'✅' if settings.NOTIFICATION_ENABLED else '❌'}
 
 ⚠️ Важно:
-• Рассылка отправляется всем зарегистрированным пользователям
+• Без --segment рассылка отправляется всем зарегистрированным пользователям
 • Заблокированные боты получат ошибку (это нормально)
 • Результат рассылки будет показан после завершения
 
@@ -278,10 +233,17 @@ async def admin_detailed_analytics(query, context):
     db_manager.log_user_action(query.from_user.id, "admin_analytics", "Просмотрел подробную аналитику")
 
     try:
-        # Получаем данные за последние 30 дней
-        daily_activity = db_manager.get_daily_activity(days=30)
-        stats = db_manager.get_user_statistics()
-        popular_actions = db_manager.get_popular_actions(days=30, limit=10)
+        # Получаем данные за последние 30 дней; когорты и воронка считаются по всей истории
+        # действий (из кэша, если данные не менялись). Все читается из копии БД в потоке
+        def collect():
+            return (
+                analytics_db.get_daily_activity(days=30),
+                analytics_db.get_user_statistics(),
+                analytics_db.get_popular_actions(days=30, limit=10),
+                get_onboarding_analytics().report(),
+            )
+
+        daily_activity, stats, popular_actions, report = await asyncio.to_thread(collect)
 
         text = f"""
 📈 Подробная аналитика (30 дней)
@@ -291,29 +253,11 @@ async def admin_detailed_analytics(query, context):
 • Новых за месяц: {len([d for d in daily_activity if d['unique_users'] > 0])} дней с активностью
 • Средняя активность: {sum(d['unique_users'] for d in daily_activity) / len(daily_activity) if daily_activity else 0:.1f} польз/день
 
-📊 Конверсия воронки:
 """
+        text += format_report(report, cohorts=4)
 
-        # Анализ воронки
-        status_stats = stats['status_stats']
-        total = stats['total_users']
-
-        if total > 0:
-            funnel_stages = [
-                ('Зарегистрировались', total, 100),
-                ('Начали пребординг',
-                 sum(status_stats.get(s, 0) for s in ['preboarding', 'preboarded', 'onboarding', 'completed']), 0),
-                ('Завершили пребординг', sum(status_stats.get(s, 0) for s in ['preboarded', 'onboarding', 'completed']),
-                 0),
-                ('Начали онбординг', sum(status_stats.get(s, 0) for s in ['onboarding', 'completed']), 0),
-                ('Завершили онбординг', status_stats.get('completed', 0), 0)
-            ]
-
-            for i, (stage, count, percentage) in enumerate(funnel_stages):
-                if i > 0:
-                    percentage = count / total * 100
-                funnel_stages[i] = (stage, count, percentage)
-                text += f"• {stage}: {count} ({percentage:.1f}%)\n"
+        # Квантили времени на этапах отвечаются по скетчам, без просмотра истории переходов
+        text += "\n" + format_summary(db_manager.stage_durations.summary())
 
         # Топ действий
         text += f"\n🔥 Популярные действия:\n"
@@ -341,6 +285,26 @@ async def admin_detailed_analytics(query, context):
         await query.edit_message_text(f"❌ Ошибка при получении аналитики:\n{str(e)}")
 
 
+def parse_broadcast_args(args: list) -> tuple:
+    """Разобрать аргументы /broadcast: (условие сегмента или None, dry-run, текст)
+
+    /broadcast <текст>
+    /broadcast --segment <условие> -- <текст>
+    /broadcast --segment <условие> [--dry-run]  (без текста - только подсчет)
+    """
+    if not args or args[0] != "--segment":
+        return None, False, " ".join(args)
+
+    args = args[1:]
+    text = ""
+    if "--" in args:
+        separator = args.index("--")
+        args, text = args[:separator], " ".join(args[separator + 1:])
+    dry_run = "--dry-run" in args or not text
+    segment = " ".join(arg for arg in args if arg != "--dry-run")
+    return segment, dry_run, text
+
+
 async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда рассылки сообщений"""
     user_id = update.effective_user.id
@@ -349,15 +313,48 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ У вас нет прав для рассылки.")
         return
 
-    if not context.args:
+    segment, dry_run, message_text = parse_broadcast_args(context.args or [])
+
+    if segment is not None:
+        if not segment:
+            await update.message.reply_text(
+                "❌ Укажите условие сегмента после --segment\n\n"
+                "Пример:\n"
+                "/broadcast --segment onboarding AND stage>=7 AND inactive=3 --dry-run"
+            )
+            return
+        try:
+            # Первое обращение строит индексы по всей таблице пользователей
+            if dry_run:
+                started = time.perf_counter()
+                count = await asyncio.to_thread(db_manager.segments.count, segment)
+                elapsed = (time.perf_counter() - started) * 1000
+            else:
+                recipients = await asyncio.to_thread(db_manager.segments.user_ids, segment)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}")
+            return
+
+        if dry_run:
+            db_manager.log_user_action(user_id, "broadcast_dry_run", f"Сегмент: {segment[:50]}")
+            await update.message.reply_text(
+                f"🎯 Сегмент: {segment}\n"
+                f"👥 Получателей: {count}\n"
+                f"⏱ Подсчет: {elapsed:.1f} мс\n\n"
+                f"Для отправки добавьте текст после --"
+            )
+            return
+    elif not message_text:
         await update.message.reply_text(
             "❌ Укажите текст сообщения после команды /broadcast\n\n"
             "Пример:\n"
-            "/broadcast Уважаемые коллеги! Завтра в офисе будет проходить team building."
+            "/broadcast Уважаемые коллеги! Завтра в офисе будет проходить team building.\n\n"
+            "Рассылка по сегменту:\n"
+            "/broadcast --segment onboarding AND stage>=7 -- Текст сообщения"
         )
         return
-
-    message_text = " ".join(context.args)
+    else:
+        recipients = None
 
     if len(message_text) > settings.MAX_MESSAGE_LENGTH:
         await update.message.reply_text(
@@ -368,8 +365,12 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     db_manager.log_user_action(user_id, "broadcast_start", f"Начал рассылку: {message_text[:50]}...")
 
-    # Получаем всех пользователей
-    all_users = db_manager.get_all_users()
+    # Без сегмента - все пользователи
+    if recipients is None:
+        recipients = [user.user_id for user in db_manager.get_all_users()]
+    if not recipients:
+        await update.message.reply_text("📭 В сегменте нет пользователей, рассылка не отправлена.")
+        return
 
     sent_count = 0
     failed_count = 0
@@ -386,22 +387,22 @@ _Для отключения уведомлений обратитесь в HR._
 
     # Отправляем статус начала рассылки
     status_message = await update.message.reply_text(
-        f"📤 Начинаю рассылку сообщения {len(all_users)} пользователям...\n"
+        f"📤 Начинаю рассылку сообщения {len(recipients)} пользователям...\n"
         f"📝 Текст: {message_text[:100]}{'...' if len(message_text) > 100 else ''}"
     )
 
     # Рассылка с задержкой
-    for i, user in enumerate(all_users):
+    for i, recipient in enumerate(recipients):
         try:
-            await context.bot.send_message(chat_id=user.user_id, text=broadcast_text)
+            await context.bot.send_message(chat_id=recipient, text=broadcast_text)
             sent_count += 1
 
             # Обновляем статус каждые 10 отправок
             if (i + 1) % 10 == 0:
-                progress = (i + 1) / len(all_users) * 100
+                progress = (i + 1) / len(recipients) * 100
                 await status_message.edit_text(
                     f"📤 Рассылка в процессе...\n"
-                    f"📊 Прогресс: {i + 1}/{len(all_users)} ({progress:.0f}%)\n"
+                    f"📊 Прогресс: {i + 1}/{len(recipients)} ({progress:.0f}%)\n"
                     f"✅ Отправлено: {sent_count}\n"
                     f"❌ Ошибок: {failed_count}"
                 )
@@ -411,7 +412,7 @@ _Для отключения уведомлений обратитесь в HR._
 
         except Exception as e:
             failed_count += 1
-            logger.error(f"Не удалось отправить сообщение пользователю {user.user_id}: {e}")
+            logger.error(f"Не удалось отправить сообщение пользователю {recipient}: {e}")
 
     # Финальный отчет
     result_text = f"""
@@ -419,7 +420,7 @@ _Для отключения уведомлений обратитесь в HR._
 
 ✅ Успешно отправлено: {sent_count}
 ❌ Не удалось отправить: {failed_count}
-📈 Процент доставки: {(sent_count / len(all_users) * 100):.1f}%
+📈 Процент доставки: {(sent_count / len(recipients) * 100):.1f}%
 
 📝 Текст сообщения:
 {message_text}
@@ -436,6 +437,195 @@ _Для отключения уведомлений обратитесь в HR._
     )
 
 
+async def search_feedback_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /search_feedback - полнотекстовый поиск по обратной связи"""
+    user_id = update.effective_user.id
+
+    if not settings.is_admin(user_id):
+        await update.message.reply_text("❌ У вас нет прав администратора.")
+        return
+
+    if not context.args:
+        await update.message.reply_text(
+            "❌ Укажите слова для поиска после команды /search_feedback\n\n"
+            "Пример:\n"
+            "/search_feedback доступ почта"
+        )
+        return
+
+    search_query = " ".join(context.args)
+    context.user_data['feedback_search_query'] = search_query
+    db_manager.log_user_action(user_id, "admin_feedback_search", f"Поиск по обратной связи: {search_query}")
+
+    await show_feedback_search_page(update.message, context, cursor=None)
+
+
+async def admin_feedback_search_next(query, context):
+    """Следующая страница поиска по обратной связи"""
+    cursor = int(query.data[len("admin_fbsearch_"):])
+    await show_feedback_search_page(query.message, context, cursor, edit=True)
+
+
+async def show_feedback_search_page(message, context, cursor, edit: bool = False):
+    """Показать страницу результатов поиска по обратной связи"""
+    search_query = context.user_data.get('feedback_search_query')
+
+    if not search_query:
+        await message.reply_text("❌ Поисковый запрос устарел. Повторите /search_feedback")
+        return
+
+    page = db_manager.search_feedback(search_query, cursor=cursor, limit=5)
+
+    if not page['results']:
+        text = f"🔍 По запросу «{search_query}» ничего не найдено."
+    else:
+        text = f"🔍 Обратная связь по запросу «{search_query}»:\n\n"
+        for feedback in page['results']:
+            username = f"@{feedback['username']}" if feedback['username'] else "Нет username"
+            text += f"👤 {feedback['user_name'] or 'Неизвестный пользователь'} ({username})\n"
+            text += f"📅 {feedback['created_at'][:16]}\n"
+            text += f"💬 {feedback['snippet']}\n\n"
+
+    keyboard = None
+    if page['next_cursor'] is not None:
+        keyboard = Keyboards.create_callback_keyboard(
+            [("➡️ Дальше", f"admin_fbsearch_{page['next_cursor']}")]
+        )
+
+    if edit:
+        await message.edit_text(text, reply_markup=keyboard)
+    else:
+        await message.reply_text(text, reply_markup=keyboard)
+
+
+async def routes_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /routes - статистика маршрутов бота"""
+    user_id = update.effective_user.id
+
+    if not settings.is_admin(user_id):
+        await update.message.reply_text("❌ У вас нет прав администратора.")
+        return
+
+    from handlers.routes import router
+
+    routes = router.get_stats(limit=20)
+    if not routes:
+        await update.message.reply_text("🧭 Обращений к маршрутам пока не было.")
+        return
+
+    text = "🧭 Маршруты (с момента запуска):\n\n"
+    for route in routes:
+        text += f"• {route['route']}: {route['hits']} раз, среднее {route['avg_ms']} мс, макс {route['max_ms']} мс"
+        if route['errors']:
+            text += f", ошибок {route['errors']}"
+        text += "\n"
+
+    await update.message.reply_text(text)
+
+
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /metrics - сводка метрик производительности"""
+    user_id = update.effective_user.id
+
+    if not settings.is_admin(user_id):
+        await update.message.reply_text("❌ У вас нет прав администратора.")
+        return
+
+    text = "📈 Метрики производительности (с момента запуска):\n\n⏱ Обработчики (p50 / p95, мс; SQL на обновление):\n"
+
+    handler_latency = sorted(metrics.get_histograms('onboarding_handler_seconds'),
+                             key=lambda item: item[1].count, reverse=True)
+    db_queries = {labels['handler']: hist for labels, hist in metrics.get_histograms('onboarding_handler_db_queries')}
+    for labels, hist in handler_latency[:10]:
+        queries = db_queries.get(labels['handler'])
+        avg_queries = queries.sum / queries.count if queries and queries.count else 0
+        text += (f"• {labels['handler']}: {hist.count} раз, {hist.quantile(0.5) * 1000:.1f} / "
+                 f"{hist.quantile(0.95) * 1000:.1f}; SQL {avg_queries:.1f}\n")
+
+    slow_methods = sorted(metrics.get_histograms('onboarding_db_seconds'),
+                          key=lambda item: item[1].sum, reverse=True)
+    if slow_methods:
+        text += "\n🗄️ Методы БД (суммарно, мс):\n"
+        for labels, hist in slow_methods[:5]:
+            text += f"• {labels['method']}: {hist.sum * 1000:.0f} ({hist.count} вызовов)\n"
+
+    api_calls = metrics.get_histograms('onboarding_api_seconds')
+    if api_calls:
+        total_time = sum(hist.sum for _, hist in api_calls)
+        total_count = sum(hist.count for _, hist in api_calls)
+        text += f"\n📡 Bot API: {total_count} запросов, ожидание {total_time:.1f} с\n"
+
+    reminders = reminder_scheduler.stats()
+    if settings.AUTO_REMINDERS:
+        text += (f"\n⏰ Напоминания: {reminders['sends_per_minute']} за минуту, "
+                 f"в очереди {reminders['backlog']}, всего {reminders['sent']}\n")
+
+    system = get_system_info()
+    text += f"\n🖥 CPU: {system['cpu_percent']}%, память: {system['memory_percent']}%"
+
+    await update.message.reply_text(text)
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда /profile - профилирование обработчиков по запросу
+
+    /profile on [доля] [mem] - включить (mem - еще и снимки памяти tracemalloc)
+    /profile dump - сохранить накопленное, не выключая
+    /profile off - выключить и сохранить результаты
+    """
+    user_id = update.effective_user.id
+
+    if not settings.is_admin(user_id):
+        await update.message.reply_text("❌ У вас нет прав администратора.")
+        return
+
+    args = [arg.lower() for arg in (context.args or [])]
+    action = args[0] if args else "status"
+
+    if action == "on":
+        sample_rate = None
+        for arg in args[1:]:
+            try:
+                sample_rate = float(arg.rstrip('%')) / (100 if arg.endswith('%') else 1)
+            except ValueError:
+                pass
+        update_profiler.enable(sample_rate, memory="mem" in args[1:])
+        db_manager.log_user_action(user_id, "admin_profile_on", f"Включил профилирование: {' '.join(args[1:])}")
+        await update.message.reply_text(
+            f"🔬 Профилирование включено: {update_profiler.sample_rate:.0%} обновлений"
+            f"{', снимки памяти' if update_profiler.memory else ''}.\n"
+            f"Выключить и сохранить: /profile off"
+        )
+        return
+
+    if action in ("off", "dump"):
+        files = update_profiler.disable() if action == "off" else update_profiler.dump()
+        text = "🔬 Профилирование выключено." if action == "off" else "🔬 Результаты сохранены."
+        if files:
+            text += "\n\n📁 Файлы:\n" + "\n".join(f"• {path}" for path in files)
+        else:
+            text += "\nПрофилей не накоплено."
+        await update.message.reply_text(text)
+        return
+
+    summary = update_profiler.summary()
+    if not summary['enabled']:
+        await update.message.reply_text(
+            "🔬 Профилирование выключено.\n\n"
+            "/profile on [доля] [mem] - включить (например, /profile on 0.05 mem)\n"
+            "/profile dump - сохранить накопленное\n"
+            "/profile off - выключить и сохранить"
+        )
+        return
+
+    text = (f"🔬 Профилирование включено с {format_datetime(summary['started_at'])}\n"
+            f"Доля: {summary['sample_rate']:.0%}, обновлений: {summary['seen']}, "
+            f"память: {'да' if summary['memory'] else 'нет'}\n")
+    for name, count in sorted(summary['samples'].items(), key=lambda item: item[1], reverse=True):
+        text += f"• {name}: {count} профилей\n"
+    await update.message.reply_text(text)
+
+
 async def get_admin_users_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Получить список пользователей (скрытая admin команда)"""
     user_id = update.effective_user.id
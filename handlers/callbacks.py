@@ -12,65 +12,36 @@ from database.manager import db_manager
 logger = logging.getLogger(__name__)
 
 
-async def handle_all_callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Центральный обработчик всех callback запросов"""
+async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Возврат в главное меню из inline-клавиатуры"""
     query = update.callback_query
     await query.answer()
 
-    user_id = query.from_user.id
-    callback_data = query.data
+    db_manager.log_user_action(query.from_user.id, "callback_back_to_main", "Нажал кнопку: back_to_main")
 
-    # Логируем callback
-    db_manager.log_user_action(user_id, f"callback_{callback_data}", f"Нажал кнопку: {callback_data}")
+    from handlers.start import start_command
+    await start_command(update, context)
 
-    # Маршрутизация callback-ов по префиксам
-    if callback_data.startswith("admin_"):
-        # Админские callback-ы обрабатываются отдельно в handlers/admin.py
-        return
 
-    elif callback_data.startswith("start_preboarding") or callback_data.startswith(
-            "docs_") or callback_data == "all_docs_sent":
-        # Пребординг callback-ы обрабатываются в handlers/preboarding.py
-        from handlers.preboarding import handle_preboarding_callback
-        await handle_preboarding_callback(update, context)
-
-    elif callback_data.startswith("start_onboarding") or callback_data.startswith("email_") or callback_data in [
-        "team_intro", "meetings", "complete_onboarding"]:
-        # Онбординг callback-ы обрабатываются в handlers/onboarding.py
-        from handlers.onboarding import handle_onboarding_callback
-        await handle_onboarding_callback(update, context)
-
-    elif callback_data == "back_to_main":
-        # Возврат в главное меню
-        from handlers.start import start_command
-        # Создаем фиктивное сообщение для обработки
-        fake_update = Update(
-            update_id=update.update_id,
-            message=query.message
-        )
-        fake_update.effective_user = query.from_user
-        await start_command(fake_update, context)
-
-    elif callback_data == "cancel":
-        # Отмена действия
-        await query.edit_message_text("❌ Действие отменено.")
-
-    elif callback_data == "noop":
-        # Ничего не делаем (для кнопок-заглушек)
-        pass
-
-    else:
-        # Неизвестный callback
-        logger.warning(f"Неизвестный callback: {callback_data} от пользователя {user_id}")
-        await query.edit_message_text(
-            "❓ Неизвестная команда. Возможно, эта функция еще не реализована.\n\n"
-            "Используйте /start для возврата в главное меню."
-        )
-
-
-async def handle_pagination_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик пагинации для длинных списков"""
+async def cancel_action(query, context):
+    """Отмена действия"""
+    await query.edit_message_text("❌ Действие отменено.")
+
+
+async def handle_unknown_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Неизвестный callback"""
     query = update.callback_query
+    await query.answer()
+
+    logger.warning(f"Неизвестный callback: {query.data} от пользователя {query.from_user.id}")
+    await query.edit_message_text(
+        "❓ Неизвестная команда. Возможно, эта функция еще не реализована.\n\n"
+        "Используйте /start для возврата в главное меню."
+    )
+
+
+async def handle_pagination_callback(query, context):
+    """Обработчик пагинации для длинных списков"""
     callback_data = query.data
 
     # Парсим данные пагинации (например: "users_page_2")
@@ -86,8 +57,6 @@ async def handle_pagination_callback(update: Update, context: ContextTypes.DEFAU
             await show_feedback_page(query, context, page)
         # Можно добавить другие типы списков
 
-    await query.answer()
-
 
 async def show_users_page(query, context, page: int):
     """Показать страницу пользователей"""
@@ -123,7 +92,7 @@ async def show_users_page(query, context, page: int):
 async def show_feedback_page(query, context, page: int):
     """Показать страницу обратной связи"""
     feedback_per_page = 5
-    all_feedback = db_manager.get_recent_feedback(limit=100)  # Получаем больше для пагинации
+    all_feedback = db_manager.get_feedback_clusters(limit=100)  # Похожие сообщения сгруппированы
     total_pages = (len(all_feedback) + feedback_per_page - 1) // feedback_per_page
 
     if page < 1:
@@ -140,9 +109,11 @@ async def show_feedback_page(query, context, page: int):
     for feedback in page_feedback:
         username = f"@{feedback['username']}" if feedback['username'] else "Нет username"
         text += f"👤 {feedback['user_name']} ({username})\n"
-        text += f"📅 {feedback['created_at'][:16]}\n"
-        text += f"💬 {feedback['message']}\n\n"
-        text += "─" * 30 + "\n\n"
+        text += f"📅 {feedback['updated_at'][:16]}\n"
+        text += f"💬 {feedback['message']}\n"
+        if feedback['count'] > 1:
+            text += f"🔁 Похожих сообщений: {feedback['count']}\n"
+        text += "\n" + "─" * 30 + "\n\n"
 
     keyboard = Keyboards.get_pagination(page, total_pages, "feedback")
 
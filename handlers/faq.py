@@ -38,31 +38,17 @@ async def handle_faq(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(text, reply_markup=reply_markup)
 
 
-async def handle_faq_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик подменю FAQ"""
-    text = update.message.text
-    user_id = update.effective_user.id
-
-    if text == "💰 Зарплата и льготы":
-        await show_salary_benefits(update, context)
-    elif text == "🕐 Рабочее время":
-        await show_work_schedule(update, context)
-    elif text == "🏖️ Отпуска и больничные":
-        await show_vacation_sick_leave(update, context)
-    elif text == "🎓 Обучение":
-        await show_education_development(update, context)
-    else:
-        # Возврат в главное меню
-        from handlers.start import start_command
-        await start_command(update, context)
-
-
 async def show_salary_benefits(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """FAQ по зарплате и льготам"""
     user_id = update.effective_user.id
     db_manager.log_user_action(user_id, "salary_faq", "Просмотрел FAQ по зарплате и льготам")
 
-    text = f"""
+    await update.message.reply_text(get_salary_benefits_text())
+
+
+def get_salary_benefits_text() -> str:
+    """Текст FAQ по зарплате и льготам"""
+    return f"""
 💰 Зарплата и льготы в {settings.COMPANY_NAME}
 
 💳 Выплата заработной платы:
@@ -191,15 +177,18 @@ A: Подать заявление с копией договора и чека
 • Срочные вопросы: {settings.HR_TELEGRAM}
 """
 
-    await update.message.reply_text(text)
-
 
 async def show_work_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """FAQ по рабочему времени"""
     user_id = update.effective_user.id
     db_manager.log_user_action(user_id, "schedule_faq", "Просмотрел FAQ по рабочему времени")
 
-    text = f"""
+    await update.message.reply_text(get_work_schedule_text())
+
+
+def get_work_schedule_text() -> str:
+    """Текст FAQ по рабочему времени"""
+    return f"""
 🕐 Рабочее время в {settings.COMPANY_NAME}
 
 ⏰ Стандартный график работы:
@@ -312,15 +301,18 @@ A: Только при острой необходимости, с двойно
 • Техподдержка: {settings.SUPPORT_EMAIL}
 """
 
-    await update.message.reply_text(text)
-
 
 async def show_vacation_sick_leave(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """FAQ по отпускам и больничным"""
     user_id = update.effective_user.id
     db_manager.log_user_action(user_id, "vacation_faq", "Просмотрел FAQ по отпускам и больничным")
 
-    text = f"""
+    await update.message.reply_text(get_vacation_sick_leave_text())
+
+
+def get_vacation_sick_leave_text() -> str:
+    """Текст FAQ по отпускам и больничным"""
+    return f"""
 🏖️ Отпуска и больничные в {settings.COMPANY_NAME}
 
 🌴 Ежегодный оплачиваемый отпуск:
@@ -423,7 +415,6 @@ A: Праздничные дни не включаются в отпуск.
 • Для больничного: листок нетрудоспособности
 • Для учебного отпуска: справка-вызов из учебного заведения
 """
-    await update.message.reply_text(text)
 
 
 async def show_education_development(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -431,7 +422,12 @@ async def show_education_development(update: Update, context: ContextTypes.DEFAU
     user_id = update.effective_user.id
     db_manager.log_user_action(user_id, "education_faq", "Просмотрел FAQ по обучению и развитию")
 
-    text = f"""
+    await update.message.reply_text(get_education_development_text())
+
+
+def get_education_development_text() -> str:
+    """Текст FAQ по обучению и развитию"""
+    return f"""
 🎓 Обучение и развитие в {settings.COMPANY_NAME}
 
 💰 Бюджет на обучение:
@@ -525,4 +521,11 @@ A: Да, групповые занятия проводятся еженедел
 • Содержание: описание курса, стоимость, обоснование пользы
 """
 
-    await update.message.reply_text(text)
\ No newline at end of file
+
+# Разделы FAQ: кнопка меню -> функция, возвращающая текст раздела
+FAQ_SECTIONS = {
+    "💰 Зарплата и льготы": get_salary_benefits_text,
+    "🕐 Рабочее время": get_work_schedule_text,
+    "🏖️ Отпуска и больничные": get_vacation_sick_leave_text,
+    "🎓 Обучение": get_education_development_text
+}
@@ -11,6 +11,8 @@ from config.settings import settings
 from database.manager import db_manager
 from database.models import UserStatus, OnboardingStage
 from bot.keyboards import Keyboards
+from services.duplicates import get_feedback_clusterer, should_notify
+from services.notifier import admin_notifier
 from utils.helpers import format_datetime, create_progress_bar
 
 logger = logging.getLogger(__name__)
@@ -102,9 +104,9 @@ async def handle_feedback_message(update: Update, context: ContextTypes.DEFAULT_
 
     # Проверяем, ждем ли мы обратную связь от этого пользователя
     if not context.user_data.get('waiting_feedback', False):
-        # Это не обратная связь, обрабатываем как обычное сообщение
-        from handlers.start import handle_main_menu
-        await handle_main_menu(update, context)
+        # Это не обратная связь - ищем ответ в FAQ и полезной информации
+        from handlers.start import handle_search_query
+        await handle_search_query(update, context)
         return
 
     # Получаем текст сообщения
@@ -133,8 +135,11 @@ async def handle_feedback_message(update: Update, context: ContextTypes.DEFAULT_
         user_name = user.full_name if user else "Неизвестный пользователь"
         username = f"@{update.effective_user.username}" if update.effective_user.username else "Нет username"
 
+        # Относим сообщение к группе похожих, чтобы не присылать администраторам дубликаты
+        match = get_feedback_clusterer().add_feedback(feedback)
+
         # Уведомляем администраторов о новой обратной связи
-        if settings.FEEDBACK_NOTIFICATION:
+        if settings.FEEDBACK_NOTIFICATION and should_notify(match.count):
             admin_message = f"""
 🔔 Новая обратная связь
 
@@ -147,14 +152,24 @@ async def handle_feedback_message(update: Update, context: ContextTypes.DEFAULT_
 
 ---
 💡 *Ответить пользователю можно через {settings.HR_TELEGRAM}*
+"""
+            if match.count > 1:
+                admin_message = f"""
+🔁 Повторяющаяся обратная связь
+
+📊 Похожих сообщений: {match.count}
+👤 Последнее от: {user_name} ({username})
+📅 Время: {format_datetime(datetime.now())}
+
+💬 Сообщение:
+{feedback_text}
+
+---
+💡 *Все группы: /admin → 💬 Обратная связь*
 """
 
-            # Отправляем уведомление всем администраторам
-            for admin_id in settings.ADMIN_IDS:
-                try:
-                    await context.bot.send_message(chat_id=admin_id, text=admin_message)
-                except Exception as e:
-                    logger.error(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
+            # Уведомление уйдет администраторам в дайджесте из фоновой задачи
+            await admin_notifier.notify(context.bot, admin_message)
 
         # Убираем флаг ожидания обратной связи
         context.user_data['waiting_feedback'] = False
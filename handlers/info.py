@@ -38,31 +38,17 @@ async def handle_useful_info(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await update.message.reply_text(text, reply_markup=reply_markup)
 
 
-async def handle_info_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик подменю полезной информации"""
-    text = update.message.text
-    user_id = update.effective_user.id
-
-    if text == "🏢 О компании":
-        await show_company_info(update, context)
-    elif text == "📜 Корпоративная культура":
-        await show_corporate_culture(update, context)
-    elif text == "🔧 Инструменты и ресурсы":
-        await show_tools_resources(update, context)
-    elif text == "📅 Календарь мероприятий":
-        await show_events_calendar(update, context)
-    else:
-        # Возврат в главное меню
-        from handlers.start import start_command
-        await start_command(update, context)
-
-
 async def show_company_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Информация о компании"""
     user_id = update.effective_user.id
     db_manager.log_user_action(user_id, "company_info", "Просмотрел информацию о компании")
 
-    text = f"""
+    await update.message.reply_text(get_company_info_text())
+
+
+def get_company_info_text() -> str:
+    """Текст раздела «Информация о компании»"""
+    return f"""
 🏢 О компании {settings.COMPANY_NAME}
 
 Мы - динамично развивающаяся IT-компания, специализирующаяся на создании инновационных технологических решений для бизнеса.
@@ -114,15 +100,18 @@ async def show_company_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
 Вся актуальная информация доступна на корпоративном сайте и в справочнике сотрудника.
 """
 
-    await update.message.reply_text(text)
-
 
 async def show_corporate_culture(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Корпоративная культура"""
     user_id = update.effective_user.id
     db_manager.log_user_action(user_id, "culture_info", "Изучил корпоративную культуру")
 
-    text = f"""
+    await update.message.reply_text(get_corporate_culture_text())
+
+
+def get_corporate_culture_text() -> str:
+    """Текст раздела «Корпоративная культура»"""
+    return f"""
 📜 Корпоративная культура {settings.COMPANY_NAME}
 
 🤝 Принципы работы:
@@ -222,15 +211,18 @@ async def show_corporate_culture(update: Update, context: ContextTypes.DEFAULT_T
 "Мы не просто создаем продукты - мы строим будущее. Каждый член нашей команды важен, и вместе мы достигаем невозможного."
 """
 
-    await update.message.reply_text(text)
-
 
 async def show_tools_resources(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Инструменты и ресурсы"""
     user_id = update.effective_user.id
     db_manager.log_user_action(user_id, "tools_info", "Изучил инструменты и ресурсы")
 
-    text = f"""
+    await update.message.reply_text(get_tools_resources_text())
+
+
+def get_tools_resources_text() -> str:
+    """Текст раздела «Инструменты и ресурсы»"""
+    return f"""
 🔧 Инструменты и ресурсы {settings.COMPANY_NAME}
 
 💻 Основные рабочие инструменты:
@@ -365,7 +357,6 @@ async def show_tools_resources(update: Update, context: ContextTypes.DEFAULT_TYP
 💬 Для новичков:
 Не стесняйтесь задавать вопросы! Лучше уточнить сразу, чем долго разбираться самостоятельно. Коллеги всегда готовы помочь.
 """
-    await update.message.reply_text(text)
 
 
 async def show_events_calendar(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -373,7 +364,12 @@ async def show_events_calendar(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = update.effective_user.id
     db_manager.log_user_action(user_id, "calendar_info", "Просмотрел календарь мероприятий")
 
-    text = f"""
+    await update.message.reply_text(get_events_calendar_text())
+
+
+def get_events_calendar_text() -> str:
+    """Текст раздела «Календарь мероприятий»"""
+    return f"""
 📅 Календарь мероприятий {settings.COMPANY_NAME}
 
 📊 Регулярные рабочие встречи:
@@ -511,4 +507,11 @@ async def show_events_calendar(update: Update, context: ContextTypes.DEFAULT_TYP
 • Все мероприятия оплачиваются компанией
 """
 
-    await update.message.reply_text(text)
\ No newline at end of file
+
+# Разделы полезной информации: кнопка меню -> функция, возвращающая текст раздела
+INFO_SECTIONS = {
+    "🏢 О компании": get_company_info_text,
+    "📜 Корпоративная культура": get_corporate_culture_text,
+    "🔧 Инструменты и ресурсы": get_tools_resources_text,
+    "📅 Календарь мероприятий": get_events_calendar_text
+}
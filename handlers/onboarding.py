@@ -8,8 +8,9 @@ from telegram.ext import ContextTypes
 
 from config.settings import settings
 from database.manager import db_manager
-from database.models import UserStatus, OnboardingStage
+from database.models import UserStatus, OnboardingStage, OnboardingEvent
 from bot.keyboards import Keyboards
+from services.notifier import admin_notifier
 from datetime import datetime
 from utils.helpers import format_datetime
 
@@ -82,7 +83,7 @@ async def handle_onboarding(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Основной онбординг для статусов PREBOARDED и ONBOARDING
     if user.status == UserStatus.PREBOARDED:
         # Переводим в статус онбординга
-        db_manager.update_user_stage(user_id, OnboardingStage.ONBOARDING_START, UserStatus.ONBOARDING)
+        db_manager.transition_user(user_id, OnboardingEvent.ONBOARDING_OPENED)
 
         text = f"""
 🎉 Отлично! Добро пожаловать в команду {settings.COMPANY_NAME}!
@@ -121,36 +122,12 @@ async def handle_onboarding(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(text, reply_markup=keyboard)
 
 
-async def handle_onboarding_callback(update, context):
-    """Обработчик callback-ов онбординга"""
-    query = update.callback_query
-    await query.answer()
-
-    user_id = query.from_user.id
-    callback_data = query.data
-
-    if callback_data == "start_onboarding":
-        await start_onboarding_process(query, context)
-    elif callback_data == "email_received":
-        await handle_email_received(query, context)
-    elif callback_data == "email_not_received":
-        await handle_email_not_received(query, context)
-    elif callback_data == "team_intro":
-        await handle_team_intro(query, context)
-    elif callback_data == "meetings":
-        await handle_meetings_info(query, context)
-    elif callback_data == "complete_onboarding":
-        await complete_onboarding(query, context)
-
-
 async def start_onboarding_process(query, context):
     """Начать процесс онбординга"""
     user_id = query.from_user.id
-    user = db_manager.get_user(user_id)
 
-    # Обновляем этап если нужно
-    if user.stage < OnboardingStage.EMAIL_ACCESS:
-        db_manager.update_user_stage(user_id, OnboardingStage.EMAIL_ACCESS)
+    # Этап меняется, только если пользователь до него еще не дошел
+    db_manager.transition_user(user_id, OnboardingEvent.ONBOARDING_STARTED)
 
     db_manager.log_user_action(user_id, "onboarding_start", "Начал процесс онбординга")
 
@@ -185,7 +162,7 @@ async def handle_email_received(query, context):
     """Обработка получения доступа к почте"""
     user_id = query.from_user.id
 
-    db_manager.update_user_stage(user_id, OnboardingStage.TEAM_INTRO)
+    db_manager.transition_user(user_id, OnboardingEvent.EMAIL_RECEIVED)
     db_manager.log_user_action(user_id, "email_access_confirmed", "Подтвердил получение доступа к почте")
 
     text = f"""
@@ -248,7 +225,7 @@ async def handle_team_intro(query, context):
     """Знакомство с командой"""
     user_id = query.from_user.id
 
-    db_manager.update_user_stage(user_id, OnboardingStage.MEETINGS)
+    db_manager.transition_user(user_id, OnboardingEvent.TEAM_INTRO_READ)
     db_manager.log_user_action(user_id, "team_intro", "Изучил информацию о команде")
 
     text = f"""
@@ -289,7 +266,7 @@ async def handle_meetings_info(query, context):
     """Информация о планерках и встречах"""
     user_id = query.from_user.id
 
-    db_manager.update_user_stage(user_id, OnboardingStage.COMPLETE)
+    db_manager.transition_user(user_id, OnboardingEvent.MEETINGS_READ)
     db_manager.log_user_action(user_id, "meetings_info", "Изучил информацию о планерках")
 
     text = f"""
@@ -340,12 +317,23 @@ async def complete_onboarding(query, context):
     """Завершение онбординга"""
     user_id = query.from_user.id
 
-    db_manager.update_user_stage(user_id, 10, UserStatus.COMPLETED)
+    user = db_manager.transition_user(user_id, OnboardingEvent.ONBOARDING_COMPLETED)
+
+    # Перехода нет: онбординг уже завершен (повторное нажатие) или пользователь еще не дошел до конца
+    if not user:
+        current = db_manager.get_user(user_id)
+        if not current or current.status != UserStatus.COMPLETED:
+            await query.edit_message_text(
+                "⚠️ Онбординг еще не пройден до конца.\n"
+                "Нажмите «📋 Онбординг» в меню, чтобы продолжить с текущего этапа."
+            )
+            return
+
     db_manager.log_user_action(user_id, "onboarding_completed", "Успешно завершил онбординг")
 
-    # Уведомляем администраторов о завершении
-    user = db_manager.get_user(user_id)
-    admin_message = f"""
+    # Уведомляем администраторов о завершении (повторное нажатие перехода не дает)
+    if user:
+        admin_message = f"""
 🎉 Онбординг завершен!
 
 👤 Сотрудник: {user.full_name} (@{query.from_user.username})
@@ -356,12 +344,8 @@ async def complete_onboarding(query, context):
 Новый сотрудник готов к работе!
 """
 
-    # Отправляем уведомление администраторам
-    for admin_id in settings.ADMIN_IDS:
-        try:
-            await context.bot.send_message(chat_id=admin_id, text=admin_message)
-        except Exception as e:
-            logger.error(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
+        # Отправляем уведомление администраторам (в фоне, дайджестом)
+        await admin_notifier.notify(context.bot, admin_message)
 
     text = f"""
 🎉🎊 ПОЗДРАВЛЯЕМ! 🎊🎉
@@ -8,7 +8,7 @@ from telegram.ext import ContextTypes
 
 from config.settings import settings
 from database.manager import db_manager
-from database.models import UserStatus, OnboardingStage
+from database.models import UserStatus, OnboardingStage, OnboardingEvent
 from bot.keyboards import Keyboards
 
 logger = logging.getLogger(__name__)
@@ -27,7 +27,7 @@ async def handle_preboarding(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     # Обновляем статус на пребординг если пользователь новый
     if user.status == UserStatus.NEW:
-        db_manager.update_user_stage(user_id, OnboardingStage.REGISTRATION, UserStatus.PREBOARDING)
+        user = db_manager.transition_user(user_id, OnboardingEvent.PREBOARDING_OPENED) or user
 
     db_manager.log_user_action(user_id, "preboarding_start", "Начал пребординг")
 
@@ -76,33 +76,11 @@ async def handle_preboarding(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await update.message.reply_text(text, reply_markup=keyboard)
 
 
-async def handle_preboarding_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик callback-ов пребординга"""
-    query = update.callback_query
-    await query.answer()
-
-    user_id = query.from_user.id
-    callback_data = query.data
-
-    if callback_data == "start_preboarding":
-        await start_preboarding_process(query, context)
-    elif callback_data == "docs_main":
-        await show_main_documents(query, context)
-    elif callback_data == "docs_tk":
-        await show_tk_documents(query, context)
-    elif callback_data == "docs_main_sent":
-        await handle_docs_main_sent(query, context)
-    elif callback_data == "docs_tk_sent":
-        await handle_docs_tk_sent(query, context)
-    elif callback_data == "all_docs_sent":
-        await handle_all_docs_sent(query, context)
-
-
 async def start_preboarding_process(query, context):
     """Начать процесс пребординга"""
     user_id = query.from_user.id
 
-    db_manager.update_user_stage(user_id, OnboardingStage.DOCUMENTS_INTRO)
+    db_manager.transition_user(user_id, OnboardingEvent.DOCUMENTS_OPENED)
     db_manager.log_user_action(user_id, "preboarding_docs", "Начал процесс подготовки документов")
 
     text = f"""
@@ -209,11 +187,9 @@ async def show_tk_documents(query, context):
 async def handle_docs_main_sent(query, context):
     """Обработка отправки основных документов"""
     user_id = query.from_user.id
-    user = db_manager.get_user(user_id)
 
-    # Обновляем этап только если текущий этап меньше
-    new_stage = max(user.stage, OnboardingStage.DOCUMENTS_MAIN)
-    db_manager.update_user_stage(user_id, new_stage)
+    # Этап меняется, только если пользователь до него еще не дошел
+    db_manager.transition_user(user_id, OnboardingEvent.DOCS_MAIN_SENT)
     db_manager.log_user_action(user_id, "docs_main_sent", "Подтвердил отправку основных документов")
 
     text = """
@@ -234,11 +210,9 @@ async def handle_docs_main_sent(query, context):
 async def handle_docs_tk_sent(query, context):
     """Обработка отправки документов по ТК РФ"""
     user_id = query.from_user.id
-    user = db_manager.get_user(user_id)
 
-    # Обновляем этап только если текущий этап меньше
-    new_stage = max(user.stage, OnboardingStage.DOCUMENTS_TK)
-    db_manager.update_user_stage(user_id, new_stage)
+    # Этап меняется, только если пользователь до него еще не дошел
+    db_manager.transition_user(user_id, OnboardingEvent.DOCS_TK_SENT)
     db_manager.log_user_action(user_id, "docs_tk_sent", "Подтвердил отправку документов по ТК РФ")
 
     text = """
@@ -260,7 +234,7 @@ async def handle_all_docs_sent(query, context):
     """Завершение отправки всех документов"""
     user_id = query.from_user.id
 
-    db_manager.update_user_stage(user_id, OnboardingStage.DOCUMENTS_COMPLETE, UserStatus.PREBOARDED)
+    db_manager.transition_user(user_id, OnboardingEvent.ALL_DOCS_SENT)
     db_manager.log_user_action(user_id, "preboarding_complete", "Завершил пребординг")
 
     text = f"""
@@ -0,0 +1,129 @@
+# handlers/routes.py
+"""
+Таблица маршрутов: кнопки меню и callback_data -> обработчики
+
+Обработчики указаны путями "модуль:функция" и загружаются при первом
+обращении, поэтому импорт таблицы не тянет за собой модули всех разделов.
+"""
+from bot.router import Router, lazy_handler, resolve_handler
+from config.settings import settings
+from database.manager import db_manager
+from services.metrics import metrics
+
+
+def on_query(path: str, admin_only: bool = False):
+    """Адаптер обработчика вида func(query, context) по пути "модуль:функция" для маршрутизатора"""
+    async def handler(update, context):
+        query = update.callback_query
+
+        if admin_only:
+            if not settings.is_admin(query.from_user.id):
+                await query.answer("❌ Нет доступа")
+                return
+            await query.answer()
+        else:
+            await query.answer()
+            db_manager.log_user_action(query.from_user.id, f"callback_{query.data}", f"Нажал кнопку: {query.data}")
+
+        await resolve_handler(path)(query, context)
+
+    handler.__name__ = handler.__qualname__ = path.partition(':')[2]
+    return handler
+
+
+async def noop(update, context):
+    """Кнопка-заглушка"""
+    await update.callback_query.answer()
+
+
+# Кнопки клавиатур (точное совпадение текста)
+TEXT_ROUTES = {
+    # Главное меню
+    "🚀 Пребординг": lazy_handler("handlers.preboarding:handle_preboarding"),
+    "📋 Онбординг": lazy_handler("handlers.onboarding:handle_onboarding"),
+    "📚 Полезная информация": lazy_handler("handlers.info:handle_useful_info"),
+    "❓ FAQ": lazy_handler("handlers.faq:handle_faq"),
+    "👥 Контакты сотрудников": lazy_handler("handlers.contacts:handle_contacts"),
+    "📞 Поддержка": lazy_handler("handlers.contacts:handle_support"),
+    "💬 Обратная связь": lazy_handler("handlers.feedback:handle_feedback"),
+    "📊 Мой прогресс": lazy_handler("handlers.feedback:handle_progress"),
+    "🏠 Главное меню": lazy_handler("handlers.start:start_command"),
+
+    # Полезная информация
+    "🏢 О компании": lazy_handler("handlers.info:show_company_info"),
+    "📜 Корпоративная культура": lazy_handler("handlers.info:show_corporate_culture"),
+    "🔧 Инструменты и ресурсы": lazy_handler("handlers.info:show_tools_resources"),
+    "📅 Календарь мероприятий": lazy_handler("handlers.info:show_events_calendar"),
+
+    # FAQ
+    "💰 Зарплата и льготы": lazy_handler("handlers.faq:show_salary_benefits"),
+    "🕐 Рабочее время": lazy_handler("handlers.faq:show_work_schedule"),
+    "🏖️ Отпуска и больничные": lazy_handler("handlers.faq:show_vacation_sick_leave"),
+    "🎓 Обучение": lazy_handler("handlers.faq:show_education_development"),
+}
+
+# Inline-кнопки (точное совпадение callback_data)
+CALLBACK_ROUTES = {
+    # Пребординг
+    "start_preboarding": on_query("handlers.preboarding:start_preboarding_process"),
+    "docs_main": on_query("handlers.preboarding:show_main_documents"),
+    "docs_tk": on_query("handlers.preboarding:show_tk_documents"),
+    "docs_main_sent": on_query("handlers.preboarding:handle_docs_main_sent"),
+    "docs_tk_sent": on_query("handlers.preboarding:handle_docs_tk_sent"),
+    "all_docs_sent": on_query("handlers.preboarding:handle_all_docs_sent"),
+
+    # Онбординг
+    "start_onboarding": on_query("handlers.onboarding:start_onboarding_process"),
+    "email_received": on_query("handlers.onboarding:handle_email_received"),
+    "email_not_received": on_query("handlers.onboarding:handle_email_not_received"),
+    "team_intro": on_query("handlers.onboarding:handle_team_intro"),
+    "meetings": on_query("handlers.onboarding:handle_meetings_info"),
+    "complete_onboarding": on_query("handlers.onboarding:complete_onboarding"),
+
+    # Администрирование
+    "admin_refresh": on_query("handlers.admin:admin_refresh_stats", admin_only=True),
+    "admin_export": on_query("handlers.admin:admin_export_data", admin_only=True),
+    "admin_broadcast": on_query("handlers.admin:admin_broadcast_info", admin_only=True),
+    "admin_cleanup": on_query("handlers.admin:admin_cleanup_data", admin_only=True),
+    "admin_analytics": on_query("handlers.admin:admin_detailed_analytics", admin_only=True),
+
+    # Общие
+    "back_to_main": lazy_handler("handlers.callbacks:back_to_main"),
+    "cancel": on_query("handlers.callbacks:cancel_action"),
+    "noop": noop,
+}
+
+# Inline-кнопки с числовым параметром: "<префикс>_<число>"
+CALLBACK_PREFIX_ROUTES = {
+    "admin_fbsearch": on_query("handlers.admin:admin_feedback_search_next", admin_only=True),
+    "users_page": on_query("handlers.callbacks:handle_pagination_callback", admin_only=True),
+    "feedback_page": on_query("handlers.callbacks:handle_pagination_callback", admin_only=True),
+}
+
+
+def build_router() -> Router:
+    """Собрать маршрутизатор из таблиц маршрутов"""
+    return Router(
+        text_routes=TEXT_ROUTES,
+        callback_routes=CALLBACK_ROUTES,
+        callback_prefix_routes=CALLBACK_PREFIX_ROUTES,
+        # Свободный текст: обратная связь или поиск по FAQ
+        text_fallback=lazy_handler("handlers.feedback:handle_feedback_message"),
+        callback_fallback=lazy_handler("handlers.callbacks:handle_unknown_callback")
+    )
+
+
+def collect_route_metrics() -> list:
+    """Статистика маршрутов в формате Prometheus"""
+    routes = [(route.replace('\\', '\\\\').replace('"', '\\"'), stats) for route, stats in router.stats.items()]
+
+    lines = ["# TYPE onboarding_route_hits_total counter"]
+    lines += [f'onboarding_route_hits_total{{route="{route}"}} {stats.hits}' for route, stats in routes]
+    lines.append("# TYPE onboarding_route_seconds_total counter")
+    lines += [f'onboarding_route_seconds_total{{route="{route}"}} {stats.total_time}' for route, stats in routes]
+    return lines
+
+
+# Глобальный маршрутизатор
+router = build_router()
+metrics.add_collector(collect_route_metrics)
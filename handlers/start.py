@@ -10,6 +10,8 @@ from config.settings import settings
 from database.manager import db_manager
 from database.models import User, UserStatus
 from bot.keyboards import Keyboards
+from services.search import get_search_index
+from utils.helpers import truncate_text
 
 logger = logging.getLogger(__name__)
 
@@ -63,7 +65,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 Выберите нужный раздел:
 """
 
-    await update.message.reply_text(
+    await update.effective_message.reply_text(
         welcome_text,
         reply_markup=Keyboards.get_main_menu()
     )
@@ -172,45 +174,29 @@ async def contacts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(contacts_text)
 
 
-async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик кнопок главного меню"""
+async def handle_search_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Поиск ответа на свободный вопрос пользователя"""
     text = update.message.text
     user_id = update.effective_user.id
 
-    # Импортируем обработчики других разделов
-    from handlers.preboarding import handle_preboarding
-    from handlers.onboarding import handle_onboarding
-    from handlers.info import handle_useful_info
-    from handlers.faq import handle_faq
-    from handlers.contacts import handle_contacts, handle_support
-    from handlers.feedback import handle_feedback, handle_progress
-
-    # Маршрутизация по кнопкам главного меню
-    if text == "🚀 Пребординг":
-        await handle_preboarding(update, context)
-    elif text == "📋 Онбординг":
-        await handle_onboarding(update, context)
-    elif text == "📚 Полезная информация":
-        await handle_useful_info(update, context)
-    elif text == "❓ FAQ":
-        await handle_faq(update, context)
-    elif text == "👥 Контакты сотрудников":
-        await handle_contacts(update, context)
-    elif text == "📞 Поддержка":
-        await handle_support(update, context)
-    elif text == "💬 Обратная связь":
-        await handle_feedback(update, context)
-    elif text == "📊 Мой прогресс":
-        await handle_progress(update, context)
-    elif text == "🏠 Главное меню":
-        await start_command(update, context)
-    else:
-        # Неизвестная команда
-        db_manager.log_user_action(user_id, "unknown_command", f"Неизвестная команда: {text}")
+    results = get_search_index().search(text, limit=settings.SEARCH_RESULTS_LIMIT)
+
+    if not results:
+        db_manager.log_user_action(user_id, "search_no_results", f"Поиск без результатов: {text}")
         await update.message.reply_text(
             "❓ Не понял вашу команду.\n\n"
             "Используйте кнопки меню для навигации или /help для справки."
         )
+        return
+
+    db_manager.log_user_action(user_id, "search", f"Поиск: {text}")
+
+    answer_text = "🔎 Вот что удалось найти:\n\n"
+    for result in results:
+        answer_text += f"📌 {result.section}\n{truncate_text(result.text, 400)}\n\n"
+    answer_text += "Полные разделы доступны в меню «❓ FAQ» и «📚 Полезная информация»."
+
+    await update.message.reply_text(answer_text)
 
 
 def _get_next_step_hint(user: User) -> str:
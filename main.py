@@ -9,35 +9,21 @@ OnboardingBuddy - Главный файл запуска бота
 import logging
 import sys
 import os
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler
-from telegram import Update
 
 # Добавляем текущую директорию в путь для импортов
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Остальное импортируется там, где нужно: команды CLI не загружают telegram,
+# обработчики и сервисы бота, а БД открывается при первом обращении к db_manager
 from config.settings import settings
-from database.manager import db_manager
-from utils.helpers import setup_logging
-
-# Импорт обработчиков
-from handlers.start import (
-    start_command, help_command, status_command,
-    contacts_command, handle_main_menu
-)
-from handlers.preboarding import handle_preboarding_callback
-from handlers.admin import (
-    admin_command, admin_callback_handler, broadcast_command
-)
-from handlers.callbacks import handle_all_callbacks
-from handlers.info import handle_info_menu
-from handlers.faq import handle_faq_menu
-from handlers.feedback import handle_feedback_message
 
 logger = logging.getLogger(__name__)
 
 
 async def error_handler(update: object, context):
     """Глобальный обработчик ошибок"""
+    from telegram import Update
+
     logger.error(f"Exception while handling an update: {context.error}")
 
     # Попытаемся отправить сообщение пользователю об ошибке
@@ -52,49 +38,77 @@ async def error_handler(update: object, context):
             logger.error(f"Не удалось отправить сообщение об ошибке: {e}")
 
 
-def setup_handlers(application: Application):
-    """Настройка обработчиков бота"""
+async def on_shutdown(application):
+    """Отправить накопленные уведомления администраторам, остановить выгрузки и сохранить скетчи"""
+    from database.manager import db_manager
+    from services.export_jobs import export_jobs
+    from services.notifier import admin_notifier
+
+    await admin_notifier.stop()
+    await export_jobs.stop()
+    db_manager.stage_durations.save()
+    db_manager.active_users.save()
+
+
+def setup_handlers(application):
+    """Настройка обработчиков бота
+
+    Команды и маршруты ссылаются на обработчики по пути "модуль:функция":
+    модуль раздела загружается при первом обращении к нему.
+    """
+    from telegram.ext import CommandHandler, MessageHandler, filters, CallbackQueryHandler
+
+    from bot.router import lazy_handler
+    from database.manager import db_manager
+    from database.replica import get_analytics_replica
+    from database.unit_of_work import use_unit_of_work
+    from handlers.routes import router
+    from services.metrics import instrument_application
+    from services.profiler import update_profiler
+    from services.reminders import reminder_scheduler
 
     # Команды
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("status", status_command))
-    application.add_handler(CommandHandler("contacts", contacts_command))
-    application.add_handler(CommandHandler("admin", admin_command))
-    application.add_handler(CommandHandler("broadcast", broadcast_command))
-
-    # Callback query обработчики
-    application.add_handler(CallbackQueryHandler(admin_callback_handler, pattern="^admin_.*"))
-    application.add_handler(
-        CallbackQueryHandler(handle_preboarding_callback, pattern="^(start_preboarding|docs_.*|all_docs_sent)$"))
-    application.add_handler(CallbackQueryHandler(handle_all_callbacks))
-
-    # Текстовые сообщения
-    application.add_handler(MessageHandler(
-        filters.TEXT & ~filters.COMMAND & filters.Regex("^(🚀|📋|📚|❓|👥|📞|💬|📊|🏠).*"),
-        handle_main_menu
-    ))
-
-    # Подменю
-    application.add_handler(MessageHandler(
-        filters.TEXT & ~filters.COMMAND & filters.Regex("^(🏢|📜|🔧|📅).*"),
-        handle_info_menu
-    ))
-
-    application.add_handler(MessageHandler(
-        filters.TEXT & ~filters.COMMAND & filters.Regex("^(💰|🕐|🏖️|🎓).*"),
-        handle_faq_menu
-    ))
-
-    # Обратная связь (должна быть последней среди текстовых)
-    application.add_handler(MessageHandler(
-        filters.TEXT & ~filters.COMMAND,
-        handle_feedback_message
-    ))
+    application.add_handler(CommandHandler("start", lazy_handler("handlers.start:start_command")))
+    application.add_handler(CommandHandler("help", lazy_handler("handlers.start:help_command")))
+    application.add_handler(CommandHandler("status", lazy_handler("handlers.start:status_command")))
+    application.add_handler(CommandHandler("contacts", lazy_handler("handlers.start:contacts_command")))
+    application.add_handler(CommandHandler("admin", lazy_handler("handlers.admin:admin_command")))
+    application.add_handler(CommandHandler("broadcast", lazy_handler("handlers.admin:broadcast_command")))
+    application.add_handler(CommandHandler("search_feedback", lazy_handler("handlers.admin:search_feedback_command")))
+    application.add_handler(CommandHandler("routes", lazy_handler("handlers.admin:routes_command")))
+    application.add_handler(CommandHandler("metrics", lazy_handler("handlers.admin:metrics_command")))
+    application.add_handler(CommandHandler("profile", lazy_handler("handlers.admin:profile_command")))
+
+    # Все callback-и и текстовые сообщения разбираются таблицей маршрутов (handlers/routes.py)
+    application.add_handler(CallbackQueryHandler(router.handle_callback))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, router.handle_text))
 
     # Обработчик ошибок
     application.add_error_handler(error_handler)
 
+    # Записи в БД за одно обновление фиксируются одной транзакцией
+    use_unit_of_work(application)
+
+    # Замер времени, запросов к БД и ожидания API для каждого обработчика
+    instrument_application(application)
+
+    # Профилирование по запросу подменяет колбэки обработчиков только на время включения
+    update_profiler.attach(application)
+
+    # Напоминания застрявшим на этапе (если AUTO_REMINDERS включены)
+    reminder_scheduler.attach(application)
+
+    # Периодическое сохранение квантилей времени на этапах
+    db_manager.stage_durations.attach(application, settings.STAGE_SKETCH_SAVE_INTERVAL)
+
+    # Периодическое сохранение дневных скетчей активных пользователей
+    db_manager.active_users.attach(application, settings.ACTIVITY_SKETCH_SAVE_INTERVAL)
+
+    # Фоновое обновление копии БД, которую читают аналитика и экспорт
+    analytics_replica = get_analytics_replica()
+    if analytics_replica:
+        analytics_replica.attach(application)
+
     logger.info("Обработчики настроены")
 
 
@@ -118,6 +132,17 @@ def validate_configuration():
 
 def main():
     """Главная функция запуска бота"""
+    from telegram import Update
+    from telegram.ext import Application
+
+    from bot.persistence import SQLitePersistence
+    from bot.request import InstrumentedRequest
+    from database.manager import db_manager
+    from services.duplicates import get_feedback_clusterer
+    from services.metrics import start_metrics_server
+    from services.profiler import update_profiler
+    from services.search import get_search_index
+    from utils.helpers import setup_logging
 
     # Настройка логирования
     setup_logging()
@@ -140,11 +165,30 @@ def main():
         sys.exit(1)
 
     # Создание приложения
-    application = Application.builder().token(settings.BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(settings.BOT_TOKEN)
+        .request(InstrumentedRequest())
+        .persistence(SQLitePersistence(db_manager, update_interval=settings.PERSISTENCE_UPDATE_INTERVAL))
+        .post_stop(on_shutdown)
+        .build()
+    )
 
     # Настройка обработчиков
     setup_handlers(application)
 
+    # Поисковый индекс по FAQ и полезной информации
+    get_search_index()
+
+    # Группы похожей обратной связи (сигнатуры загружаются из БД один раз)
+    get_feedback_clusterer()
+
+    # Выгрузка метрик в формате Prometheus
+    start_metrics_server(settings.METRICS_PORT)
+
+    # Включение/выключение профилирования сигналом: kill -USR2 <pid>
+    update_profiler.install_signal_handler()
+
     # Статистика при запуске
     stats = db_manager.get_user_statistics()
     logger.info(f"📊 Статистика: {stats['total_users']} пользователей, "
@@ -183,20 +227,52 @@ if __name__ == '__main__':
             validate_configuration()
             print("✅ Конфигурация проверена")
         elif command == 'stats':
-            stats = db_manager.get_user_statistics()
+            from database.manager import db_manager
+
+            # --exact: активные пользователи точно по user_actions, а не по скетчам (для сверки)
+            stats = db_manager.get_user_statistics(exact='--exact' in sys.argv[2:])
             print("📊 Статистика бота:")
             print(f"  Всего пользователей: {stats['total_users']}")
-            print(f"  Активных за неделю: {stats['active_week']}")
+            print(f"  Активных за день / неделю / месяц: "
+                  f"{stats['active_day']} / {stats['active_week']} / {stats['active_month']}")
             print(f"  Завершили онбординг: {stats['completion_rate']}%")
+            # Досчитанные скетчи сохраняются, чтобы следующий запуск не просматривал те же действия
+            db_manager.active_users.save()
         elif command == 'export':
             from utils.export import export_data
 
-            export_data()
+            # python main.py export [--format json|parquet|arrow] [--incremental]
+            export_data(sys.argv[sys.argv.index('--format') + 1] if '--format' in sys.argv else 'json',
+                        '--incremental' in sys.argv)
+        elif command == 'analytics':
+            from database.manager import db_manager
+            from services.analytics import get_onboarding_analytics, format_report
+            from services.stage_durations import format_summary
+
+            report = get_onboarding_analytics().report()
+            print(format_report(report, cohorts=12))
+            print(format_summary(db_manager.stage_durations.summary()))
+            print(f"⏱ Рассчитано за {report['compute_seconds']:.1f} с")
+            db_manager.stage_durations.save()
         elif command == 'cleanup':
+            from database.manager import db_manager
+
             days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
             deleted = db_manager.cleanup_old_data(days)
             print(f"🗑️ Удалено {deleted} старых записей")
+        elif command == 'reshard':
+            from database.sharding import reshard
+
+            # python main.py reshard <шардов> [--from <текущее количество шардов>]
+            target = int(sys.argv[2])
+            current = int(sys.argv[sys.argv.index('--from') + 1]) if '--from' in sys.argv else settings.DATABASE_SHARDS
+            print(f"🔀 Перенос пользователей: {current} -> {target} шардов (бот должен быть остановлен)...")
+            copied = reshard(settings.DATABASE_PATH, current, target)
+            for table, rows in copied.items():
+                print(f"  {table}: {rows} строк")
+            print(f"✅ Готово. Укажите DATABASE_SHARDS={target} перед запуском бота")
         elif command == 'validate':
+            from database.manager import db_manager
             from utils.validators import get_validation_summary
 
             summary = get_validation_summary()
@@ -212,6 +288,6 @@ if __name__ == '__main__':
             print(f"🗑️ Удалено {deleted} старых записей")
         else:
             print("❓ Неизвестная команда")
-            print("Доступные команды: setup, validate, stats, export, analytics, cleanup")
+            print("Доступные команды: setup, validate, stats, export, analytics, cleanup, reshard")
     else:
         main()
\ No newline at end of file
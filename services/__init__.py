@@ -3,9 +3,11 @@
 Модуль сервисов и бизнес-логики
 """
 
+from .search import SearchIndex, SearchResult, get_search_index
+
 # Заготовки для будущих сервисов
 # from .user_service import UserService
 # from .notification_service import NotificationService
 # from .analytics_service import AnalyticsService
 
-__all__ = []
\ No newline at end of file
+__all__ = ['SearchIndex', 'SearchResult', 'get_search_index']
\ No newline at end of file
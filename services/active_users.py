@@ -0,0 +1,187 @@
+# services/active_users.py
+"""
+Количество активных пользователей за день, неделю и месяц по скетчам
+HyperLogLog
+
+На каждый день хранится скетч пользователей, совершивших действие, и
+количество действий. log_user_action пополняет скетч текущего дня, DAU/
+WAU/MAU получаются объединением дневных скетчей без COUNT(DISTINCT) по
+user_actions. Скетчи периодически сохраняются в БД вместе с id последнего
+учтенного действия; при загрузке досчитываются действия после него (при
+первом запуске - вся история), поэтому после перезапуска ничего не теряется.
+"""
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from services.sketches import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+# Сколько действий досчитывать за один запрос при загрузке
+REPLAY_CHUNK = 1_000_000
+
+
+class ActiveUsers:
+    """Дневные скетчи активных пользователей одного DatabaseManager"""
+
+    def __init__(self, manager, precision: int = 14):
+        self.manager = manager
+        self.precision = precision
+        self.days: Dict[str, HyperLogLog] = {}
+        self.actions: Dict[str, int] = {}
+        self.last_action_id = 0
+        self.saves = 0
+        self._dirty = set()
+        # Кэш оценок по дням и объединений прошедших дней: меняется в основном только текущий день
+        self._counts: Dict[str, int] = {}
+        self._unions: Dict[tuple, HyperLogLog] = {}
+        self._pending: List[tuple] = []
+        self._replayed_until = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        """Загрузить сохраненные скетчи и досчитать действия после сохранения
+
+        Досчет идет без основной блокировки: действия, записанные в это
+        время, откладываются в _pending и учитываются в конце загрузки.
+        """
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+
+            days, actions, dirty = {}, {}, set()
+            last_saved = 0
+            for day, blob, day_actions, last_action_id in self.manager.get_activity_sketches():
+                days[day] = HyperLogLog.from_bytes(blob)
+                actions[day] = day_actions
+                last_saved = max(last_saved, last_action_id or 0)
+
+            until_id = self.manager.get_last_action_id()
+            for after_id in range(last_saved, until_id, REPLAY_CHUNK):
+                for day, user_id, day_actions in self.manager.get_action_days(
+                        after_id, min(after_id + REPLAY_CHUNK, until_id)):
+                    sketch = days.get(day)
+                    if sketch is None:
+                        sketch = days[day] = HyperLogLog(self.precision)
+                    sketch.add(user_id)
+                    actions[day] = actions.get(day, 0) + day_actions
+                    dirty.add(day)
+            if until_id > last_saved:
+                logger.info(f"Скетчи активных пользователей: учтено действий {until_id - last_saved}")
+
+            with self._lock:
+                self.days, self.actions = days, actions
+                self._dirty = dirty
+                self._counts, self._unions = {}, {}
+                self.last_action_id = self._replayed_until = max(last_saved, until_id)
+                for pending in self._pending:
+                    self._add(*pending)
+                self._pending = []
+                self._loaded = True
+
+    def _add(self, action_id: int, user_id: int, day: str):
+        # Действия до _replayed_until уже учтены загрузкой; остальные могут приходить не по порядку id
+        if action_id <= self._replayed_until:
+            return
+        sketch = self.days.get(day)
+        if sketch is None:
+            sketch = self.days[day] = HyperLogLog(self.precision)
+        sketch.add(user_id)
+        self.actions[day] = self.actions.get(day, 0) + 1
+        self._dirty.add(day)
+        self._counts.pop(day, None)
+        if self._unions:
+            for first, last in [key for key in self._unions if key[0] <= day <= key[1]]:
+                del self._unions[first, last]
+        self.last_action_id = max(self.last_action_id, action_id)
+
+    def observe(self, action_id: int, user_id: int, moment: datetime):
+        """Учесть действие пользователя"""
+        with self._lock:
+            if self._loaded:
+                self._add(action_id, user_id, moment.date().isoformat())
+            else:
+                self._pending.append((action_id, user_id, moment.date().isoformat()))
+
+    def count(self, days: int = 1, today: Optional[date] = None) -> int:
+        """Количество разных активных пользователей за последние days календарных дней (включая сегодня)"""
+        self._ensure_loaded()
+        today = today or date.today()
+        first = (today - timedelta(days=days - 1)).isoformat()
+        yesterday = (today - timedelta(days=1)).isoformat()
+        with self._lock:
+            if days == 1:
+                return self._day_count(today.isoformat())
+
+            # Объединение прошедших дней кэшируется, к нему добавляется только текущий день
+            past = self._unions.get((first, yesterday))
+            if past is None:
+                past = HyperLogLog.union(
+                    [self.days[day] for day in self._window(first, yesterday)], self.precision
+                )
+                self._unions[first, yesterday] = past
+                # Окна прошлых дат больше не понадобятся
+                if len(self._unions) > 8:
+                    del self._unions[next(iter(self._unions))]
+            current = self.days.get(today.isoformat())
+            return HyperLogLog.union([past, current]).count() if current else past.count()
+
+    def _window(self, first: str, last: str) -> List[str]:
+        return [day for day in self.days if first <= day <= last]
+
+    def _day_count(self, day: str) -> int:
+        count = self._counts.get(day)
+        if count is None:
+            sketch = self.days.get(day)
+            count = self._counts[day] = sketch.count() if sketch else 0
+        return count
+
+    def daily(self, days: int = 30, today: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Активные пользователи и действия по дням начиная с today - days, от новых к старым"""
+        self._ensure_loaded()
+        since = ((today or date.today()) - timedelta(days=days)).isoformat()
+        with self._lock:
+            return [
+                {'date': day, 'unique_users': self._day_count(day), 'total_actions': self.actions[day]}
+                for day in sorted(self.days, reverse=True) if day >= since
+            ]
+
+    def save(self) -> int:
+        """Сохранить изменившиеся дни; вернуть их количество"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            dirty = sorted(self._dirty)
+            rows = [(day, self.days[day].to_bytes(), self.actions[day]) for day in dirty]
+            self._dirty.clear()
+            last_action_id = self.last_action_id
+
+        try:
+            self.manager.save_activity_sketches(rows, last_action_id)
+        except Exception:
+            with self._lock:
+                self._dirty.update(dirty)
+            raise
+
+        self.saves += 1
+        return len(rows)
+
+    def attach(self, application, interval: float):
+        """Сохранять скетчи по расписанию JobQueue приложения"""
+        if application.job_queue is None:
+            logger.warning("JobQueue недоступна, скетчи активных пользователей сохраняются только при остановке")
+            return
+
+        async def save_job(context):
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"Не удалось сохранить скетчи активных пользователей: {e}")
+
+        application.job_queue.run_repeating(save_job, interval=interval, first=interval, name="active_users")
@@ -0,0 +1,247 @@
+# services/analytics.py
+"""
+Когорты, воронка этапов и время до этапа по истории действий
+
+Данные собираются двумя агрегирующими запросами к user_actions (недели
+активности и первые достижения этапов) и одним проходом по их
+результату. Отчет кэшируется до изменения данных; когда добавились
+только новые действия, досчитываются лишь они (диапазон id после
+прошлой отметки), а полный пересчет нужен после очистки старых данных.
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Этапы воронки после регистрации: действие, которое записывается при достижении этапа, и название
+FUNNEL_STEPS = [
+    ('preboarding_start', "Начали пребординг"),
+    ('docs_main_sent', "Отправили основные документы"),
+    ('docs_tk_sent', "Отправили документы по ТК РФ"),
+    ('preboarding_complete', "Завершили пребординг"),
+    ('onboarding_start', "Начали онбординг"),
+    ('email_access_confirmed', "Получили доступ к почте"),
+    ('team_intro', "Познакомились с командой"),
+    ('meetings_info', "Узнали о планерках"),
+    ('onboarding_completed', "Завершили онбординг"),
+]
+
+# Понедельник недели с номером 0 (см. DatabaseManager.get_activity_weeks)
+EPOCH_MONDAY = date(1969, 12, 29)
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Квантиль отсортированного списка (ближайший ранг)"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def week_number(day: date) -> int:
+    """Номер недели, как в DatabaseManager.get_activity_weeks"""
+    return (day - EPOCH_MONDAY).days // 7
+
+
+def week_start(week: int) -> date:
+    """Понедельник недели по ее номеру"""
+    return EPOCH_MONDAY + timedelta(weeks=week)
+
+
+def _hours(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds / 3600, 1) if seconds is not None else None
+
+
+def _days(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds / 86400, 1) if seconds is not None else None
+
+
+class OnboardingAnalytics:
+    """Отчет по когортам и воронке с кэшем до изменения данных"""
+
+    def __init__(self, manager, cohort_weeks: int = 12, retention_weeks: int = 8):
+        self.manager = manager
+        self.cohort_weeks = cohort_weeks
+        self.retention_weeks = retention_weeks
+        self.full_computations = 0
+        self.incremental_computations = 0
+
+        # Накопленное состояние: недели активности и первые достижения этапов по пользователям
+        self._weeks: Dict[int, Set[int]] = {}
+        self._firsts: Dict[int, Dict[str, str]] = {}
+        self._first_id: Optional[int] = None
+        self._last_id = 0
+
+        self._watermark: Optional[tuple] = None
+        self._report: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def report(self, force: bool = False) -> Dict[str, Any]:
+        """Отчет (из кэша, если данные не менялись)"""
+        with self._lock:
+            watermark = self.manager.get_analytics_watermark()
+            if not force and self._report is not None and watermark == self._watermark:
+                return self._report
+
+            started = time.perf_counter()
+            first_id, last_id = watermark[0] or 0, watermark[1] or 0
+
+            # После удаления старых действий (или сброса) накопленное состояние неверно
+            incremental = not force and self._first_id == first_id and last_id >= self._last_id
+            if not incremental:
+                self._weeks = {}
+                self._firsts = {}
+                self._last_id = 0
+
+            self._absorb(self._last_id, last_id)
+            self._first_id, self._last_id = first_id, last_id
+
+            self._report = self._summarize()
+            self._report['compute_seconds'] = round(time.perf_counter() - started, 2)
+            self._report['incremental'] = incremental
+            self._watermark = watermark
+
+            if incremental:
+                self.incremental_computations += 1
+            else:
+                self.full_computations += 1
+            logger.info(f"Аналитика когорт {'досчитана' if incremental else 'пересчитана'} "
+                        f"за {self._report['compute_seconds']:.1f} с")
+            return self._report
+
+    def _absorb(self, after_id: int, until_id: int):
+        """Добавить в состояние действия с id из (after_id, until_id]"""
+        if until_id <= after_id:
+            return
+
+        weeks = self._weeks
+        for user_id, week in self.manager.get_activity_weeks(after_id, until_id):
+            user_weeks = weeks.get(user_id)
+            if user_weeks is None:
+                weeks[user_id] = {week}
+            else:
+                user_weeks.add(week)
+
+        actions = [action for action, _ in FUNNEL_STEPS]
+        for user_id, action, first_at in self.manager.get_first_actions(actions, after_id, until_id):
+            firsts = self._firsts.setdefault(user_id, {})
+            # Даты хранятся строками одного формата, поэтому сравниваются без разбора
+            if action not in firsts or first_at < firsts[action]:
+                firsts[action] = first_at
+
+    def _summarize(self) -> Dict[str, Any]:
+        """Когорты, воронка и время до этапов по накопленному состоянию"""
+        current_week = week_number(date.today())
+        steps = len(FUNNEL_STEPS)
+        cohorts: Dict[int, Dict[str, Any]] = {}
+        reached = [0] * steps
+        durations: List[List[float]] = [[] for _ in range(steps)]
+        no_firsts: Dict[str, str] = {}
+        total = 0
+
+        for user_id, created_at in self.manager.get_user_signups():
+            if not created_at:
+                continue
+            total += 1
+            signup = datetime.fromisoformat(created_at)
+            signup_week = week_number(signup.date())
+
+            cohort = cohorts.get(signup_week)
+            if cohort is None:
+                cohort = cohorts[signup_week] = {
+                    'users': 0, 'active': [0] * (self.retention_weeks + 1), 'completion': []
+                }
+            cohort['users'] += 1
+            for week in self._weeks.get(user_id, ()):
+                offset = week - signup_week
+                if 0 <= offset <= self.retention_weeks:
+                    cohort['active'][offset] += 1
+
+            # Этап засчитывается, только если пройдены все предыдущие
+            firsts = self._firsts.get(user_id, no_firsts)
+            for index, (action, _) in enumerate(FUNNEL_STEPS):
+                first_at = firsts.get(action)
+                if first_at is None:
+                    break
+                reached[index] += 1
+                elapsed = max(0.0, (datetime.fromisoformat(first_at) - signup).total_seconds())
+                durations[index].append(elapsed)
+                if index == steps - 1:
+                    cohort['completion'].append(elapsed)
+
+        funnel = []
+        for index, (action, name) in enumerate(FUNNEL_STEPS):
+            previous = reached[index - 1] if index else total
+            values = sorted(durations[index])
+            funnel.append({
+                'action': action,
+                'name': name,
+                'users': reached[index],
+                'conversion': round(reached[index] / previous * 100, 1) if previous else 0.0,
+                'from_start': round(reached[index] / total * 100, 1) if total else 0.0,
+                'median_hours': _hours(percentile(values, 0.5)),
+                'p90_hours': _hours(percentile(values, 0.9)),
+            })
+
+        cohort_rows = []
+        for signup_week in sorted(cohorts)[-self.cohort_weeks:]:
+            cohort = cohorts[signup_week]
+            completion = sorted(cohort['completion'])
+            cohort_rows.append({
+                'week': week_start(signup_week).isoformat(),
+                'users': cohort['users'],
+                # Недели, которые еще не наступили, - None, а не 0%
+                'retention': [
+                    round(active / cohort['users'] * 100, 1) if signup_week + offset <= current_week else None
+                    for offset, active in enumerate(cohort['active'])
+                ],
+                'completed': len(completion),
+                'completion_median_days': _days(percentile(completion, 0.5)),
+                'completion_p90_days': _days(percentile(completion, 0.9)),
+            })
+
+        return {
+            'users': total,
+            'funnel': funnel,
+            'cohorts': cohort_rows,
+            'computed_at': datetime.now().isoformat(),
+        }
+
+
+def format_report(report: Dict[str, Any], cohorts: int = 6) -> str:
+    """Отчет в виде текста для Telegram и консоли"""
+    text = (f"📊 Воронка (конверсия от предыдущего этапа; время от регистрации, медиана / p90):\n"
+            f"• Зарегистрировались: {report['users']}\n")
+    for step in report['funnel']:
+        timing = ""
+        if step['median_hours'] is not None:
+            timing = f", {step['median_hours']:.0f} / {step['p90_hours']:.0f} ч"
+        text += f"• {step['name']}: {step['users']} ({step['conversion']:.1f}%{timing})\n"
+
+    text += "\n👥 Когорты по неделе регистрации (активны на неделе 0 / 1 / 4; завершили, медиана дней):\n"
+    for cohort in report['cohorts'][-cohorts:]:
+        retention = [f"{value:.0f}%" if value is not None else "-" for value in cohort['retention']]
+        week4 = retention[4] if len(retention) > 4 else "-"
+        median = f"{cohort['completion_median_days']:.1f}" if cohort['completion_median_days'] is not None else "-"
+        text += (f"• {datetime.fromisoformat(cohort['week']).strftime('%d.%m')}: {cohort['users']} польз., "
+                 f"{retention[0]} / {retention[1]} / {week4}; {cohort['completed']}, {median}\n")
+
+    return text
+
+
+_onboarding_analytics: Optional[OnboardingAnalytics] = None
+
+
+def get_onboarding_analytics() -> OnboardingAnalytics:
+    """Получить общий экземпляр аналитики (кэш отчета общий для всех обработчиков)"""
+    global _onboarding_analytics
+
+    if _onboarding_analytics is None:
+        # Полные проходы по истории действий читают копию БД, а не основную
+        from database.replica import analytics_db
+
+        _onboarding_analytics = OnboardingAnalytics(analytics_db)
+
+    return _onboarding_analytics
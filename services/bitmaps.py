@@ -0,0 +1,218 @@
+# services/bitmaps.py
+"""
+Сжатые множества неотрицательных целых чисел в духе Roaring (Chambi,
+Lemire и др., 2016)
+
+Числа делятся на блоки по старшим битам (value >> 16); младшие 16 бит
+хранятся в контейнере блока одного из двух видов: отсортированный массив
+array('H') для редких значений (2 байта на значение) или битовая карта на
+65536 бит - целое Python размером 8 КБ для плотных. Пересечение,
+объединение и разность идут поблочно, две битовые карты комбинируются
+одной целочисленной операцией.
+"""
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Union
+
+# Контейнер с большим количеством значений хранится битовой картой
+ARRAY_LIMIT = 4096
+# Битовая карта превращается обратно в массив, когда в ней осталось не больше значений
+# (с запасом относительно ARRAY_LIMIT, чтобы контейнер не менял вид на каждом add/discard)
+BITMAP_LIMIT = ARRAY_LIMIT // 2
+BLOCK_BYTES = 1 << 13
+
+Container = Union[array, int]
+
+# Номера установленных битов для каждого значения байта
+_BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def _to_bitmap(values: Iterable[int]) -> int:
+    data = bytearray(BLOCK_BYTES)
+    for value in values:
+        data[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(data, 'little')
+
+
+def _to_array(bits: int) -> array:
+    result = array('H')
+    for index, byte in enumerate(bits.to_bytes(BLOCK_BYTES, 'little')):
+        if byte:
+            base = index << 3
+            result.extend(base + bit for bit in _BYTE_BITS[byte])
+    return result
+
+
+def _cardinality(container: Container) -> int:
+    return container.bit_count() if isinstance(container, int) else len(container)
+
+
+def _values(container: Container) -> array:
+    return _to_array(container) if isinstance(container, int) else container
+
+
+def _from_values(values: List[int]) -> Container:
+    """Контейнер для отсортированных младших частей"""
+    return _to_bitmap(values) if len(values) > ARRAY_LIMIT else array('H', values)
+
+
+def _and(first: Container, second: Container) -> Container:
+    if isinstance(first, int) and isinstance(second, int):
+        return first & second
+    if isinstance(first, int):
+        first, second = second, first
+    if isinstance(second, int):
+        data = second.to_bytes(BLOCK_BYTES, 'little')
+        return array('H', [value for value in first if data[value >> 3] >> (value & 7) & 1])
+    return array('H', sorted(set(first).intersection(second)))
+
+
+def _or(first: Container, second: Container) -> Container:
+    if isinstance(first, int) and isinstance(second, int):
+        return first | second
+    if isinstance(first, int):
+        first, second = second, first
+    if isinstance(second, int):
+        return second | _to_bitmap(first)
+    return _from_values(sorted(set(first).union(second)))
+
+
+def _sub(first: Container, second: Container) -> Container:
+    if isinstance(first, int):
+        return first & ~(second if isinstance(second, int) else _to_bitmap(second))
+    if isinstance(second, int):
+        data = second.to_bytes(BLOCK_BYTES, 'little')
+        return array('H', [value for value in first if not data[value >> 3] >> (value & 7) & 1])
+    return array('H', sorted(set(first).difference(second)))
+
+
+def _copy(container: Container) -> Container:
+    # Целые неизменяемы, массивы копируются, чтобы add/discard результата не меняли исходное множество
+    return container if isinstance(container, int) else array('H', container)
+
+
+class RoaringBitmap:
+    """Сжатое множество неотрицательных целых чисел"""
+
+    __slots__ = ('containers',)
+
+    def __init__(self, values: Iterable[int] = ()):
+        self.containers: Dict[int, Container] = {}
+        blocks: Dict[int, List[int]] = {}
+        for value in values:
+            blocks.setdefault(value >> 16, []).append(value & 0xFFFF)
+        for key, lows in blocks.items():
+            self.containers[key] = _from_values(sorted(set(lows)))
+
+    @classmethod
+    def _of(cls, containers: Dict[int, Container]) -> 'RoaringBitmap':
+        bitmap = cls()
+        bitmap.containers = {key: container for key, container in containers.items() if container}
+        return bitmap
+
+    def add(self, value: int):
+        key, low = value >> 16, value & 0xFFFF
+        container = self.containers.get(key)
+        if container is None:
+            self.containers[key] = array('H', [low])
+        elif isinstance(container, int):
+            self.containers[key] = container | (1 << low)
+        else:
+            index = bisect_left(container, low)
+            if index < len(container) and container[index] == low:
+                return
+            container.insert(index, low)
+            if len(container) > ARRAY_LIMIT:
+                self.containers[key] = _to_bitmap(container)
+
+    def discard(self, value: int):
+        key, low = value >> 16, value & 0xFFFF
+        container = self.containers.get(key)
+        if container is None:
+            return
+        if isinstance(container, int):
+            container &= ~(1 << low)
+            if container.bit_count() <= BITMAP_LIMIT:
+                container = _to_array(container)
+            self.containers[key] = container
+        else:
+            index = bisect_left(container, low)
+            if index < len(container) and container[index] == low:
+                del container[index]
+        if not self.containers[key]:
+            del self.containers[key]
+
+    def __contains__(self, value: int) -> bool:
+        container = self.containers.get(value >> 16)
+        if container is None:
+            return False
+        low = value & 0xFFFF
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        index = bisect_left(container, low)
+        return index < len(container) and container[index] == low
+
+    def __len__(self) -> int:
+        return sum(_cardinality(container) for container in self.containers.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.containers)
+
+    def __iter__(self) -> Iterator[int]:
+        for key in sorted(self.containers):
+            base = key << 16
+            for low in _values(self.containers[key]):
+                yield base | low
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RoaringBitmap):
+            return NotImplemented
+        return self.containers.keys() == other.containers.keys() and all(
+            list(_values(container)) == list(_values(other.containers[key]))
+            for key, container in self.containers.items()
+        )
+
+    def __and__(self, other: 'RoaringBitmap') -> 'RoaringBitmap':
+        return RoaringBitmap._of({
+            key: _and(container, other.containers[key])
+            for key, container in self.containers.items() if key in other.containers
+        })
+
+    def __or__(self, other: 'RoaringBitmap') -> 'RoaringBitmap':
+        containers = {key: _copy(container) for key, container in self.containers.items()}
+        for key, container in other.containers.items():
+            mine = containers.get(key)
+            containers[key] = _copy(container) if mine is None else _or(mine, container)
+        return RoaringBitmap._of(containers)
+
+    def __sub__(self, other: 'RoaringBitmap') -> 'RoaringBitmap':
+        return RoaringBitmap._of({
+            key: _sub(container, other.containers[key]) if key in other.containers else _copy(container)
+            for key, container in self.containers.items()
+        })
+
+    @classmethod
+    def union(cls, bitmaps: Iterable['RoaringBitmap']) -> 'RoaringBitmap':
+        """Объединение нескольких множеств (каждый блок собирается за один проход)"""
+        bits: Dict[int, int] = {}
+        lows: Dict[int, set] = {}
+        for bitmap in bitmaps:
+            for key, container in bitmap.containers.items():
+                if isinstance(container, int):
+                    bits[key] = bits.get(key, 0) | container
+                else:
+                    lows.setdefault(key, set()).update(container)
+
+        containers = {}
+        for key in bits.keys() | lows.keys():
+            values = lows.get(key)
+            if key in bits:
+                containers[key] = bits[key] | _to_bitmap(values) if values else bits[key]
+            else:
+                containers[key] = _from_values(sorted(values))
+        return cls._of(containers)
+
+    def nbytes(self) -> int:
+        """Размер контейнеров в байтах"""
+        return sum(BLOCK_BYTES if isinstance(container, int) else container.itemsize * len(container)
+                   for container in self.containers.values())
@@ -0,0 +1,167 @@
+# services/duplicates.py
+"""
+Группировка похожей обратной связи (шинглы + MinHash + LSH)
+"""
+import logging
+import random
+import zlib
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from database.models import Feedback
+from services.search import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Простое число Мерсенна для универсального хеширования
+_PRIME = (1 << 61) - 1
+_MASK = 0xFFFFFFFF
+_SEED = 20240601
+
+# Количество сообщений в группе, при котором администраторы получают повторное уведомление
+NOTIFY_MILESTONES = frozenset({2, 5, 10, 25, 50})
+
+
+def shingles(text: str) -> Set[str]:
+    """Шинглы сообщения: множество основ значимых слов
+
+    Сообщения обратной связи короткие, поэтому пары слов делают сходство
+    слишком чувствительным к порядку слов.
+    """
+    return set(normalize_text(text))
+
+
+def should_notify(count: int) -> bool:
+    """Нужно ли уведомлять администраторов о сообщении, ставшем count-м в группе"""
+    return count == 1 or count in NOTIFY_MILESTONES or count % 100 == 0
+
+
+@dataclass
+class ClusterMatch:
+    """Результат отнесения сообщения к группе"""
+    cluster_id: Optional[int]
+    similarity: float
+    signature: array
+    count: int = 1
+
+
+class FeedbackClusterer:
+    """Инкрементальный поиск похожих сообщений обратной связи
+
+    В LSH-корзины попадают только сигнатуры образцов групп, поэтому группа
+    не "расползается" за счет цепочек частично похожих сообщений.
+    """
+
+    def __init__(self, manager, num_perm: int = 64, bands: int = 16, threshold: float = 0.5):
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+
+        self.manager = manager
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        rng = random.Random(_SEED)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self.buckets: Dict[tuple, List[int]] = {}
+        self.signatures: Dict[int, array] = {}
+        self.loaded = False
+
+    def signature(self, text: str) -> Optional[array]:
+        """MinHash-сигнатура сообщения (None, если в нем нет значимых слов)"""
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)]
+        if not hashes:
+            return None
+
+        return array('I', (
+            min((a * h + b) % _PRIME for h in hashes) & _MASK
+            for a, b in self._perms
+        ))
+
+    def _band_keys(self, signature: array) -> List[tuple]:
+        """Ключи LSH-корзин для сигнатуры"""
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def register(self, cluster_id: int, signature: array):
+        """Добавить образец группы в LSH-корзины"""
+        self.signatures[cluster_id] = signature
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(cluster_id)
+
+    def assign(self, text: str) -> ClusterMatch:
+        """Найти группу для сообщения (только в памяти, без записи в БД)"""
+        signature = self.signature(text)
+        if signature is None:
+            return ClusterMatch(cluster_id=None, similarity=0.0, signature=array('I'))
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        best_id, best_similarity = None, 0.0
+        for cluster_id in candidates:
+            other = self.signatures[cluster_id]
+            similarity = sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+            if similarity > best_similarity:
+                best_id, best_similarity = cluster_id, similarity
+
+        if best_similarity < self.threshold:
+            best_id = None
+
+        return ClusterMatch(cluster_id=best_id, similarity=best_similarity, signature=signature)
+
+    def add_feedback(self, feedback: Feedback) -> ClusterMatch:
+        """Отнести сохраненное сообщение к группе и записать результат в БД"""
+        self.load()
+
+        match = self.assign(feedback.message)
+
+        if match.cluster_id is not None:
+            match.count = self.manager.increment_feedback_cluster(match.cluster_id)
+        else:
+            cluster = self.manager.create_feedback_cluster(feedback)
+            match.cluster_id = cluster.id
+            match.count = 1
+            if len(match.signature):
+                self.register(cluster.id, match.signature)
+
+        self.manager.save_feedback_signature(feedback.id, match.cluster_id, match.signature.tobytes())
+        return match
+
+    def load(self):
+        """Загрузить сигнатуры образцов из БД и сгруппировать необработанную обратную связь"""
+        if self.loaded:
+            return
+        self.loaded = True
+
+        for cluster_id, blob in self.manager.get_cluster_signatures():
+            signature = array('I')
+            signature.frombytes(blob)
+            if len(signature) == self.num_perm:
+                self.register(cluster_id, signature)
+
+        unclustered = self.manager.get_unclustered_feedback()
+        for feedback in unclustered:
+            self.add_feedback(feedback)
+
+        logger.info(f"Группы обратной связи загружены: {len(self.signatures)} групп, "
+                    f"обработано новых сообщений: {len(unclustered)}")
+
+
+_feedback_clusterer: Optional[FeedbackClusterer] = None
+
+
+def get_feedback_clusterer() -> FeedbackClusterer:
+    """Получить общий экземпляр группировщика обратной связи (загружается один раз)"""
+    global _feedback_clusterer
+
+    if _feedback_clusterer is None:
+        from database.manager import db_manager
+
+        _feedback_clusterer = FeedbackClusterer(db_manager)
+        _feedback_clusterer.load()
+
+    return _feedback_clusterer
@@ -0,0 +1,255 @@
+# services/export_jobs.py
+"""
+Фоновые выгрузки данных для администраторов с отправкой файлов в Telegram
+
+Выгрузка запускается отдельной задачей и не занимает обработчик:
+таблицы читаются пачками из копии БД для аналитики в потоке и пишутся
+построчно (JSON Lines) в архивы gzip. Архив делится на части не больше
+EXPORT_PART_SIZE_MB, каждая часть - самостоятельный .jsonl.gz. Пока идет
+выгрузка, сообщение администратора обновляется прогрессом не чаще раза в
+progress_interval секунд; готовые части отправляются документами.
+Одновременно выполняется не больше max_jobs выгрузок, остальные ждут в
+очереди; у одного администратора - одна выгрузка за раз.
+"""
+import asyncio
+import gzip
+import io
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from config.settings import settings
+from utils.columnar import TABLE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Строк в пачке: чем меньше, тем точнее прогресс и размер частей
+EXPORT_BATCH_SIZE = 10_000
+
+
+class ExportCancelled(Exception):
+    """Выгрузка остановлена вместе с ботом"""
+
+
+@dataclass
+class ExportJob:
+    """Выгрузка одного администратора"""
+    admin_id: int
+    chat_id: int
+    message_id: Optional[int] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    state: str = "queued"
+    rows: int = 0
+    total_rows: int = 0
+    table_rows: Dict[str, int] = field(default_factory=dict)
+    status_counts: Dict[str, int] = field(default_factory=dict)
+    parts: List[str] = field(default_factory=list)
+    cancelled: bool = False
+
+    def progress_text(self) -> str:
+        """Текст сообщения с прогрессом"""
+        if self.state == "queued":
+            return "⏳ Экспорт данных в очереди: выполняются другие выгрузки..."
+        percent = self.rows * 100 // self.total_rows if self.total_rows else 0
+        text = f"📤 Экспорт данных: {percent}% ({self.rows} из {self.total_rows} записей)"
+        if self.state == "sending":
+            text += f"\n📎 Отправка файлов: {len(self.parts)}"
+        return text
+
+
+def write_export(manager, job: ExportJob, directory: str, part_size: int,
+                 batch_size: int = EXPORT_BATCH_SIZE) -> List[str]:
+    """Записать таблицы в архивы частей; вернуть пути частей
+
+    Выполняется в потоке. Каждая строка - JSON-объект с полем table;
+    новая часть начинается, когда сжатый размер текущей достиг part_size.
+    """
+    counts = manager.count_export_rows()
+    job.total_rows = sum(counts[table] for table in TABLE_COLUMNS)
+    timestamp = job.created_at.strftime('%Y%m%d_%H%M%S')
+    os.makedirs(directory, exist_ok=True)
+
+    raw = writer = None
+
+    def open_part():
+        nonlocal raw, writer
+        path = os.path.join(directory, f"onboarding_export_{timestamp}_part{len(job.parts) + 1}.jsonl.gz")
+        job.parts.append(path)
+        raw = open(path, 'wb')
+        writer = io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode='wb'), encoding='utf-8')
+
+    def close_part():
+        writer.close()
+        raw.close()
+
+    open_part()
+    try:
+        for table in TABLE_COLUMNS:
+            columns = [name for name, _ in TABLE_COLUMNS[table]]
+            job.table_rows[table] = 0
+            for rows in manager.iter_table_batches(table, columns, batch_size):
+                if job.cancelled:
+                    raise ExportCancelled()
+                if raw.tell() >= part_size:
+                    close_part()
+                    open_part()
+                for row in rows:
+                    record = dict(zip(columns, row))
+                    writer.write(json.dumps({'table': table, **record}, ensure_ascii=False) + '\n')
+                    if table == 'users':
+                        job.status_counts[record['status']] = job.status_counts.get(record['status'], 0) + 1
+                job.table_rows[table] += len(rows)
+                job.rows += len(rows)
+        close_part()
+    except BaseException:
+        close_part()
+        remove_parts(job)
+        raise
+    return job.parts
+
+
+def remove_parts(job: ExportJob):
+    """Удалить файлы частей выгрузки"""
+    for path in job.parts:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ExportJobs:
+    """Очередь фоновых выгрузок"""
+
+    def __init__(self, max_jobs: int = 1, progress_interval: float = 5.0, part_size_mb: float = 45,
+                 directory: str = "data/exports"):
+        self.max_jobs = max_jobs
+        self.progress_interval = progress_interval
+        self.part_size = int(part_size_mb * 2 ** 20)
+        self.directory = directory
+        self.jobs: Dict[int, ExportJob] = {}
+        self.completed = 0
+        self.progress_edits = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, bot, admin_id: int, chat_id: int, message_id: int = None) -> Optional[ExportJob]:
+        """Поставить выгрузку в очередь; None, если у администратора уже идет выгрузка"""
+        if admin_id in self.jobs:
+            return None
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_jobs)
+
+        job = self.jobs[admin_id] = ExportJob(admin_id=admin_id, chat_id=chat_id, message_id=message_id)
+        task = asyncio.create_task(self._run(bot, job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, bot, job: ExportJob):
+        """Выполнить выгрузку и отправить части администратору"""
+        from database.replica import analytics_db
+
+        started = time.perf_counter()
+        try:
+            if self._semaphore.locked():
+                await self._show_progress(bot, job)
+            async with self._semaphore:
+                job.state = "running"
+                worker = asyncio.ensure_future(asyncio.to_thread(
+                    write_export, analytics_db, job, self.directory, self.part_size
+                ))
+                # Прогресс обновляется по времени, а не по пачкам: не чаще раза в progress_interval
+                while not worker.done():
+                    await self._show_progress(bot, job)
+                    await asyncio.wait({worker}, timeout=self.progress_interval)
+                parts = worker.result()
+
+                job.state = "sending"
+                await self._show_progress(bot, job)
+                for number, path in enumerate(parts, 1):
+                    # Остановка бота не ждет отправки оставшихся частей
+                    if job.cancelled:
+                        raise ExportCancelled()
+                    with open(path, 'rb') as document:
+                        await bot.send_document(
+                            chat_id=job.chat_id,
+                            document=document,
+                            filename=os.path.basename(path),
+                            caption=f"📦 Часть {number} из {len(parts)}",
+                        )
+            remove_parts(job)
+
+            job.state = "done"
+            self.completed += 1
+            await self._edit(bot, job, self._summary(job, time.perf_counter() - started))
+            logger.info(f"Экспорт для администратора {job.admin_id}: {job.rows} записей, "
+                        f"{len(job.parts)} частей за {time.perf_counter() - started:.1f} с")
+        except ExportCancelled:
+            logger.info(f"Экспорт для администратора {job.admin_id} остановлен")
+            if job.state == "sending":
+                # Части, которые не успели отправить, остаются на сервере
+                logger.info(f"Неотправленные файлы экспорта сохранены в {self.directory}/")
+        except Exception as e:
+            logger.error(f"Ошибка экспорта данных для администратора {job.admin_id}: {e}")
+            text = f"❌ Ошибка при экспорте данных:\n{e}"
+            if job.state == "sending":
+                text += f"\n\n📁 Файлы сохранены на сервере в {self.directory}/"
+            await self._edit(bot, job, text)
+        finally:
+            self.jobs.pop(job.admin_id, None)
+
+    @staticmethod
+    def _summary(job: ExportJob, seconds: float) -> str:
+        text = f"""
+📥 Экспорт данных завершен
+
+📊 Экспортированные данные:
+• Пользователи: {job.table_rows.get('users', 0)}
+• Обратная связь: {job.table_rows.get('feedback', 0)}
+• Действия пользователей: {job.table_rows.get('user_actions', 0)}
+
+📎 Файлов: {len(job.parts)} (JSON Lines, gzip)
+⏱ Время: {seconds:.1f} с
+
+💾 Сводка по статусам:
+"""
+        for status, count in job.status_counts.items():
+            text += f"• {status}: {count}\n"
+        return text
+
+    async def _show_progress(self, bot, job: ExportJob):
+        if await self._edit(bot, job, job.progress_text()):
+            self.progress_edits += 1
+
+    async def _edit(self, bot, job: ExportJob, text: str) -> bool:
+        """Обновить сообщение выгрузки (или отправить новое, если его нет)"""
+        try:
+            if job.message_id is None:
+                message = await bot.send_message(chat_id=job.chat_id, text=text)
+                job.message_id = message.message_id
+            else:
+                await bot.edit_message_text(chat_id=job.chat_id, message_id=job.message_id, text=text)
+            return True
+        except Exception as e:
+            # "Message is not modified", если прогресс не изменился с прошлого обновления
+            logger.debug(f"Не удалось обновить сообщение экспорта: {e}")
+            return False
+
+    async def stop(self):
+        """Остановить выгрузки при остановке бота (между пачками строк и между частями)"""
+        for job in self.jobs.values():
+            job.cancelled = True
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# Глобальная очередь выгрузок
+export_jobs = ExportJobs(
+    max_jobs=settings.EXPORT_MAX_JOBS,
+    progress_interval=settings.EXPORT_PROGRESS_INTERVAL,
+    part_size_mb=settings.EXPORT_PART_SIZE_MB
+)
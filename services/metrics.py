@@ -0,0 +1,333 @@
+# services/metrics.py
+"""
+Метрики производительности: гистограммы задержек обработчиков, методов БД
+и запросов к Bot API с выгрузкой в текстовом формате Prometheus
+"""
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from types import FunctionType
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Учесть значение"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля линейной интерполяцией внутри корзины"""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class Counter:
+    """Монотонный счетчик"""
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        """Увеличить счетчик"""
+        self.value += amount
+
+
+def _escape(value) -> str:
+    """Экранирование значения метки"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    """Метки в формате Prometheus"""
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    """Реестр метрик"""
+
+    def __init__(self):
+        self.histograms: Dict[str, Dict[tuple, Histogram]] = {}
+        self.counters: Dict[str, Dict[tuple, Counter]] = {}
+        self.descriptions: Dict[str, str] = {}
+        self.collectors: List[Callable[[], List[str]]] = []
+
+    def histogram(self, name: str, description: str, buckets: Tuple[float, ...], **labels) -> Histogram:
+        """Получить (или создать) гистограмму с метками"""
+        self.descriptions.setdefault(name, description)
+        series = self.histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        if key not in series:
+            series[key] = Histogram(buckets)
+        return series[key]
+
+    def counter(self, name: str, description: str, **labels) -> Counter:
+        """Получить (или создать) счетчик с метками"""
+        self.descriptions.setdefault(name, description)
+        series = self.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        if key not in series:
+            series[key] = Counter()
+        return series[key]
+
+    def get_histograms(self, name: str) -> List[Tuple[Dict[str, str], Histogram]]:
+        """Все гистограммы метрики с их метками"""
+        return [(dict(key), histogram) for key, histogram in self.histograms.get(name, {}).items()]
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Добавить функцию, возвращающую дополнительные строки выгрузки"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Выгрузка всех метрик в текстовом формате Prometheus"""
+        lines = []
+
+        for name, series in self.counters.items():
+            lines.append(f"# HELP {name} {self.descriptions[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, counter in list(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {counter.value}")
+
+        for name, series in self.histograms.items():
+            lines.append(f"# HELP {name} {self.descriptions[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in list(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(key, 'le="%s"' % bound)
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                labels = _format_labels(key, 'le="+Inf"')
+                lines.append(f"{name}_bucket{labels} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+
+        for collector in self.collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                logger.error(f"Ошибка сбора метрик: {e}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Глобальный реестр метрик
+metrics = MetricsRegistry()
+
+
+class UpdateStats:
+    """Счетчики одного обновления Telegram"""
+
+    __slots__ = ('db_queries', 'db_time', 'db_depth', 'api_time')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.db_depth = 0
+        self.api_time = 0.0
+
+
+# Счетчики обновления, которое сейчас обрабатывается (None вне обработчиков)
+current_update: ContextVar[Optional[UpdateStats]] = ContextVar('current_update', default=None)
+
+_db_statements = metrics.counter('onboarding_db_statements_total', 'Выполнено SQL-запросов')
+_db_commits = metrics.counter('onboarding_db_commits_total', 'Зафиксировано транзакций')
+
+
+def count_db_statement(statement: str):
+    """Trace-callback SQLite: учесть выполненный SQL-запрос"""
+    _db_statements.value += 1
+    if statement == 'COMMIT':
+        _db_commits.value += 1
+    stats = current_update.get()
+    if stats is not None:
+        stats.db_queries += 1
+
+
+def instrument_handler(name: str, callback):
+    """Обернуть обработчик обновлений замером времени, запросов к БД и ожидания API"""
+    latency = metrics.histogram('onboarding_handler_seconds', 'Время обработки обновления',
+                                LATENCY_BUCKETS, handler=name)
+    db_queries = metrics.histogram('onboarding_handler_db_queries', 'SQL-запросов на обновление',
+                                   COUNT_BUCKETS, handler=name)
+    db_time = metrics.histogram('onboarding_handler_db_seconds', 'Время в БД на обновление',
+                                LATENCY_BUCKETS, handler=name)
+    api_time = metrics.histogram('onboarding_handler_api_seconds', 'Ожидание Bot API на обновление',
+                                 LATENCY_BUCKETS, handler=name)
+    errors = metrics.counter('onboarding_handler_errors_total', 'Ошибки обработчиков', handler=name)
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        stats = UpdateStats()
+        token = current_update.set(stats)
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            errors.value += 1
+            raise
+        finally:
+            latency.observe(time.perf_counter() - started)
+            db_queries.observe(stats.db_queries)
+            db_time.observe(stats.db_time)
+            api_time.observe(stats.api_time)
+            current_update.reset(token)
+
+    return wrapper
+
+
+def instrument_method(name: str, func):
+    """Обернуть метод БД замером времени"""
+    latency = metrics.histogram('onboarding_db_seconds', 'Время выполнения методов DatabaseManager',
+                                DB_LATENCY_BUCKETS, method=name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = current_update.get()
+        if stats is not None:
+            stats.db_depth += 1
+
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            latency.observe(elapsed)
+            if stats is not None:
+                stats.db_depth -= 1
+                # Вложенные вызовы методов БД уже учтены во внешнем
+                if not stats.db_depth:
+                    stats.db_time += elapsed
+
+    return wrapper
+
+
+def instrument_class(cls, exclude: Tuple[str, ...] = ()):
+    """Обернуть все публичные методы класса"""
+    for attr_name, attr in list(vars(cls).items()):
+        if attr_name.startswith('_') or attr_name in exclude or not isinstance(attr, FunctionType):
+            continue
+        setattr(cls, attr_name, instrument_method(attr_name, attr))
+    return cls
+
+
+def handler_name(handler) -> str:
+    """Имя обработчика для метрик: "/команда" или имя функции"""
+    from telegram.ext import CommandHandler
+
+    if isinstance(handler, CommandHandler):
+        return "/" + sorted(handler.commands)[0]
+    return getattr(handler.callback, '__name__', type(handler).__name__)
+
+
+def instrument_application(application):
+    """Обернуть все зарегистрированные обработчики приложения"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = instrument_handler(handler_name(handler), handler.callback)
+
+
+def observe_api_call(method: str, elapsed: float):
+    """Учесть время запроса к Bot API"""
+    metrics.histogram('onboarding_api_seconds', 'Время запросов к Bot API',
+                      LATENCY_BUCKETS, method=method).observe(elapsed)
+    stats = current_update.get()
+    if stats is not None:
+        stats.api_time += elapsed
+
+
+def _collect_process_metrics() -> List[str]:
+    """Метрики процесса (если установлен psutil)"""
+    try:
+        import psutil
+    except ImportError:
+        return []
+
+    process = psutil.Process()
+    return [
+        "# TYPE process_resident_memory_bytes gauge",
+        f"process_resident_memory_bytes {process.memory_info().rss}",
+        "# TYPE process_cpu_seconds_total counter",
+        f"process_cpu_seconds_total {sum(process.cpu_times()[:2])}",
+    ]
+
+
+metrics.add_collector(_collect_process_metrics)
+
+
+def _metrics_handler_class():
+    """HTTP-обработчик выгрузки метрик (http.server импортируется, только когда сервер нужен)"""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHTTPHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHTTPHandler
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1'):
+    """Запустить HTTP-сервер метрик в фоновом потоке (ThreadingHTTPServer или None)"""
+    if not port:
+        return None
+
+    from http.server import ThreadingHTTPServer
+
+    try:
+        server = ThreadingHTTPServer((host, port), _metrics_handler_class())
+    except OSError as e:
+        logger.error(f"Не удалось запустить сервер метрик на {host}:{port}: {e}")
+        return None
+
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    logger.info(f"📈 Метрики доступны на http://{host}:{port}/metrics")
+    return server
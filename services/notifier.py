@@ -0,0 +1,142 @@
+# services/notifier.py
+"""
+Фоновая отправка уведомлений администраторам с объединением в дайджесты
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+DIGEST_SEPARATOR = "\n\n" + "─" * 30 + "\n\n"
+
+
+def build_digests(messages: List[str], max_length: int) -> List[str]:
+    """Склеить сообщения в дайджесты, не превышая максимальную длину сообщения"""
+    if len(messages) == 1:
+        return [messages[0][:max_length]]
+
+    header = f"📬 Дайджест уведомлений ({len(messages)})\n\n"
+    digests = []
+    current = header
+
+    for message in messages:
+        message = message.strip()[:max_length - len(header)]
+        if current != header and len(current) + len(DIGEST_SEPARATOR) + len(message) > max_length:
+            digests.append(current)
+            current = header
+        current += (DIGEST_SEPARATOR if current != header else "") + message
+
+    digests.append(current)
+    return digests
+
+
+class AdminNotifier:
+    """Очередь уведомлений администраторам
+
+    Сообщения накапливаются для каждого администратора отдельно и
+    отправляются одним дайджестом раз в window секунд или сразу по
+    достижении max_batch сообщений. Отправка разным администраторам идет
+    параллельно в фоновой задаче и не задерживает ответ пользователю.
+    """
+
+    def __init__(self, window: float = 30.0, max_batch: int = 10, max_length: int = 4000):
+        self.window = window
+        self.max_batch = max_batch
+        self.max_length = max_length
+        self.pending: Dict[int, List[str]] = {}
+        self.sent_messages = 0
+        self.sent_digests = 0
+        self._bot = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    async def notify(self, bot, text: str, admin_ids: List[int] = None):
+        """Поставить уведомление в очередь для администраторов"""
+        admin_ids = settings.ADMIN_IDS if admin_ids is None else admin_ids
+
+        # Дайджесты отключены: отправляем сразу, как раньше
+        if self.window <= 0:
+            for admin_id in admin_ids:
+                await self._send(bot, admin_id, text)
+            return
+
+        self._ensure_started(bot)
+
+        for admin_id in admin_ids:
+            queue = self.pending.setdefault(admin_id, [])
+            queue.append(text)
+            if len(queue) >= self.max_batch:
+                self._wakeup.set()
+
+    def _ensure_started(self, bot):
+        """Запустить фоновую задачу при первом уведомлении"""
+        self._bot = bot
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        """Цикл отправки дайджестов"""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.window)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка отправки дайджеста уведомлений: {e}")
+
+    async def flush(self):
+        """Отправить все накопленные уведомления"""
+        if not self.pending or self._bot is None:
+            return
+
+        pending, self.pending = self.pending, {}
+        await asyncio.gather(*(
+            self._send_digests(admin_id, messages)
+            for admin_id, messages in pending.items()
+        ))
+
+    async def _send_digests(self, admin_id: int, messages: List[str]):
+        """Отправить накопленные сообщения одному администратору"""
+        for start in range(0, len(messages), self.max_batch):
+            batch = messages[start:start + self.max_batch]
+            for digest in build_digests(batch, self.max_length):
+                await self._send(self._bot, admin_id, digest)
+                self.sent_digests += 1
+            self.sent_messages += len(batch)
+
+    async def _send(self, bot, admin_id: int, text: str):
+        """Отправить сообщение администратору"""
+        try:
+            await bot.send_message(chat_id=admin_id, text=text)
+        except Exception as e:
+            logger.error(f"Не удалось отправить уведомление администратору {admin_id}: {e}")
+
+    async def stop(self):
+        """Остановить фоновую задачу, отправив оставшиеся уведомления"""
+        # Останавливаем флагом, а не cancel(): wait_for может поглотить отмену,
+        # если событие пробуждения сработало одновременно с ней
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+
+        await self.flush()
+
+
+# Глобальный экземпляр очереди уведомлений
+admin_notifier = AdminNotifier(
+    window=settings.NOTIFICATION_DIGEST_WINDOW,
+    max_batch=settings.NOTIFICATION_DIGEST_MAX_SIZE,
+    max_length=settings.MAX_MESSAGE_LENGTH
+)
@@ -0,0 +1,262 @@
+# services/profiler.py
+"""
+Профилирование обработчиков по запросу: cProfile для выборки обновлений
+и снимки памяти tracemalloc
+
+Пока профилирование выключено, обработчики приложения не обернуты и
+накладных расходов нет. При включении (/profile on или SIGUSR2) колбэки
+обработчиков подменяются обертками, при выключении восстанавливаются.
+Результаты пишутся в data/temp:
+- profile_<обработчик>_<время>.pstats - для pstats, snakeviz, gprof2dot;
+- profile_<обработчик>_<время>.folded - свернутые стеки для flamegraph.pl и speedscope;
+- memory_<время>.tracemalloc и memory_<время>.txt - снимок памяти и топ мест выделения.
+"""
+import cProfile
+import functools
+import logging
+import os
+import pstats
+import random
+import re
+import signal
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config.settings import settings
+from services.metrics import handler_name
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = 'data/temp'
+
+# Глубина стека, сохраняемая tracemalloc для каждого выделения
+TRACEMALLOC_FRAMES = 10
+
+# Ограничения обхода графа вызовов при построении свернутых стеков
+FOLDED_MAX_DEPTH = 64
+FOLDED_MIN_SECONDS = 1e-5
+
+
+def _function_label(func: tuple) -> str:
+    """Подпись функции из ключа pstats: (файл, строка, имя)"""
+    filename, line, name = func
+    if filename == '~':
+        return name.replace(';', ',')
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(';', ',')
+
+
+def write_folded(stats: pstats.Stats, path: str) -> int:
+    """Записать свернутые стеки (формат flamegraph.pl) по статистике cProfile
+
+    cProfile хранит только пары вызывающий -> вызываемый, поэтому время
+    функции, вызываемой из нескольких мест, делится между стеками
+    пропорционально времени вызовов по каждому ребру.
+
+    Returns:
+        Количество записанных стеков
+    """
+    entries = stats.stats
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+
+    folded: Dict[str, int] = defaultdict(int)
+
+    def walk(func: tuple, stack: tuple, labels: tuple, share: float):
+        _, _, self_time, total_time, _ = entries[func]
+        labels = labels + (_function_label(func),)
+        microseconds = int(self_time * share * 1_000_000)
+        if microseconds:
+            folded[";".join(labels)] += microseconds
+
+        if len(labels) >= FOLDED_MAX_DEPTH:
+            return
+
+        for callee, edge_time in callees.get(func, ()):
+            callee_total = entries[callee][3]
+            if callee in stack or callee_total <= 0:
+                continue
+            callee_share = share * edge_time / callee_total
+            if callee_total * callee_share >= FOLDED_MIN_SECONDS:
+                walk(callee, stack + (callee,), labels, callee_share)
+
+    for func, (_, _, _, _, callers) in entries.items():
+        if not callers:
+            walk(func, (func,), (), 1.0)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, value in folded.items():
+            f.write(f"{stack} {value}\n")
+
+    return len(folded)
+
+
+class UpdateProfiler:
+    """Выборочное профилирование обновлений по обработчикам"""
+
+    def __init__(self, output_dir: str = PROFILE_DIR, sample_rate: float = 0.1):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.enabled = False
+        self.memory = False
+        self.started_at: Optional[datetime] = None
+        self.seen = 0
+        self.samples: Dict[str, int] = {}
+        self.stats: Dict[str, pstats.Stats] = {}
+        self._application = None
+        self._originals = {}
+        self._active = False
+        self._rng = random.Random()
+
+    def attach(self, application):
+        """Запомнить приложение, обработчики которого будут профилироваться"""
+        self._application = application
+
+    def enable(self, sample_rate: float = None, memory: bool = False):
+        """Включить профилирование"""
+        if sample_rate is not None:
+            self.sample_rate = max(0.0, min(1.0, sample_rate))
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.memory = True
+
+        if self.enabled:
+            return
+        if self._application is None:
+            raise RuntimeError("Профилировщик не привязан к приложению")
+
+        for handlers in self._application.handlers.values():
+            for handler in handlers:
+                self._originals[handler] = handler.callback
+                handler.callback = self._wrap(handler_name(handler), handler.callback)
+
+        self.enabled = True
+        self.started_at = datetime.now()
+        self.seen = 0
+        logger.info(f"🔬 Профилирование включено: доля {self.sample_rate:.0%}, "
+                    f"память: {'да' if self.memory else 'нет'}")
+
+    def disable(self) -> List[str]:
+        """Выключить профилирование и сохранить результаты"""
+        if not self.enabled:
+            return []
+
+        for handler, callback in self._originals.items():
+            handler.callback = callback
+        self._originals = {}
+        self.enabled = False
+
+        files = self.dump()
+        if self.memory:
+            tracemalloc.stop()
+            self.memory = False
+
+        logger.info(f"🔬 Профилирование выключено, сохранено файлов: {len(files)}")
+        return files
+
+    def toggle(self) -> List[str]:
+        """Переключить профилирование (для сигнала)"""
+        if self.enabled:
+            return self.disable()
+        self.enable(settings.PROFILE_SAMPLE_RATE, memory=settings.PROFILE_MEMORY)
+        return []
+
+    def _wrap(self, name: str, callback):
+        """Обертка обработчика, профилирующая выборку обновлений"""
+
+        @functools.wraps(callback)
+        async def wrapper(update, context):
+            self.seen += 1
+            # cProfile перехватывает весь поток, поэтому одновременно профилируется одно обновление.
+            # Задачи, выполняющиеся в цикле событий во время await, попадут в тот же профиль.
+            if self._active or self._rng.random() >= self.sample_rate:
+                return await callback(update, context)
+
+            profile = cProfile.Profile()
+            self._active = True
+            profile.enable()
+            try:
+                return await callback(update, context)
+            finally:
+                profile.disable()
+                self._active = False
+                self._add(name, profile)
+
+        return wrapper
+
+    def _add(self, name: str, profile: cProfile.Profile):
+        """Добавить профиль обновления к статистике обработчика"""
+        self.samples[name] = self.samples.get(name, 0) + 1
+        if name in self.stats:
+            self.stats[name].add(profile)
+        else:
+            self.stats[name] = pstats.Stats(profile)
+
+    def dump(self) -> List[str]:
+        """Сохранить накопленные профили и снимок памяти, вернуть пути к файлам"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        files = []
+
+        stats, self.stats = self.stats, {}
+        self.samples = {}
+        for name, handler_stats in stats.items():
+            safe_name = re.sub(r'[^\w-]+', '_', name).strip('_')
+            base = os.path.join(self.output_dir, f"profile_{safe_name}_{timestamp}")
+            handler_stats.dump_stats(base + '.pstats')
+            write_folded(handler_stats, base + '.folded')
+            files.extend([base + '.pstats', base + '.folded'])
+
+        if self.memory and tracemalloc.is_tracing():
+            files.extend(self._dump_memory(timestamp))
+
+        return files
+
+    def _dump_memory(self, timestamp: str) -> List[str]:
+        """Сохранить снимок tracemalloc и топ мест выделения памяти"""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        base = os.path.join(self.output_dir, f"memory_{timestamp}")
+        snapshot.dump(base + '.tracemalloc')
+
+        current, peak = tracemalloc.get_traced_memory()
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(f"Текущий объем: {current / 1024:.0f} КБ, пик: {peak / 1024:.0f} КБ\n\n")
+            for stat in snapshot.statistics('lineno')[:30]:
+                f.write(f"{stat}\n")
+
+        return [base + '.tracemalloc', base + '.txt']
+
+    def summary(self) -> Dict[str, object]:
+        """Состояние профилировщика"""
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'memory': self.memory,
+            'started_at': self.started_at,
+            'seen': self.seen,
+            'samples': dict(self.samples),
+        }
+
+    def install_signal_handler(self, signum: int = getattr(signal, 'SIGUSR2', None)):
+        """Переключать профилирование сигналом (по умолчанию SIGUSR2, только Unix)"""
+        if signum is None:
+            return
+
+        def handle(received, frame):
+            try:
+                self.toggle()
+            except Exception as e:
+                logger.error(f"Ошибка переключения профилирования: {e}")
+
+        signal.signal(signum, handle)
+
+
+# Глобальный профилировщик
+update_profiler = UpdateProfiler(sample_rate=settings.PROFILE_SAMPLE_RATE)
@@ -0,0 +1,211 @@
+# services/reminders.py
+"""
+Напоминания сотрудникам, которые остановились на одном этапе адаптации
+
+Время следующего напоминания хранится в users.next_reminder_at и
+сдвигается при каждом переходе на новый этап. Задача JobQueue раз в
+REMINDER_CHECK_INTERVAL секунд забирает из очереди пачки тех, кому пора
+напомнить (по частичному индексу, без просмотра всей таблицы), и
+отправляет им сообщение для их этапа, не превышая REMINDER_RATE
+сообщений в секунду.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from telegram.error import Forbidden, RetryAfter
+
+from config.settings import settings
+from database.models import User, OnboardingStage
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Подсказка, куда нажать, для этапов пребординга и онбординга
+PREBOARDING_HINT = "Продолжить можно в разделе «🚀 Пребординг» главного меню."
+ONBOARDING_HINT = "Продолжить можно в разделе «📋 Онбординг» главного меню."
+
+# Особые тексты для этапов, где сотрудник обычно ждет чего-то от себя самого
+STAGE_TEXTS = {
+    0: "👋 Вы еще не начали подготовку к выходу на работу.\n\n"
+       "Начните с раздела «🚀 Пребординг» - это займет несколько минут.",
+    OnboardingStage.DOCUMENTS_MAIN: "📄 Не забудьте отправить основные документы - "
+                                    "без них мы не сможем оформить вас на работу.",
+    OnboardingStage.DOCUMENTS_TK: "📄 Осталось отправить документы по ТК РФ.",
+    OnboardingStage.EMAIL_ACCESS: "📧 Проверьте, получили ли вы доступ к корпоративной почте. "
+                                  "Если нет - напишите в поддержку.",
+}
+
+
+def build_reminder_text(user: User) -> str:
+    """Текст напоминания для этапа пользователя"""
+    stage = user.stage or 0
+    text = STAGE_TEXTS.get(stage)
+
+    if text is None:
+        text = ("⏰ Напоминание об адаптации\n\n"
+                f"Вы остановились на этапе «{OnboardingStage.get_stage_name(stage)}».\n"
+                f"Следующий шаг: {OnboardingStage.get_next_stage_description(stage)}")
+
+    hint = PREBOARDING_HINT if stage < OnboardingStage.ONBOARDING_START else ONBOARDING_HINT
+    return f"{text}\n\n{hint}"
+
+
+class ReminderScheduler:
+    """Отправка напоминаний из очереди users.next_reminder_at
+
+    За один запуск отправляется не больше rate * interval сообщений, чтобы
+    запуск успевал закончиться до следующего; остаток очереди переходит
+    на следующий запуск.
+    """
+
+    def __init__(self, manager=None, batch_size: int = 50, rate: float = 20.0, interval: float = 60.0):
+        self.manager = manager
+        self.batch_size = batch_size
+        self.rate = rate
+        self.interval = interval
+        self.sent = 0
+        self.failed = 0
+        self.blocked = 0
+        self.backlog = 0
+        self.last_run: Optional[datetime] = None
+        self._recent_sends: deque = deque()
+        self._running = False
+
+    def _get_manager(self):
+        if self.manager is None:
+            from database.manager import db_manager
+            self.manager = db_manager
+        return self.manager
+
+    def attach(self, application) -> bool:
+        """Запускать отправку напоминаний по расписанию JobQueue приложения"""
+        if not settings.AUTO_REMINDERS:
+            return False
+
+        if application.job_queue is None:
+            logger.warning("JobQueue недоступна (нужен python-telegram-bot[job-queue]), напоминания выключены")
+            return False
+
+        application.job_queue.run_repeating(self._job, interval=self.interval, first=self.interval, name="reminders")
+        logger.info(f"Напоминания включены: проверка раз в {self.interval:.0f} с, "
+                    f"не чаще {self.rate:.0f} сообщений в секунду")
+        return True
+
+    async def _job(self, context):
+        await self.run_once(context.bot)
+
+    async def run_once(self, bot, now: datetime = None) -> int:
+        """Отправить напоминания всем, кому пора (в пределах лимита одного запуска)"""
+        if self._running:
+            return 0
+
+        self._running = True
+        manager = self._get_manager()
+        budget = max(self.batch_size, int(self.rate * self.interval))
+        sent_before = self.sent
+
+        try:
+            while budget > 0:
+                started = time.monotonic()
+                users = await asyncio.to_thread(manager.claim_due_reminders, min(self.batch_size, budget), now)
+                if not users:
+                    break
+                budget -= len(users)
+
+                await self._send_batch(bot, users)
+
+                # Пачка из n сообщений должна занимать не меньше n / rate секунд
+                delay = len(users) / self.rate - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            self.backlog = await asyncio.to_thread(manager.count_due_reminders, now)
+        except Exception as e:
+            logger.error(f"Ошибка отправки напоминаний: {e}")
+        finally:
+            self._running = False
+            self.last_run = datetime.now()
+
+        sent = self.sent - sent_before
+        if sent or self.backlog:
+            logger.info(f"Напоминания: отправлено {sent}, в очереди {self.backlog}")
+        return sent
+
+    async def _send_batch(self, bot, users: List[User]):
+        """Отправить пачку напоминаний параллельно"""
+        results = await asyncio.gather(*(self._send(bot, user) for user in users))
+
+        # Заблокировавшим бота больше не напоминаем, при ограничении частоты повторим со следующим запуском
+        blocked = [user.user_id for user, result in zip(users, results) if result == 'blocked']
+        retry = [user.user_id for user, result in zip(users, results) if result == 'retry']
+        manager = self._get_manager()
+        if blocked:
+            await asyncio.to_thread(manager.reschedule_reminders, blocked, None)
+        if retry:
+            await asyncio.to_thread(manager.reschedule_reminders, retry, datetime.now())
+
+    async def _send(self, bot, user: User) -> str:
+        """Отправить одно напоминание; вернуть результат: sent, blocked, retry или failed"""
+        try:
+            await bot.send_message(chat_id=user.user_id, text=build_reminder_text(user))
+        except Forbidden:
+            self.blocked += 1
+            return 'blocked'
+        except RetryAfter as e:
+            self.failed += 1
+            logger.warning(f"Telegram ограничил частоту отправки напоминаний на {e.retry_after} с")
+            return 'retry'
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Не удалось отправить напоминание пользователю {user.user_id}: {e}")
+            return 'failed'
+
+        self.sent += 1
+        self._recent_sends.append(time.monotonic())
+        return 'sent'
+
+    def sends_per_minute(self) -> int:
+        """Отправлено напоминаний за последнюю минуту"""
+        threshold = time.monotonic() - 60
+        while self._recent_sends and self._recent_sends[0] < threshold:
+            self._recent_sends.popleft()
+        return len(self._recent_sends)
+
+    def stats(self) -> Dict[str, Any]:
+        """Сводка для /metrics и логов"""
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'blocked': self.blocked,
+            'backlog': self.backlog,
+            'sends_per_minute': self.sends_per_minute(),
+            'last_run': self.last_run,
+        }
+
+    def _collect_metrics(self) -> List[str]:
+        """Метрики напоминаний в формате Prometheus"""
+        return [
+            "# TYPE onboarding_reminders_sent_total counter",
+            f"onboarding_reminders_sent_total {self.sent}",
+            "# TYPE onboarding_reminders_failed_total counter",
+            f"onboarding_reminders_failed_total {self.failed}",
+            "# TYPE onboarding_reminders_blocked_total counter",
+            f"onboarding_reminders_blocked_total {self.blocked}",
+            "# TYPE onboarding_reminders_backlog gauge",
+            f"onboarding_reminders_backlog {self.backlog}",
+            "# TYPE onboarding_reminders_per_minute gauge",
+            f"onboarding_reminders_per_minute {self.sends_per_minute()}",
+        ]
+
+
+# Глобальный планировщик напоминаний
+reminder_scheduler = ReminderScheduler(
+    batch_size=settings.REMINDER_BATCH_SIZE,
+    rate=settings.REMINDER_RATE,
+    interval=settings.REMINDER_CHECK_INTERVAL
+)
+metrics.add_collector(reminder_scheduler._collect_metrics)
@@ -0,0 +1,208 @@
+# services/search.py
+"""
+Полнотекстовый поиск по разделам FAQ и полезной информации
+"""
+import heapq
+import logging
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Слова, которые не несут смысла для поиска
+STOP_WORDS = frozenset("""
+а без более бы был была были было быть в вам вас весь во вот все всего всех вы где да даже для до его ее
+если есть еще же за здесь и из или им их к как ко когда кто ли либо мне можно мой мы на над надо наш не
+него нее нет ни них но ну о об однако он она они оно от очень по под при про с со так также такой там те
+тем то того тоже той только том ты у уже хотя чего чей чем что чтобы чье эта эти это я
+""".split())
+
+# Окончания для облегченного стемминга (от длинных к коротким)
+_SUFFIXES = sorted("""
+иями ями ами иях ях ах ией иям ием ого его ому ему ыми ими ейший айший ость ости остью
+ать ять ить еть уть ться тся ешь ете ишь ите ует уют ают яют ала ила ыла ена ено ены
+ая яя ое ее ые ие ый ий ой ей ом ем ам ям ую юю ов ев ию ью ья ье ьи ы и а я о е у ю ь
+""".split(), key=len, reverse=True)
+
+_TOKEN_RE = re.compile(r"[a-zа-я0-9]+")
+_MIN_STEM_LENGTH = 3
+
+# Учет запросов без результатов: длина запроса и количество различных запросов в памяти
+ZERO_RESULT_QUERY_LENGTH = 100
+ZERO_RESULT_QUERIES_LIMIT = 1000
+
+
+def stem(word: str) -> str:
+    """Облегченный стемминг русского слова (отсечение окончания)"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    return word
+
+
+def _split_paragraphs(text: str) -> List[str]:
+    """Разбить текст на абзацы, присоединяя однострочные заголовки к следующему абзацу"""
+    paragraphs = []
+    header = ""
+
+    for block in re.split(r'\n\s*\n', text):
+        block = block.strip()
+        if not block:
+            continue
+        if '\n' not in block:
+            header = f"{header}\n{block}" if header else block
+            continue
+        paragraphs.append(f"{header}\n{block}" if header else block)
+        header = ""
+
+    if header:
+        paragraphs.append(header)
+    return paragraphs
+
+
+def normalize_text(text: str) -> List[str]:
+    """Нормализация текста: нижний регистр, ё→е, токенизация и стемминг"""
+    text = text.lower().replace('ё', 'е')
+    return [stem(token) for token in _TOKEN_RE.findall(text) if token not in STOP_WORDS]
+
+
+@dataclass
+class SearchDocument:
+    """Фрагмент раздела в поисковом индексе"""
+    doc_id: int
+    section: str
+    text: str
+    length: int = 0
+
+
+@dataclass
+class SearchResult:
+    """Результат поиска"""
+    section: str
+    text: str
+    score: float
+
+
+class SearchIndex:
+    """Инвертированный индекс с ранжированием BM25"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, title_weight: int = 3):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.documents: List[SearchDocument] = []
+        self.postings: Dict[str, List[tuple]] = {}
+        self.idf: Dict[str, float] = {}
+        self.zero_result_queries: Counter = Counter()
+        self._norms: List[float] = []
+
+    def add_section(self, section: str, text: str):
+        """Добавить раздел в индекс, разбив его на абзацы"""
+        title_terms = normalize_text(section) * self.title_weight
+
+        for paragraph in _split_paragraphs(text):
+            terms = normalize_text(paragraph)
+            if not terms:
+                continue
+
+            doc = SearchDocument(
+                doc_id=len(self.documents),
+                section=section,
+                text=paragraph,
+                length=len(terms) + len(title_terms)
+            )
+            self.documents.append(doc)
+
+            for term, tf in Counter(terms + title_terms).items():
+                self.postings.setdefault(term, []).append((doc.doc_id, tf))
+
+    def build(self):
+        """Рассчитать IDF и нормировки длины документов"""
+        total_docs = len(self.documents)
+        avg_length = sum(doc.length for doc in self.documents) / total_docs if total_docs else 0
+
+        self.idf = {
+            term: math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+        self._norms = [
+            self.k1 * (1 - self.b + self.b * doc.length / avg_length) if avg_length else self.k1
+            for doc in self.documents
+        ]
+
+        logger.info(f"Поисковый индекс построен: {total_docs} фрагментов, {len(self.postings)} терминов")
+
+    def search(self, query: str, limit: int = 3) -> List[SearchResult]:
+        """Найти наиболее релевантные фрагменты"""
+        scores: Dict[int, float] = {}
+        k1 = self.k1
+
+        for term in set(normalize_text(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            idf = self.idf[term]
+            for doc_id, tf in postings:
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + self._norms[doc_id])
+
+        if not scores:
+            self._count_zero_result(query)
+            logger.info(f"Поиск без результатов: {query}")
+            return []
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [
+            SearchResult(
+                section=self.documents[doc_id].section,
+                text=self.documents[doc_id].text,
+                score=round(score, 3)
+            )
+            for doc_id, score in top
+        ]
+
+    def _count_zero_result(self, query: str):
+        """Учесть запрос без результатов
+
+        Запрос приводится к одному виду и обрезается; когда различных
+        запросов становится больше ZERO_RESULT_QUERIES_LIMIT, остается
+        половина самых частых.
+        """
+        key = " ".join(query.lower().replace('ё', 'е').split())[:ZERO_RESULT_QUERY_LENGTH]
+        self.zero_result_queries[key] += 1
+        if len(self.zero_result_queries) > ZERO_RESULT_QUERIES_LIMIT:
+            self.zero_result_queries = Counter(
+                dict(self.zero_result_queries.most_common(ZERO_RESULT_QUERIES_LIMIT // 2))
+            )
+
+    def get_zero_result_queries(self, limit: int = 10) -> List[tuple]:
+        """Самые частые запросы без результатов"""
+        return self.zero_result_queries.most_common(limit)
+
+
+def build_search_index(sections: Dict[str, Callable[[], str]]) -> SearchIndex:
+    """Построить индекс по словарю 'название раздела -> функция текста'"""
+    index = SearchIndex()
+    for section, get_text in sections.items():
+        index.add_section(section, get_text())
+    index.build()
+    return index
+
+
+_search_index: Optional[SearchIndex] = None
+
+
+def get_search_index() -> SearchIndex:
+    """Получить поисковый индекс по FAQ и полезной информации (строится один раз)"""
+    global _search_index
+
+    if _search_index is None:
+        from handlers.faq import FAQ_SECTIONS
+        from handlers.info import INFO_SECTIONS
+
+        _search_index = build_search_index({**FAQ_SECTIONS, **INFO_SECTIONS})
+
+    return _search_index
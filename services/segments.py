@@ -0,0 +1,308 @@
+# services/segments.py
+"""
+Сегменты пользователей для адресных рассылок по битовым индексам
+
+Каждому пользователю присваивается плотная позиция (id Telegram разрежены),
+и по позициям строятся сжатые битовые множества (services/bitmaps.py):
+по статусу, по этапу и по дню последней активности. DatabaseManager
+обновляет их после фиксации записей (создание пользователя, смена этапа,
+действие), поэтому условие вроде "onboarding AND stage>=7 AND inactive=3"
+считается операциями над множествами без запросов к БД. Индексы строятся
+при первом обращении по users и user_actions.
+
+Язык условий: термы через AND (можно опустить), OR, NOT и скобки.
+    status=onboarding,preboarded  status!=completed  onboarding
+    stage>=7  stage<3  stage=5  stage!=10
+    active=7    - были активны за последние 7 дней (включая сегодня)
+    inactive=3  - не были активны за последние 3 дня
+    all         - все пользователи
+"""
+import logging
+import re
+import threading
+from array import array
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+from database.models import UserStatus
+from services.bitmaps import RoaringBitmap
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r'\(|\)|[^\s()]+')
+_TERM = re.compile(r'^(status|stage|active|inactive)(!=|>=|<=|=|>|<)(.+)$')
+_COMPARE = {
+    '=': lambda value, bound: value == bound,
+    '!=': lambda value, bound: value != bound,
+    '>=': lambda value, bound: value >= bound,
+    '<=': lambda value, bound: value <= bound,
+    '>': lambda value, bound: value > bound,
+    '<': lambda value, bound: value < bound,
+}
+
+Selector = Callable[['UserSegments'], RoaringBitmap]
+
+
+class UserSegments:
+    """Битовые индексы пользователей одного DatabaseManager"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        # Позиция в индексах -> user_id и обратно
+        self.ids: List[int] = []
+        self.positions: Dict[int, int] = {}
+        self.statuses: Dict[str, RoaringBitmap] = {}
+        self.stages: Dict[int, RoaringBitmap] = {}
+        # День последней активности (date.toordinal()) -> пользователи
+        self.activity: Dict[int, RoaringBitmap] = {}
+        # Объединения дней активности по началу окна: пользователь может только войти в окно,
+        # поэтому они дополняются при действиях, а не пересчитываются
+        self._active_unions: Dict[int, RoaringBitmap] = {}
+        # Текущие значения по позициям, чтобы переносить пользователя между множествами
+        self._status: List[Optional[str]] = []
+        self._stage = array('b')
+        self._active = array('l')
+        self._pending: List[tuple] = []
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        """Построить индексы по БД
+
+        Изменения, зафиксированные во время построения, откладываются в
+        _pending и применяются в конце: они не старее прочитанных строк.
+        """
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+
+            ids, statuses, stages, activity = [], {}, {}, {}
+            status_of, stage_of, active_of = [], array('b'), array('l')
+            days: Dict[str, int] = {}
+            for position, (user_id, status, stage, last_action_at) in enumerate(self.manager.get_segment_rows()):
+                stage = stage or 0
+                day = 0
+                if last_action_at:
+                    day = days.get(last_action_at[:10])
+                    if day is None:
+                        day = days[last_action_at[:10]] = date.fromisoformat(last_action_at[:10]).toordinal()
+                    activity.setdefault(day, []).append(position)
+                status = status or UserStatus.NEW.value
+                statuses.setdefault(status, []).append(position)
+                stages.setdefault(stage, []).append(position)
+                ids.append(user_id)
+                status_of.append(status)
+                stage_of.append(stage)
+                active_of.append(day)
+
+            with self._lock:
+                self.ids = ids
+                self.positions = {user_id: position for position, user_id in enumerate(ids)}
+                self.statuses = {status: RoaringBitmap(positions) for status, positions in statuses.items()}
+                self.stages = {stage: RoaringBitmap(positions) for stage, positions in stages.items()}
+                self.activity = {day: RoaringBitmap(positions) for day, positions in activity.items()}
+                self._active_unions = {}
+                self._status, self._stage, self._active = status_of, stage_of, active_of
+                for apply, args in self._pending:
+                    apply(*args)
+                self._pending = []
+                self._loaded = True
+            logger.info(f"Индексы сегментов построены: {len(ids)} пользователей")
+
+    def _position(self, user_id: int) -> int:
+        position = self.positions.get(user_id)
+        if position is None:
+            position = self.positions[user_id] = len(self.ids)
+            self.ids.append(user_id)
+            self._status.append(None)
+            self._stage.append(-1)
+            self._active.append(0)
+        return position
+
+    @staticmethod
+    def _move(index: Dict, position: int, old, new):
+        if old == new:
+            return
+        if old in index:
+            index[old].discard(position)
+        index.setdefault(new, RoaringBitmap()).add(position)
+
+    def _set_user(self, user_id: int, status: Optional[str], stage: Optional[int]):
+        position = self._position(user_id)
+        if status is not None:
+            self._move(self.statuses, position, self._status[position], status)
+            self._status[position] = status
+        if stage is not None:
+            self._move(self.stages, position, self._stage[position], stage)
+            self._stage[position] = stage
+
+    def _set_active(self, user_id: int, day: int):
+        position = self._position(user_id)
+        # Действия приходят не строго по порядку: день последней активности только растет
+        if day > self._active[position]:
+            self._move(self.activity, position, self._active[position] or None, day)
+            self._active[position] = day
+            for since, bitmap in self._active_unions.items():
+                if day >= since:
+                    bitmap.add(position)
+
+    def _apply(self, apply: Callable, *args):
+        with self._lock:
+            if self._loaded:
+                apply(*args)
+            else:
+                self._pending.append((apply, args))
+
+    def observe_user(self, user_id: int, status: Optional[UserStatus] = None, stage: Optional[int] = None):
+        """Учесть новый статус и/или этап пользователя"""
+        self._apply(self._set_user, user_id, status.value if status else None, stage)
+
+    def observe_activity(self, user_id: int, moment: datetime):
+        """Учесть действие пользователя"""
+        self._apply(self._set_active, user_id, moment.date().toordinal())
+
+    def everyone(self) -> RoaringBitmap:
+        """Все пользователи (без тех, у кого есть только действия)"""
+        return RoaringBitmap.union(self.statuses.values())
+
+    def active_since(self, day: int) -> RoaringBitmap:
+        """Пользователи, активные начиная с дня day (date.toordinal()); результат не изменять"""
+        union = self._active_unions.get(day)
+        if union is None:
+            union = RoaringBitmap.union(bitmap for active_day, bitmap in self.activity.items() if active_day >= day)
+            self._active_unions[day] = union
+            # Окна прошлых дат больше не понадобятся
+            if len(self._active_unions) > 8:
+                del self._active_unions[next(iter(self._active_unions))]
+        return union
+
+    def select(self, expression: str, today: Optional[date] = None) -> RoaringBitmap:
+        """Позиции пользователей сегмента"""
+        selector = parse_segment(expression, today)
+        self._ensure_loaded()
+        with self._lock:
+            return selector(self) & self.everyone()
+
+    def count(self, expression: str, today: Optional[date] = None) -> int:
+        """Количество пользователей сегмента"""
+        return len(self.select(expression, today))
+
+    def user_ids(self, expression: str, today: Optional[date] = None) -> List[int]:
+        """id пользователей сегмента"""
+        positions = self.select(expression, today)
+        with self._lock:
+            ids = self.ids
+            return [ids[position] for position in positions]
+
+
+def _term(token: str, today: date) -> Selector:
+    """Селектор одного условия"""
+    lowered = token.lower()
+    if lowered == 'all':
+        return lambda index: index.everyone()
+    if lowered in {status.value for status in UserStatus}:
+        return lambda index: index.statuses.get(lowered, RoaringBitmap())
+
+    match = _TERM.match(lowered)
+    if not match:
+        raise ValueError(f"Неизвестное условие сегмента: {token}")
+    field, operator, value = match.groups()
+    compare = _COMPARE[operator]
+
+    if field == 'status':
+        values = set(value.split(','))
+        unknown = values - {status.value for status in UserStatus}
+        if unknown or operator not in ('=', '!='):
+            raise ValueError(f"Условие по статусу: status=<статус>[,<статус>] или status!=..., "
+                             f"статусы: {', '.join(status.value for status in UserStatus)}")
+        if operator == '=':
+            return lambda index: RoaringBitmap.union(index.statuses.get(status, RoaringBitmap()) for status in values)
+        return lambda index: RoaringBitmap.union(
+            bitmap for status, bitmap in index.statuses.items() if status not in values
+        )
+
+    if not value.isdigit():
+        raise ValueError(f"Ожидается число в условии {token}")
+    bound = int(value)
+    if field == 'stage':
+        return lambda index: RoaringBitmap.union(
+            bitmap for stage, bitmap in index.stages.items() if compare(stage, bound)
+        )
+
+    # active/inactive=N: окно из N последних дней, включая сегодня
+    if operator != '=' or bound < 1:
+        raise ValueError(f"Условие активности: {field}=<дней>, не меньше 1")
+    since = today.toordinal() - bound + 1
+    if field == 'active':
+        return lambda index: index.active_since(since)
+    return lambda index: index.everyone() - index.active_since(since)
+
+
+def parse_segment(expression: str, today: Optional[date] = None) -> Selector:
+    """Разобрать условие сегмента; ValueError, если оно записано с ошибкой"""
+    tokens = _TOKEN.findall(expression)
+    if not tokens:
+        raise ValueError("Пустое условие сегмента")
+    today = today or date.today()
+    position = 0
+
+    def peek() -> Optional[str]:
+        return tokens[position].upper() if position < len(tokens) else None
+
+    def take() -> str:
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or() -> Selector:
+        parts = [parse_and()]
+        while peek() == 'OR':
+            take()
+            parts.append(parse_and())
+        if len(parts) == 1:
+            return parts[0]
+        return lambda index: RoaringBitmap.union(part(index) for part in parts)
+
+    def parse_and() -> Selector:
+        parts = [parse_not()]
+        while peek() not in (None, 'OR', ')'):
+            if peek() == 'AND':
+                take()
+            parts.append(parse_not())
+
+        def select(index):
+            result = parts[0](index)
+            for part in parts[1:]:
+                if not result:
+                    break
+                result = result & part(index)
+            return result
+
+        return parts[0] if len(parts) == 1 else select
+
+    def parse_not() -> Selector:
+        token = peek()
+        if token is None:
+            raise ValueError("Условие сегмента оборвано")
+        if token == 'NOT':
+            take()
+            inner = parse_not()
+            return lambda index: index.everyone() - inner(index)
+        if token == '(':
+            take()
+            inner = parse_or()
+            if peek() != ')':
+                raise ValueError("Не закрыта скобка в условии сегмента")
+            take()
+            return inner
+        if token in ('AND', 'OR', ')'):
+            raise ValueError(f"Неожиданное {tokens[position]} в условии сегмента")
+        return _term(take(), today)
+
+    selector = parse_or()
+    if position < len(tokens):
+        raise ValueError(f"Неожиданное {tokens[position]} в условии сегмента")
+    return selector
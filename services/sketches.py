@@ -0,0 +1,233 @@
+# services/sketches.py
+"""
+Компактные вероятностные структуры для агрегатов без просмотра истории
+
+KLLSketch - квантили потока значений (ошибка по рангу около 1.7 / k)
+в памяти O(k) независимо от количества значений.
+HyperLogLog - количество различных значений (ошибка около 1.04 / sqrt(2^p))
+в 2^p байтах; скетчи объединяются без потери точности.
+"""
+import bisect
+import json
+import math
+import random
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+
+class KLLSketch:
+    """Скетч квантилей KLL (Karnin, Lang, Liberty, 2016)
+
+    Значения копятся в уровнях-компакторах; переполненный уровень
+    сортируется, и каждое второе значение (со случайным сдвигом)
+    переходит на уровень выше с удвоенным весом. Вместимость уровней
+    убывает геометрически вниз от верхнего, поэтому общий размер - O(k).
+    """
+
+    def __init__(self, k: int = 200, c: float = 2 / 3, seed: Optional[int] = None):
+        self.k = k
+        self.c = c
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.levels: List[List[float]] = [[]]
+        self._size = 0
+        self._max_size = self._capacity(0)
+        self._rng = random.Random(seed)
+        self._cdf: Optional[Tuple[List[float], List[float]]] = None
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def _grow(self):
+        self.levels.append([])
+        self._max_size = sum(self._capacity(level) for level in range(len(self.levels)))
+
+    def update(self, value: float):
+        """Добавить значение"""
+        self.levels[0].append(value)
+        self._size += 1
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self._cdf = None
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self):
+        for level in range(len(self.levels)):
+            items = self.levels[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 >= len(self.levels):
+                    self._grow()
+                items.sort()
+                # При нечетном количестве последнее значение остается на уровне
+                leftover = [items.pop()] if len(items) % 2 else []
+                self.levels[level + 1].extend(items[self._rng.randint(0, 1)::2])
+                self.levels[level] = leftover
+                self._size = sum(len(items) for items in self.levels)
+                if self._size < self._max_size:
+                    break
+
+    def merge(self, other: 'KLLSketch'):
+        """Добавить значения другого скетча"""
+        while len(self.levels) < len(other.levels):
+            self._grow()
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self._size = sum(len(items) for items in self.levels)
+        self._cdf = None
+        while self._size >= self._max_size:
+            self._compress()
+
+    def _weighted(self) -> Tuple[List[float], List[float]]:
+        """Отсортированные значения и накопленные веса (кэшируются до следующего update)"""
+        if self._cdf is None:
+            pairs = sorted((value, 1 << level) for level, items in enumerate(self.levels) for value in items)
+            values, cumulative, total = [], [], 0
+            for value, weight in pairs:
+                total += weight
+                values.append(value)
+                cumulative.append(total)
+            self._cdf = (values, cumulative)
+        return self._cdf
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка q-квантиля (0 <= q <= 1)"""
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        values, cumulative = self._weighted()
+        index = bisect.bisect_left(cumulative, q * cumulative[-1])
+        return values[min(index, len(values) - 1)]
+
+    def rank(self, value: float) -> float:
+        """Оценка доли значений, не превышающих value"""
+        values, cumulative = self._weighted()
+        if not values:
+            return 0.0
+        index = bisect.bisect_right(values, value)
+        return cumulative[index - 1] / cumulative[-1] if index else 0.0
+
+    def to_bytes(self) -> bytes:
+        """Сериализовать (значения округляются до миллисекунд)"""
+        return json.dumps({
+            'k': self.k,
+            'n': self.count,
+            'min': self.min,
+            'max': self.max,
+            'levels': [[round(value, 3) for value in items] for items in self.levels],
+        }, separators=(',', ':')).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'KLLSketch':
+        """Восстановить скетч, сериализованный to_bytes"""
+        state = json.loads(data)
+        sketch = cls(k=state['k'])
+        sketch.count = state['n']
+        sketch.min = state['min']
+        sketch.max = state['max']
+        sketch.levels = [list(items) for items in state['levels']] or [[]]
+        sketch._size = sum(len(items) for items in sketch.levels)
+        sketch._max_size = sum(sketch._capacity(level) for level in range(len(sketch.levels)))
+        return sketch
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def hash64(value: int) -> int:
+    """64-битный хеш целого числа (финализатор splitmix64)"""
+    z = (value + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+class HyperLogLog:
+    """Скетч HyperLogLog (Flajolet и др., 2007) для целых значений
+
+    Старшие p бит хеша выбирают регистр, в регистре хранится наибольшая
+    позиция первой единицы в остальных битах. Объединение скетчей -
+    поэлементный максимум регистров, поэтому число различных значений за
+    неделю или месяц получается из дневных скетчей.
+    """
+
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.registers = bytearray(1 << p)
+        self._shift = 64 - p
+        self._low_mask = (1 << self._shift) - 1
+
+    def add(self, value: int):
+        """Добавить значение"""
+        x = hash64(value)
+        index = x >> self._shift
+        rank = self._shift - (x & self._low_mask).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[int]):
+        """Добавить несколько значений"""
+        registers, shift, low_mask = self.registers, self._shift, self._low_mask
+        for value in values:
+            x = hash64(value)
+            index = x >> shift
+            rank = shift - (x & low_mask).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        """Добавить значения другого скетча той же точности"""
+        if other.p != self.p:
+            raise ValueError(f"Нельзя объединить HyperLogLog с точностью {self.p} и {other.p}")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    @classmethod
+    def union(cls, sketches: List['HyperLogLog'], p: int = 14) -> 'HyperLogLog':
+        """Объединение нескольких скетчей за один проход по регистрам"""
+        result = cls(sketches[0].p if sketches else p)
+        if len(sketches) == 1:
+            result.registers[:] = sketches[0].registers
+        elif sketches:
+            if any(sketch.p != result.p for sketch in sketches):
+                raise ValueError("Нельзя объединить HyperLogLog разной точности")
+            result.registers = bytearray(map(max, *(sketch.registers for sketch in sketches)))
+        return result
+
+    def count(self) -> int:
+        """Оценка количества различных значений"""
+        m = len(self.registers)
+        zeros = self.registers.count(0)
+        if zeros == m:
+            return 0
+
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(map(_INVERSE_POWERS.__getitem__, self.registers))
+        # На малых количествах точнее линейный подсчет по пустым регистрам
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        """Сериализовать: точность и сжатые регистры (у малых множеств почти все нули)"""
+        return bytes([self.p]) + zlib.compress(bytes(self.registers), 6)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'HyperLogLog':
+        """Восстановить скетч, сериализованный to_bytes"""
+        sketch = cls(data[0])
+        sketch.registers = bytearray(zlib.decompress(data[1:]))
+        return sketch
+
+
+# 2^-r для каждого возможного значения регистра
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
@@ -0,0 +1,168 @@
+# services/stage_durations.py
+"""
+Квантили времени, проведенного сотрудниками на каждом этапе онбординга
+
+Для каждого этапа хранится скетч KLL, который пополняется при переходе
+пользователя на следующий этап (DatabaseManager.transition_user и
+update_user_stage). p50/p90/p99 отвечаются по скетчу без просмотра
+истории. Скетчи периодически сохраняются в БД вместе с id последнего
+учтенного перехода; при загрузке досчитываются переходы, записанные
+после него, поэтому после аварийного перезапуска ничего не теряется.
+"""
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from database.models import OnboardingStage
+from services.sketches import KLLSketch
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class StageDurations:
+    """Скетчи времени на этапах одного DatabaseManager"""
+
+    def __init__(self, manager, k: int = 200):
+        self.manager = manager
+        self.k = k
+        self.sketches: Dict[int, KLLSketch] = {}
+        self.last_transition_id = 0
+        self.saves = 0
+        self._replayed_until = 0
+        self._dirty = set()
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def _ensure_loaded(self):
+        """Загрузить сохраненные скетчи и учесть переходы после сохранения"""
+        if self._loaded:
+            return
+        self._loaded = True
+
+        last_saved = 0
+        for stage, blob, last_transition_id in self.manager.get_stage_sketches():
+            self.sketches[stage] = KLLSketch.from_bytes(blob)
+            last_saved = max(last_saved, last_transition_id or 0)
+        self.last_transition_id = last_saved
+
+        replayed = self.manager.get_stage_transitions(last_saved)
+        for transition_id, stage, duration in replayed:
+            self._add(transition_id, stage, duration)
+        self._replayed_until = self.last_transition_id
+        if replayed:
+            logger.info(f"Скетчи времени этапов: учтено {len(replayed)} переходов после сохранения")
+
+    def _add(self, transition_id: int, stage: int, duration: float):
+        sketch = self.sketches.get(stage)
+        if sketch is None:
+            sketch = self.sketches[stage] = KLLSketch(self.k)
+        sketch.update(duration)
+        self._dirty.add(stage)
+        self.last_transition_id = max(self.last_transition_id, transition_id)
+
+    def observe(self, transition_id: int, stage: int, duration: float):
+        """Учесть переход: пользователь провел duration секунд на этапе stage"""
+        with self._lock:
+            if not self._loaded:
+                # Загрузка сама учтет этот переход: он уже записан в stage_transitions
+                self._ensure_loaded()
+                return
+            # Переходы до _replayed_until уже учтены загрузкой; остальные могут приходить не по порядку id
+            if transition_id > self._replayed_until:
+                self._add(transition_id, stage, duration)
+
+    def save(self) -> int:
+        """Сохранить изменившиеся скетчи; вернуть их количество"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            stages = sorted(self._dirty)
+            rows = [(stage, self.sketches[stage].to_bytes()) for stage in stages]
+            self._dirty.clear()
+            last_transition_id = self.last_transition_id
+
+        try:
+            self.manager.save_stage_sketches(rows, last_transition_id)
+        except Exception:
+            with self._lock:
+                self._dirty.update(stages)
+            raise
+
+        self.saves += 1
+        return len(rows)
+
+    def quantiles(self, stage: int, quantiles=QUANTILES) -> Dict[float, Optional[float]]:
+        """Квантили времени на этапе в секундах"""
+        with self._lock:
+            self._ensure_loaded()
+            sketch = self.sketches.get(stage)
+            return {q: sketch.quantile(q) if sketch else None for q in quantiles}
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """p50/p90/p99 (в часах) и количество переходов для каждого этапа"""
+        with self._lock:
+            self._ensure_loaded()
+            rows = []
+            for stage in sorted(self.sketches):
+                sketch = self.sketches[stage]
+                rows.append({
+                    'stage': stage,
+                    'name': OnboardingStage.get_stage_name(stage),
+                    'count': sketch.count,
+                    **{f'p{round(q * 100)}_hours': round(sketch.quantile(q) / 3600, 1) for q in QUANTILES},
+                })
+            return rows
+
+    def verify(self) -> List[Dict[str, Any]]:
+        """Сверить скетчи с точным пересчетом по stage_transitions
+
+        Для каждого этапа и квантиля - ошибка по рангу: насколько доля
+        длительностей, не превышающих оценку, отличается от q.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            stages = {stage: sketch for stage, sketch in self.sketches.items()}
+
+        import bisect
+
+        results = []
+        for stage, sketch in sorted(stages.items()):
+            exact = self.manager.get_stage_durations(stage)
+            if not exact:
+                continue
+            row = {'stage': stage, 'count': len(exact), 'sketch_count': sketch.count}
+            for q in QUANTILES:
+                estimate = sketch.quantile(q)
+                rank = bisect.bisect_right(exact, estimate) / len(exact)
+                row[f'p{round(q * 100)}'] = (estimate, exact[min(len(exact) - 1, int(q * len(exact)))])
+                row[f'p{round(q * 100)}_rank_error'] = round(abs(rank - q), 4)
+            results.append(row)
+        return results
+
+    def attach(self, application, interval: float):
+        """Сохранять скетчи по расписанию JobQueue приложения"""
+        if application.job_queue is None:
+            logger.warning("JobQueue недоступна, скетчи времени этапов сохраняются только при остановке")
+            return
+
+        async def save_job(context):
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"Не удалось сохранить скетчи времени этапов: {e}")
+
+        application.job_queue.run_repeating(save_job, interval=interval, first=interval, name="stage_durations")
+
+
+def format_summary(rows: List[Dict[str, Any]]) -> str:
+    """Квантили времени этапов в виде текста"""
+    if not rows:
+        return "⏱ Время на этапах: переходов еще не было\n"
+
+    text = "⏱ Время на этапах (p50 / p90 / p99, ч):\n"
+    for row in rows:
+        text += (f"• {row['name']}: {row['p50_hours']} / {row['p90_hours']} / {row['p99_hours']} "
+                 f"({row['count']} переходов)\n")
+    return text
@@ -0,0 +1,4 @@
+# tests/__init__.py
+"""
+Тесты OnboardingBuddy
+"""
@@ -0,0 +1,44 @@
+# tests/test_reshard.py
+"""
+Перенос пользователей между шардами (database/sharding.reshard): еще не
+выгруженные удаления старых действий доходят до инкрементальной выгрузки
+"""
+import os
+from datetime import datetime, timedelta
+
+from database.manager import DatabaseManager
+from database.sharding import ShardedDatabaseManager, reshard
+from utils.delta_export import export_delta
+
+USERS = 20
+
+
+def open_manager(path: str, shards: int) -> DatabaseManager:
+    return DatabaseManager(path) if shards == 1 else ShardedDatabaseManager(path, shards)
+
+
+def test_reshard_keeps_unexported_tombstones(tmp_path):
+    path = os.path.join(tmp_path, "onboarding.db")
+    exports = os.path.join(tmp_path, "delta")
+    manager = open_manager(path, 1)
+    for user_id in range(1, USERS + 1):
+        manager.create_user(user_id, f"user{user_id}")
+        manager.log_user_action(user_id, "start")
+    export_delta(manager, manager, exports, fmt='jsonl')
+
+    layouts = [(1, 4), (4, 8), (8, 1)]
+    for step, (from_shards, to_shards) in enumerate(layouts):
+        # Удаление записывается в каждый шард, но выгружается один раз
+        manager = open_manager(path, from_shards)
+        manager.log_user_action(1, f"step{step}")
+        assert manager.cleanup_old_data(cutoff_date=datetime.now() + timedelta(seconds=1)) > 0
+
+        copied = reshard(path, from_shards, to_shards)
+        assert copied['export_tombstones'] == step + 1
+
+        manager = open_manager(path, to_shards)
+        assert len(manager.get_export_tombstones()) == step + 1
+        entry = export_delta(manager, manager, exports, fmt='jsonl')
+        assert len(entry['tombstones']) == 1
+        # Перенос не повторяет уже выгруженные удаления
+        assert export_delta(manager, manager, exports, fmt='jsonl')['tombstones'] == []
@@ -0,0 +1,43 @@
+# tests/test_search_feedback.py
+"""
+Поиск по обратной связи (DatabaseManager.search_feedback) с FTS5 и без
+него: регистр и «ё» не влияют на результат
+"""
+import os
+
+import pytest
+
+from database.manager import DatabaseManager
+
+MESSAGES = [
+    "Пропуск в офис выдали только на третий день",
+    "Не нашел ёлку в переговорке",
+    "Wi-Fi в офисе работает медленно",
+]
+
+
+@pytest.fixture(params=[True, False], ids=['fts', 'like'])
+def manager(tmp_path, request):
+    manager = DatabaseManager(os.path.join(tmp_path, "search.db"))
+    if request.param and not manager.fts_enabled:
+        pytest.skip("FTS5 недоступен")
+    manager.fts_enabled = request.param
+    for message in MESSAGES:
+        manager.save_feedback(1, message)
+    return manager
+
+
+@pytest.mark.parametrize('query, expected', [
+    ("пропуск", 0),
+    ("ПРОПУСК офис", 0),
+    ("елку", 1),
+    ("Ёлку", 1),
+    ("wi-fi", 2),
+])
+def test_search_ignores_case_and_yo(manager, query, expected):
+    results = manager.search_feedback(query)['results']
+    assert [result['id'] for result in results] == [expected + 1]
+
+
+def test_search_without_match(manager):
+    assert manager.search_feedback("отпуск")['results'] == []
@@ -0,0 +1,93 @@
+# tests/test_transitions.py
+"""
+Переходы между этапами (DatabaseManager.transition_user): этап не уходит
+назад, журнал stage_transitions не теряет переходов, повторные и
+запоздалые нажатия ничего не меняют, сценарии из кнопок интерфейса
+доводят сотрудника до завершения онбординга
+"""
+import os
+
+import pytest
+
+from bench.transitions_bench import FIRST_USER_ID, JOURNEY, JOURNEYS, build_taps, create_users, replay, verify
+from database.models import STAGE_TRANSITIONS, OnboardingEvent, OnboardingStage, UserStatus
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    def make(users: int):
+        return create_users(os.path.join(tmp_path, f"transitions_{users}.db"), users)
+    return make
+
+
+def test_concurrent_taps_keep_log_consistent(make_manager):
+    users = 100
+    manager = make_manager(users)
+    outcome = replay(manager.transition_user, build_taps(users), threads=4)
+    report = verify(manager, users)
+
+    assert outcome['errors'] == []
+    # to_stage < from_stage
+    assert report['backwards'] == 0
+    # Журнал каждого пользователя - цепочка от 0 до этапа в users
+    assert report['broken'] == 0
+    # Завершение на этапе 10 меняет только статус и не пишется в журнал
+    assert report['logged'] <= len(outcome['applied'])
+
+
+@pytest.mark.parametrize('stage, event', list(STAGE_TRANSITIONS), ids=lambda value: getattr(value, 'value', value))
+def test_every_transition_moves_forward(make_manager, stage, event):
+    manager = make_manager(1)
+    with manager.get_connection() as conn:
+        conn.execute('UPDATE users SET stage = ? WHERE user_id = ?', (stage, FIRST_USER_ID))
+        conn.commit()
+
+    to_stage, status = STAGE_TRANSITIONS[(stage, event)]
+    user = manager.transition_user(FIRST_USER_ID, event)
+
+    assert to_stage >= stage
+    assert user is not None and user.stage == to_stage
+    if status:
+        assert user.status == status
+
+
+def test_duplicate_and_stale_taps_return_none(make_manager):
+    manager = make_manager(1)
+    user_id = FIRST_USER_ID
+
+    for event in JOURNEY[:5]:
+        assert manager.transition_user(user_id, event) is not None
+    assert manager.get_user(user_id).stage == OnboardingStage.DOCUMENTS_COMPLETE
+
+    # Двойное нажатие
+    assert manager.transition_user(user_id, OnboardingEvent.ALL_DOCS_SENT) is None
+    # Кнопки из старых сообщений
+    for event in JOURNEY[:4]:
+        assert manager.transition_user(user_id, event) is None
+    # Кнопка из будущего этапа
+    assert manager.transition_user(user_id, OnboardingEvent.MEETINGS_READ) is None
+
+    user = manager.get_user(user_id)
+    assert (user.stage, user.status) == (OnboardingStage.DOCUMENTS_COMPLETE, UserStatus.PREBOARDED)
+    assert verify(manager, 1)['logged'] == 5
+
+
+@pytest.mark.parametrize('journey', JOURNEYS, ids=range(len(JOURNEYS)))
+def test_journey_reaches_completed(make_manager, journey):
+    manager = make_manager(1)
+    for event in journey:
+        manager.transition_user(FIRST_USER_ID, event)
+
+    user = manager.get_user(FIRST_USER_ID)
+    assert (user.stage, user.status) == (OnboardingStage.COMPLETE, UserStatus.COMPLETED)
+    assert verify(manager, 1)['broken'] == 0
+
+
+def test_shuffled_taps_in_order_complete_every_user(make_manager):
+    users = 40
+    manager = make_manager(users)
+    replay(manager.transition_user, build_taps(users), threads=1)
+    report = verify(manager, users)
+
+    assert report['completed'] == users
+    assert report['broken'] == 0
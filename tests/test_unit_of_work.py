@@ -0,0 +1,108 @@
+# tests/test_unit_of_work.py
+"""
+Единица работы обновления (database/unit_of_work.py): ошибка БД в методе,
+перехваченная обработчиком, откатывает только этот метод; ошибка
+обработчика откатывает все обновление
+"""
+import asyncio
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from database.manager import DatabaseManager
+from database.models import OnboardingEvent, OnboardingStage, UserStatus
+from database.unit_of_work import unit_of_work
+
+USER_ID = 1
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = DatabaseManager(os.path.join(tmp_path, "unit.db"))
+    now = datetime.now()
+    with manager.get_connection() as conn:
+        conn.execute('''
+            INSERT INTO users (user_id, username, status, stage, created_at, updated_at, stage_started_at)
+            VALUES (?, 'user', ?, ?, ?, ?, ?)
+        ''', (USER_ID, UserStatus.ONBOARDING.value, OnboardingStage.EMAIL_ACCESS, now, now, now))
+        conn.commit()
+    return manager
+
+
+def failing_write(manager: DatabaseManager, fired: list):
+    """Метод DatabaseManager, в котором запрос падает после записи"""
+    with manager.get_connection() as conn:
+        conn.execute("INSERT INTO user_actions (user_id, action, details) VALUES (?, 'failed', '')", (USER_ID,))
+        manager._after_commit(lambda: fired.append('failed'))
+        conn.execute('SELECT * FROM missing_table')
+
+
+def actions(manager: DatabaseManager) -> list:
+    return sorted(action.action for action in manager.get_user_actions(USER_ID))
+
+
+def observed(manager: DatabaseManager) -> int:
+    return sum(sketch.count for sketch in manager.stage_durations.sketches.values())
+
+
+def run(handler):
+    asyncio.run(unit_of_work(handler)(None, None))
+
+
+@pytest.mark.parametrize('writes_before', [True, False], ids=['after_writes', 'first_method'])
+def test_caught_method_error_rolls_back_only_that_method(manager, writes_before):
+    fired = []
+    sketched = observed(manager)
+
+    async def handler(update, context):
+        if writes_before:
+            manager.log_user_action(USER_ID, "callback_email_received")
+            manager.transition_user(USER_ID, OnboardingEvent.EMAIL_RECEIVED)
+        with pytest.raises(sqlite3.OperationalError):
+            failing_write(manager, fired)
+        manager.log_user_action(USER_ID, "after_error")
+
+    run(handler)
+
+    assert fired == []
+    if writes_before:
+        assert actions(manager) == ['after_error', 'callback_email_received']
+        assert manager.get_user(USER_ID).stage == OnboardingStage.TEAM_INTRO
+        # Отложенное действие перехода выполнено после фиксации
+        assert observed(manager) == sketched + 1
+    else:
+        assert actions(manager) == ['after_error']
+
+
+def test_handler_error_rolls_back_whole_update(manager):
+    sketched = observed(manager)
+
+    async def handler(update, context):
+        manager.log_user_action(USER_ID, "callback_email_received")
+        manager.transition_user(USER_ID, OnboardingEvent.EMAIL_RECEIVED)
+        raise RuntimeError("handler failed")
+
+    with pytest.raises(RuntimeError):
+        run(handler)
+
+    assert actions(manager) == []
+    assert manager.get_user(USER_ID).stage == OnboardingStage.EMAIL_ACCESS
+    assert observed(manager) == sketched
+
+
+def test_writes_before_await_survive_later_method_error(manager):
+    fired = []
+
+    async def handler(update, context):
+        manager.log_user_action(USER_ID, "before_await")
+        await asyncio.sleep(0)
+        manager.log_user_action(USER_ID, "after_await")
+        with pytest.raises(sqlite3.OperationalError):
+            failing_write(manager, fired)
+
+    run(handler)
+
+    assert fired == []
+    assert actions(manager) == ['after_await', 'before_await']
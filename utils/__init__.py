@@ -1,19 +1,26 @@
 # utils/__init__.py
 """
 Модуль утилит и вспомогательных функций
+
+Модули загружаются при первом обращении к их именам: экспорт, например,
+открывает БД, а для настройки логирования она не нужна.
 """
+import importlib
+
+_EXPORTS = {
+    'setup_logging': 'helpers', 'format_datetime': 'helpers', 'truncate_text': 'helpers',
+    'create_progress_bar': 'helpers', 'validate_email': 'helpers', 'validate_telegram_username': 'helpers',
+    'safe_int': 'helpers', 'safe_float': 'helpers', 'save_json': 'helpers', 'load_json': 'helpers',
+    'format_user_info': 'helpers', 'rate_limit_check': 'helpers',
+    'export_data': 'export', 'export_analytics_report': 'export',
+    'validate_config_file': 'validators', 'get_validation_summary': 'validators',
+}
+
+__all__ = list(_EXPORTS)
 
-from .helpers import (
-    setup_logging, format_datetime, truncate_text, create_progress_bar,
-    validate_email, validate_telegram_username, safe_int, safe_float,
-    save_json, load_json, format_user_info, rate_limit_check
-)
-from .export import export_data, export_analytics_report
-from .validators import validate_config_file, get_validation_summary
 
-__all__ = [
-    'setup_logging', 'format_datetime', 'truncate_text', 'create_progress_bar',
-    'validate_email', 'validate_telegram_username', 'safe_int', 'safe_float',
-    'save_json', 'load_json', 'format_user_info', 'rate_limit_check',
-    'export_data', 'export_analytics_report', 'validate_config_file', 'get_validation_summary'
-]
\ No newline at end of file
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f'.{module}', __name__), name)
@@ -0,0 +1,153 @@
+# utils/columnar.py
+"""
+Колоночная выгрузка таблиц для BI: Parquet или Arrow IPC (нужен pyarrow)
+
+Таблицы users, feedback и user_actions читаются курсором пачками
+(DatabaseManager.iter_table_batches) и пишутся пачка за пачкой, в памяти
+не бывает больше одной пачки. Столбцы типизированы: целые, строки,
+время (timestamp, микросекунды); status и action хранятся как словарь
+значений. Словарь общий для всех пачек файла и только дополняется,
+поэтому пачки Arrow IPC несут лишь новые значения (дельты словаря).
+Файлы сжимаются (zstd по умолчанию) и пишутся во временный файл, который
+переименовывается после записи последней пачки.
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Форматы и расширения файлов
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Столбцы таблиц и их типы. next_reminder_at не выгружается: это очередь напоминаний бота,
+# она меняется без updated_at (claim_due_reminders) и в инкрементальной выгрузке устаревала бы
+TABLE_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    'users': [
+        ('user_id', 'int64'), ('username', 'string'), ('full_name', 'string'), ('position', 'string'),
+        ('status', 'dictionary'), ('stage', 'int8'), ('created_at', 'timestamp'), ('updated_at', 'timestamp'),
+        ('stage_started_at', 'timestamp'),
+    ],
+    'feedback': [
+        ('id', 'int64'), ('user_id', 'int64'), ('message', 'string'), ('created_at', 'timestamp'),
+    ],
+    'user_actions': [
+        ('id', 'int64'), ('user_id', 'int64'), ('action', 'dictionary'), ('details', 'string'),
+        ('created_at', 'timestamp'),
+    ],
+}
+
+# Строк в пачке (и в группе строк Parquet)
+BATCH_SIZE = 100_000
+
+
+def _arrow_type(kind: str):
+    import pyarrow as pa
+
+    return {
+        'int64': pa.int64(),
+        'int8': pa.int8(),
+        'string': pa.string(),
+        'timestamp': pa.timestamp('us'),
+        'dictionary': pa.dictionary(pa.int32(), pa.string()),
+    }[kind]
+
+
+def table_schema(table: str):
+    """Схема Arrow таблицы"""
+    import pyarrow as pa
+
+    return pa.schema([(name, _arrow_type(kind)) for name, kind in TABLE_COLUMNS[table]])
+
+
+class _Dictionary:
+    """Словарь значений столбца, общий для всех пачек одного файла"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, column):
+        import pyarrow as pa
+
+        # Пачка кодируется своим словарем в Arrow, в Python переводятся только ее различные значения
+        local = pa.array(column, pa.string()).dictionary_encode()
+        mapping = []
+        for value in local.dictionary.to_pylist():
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+            mapping.append(code)
+        indices = pa.array(mapping, pa.int32()).take(local.indices)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(self.values, pa.string()))
+
+
+def _record_batch(schema, kinds: List[str], dictionaries: Dict[int, _Dictionary], rows: List[tuple]):
+    import pyarrow as pa
+
+    arrays = []
+    for position, (column, kind) in enumerate(zip(zip(*rows), kinds)):
+        if kind == 'dictionary':
+            arrays.append(dictionaries[position].encode(column))
+        elif kind == 'timestamp':
+            # sqlite3 хранит время строкой ISO 8601 ("2024-05-01 09:30:00[.ffffff]")
+            arrays.append(pa.array(column, pa.string()).cast(pa.timestamp('us')))
+        else:
+            arrays.append(pa.array(column, schema.field(position).type))
+    return pa.record_batch(arrays, schema=schema)
+
+
+def write_table(manager, table: str, path: str, fmt: str = 'parquet', compression: str = 'zstd',
+                batch_size: int = BATCH_SIZE, after: Any = None, until: Any = None) -> int:
+    """Выгрузить таблицу в файл path; вернуть количество строк
+
+    after/until выбирают строки по столбцу отметки таблицы (см.
+    DatabaseManager.iter_table_batches).
+    """
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+
+    schema = table_schema(table)
+    columns = [name for name, _ in TABLE_COLUMNS[table]]
+    kinds = [kind for _, kind in TABLE_COLUMNS[table]]
+    dictionaries = {position: _Dictionary() for position, kind in enumerate(kinds) if kind == 'dictionary'}
+
+    temp_path = f"{path}.tmp"
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(temp_path, schema, compression=compression)
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=compression, emit_dictionary_deltas=True)
+        writer = pa.ipc.new_file(temp_path, schema, options=options)
+
+    rows_written = 0
+    try:
+        for rows in manager.iter_table_batches(table, columns, batch_size, after, until):
+            writer.write_batch(_record_batch(schema, kinds, dictionaries, rows))
+            rows_written += len(rows)
+    except Exception:
+        writer.close()
+        os.remove(temp_path)
+        raise
+    writer.close()
+    os.replace(temp_path, path)
+    return rows_written
+
+
+def export_columnar(manager, timestamp: str, fmt: str = 'parquet', directory: str = "data/exports",
+                    compression: str = 'zstd', tables: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Выгрузить таблицы в directory; вернуть по таблицам файл, строки, размер и время"""
+    result = {}
+    for table in tables or TABLE_COLUMNS:
+        path = os.path.join(directory, f"{table}_{timestamp}{COLUMNAR_FORMATS[fmt]}")
+        started = time.perf_counter()
+        rows = write_table(manager, table, path, fmt, compression)
+        result[table] = {
+            'path': path,
+            'rows': rows,
+            'bytes': os.path.getsize(path),
+            'seconds': time.perf_counter() - started,
+        }
+    return result
@@ -0,0 +1,181 @@
+# utils/delta_export.py
+"""
+Инкрементальная выгрузка: только строки, созданные или измененные после
+прошлой выгрузки, и удаления (tombstone-ы)
+
+Отметка таблицы - максимум ее столбца отметки (DatabaseManager.
+EXPORT_TABLES: id для feedback и user_actions, updated_at для users) на
+момент выгрузки; она хранится в таблице export_state вместе с номером
+выгрузки. Следующая выгрузка берет строки между прошлой и новой
+отметкой, поэтому ее время зависит от числа изменений, а не от размера
+истории. Удаления старых действий (cleanup_old_data) записываются в
+export_tombstones условием, по которому удалены строки. Выгружаются только
+столбцы users, которые меняются вместе с updated_at (next_reminder_at -
+нет, см. utils/columnar.py).
+
+Каждая выгрузка - каталог <номер>/ с файлом на таблицу; manifest.json
+перечисляет выгрузки по порядку: для каждой - файлы, число строк, ключ
+таблицы, границы отметок и tombstone-ы. Потребитель применяет выгрузки
+по возрастанию номера, в каждой - сначала tombstone-ы, затем строки как
+upsert по ключу. Первая выгрузка (full) содержит таблицы целиком.
+
+Окно перед прошлой отметкой выгружается повторно: updated_at ставится
+до фиксации записи, а id действий при шардах выдаются до записи в шард,
+поэтому строка может появиться в БД позже строк с большей отметкой.
+Повторы безопасны, так как строки применяются по ключу.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from database.manager import EXPORT_TABLES
+
+DELTA_DIRECTORY = "data/exports/delta"
+
+# Форматы файлов выгрузки: колоночные (utils/columnar.py, нужен pyarrow) и JSON Lines
+DELTA_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow', 'jsonl': '.jsonl'}
+
+# Ключ строк таблицы для upsert у потребителя
+TABLE_KEYS = {'users': 'user_id', 'feedback': 'id', 'user_actions': 'id'}
+
+# Повторно выгружаемое окно перед прошлой отметкой
+UPDATED_AT_OVERLAP = timedelta(seconds=60)
+SHARDED_ID_OVERLAP = 1000
+
+MANIFEST_VERSION = 1
+
+
+def _lower_bound(manager, table: str, previous: Any) -> Any:
+    """Нижняя граница отметки с окном повтора"""
+    if previous is None:
+        return None
+    if EXPORT_TABLES[table] == 'updated_at':
+        return (datetime.fromisoformat(previous) - UPDATED_AT_OVERLAP).isoformat(' ')
+    if getattr(manager, 'shards', None) and table != 'feedback':
+        return max(0, previous - SHARDED_ID_OVERLAP)
+    return previous
+
+
+def _write_jsonl(manager, table: str, path: str, after: Any, until: Any) -> int:
+    from utils.columnar import TABLE_COLUMNS
+
+    columns = [name for name, _ in TABLE_COLUMNS[table]]
+    rows_written = 0
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        for rows in manager.iter_table_batches(table, columns, after=after, until=until):
+            f.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows)
+            rows_written += len(rows)
+    os.replace(temp_path, path)
+    return rows_written
+
+
+def _write_json_atomic(data: Dict[str, Any], path: str):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def load_manifest(directory: str = DELTA_DIRECTORY) -> Dict[str, Any]:
+    """Манифест выгрузок каталога (пустой, если выгрузок еще не было)"""
+    path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(path):
+        return {
+            'version': MANIFEST_VERSION,
+            'apply': "по возрастанию sequence; в выгрузке сначала tombstones, затем строки таблиц как upsert по key",
+            'deltas': [],
+        }
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def export_delta(manager, state_manager, directory: str = DELTA_DIRECTORY, fmt: str = 'parquet',
+                 compression: str = 'zstd') -> Dict[str, Any]:
+    """Выгрузить изменения после прошлой выгрузки; вернуть запись манифеста
+
+    manager - откуда читаются строки (копия БД для аналитики),
+    state_manager - где хранится состояние выгрузки (основная БД).
+    Состояние сохраняется после записи файлов и манифеста: если выгрузка
+    прервалась, следующая повторит ее под тем же номером, заменив ее
+    файлы и запись манифеста.
+    """
+    if fmt not in DELTA_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+
+    state = state_manager.get_export_state()
+    sequence = int(state.get('sequence') or 0) + 1
+    high = manager.get_export_high_watermarks()
+    tombstones = manager.get_export_tombstones(state.get('tombstones'))
+
+    delta_name = f"{sequence:06d}"
+    os.makedirs(os.path.join(directory, delta_name), exist_ok=True)
+
+    tables = {}
+    new_state: Dict[str, Any] = {'sequence': sequence}
+    for table, column in EXPORT_TABLES.items():
+        previous = state.get(table)
+        after = _lower_bound(manager, table, previous)
+        until = high[table]
+        file_name = os.path.join(delta_name, f"{table}{DELTA_FORMATS[fmt]}")
+        path = os.path.join(directory, file_name)
+
+        if fmt == 'jsonl':
+            rows = _write_jsonl(manager, table, path, after, until)
+        else:
+            from utils.columnar import write_table
+
+            rows = write_table(manager, table, path, fmt, compression, after=after, until=until)
+
+        tables[table] = {
+            'file': file_name,
+            'rows': rows,
+            'key': TABLE_KEYS[table],
+            'watermark': {'column': column, 'after': after, 'until': until},
+        }
+        new_state[table] = until if previous is None or (until is not None and until > previous) else previous
+
+    if tombstones:
+        new_state['tombstones'] = tombstones[-1]['recorded_at']
+
+    entry = {
+        'sequence': sequence,
+        'created_at': datetime.now().isoformat(),
+        'full': all(state.get(table) is None for table in EXPORT_TABLES),
+        'format': fmt,
+        'tables': tables,
+        'tombstones': [
+            {'table': tombstone['table'], 'condition': tombstone['condition'], 'value': tombstone['value']}
+            for tombstone in tombstones
+        ],
+    }
+    manifest = load_manifest(directory)
+    # Выгрузка, прерванная после записи манифеста, повторяется под тем же номером: ее запись заменяется
+    manifest['deltas'] = [delta for delta in manifest['deltas'] if delta['sequence'] != sequence]
+    manifest['deltas'].append(entry)
+    _write_json_atomic(manifest, os.path.join(directory, "manifest.json"))
+
+    state_manager.save_export_state(new_state)
+    return entry
+
+
+def read_delta_rows(directory: str, entry: Dict[str, Any], table: str) -> List[Dict[str, Any]]:
+    """Строки таблицы из выгрузки (время - строками, как в БД)"""
+    path = os.path.join(directory, entry['tables'][table]['file'])
+    if entry['format'] == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if entry['format'] == 'parquet':
+        loaded = pq.read_table(path)
+    else:
+        with pa.memory_map(path) as source:
+            loaded = pa.ipc.open_file(source).read_all()
+    return [
+        {name: value.isoformat(' ') if isinstance(value, datetime) else value for name, value in row.items()}
+        for row in loaded.to_pylist()
+    ]
@@ -1,6 +1,8 @@
 # utils/export.py
 """
 Утилиты для экспорта данных OnboardingBuddy
+
+Данные читаются из копии БД для аналитики (database/replica.py).
 """
 import csv
 import json
@@ -8,19 +10,35 @@ import os
 from datetime import datetime
 from typing import Dict, List, Any
 
-from database.manager import db_manager
+from database.replica import analytics_db
+from services.analytics import get_onboarding_analytics
 from utils.helpers import save_json, create_data_directory_structure
 
 
-def export_data():
-    """Основная функция экспорта данных"""
+def export_data(fmt: str = 'json', incremental: bool = False):
+    """Основная функция экспорта данных
+
+    fmt: 'json' - JSON, CSV и отчет; 'parquet' или 'arrow' - колоночные
+    файлы таблиц для BI (utils/columnar.py). incremental - только
+    изменения после прошлой выгрузки (utils/delta_export.py).
+    """
     print("📤 Начинаем экспорт данных OnboardingBuddy...")
 
     # Создаем директории если нужно
     create_data_directory_structure()
 
+    if incremental:
+        if export_incremental(fmt):
+            print("✅ Экспорт данных завершен успешно!")
+        return
+
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 
+    if fmt != 'json':
+        if export_to_columnar(timestamp, fmt):
+            print("✅ Экспорт данных завершен успешно!")
+        return
+
     try:
         # Экспорт в JSON
         json_success = export_to_json(timestamp)
@@ -44,7 +62,7 @@ def export_to_json(timestamp: str) -> bool:
 
     try:
         # Получаем все данные
-        export_data = db_manager.export_to_dict()
+        export_data = analytics_db.export_to_dict()
 
         # Добавляем метаданные
         export_data['export_info'] = {
@@ -72,6 +90,62 @@ def export_to_json(timestamp: str) -> bool:
         return False
 
 
+def export_to_columnar(timestamp: str, fmt: str = 'parquet') -> bool:
+    """Экспорт таблиц в Parquet или Arrow IPC"""
+    from utils.columnar import COLUMNAR_FORMATS, export_columnar
+
+    if fmt not in COLUMNAR_FORMATS:
+        print(f"❌ Неизвестный формат: {fmt} (доступны: json, {', '.join(COLUMNAR_FORMATS)})")
+        return False
+
+    print(f"🧱 Экспорт в {fmt}...")
+
+    try:
+        files = export_columnar(analytics_db, timestamp, fmt)
+    except ImportError:
+        print("❌ Для экспорта в Parquet/Arrow нужен pyarrow: pip install pyarrow")
+        return False
+    except Exception as e:
+        print(f"❌ Ошибка экспорта в {fmt}: {e}")
+        return False
+
+    for table, info in files.items():
+        print(f"✅ {table}: {info['path']} ({info['rows']} записей, "
+              f"{info['bytes'] / 1024:.0f} КБ, {info['seconds']:.1f} с)")
+    return True
+
+
+def export_incremental(fmt: str = 'parquet') -> bool:
+    """Инкрементальная выгрузка изменений после прошлой выгрузки"""
+    from database.manager import db_manager
+    from utils.delta_export import DELTA_DIRECTORY, DELTA_FORMATS, export_delta
+
+    # JSON выгружается построчно (JSON Lines), чтобы файлы можно было дописывать и читать потоком
+    fmt = 'jsonl' if fmt == 'json' else fmt
+    if fmt not in DELTA_FORMATS:
+        print(f"❌ Неизвестный формат: {fmt} (доступны: json, {', '.join(DELTA_FORMATS)})")
+        return False
+
+    print(f"🧩 Инкрементальный экспорт в {fmt}...")
+
+    try:
+        entry = export_delta(analytics_db, db_manager, DELTA_DIRECTORY, fmt)
+    except ImportError:
+        print("❌ Для экспорта в Parquet/Arrow нужен pyarrow: pip install pyarrow")
+        return False
+    except Exception as e:
+        print(f"❌ Ошибка инкрементального экспорта: {e}")
+        return False
+
+    kind = "полная" if entry['full'] else "изменения"
+    print(f"✅ Выгрузка №{entry['sequence']} ({kind}), манифест: {DELTA_DIRECTORY}/manifest.json")
+    for table, info in entry['tables'].items():
+        print(f"✅ {table}: {DELTA_DIRECTORY}/{info['file']} ({info['rows']} записей)")
+    if entry['tombstones']:
+        print(f"🪦 Удалений: {len(entry['tombstones'])}")
+    return True
+
+
 def export_to_csv(timestamp: str) -> bool:
     """Экспорт данных в CSV файлы"""
     print("📊 Экспорт в CSV формат...")
@@ -106,7 +180,7 @@ def export_to_csv(timestamp: str) -> bool:
 def export_users_csv(timestamp: str) -> bool:
     """Экспорт пользователей в CSV"""
     try:
-        users = db_manager.get_all_users()
+        users = analytics_db.get_all_users()
         filename = f"data/exports/users_{timestamp}.csv"
 
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
@@ -144,7 +218,7 @@ def export_users_csv(timestamp: str) -> bool:
 def export_feedback_csv(timestamp: str) -> bool:
     """Экспорт обратной связи в CSV"""
     try:
-        feedback_list = db_manager.get_recent_feedback(limit=1000)  # Все фидбеки
+        feedback_list = analytics_db.get_recent_feedback(limit=1000)  # Все фидбеки
         filename = f"data/exports/feedback_{timestamp}.csv"
 
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
@@ -186,7 +260,7 @@ def export_actions_csv(timestamp: str) -> bool:
         filename = f"data/exports/user_actions_{timestamp}.csv"
 
         # Получаем популярные действия как пример
-        popular_actions = db_manager.get_popular_actions(days=30, limit=100)
+        popular_actions = analytics_db.get_popular_actions(days=30, limit=100)
 
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
             writer = csv.writer(csvfile)
@@ -213,8 +287,8 @@ def export_actions_csv(timestamp: str) -> bool:
 def export_statistics_csv(timestamp: str) -> bool:
     """Экспорт статистики в CSV"""
     try:
-        stats = db_manager.get_user_statistics()
-        daily_activity = db_manager.get_daily_activity(days=30)
+        stats = analytics_db.get_user_statistics()
+        daily_activity = analytics_db.get_daily_activity(days=30)
 
         # Общая статистика
         stats_filename = f"data/exports/statistics_{timestamp}.csv"
@@ -259,7 +333,7 @@ def create_export_report(timestamp: str, json_success: bool, csv_success: bool):
     try:
         report_filename = f"data/exports/export_report_{timestamp}.txt"
 
-        stats = db_manager.get_user_statistics()
+        stats = analytics_db.get_user_statistics()
 
         report_content = f"""
 OnboardingBuddy - Отчет об экспорте данных
@@ -346,11 +420,11 @@ CSV файлы: Отдельные таблицы для анализа в Excel
 def export_user_data(user_id: int) -> Dict[str, Any]:
     """Экспорт данных конкретного пользователя"""
     try:
-        user = db_manager.get_user(user_id)
+        user = analytics_db.get_user(user_id)
         if not user:
             return {}
 
-        actions = db_manager.get_user_actions(user_id, limit=100)
+        actions = analytics_db.get_user_actions(user_id, limit=100)
 
         user_data = {
             'user_info': user.to_dict(),
@@ -373,29 +447,12 @@ def export_analytics_report() -> bool:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"data/exports/analytics_report_{timestamp}.json"
 
-        stats = db_manager.get_user_statistics()
-        daily_activity = db_manager.get_daily_activity(days=30)
-        popular_actions = db_manager.get_popular_actions(days=30, limit=20)
-
-        # Анализ конверсии
-        total_users = stats['total_users']
-        status_stats = stats['status_stats']
-
-        conversion_funnel = {}
-        if total_users > 0:
-            conversion_funnel = {
-                'registration_to_preboarding': (
-                        sum(status_stats.get(s, 0) for s in ['preboarding', 'preboarded', 'onboarding', 'completed'])
-                        / total_users * 100
-                ),
-                'preboarding_to_onboarding': (
-                        sum(status_stats.get(s, 0) for s in ['onboarding', 'completed'])
-                        / total_users * 100
-                ),
-                'onboarding_to_completion': (
-                        status_stats.get('completed', 0) / total_users * 100
-                )
-            }
+        stats = analytics_db.get_user_statistics()
+        daily_activity = analytics_db.get_daily_activity(days=30)
+        popular_actions = analytics_db.get_popular_actions(days=30, limit=20)
+
+        # Воронка, когорты и время до этапов по всей истории действий
+        report = get_onboarding_analytics().report()
 
         # Активность по дням недели
         weekday_activity = {}
@@ -428,7 +485,8 @@ def export_analytics_report() -> bool:
                 'generated_at': datetime.now().isoformat()
             },
             'summary': stats,
-            'conversion_funnel': conversion_funnel,
+            'conversion_funnel': report['funnel'],
+            'cohorts': report['cohorts'],
             'daily_activity': daily_activity,
             'weekday_activity': weekday_activity,
             'popular_actions': popular_actions
@@ -2,41 +2,64 @@
 """
 Вспомогательные функции для OnboardingBuddy
 """
+import atexit
 import logging
 import os
 import json
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from config.settings import settings
+from utils.log_pipeline import LogPipeline, JsonFormatter, TEXT_FORMAT, create_file_handler
 
+# Текущая очередь логов (создается в setup_logging)
+_log_pipeline: Optional[LogPipeline] = None
 
-def setup_logging():
-    """Настройка системы логирования"""
+
+def setup_logging() -> LogPipeline:
+    """Настройка системы логирования
+
+    Записи из обработчиков попадают в очередь, а в файл (с ротацией)
+    и консоль их пишет отдельный поток, не блокируя цикл событий.
+    """
+    global _log_pipeline
 
     # Создаем директорию для логов если её нет
     log_dir = os.path.dirname(settings.LOG_FILE)
     os.makedirs(log_dir, exist_ok=True)
 
     # Настройка формата логов
-    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    formatter = JsonFormatter() if settings.LOG_JSON else logging.Formatter(TEXT_FORMAT)
 
     # Настройка уровня логирования
     log_level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
 
-    # Конфигурация логирования
-    logging.basicConfig(
-        level=log_level,
-        format=log_format,
-        handlers=[
-            logging.FileHandler(settings.LOG_FILE, encoding='utf-8'),
-            logging.StreamHandler()
-        ]
+    file_handler = create_file_handler(
+        settings.LOG_FILE, settings.LOG_MAX_BYTES, settings.LOG_BACKUP_COUNT, settings.LOG_ROTATE_WHEN
     )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    # Повторный вызов заменяет предыдущую конфигурацию
+    root = logging.getLogger()
+    if _log_pipeline is not None:
+        _log_pipeline.stop(root)
+    root.setLevel(log_level)
+
+    _log_pipeline = LogPipeline(
+        [file_handler, stream_handler],
+        sample_rate=settings.LOG_SAMPLE_RATE,
+        sample_burst=settings.LOG_SAMPLE_BURST
+    )
+    _log_pipeline.start(root)
+    atexit.register(_log_pipeline.stop, root)
 
     # Устанавливаем уровень для библиотек
     logging.getLogger('httpx').setLevel(logging.WARNING)
     logging.getLogger('telegram').setLevel(logging.WARNING)
 
+    return _log_pipeline
+
 
 def format_datetime(dt: datetime, format_type: str = 'full') -> str:
     """Форматирование даты и времени"""
@@ -413,7 +436,8 @@ def get_system_info() -> Dict[str, Any]:
     return {
         'platform': platform.platform(),
         'python_version': platform.python_version(),
-        'cpu_percent': psutil.cpu_percent(interval=1),
+        # Загрузка с момента предыдущего вызова, без блокирующего ожидания
+        'cpu_percent': psutil.cpu_percent(interval=None),
         'memory_percent': psutil.virtual_memory().percent,
         'disk_usage': psutil.disk_usage('/').percent if os.name != 'nt' else psutil.disk_usage('C:').percent
     }
\ No newline at end of file
@@ -0,0 +1,149 @@
+# utils/log_pipeline.py
+"""
+Асинхронная запись логов: QueueHandler в потоке вызова, запись в файл
+и консоль в отдельном потоке QueueListener
+
+Вызов logger.info в обработчике только кладет запись в очередь и не ждет
+диска. Файл ротируется по размеру или по времени, формат - текст или JSON.
+Частые INFO/DEBUG-сообщения из одного места кода прореживаются.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Стандартные атрибуты LogRecord, не попадающие в JSON как дополнительные поля
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись лога - один JSON-объект в строке"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+        }
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exception'] = record.exc_text
+
+        # Поля, переданные через extra=...
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in data:
+                data[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+
+        return json.dumps(data, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Прореживание частых сообщений уровня ниже WARNING
+
+    Ключ - место вызова (файл и строка), поэтому f-строки с разными
+    значениями считаются одним сообщением. За интервал с каждого места
+    пропускаются первые burst записей, дальше - каждая 1/rate-я. Число
+    пропущенных дописывается к следующей записанной.
+    """
+
+    def __init__(self, rate: float = 0.1, burst: int = 20, interval: float = 60.0):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self.burst = burst
+        self.interval = interval
+        self.window_start = time.monotonic()
+        self.counts: Dict[tuple, int] = {}
+        self.suppressed: Dict[tuple, int] = {}
+        self.total_suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.interval:
+                self.window_start = now
+                self.counts.clear()
+
+            count = self.counts.get(key, 0) + 1
+            self.counts[key] = count
+
+            if count > self.burst and (not self.every or (count - self.burst) % self.every):
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                self.total_suppressed += 1
+                return False
+
+            skipped = self.suppressed.pop(key, 0)
+
+        if skipped:
+            record.msg = f"{record.getMessage()} [пропущено похожих: {skipped}]"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который при переполнении очереди отбрасывает записи, а не блокирует поток"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def create_file_handler(path: str, max_bytes: int, backup_count: int, when: str = '') -> logging.Handler:
+    """Файловый обработчик с ротацией по времени (when) или по размеру"""
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding='utf-8'
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+
+
+class LogPipeline:
+    """Очередь логов и поток, записывающий их в конечные обработчики"""
+
+    def __init__(self, handlers: List[logging.Handler], sample_rate: float = 1.0, sample_burst: int = 20,
+                 max_queue: int = 100_000):
+        self.queue: queue.Queue = queue.Queue(max_queue)
+        self.queue_handler = DroppingQueueHandler(self.queue)
+        self.sampling: Optional[SamplingFilter] = None
+        if sample_rate < 1.0:
+            self.sampling = SamplingFilter(sample_rate, sample_burst)
+            self.queue_handler.addFilter(self.sampling)
+
+        self.handlers = handlers
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+    def start(self, logger: logging.Logger = None):
+        """Подключить очередь к логгеру (по умолчанию корневому) и запустить поток записи"""
+        (logger or logging.getLogger()).addHandler(self.queue_handler)
+        self.listener.start()
+
+    def stop(self, logger: logging.Logger = None):
+        """Отключить очередь и дописать оставшиеся записи"""
+        (logger or logging.getLogger()).removeHandler(self.queue_handler)
+        if self.listener._thread is None:
+            return
+        self.listener.stop()
+        for handler in self.handlers:
+            handler.close()